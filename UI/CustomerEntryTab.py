@@ -30,7 +30,7 @@ class CustomerEntryTab(QWidget):
         header = QHBoxLayout()
         self.searchBox = QLineEdit(); self.searchBox.setPlaceholderText('Tìm theo tên hoặc CMND/CCCD')
         btnSearch = QPushButton('Tìm'); btnSearch.clicked.connect(self.search_customers)
-        btnImport = QPushButton('Import CSV (100)'); btnImport.clicked.connect(self.import_csv_sample)
+        self.btnImport = btnImport = QPushButton('Import CSV / Parquet'); btnImport.clicked.connect(self.import_csv_sample)
         header.addWidget(self.searchBox)
         header.addWidget(btnSearch)
         header.addWidget(btnImport)
@@ -139,53 +139,39 @@ class CustomerEntryTab(QWidget):
         self.spnAge.setValue(float(c.AGE or 0))
 
     def import_csv_sample(self):
-        from pathlib import Path
-        import pandas as pd
+        from PyQt6.QtWidgets import QFileDialog
+        from services.customer_import import CustomerImportService
+        from ui.task_executor import get_task_executor
         root = Path(__file__).resolve().parents[1]
         csv = root / 'MLBA_FinalProject' / 'UCI_Credit_Card_12months.csv'
-        if not csv.exists():
-            self.lblStatus.setText('Không thấy CSV 12 tháng')
+        path, _ = QFileDialog.getOpenFileName(
+            self, 'Chọn file khách hàng', str(csv if csv.exists() else root),
+            'CSV / Parquet (*.csv *.csv.gz *.parquet)'
+        )
+        if not path:
             return
-        try:
-            df = pd.read_csv(csv)
-            df = df.head(100)
+
+        def run(progress=None, cancel_token=None):
             db = get_db_connector()
-            qs = get_query_service(db)
-            count = 0
-            for _, r in df.iterrows():
-                name = r.get('FULL NAME') if 'FULL NAME' in df.columns else None
-                cid = r.get('CITIZEN ID') if 'CITIZEN ID' in df.columns else None
-                customer = Customer(
-                    customer_name=str(name) if name is not None else None,
-                    customer_id_card=str(cid) if cid is not None else None,
-                    LIMIT_BAL=float(r['LIMIT_BAL']) if 'LIMIT_BAL' in df.columns else 0.0,
-                    SEX=int(r['SEX']), EDUCATION=int(r['EDUCATION']), MARRIAGE=int(r['MARRIAGE']), AGE=int(r['AGE']),
-                    PAY_0=int(r['PAY_0']), PAY_2=int(r['PAY_2']), PAY_3=int(r['PAY_3']), PAY_4=int(r['PAY_4']), PAY_5=int(r['PAY_5']), PAY_6=int(r['PAY_6']),
-                    PAY_7=int(r['PAY_7']) if 'PAY_7' in df.columns else 0,
-                    PAY_8=int(r['PAY_8']) if 'PAY_8' in df.columns else 0,
-                    PAY_9=int(r['PAY_9']) if 'PAY_9' in df.columns else 0,
-                    PAY_10=int(r['PAY_10']) if 'PAY_10' in df.columns else 0,
-                    PAY_11=int(r['PAY_11']) if 'PAY_11' in df.columns else 0,
-                    PAY_12=int(r['PAY_12']) if 'PAY_12' in df.columns else 0,
-                    BILL_AMT1=float(r['BILL_AMT1']), BILL_AMT2=float(r['BILL_AMT2']), BILL_AMT3=float(r['BILL_AMT3']), BILL_AMT4=float(r['BILL_AMT4']), BILL_AMT5=float(r['BILL_AMT5']), BILL_AMT6=float(r['BILL_AMT6']),
-                    BILL_AMT7=float(r['BILL_AMT7']) if 'BILL_AMT7' in df.columns else 0,
-                    BILL_AMT8=float(r['BILL_AMT8']) if 'BILL_AMT8' in df.columns else 0,
-                    BILL_AMT9=float(r['BILL_AMT9']) if 'BILL_AMT9' in df.columns else 0,
-                    BILL_AMT10=float(r['BILL_AMT10']) if 'BILL_AMT10' in df.columns else 0,
-                    BILL_AMT11=float(r['BILL_AMT11']) if 'BILL_AMT11' in df.columns else 0,
-                    BILL_AMT12=float(r['BILL_AMT12']) if 'BILL_AMT12' in df.columns else 0,
-                    PAY_AMT1=float(r['PAY_AMT1']), PAY_AMT2=float(r['PAY_AMT2']), PAY_AMT3=float(r['PAY_AMT3']), PAY_AMT4=float(r['PAY_AMT4']), PAY_AMT5=float(r['PAY_AMT5']), PAY_AMT6=float(r['PAY_AMT6']),
-                    PAY_AMT7=float(r['PAY_AMT7']) if 'PAY_AMT7' in df.columns else 0,
-                    PAY_AMT8=float(r['PAY_AMT8']) if 'PAY_AMT8' in df.columns else 0,
-                    PAY_AMT9=float(r['PAY_AMT9']) if 'PAY_AMT9' in df.columns else 0,
-                    PAY_AMT10=float(r['PAY_AMT10']) if 'PAY_AMT10' in df.columns else 0,
-                    PAY_AMT11=float(r['PAY_AMT11']) if 'PAY_AMT11' in df.columns else 0,
-                    PAY_AMT12=float(r['PAY_AMT12']) if 'PAY_AMT12' in df.columns else 0,
-                )
-                if qs.save_customer(customer):
-                    count += 1
-            db.close()
-            self.lblStatus.setText(f'Đã import {count} khách hàng')
+            try:
+                return CustomerImportService(db).import_file(path, progress=progress, cancel_token=cancel_token)
+            finally:
+                db.close()
+
+        def done(stats):
+            msg = f"Đã import {stats['rows']:,} khách hàng ({stats['rows_per_sec']:,.0f} dòng/s)"
+            if stats['rejected']:
+                msg += f", loại {stats['rejected']:,} dòng → {stats['rejects_path']}"
+            self.lblStatus.setText(msg)
             self.search_customers()
-        except Exception:
-            self.lblStatus.setText('Import lỗi')
+
+        self.btnImport.setEnabled(False)
+        self.lblStatus.setText('Đang import...')
+        self._import_task = get_task_executor().submit(
+            run,
+            name='customer_import',
+            on_progress=lambda pct, msg: self.lblStatus.setText(f'Đang import {pct}% - {msg}'),
+            on_result=done,
+            on_error=lambda e: self.lblStatus.setText(f'Import lỗi: {e}'),
+            on_finished=lambda: self.btnImport.setEnabled(True),
+        )
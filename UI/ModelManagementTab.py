@@ -1,11 +1,33 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QTextEdit
-from PyQt6.QtCore import QProcess
+from PyQt6.QtCore import QProcess, QObject, pyqtSignal
 import subprocess, sys
 from pathlib import Path
+base_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(base_dir))
+try:
+    from .integration import get_db_connector
+except Exception:
+    from integration import get_db_connector
+
+# Tên hiển thị -> tên model của ModelManagementService._create_model
+SERVICE_NAMES = {'Random Forest': 'RandomForest', 'Neural Net': 'Neural Network'}
+JOB_COLUMNS = ['Job', 'Model', 'Trạng thái', 'Tiến độ', 'Round', 'AUC']
+
+
+class _JobBridge(QObject):
+    """Chuyển cập nhật job từ thread monitor của TrainingJobRunner sang GUI thread"""
+    changed = pyqtSignal(dict)
+
 
 class ModelManagementTab(QWidget):
-    def __init__(self):
+    def __init__(self, username: str = 'admin'):
         super().__init__()
+        self.username = username
+        self._runner = None
+        self._splits = None
+        self._job_rows = {}
+        self._bridge = _JobBridge()
+        self._bridge.changed.connect(self._on_job_changed)
         self.setup_ui()
 
     def setup_ui(self):
@@ -32,10 +54,19 @@ class ModelManagementTab(QWidget):
         btn_train = QPushButton('Train All Models')
         btn_train.clicked.connect(self.train_all)
         actions.addWidget(btn_train)
+        self.btnTrainSelected = QPushButton('Train Selected')
+        self.btnTrainSelected.clicked.connect(self.train_selected)
+        actions.addWidget(self.btnTrainSelected)
+        self.btnCancelJob = QPushButton('Cancel Job')
+        self.btnCancelJob.clicked.connect(self.cancel_selected_job)
+        actions.addWidget(self.btnCancelJob)
         actions.addWidget(QPushButton('Benchmark All'))
         actions.addWidget(QPushButton('Compare Selected'))
         actions.addStretch()
         layout.addLayout(actions)
+        self.jobs = QTableWidget(0, len(JOB_COLUMNS))
+        self.jobs.setHorizontalHeaderLabels(JOB_COLUMNS)
+        layout.addWidget(self.jobs)
         self.log = QTextEdit(); self.log.setReadOnly(True)
         layout.addWidget(self.log)
         self.setLayout(layout)
@@ -69,3 +100,84 @@ class ModelManagementTab(QWidget):
             self.log.append(data)
         except Exception:
             pass
+
+    # ---------- job train nền ----------
+    def _get_runner(self):
+        if self._runner is None:
+            from services.training_jobs import get_training_job_runner
+            db = get_db_connector()
+            try:
+                self._runner = get_training_job_runner(db.config)
+            finally:
+                db.close()
+            # Runner dùng chung cả process: gỡ listener khi tab bị hủy để không emit lên bridge đã xóa
+            runner, listener = self._runner, self._bridge.changed.emit
+            runner.add_listener(listener)
+            self.destroyed.connect(lambda *_: runner.remove_listener(listener))
+        return self._runner
+
+    def train_selected(self):
+        rows = sorted({i.row() for i in self.table.selectedItems()})
+        names = [SERVICE_NAMES.get(self.table.item(r, 1).text(), self.table.item(r, 1).text())
+                 for r in rows if self.table.item(r, 1)]
+        if not names:
+            self.log.append('Chọn ít nhất 1 model để train')
+            return
+        if self._splits is not None:
+            self._submit(names)
+            return
+        from ui.task_executor import get_task_executor
+
+        def load():
+            from ml.train_models import load_and_preprocess
+            return load_and_preprocess()
+
+        def loaded(splits):
+            self._splits = splits
+            self._submit(names)
+
+        self.btnTrainSelected.setEnabled(False)
+        self.log.append('Đang load dữ liệu train...')
+        get_task_executor().submit(
+            load,
+            name='load_training_data',
+            on_result=loaded,
+            on_error=lambda e: self.log.append(f'Load dữ liệu lỗi: {e}'),
+            on_finished=lambda: self.btnTrainSelected.setEnabled(True),
+        )
+
+    def _submit(self, names):
+        X_train, X_valid, X_test, y_train, y_valid, y_test = self._splits
+        runner = self._get_runner()
+        for name in names:
+            runner.submit(name, X_train, y_train, X_test, y_test, self.username)
+
+    def cancel_selected_job(self):
+        row = self.jobs.currentRow()
+        if row < 0 or self._runner is None:
+            return
+        job_id = next((j for j, r in self._job_rows.items() if r == row), None)
+        if job_id and self._runner.cancel(job_id):
+            self.log.append(f'Đang hủy job {job_id}...')
+
+    def _on_job_changed(self, job):
+        row = self._job_rows.get(job['job_id'])
+        if row is None:
+            row = self.jobs.rowCount()
+            self.jobs.insertRow(row)
+            self._job_rows[job['job_id']] = row
+        rnd = f"{job['round']}/{job['total_rounds']}" if job.get('round') else '-'
+        auc = job.get('eval_auc')
+        if job['status'] == 'completed':
+            auc = job['result']['metrics']['auc']
+        values = [job['job_id'][:8], job['model_name'], job['status'], f"{job['progress']}%", rnd,
+                  f'{auc:.4f}' if auc is not None else '-']
+        for col, val in enumerate(values):
+            self.jobs.setItem(row, col, QTableWidgetItem(val))
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            msg = f"Job {job['job_id'][:8]} ({job['model_name']}): {job['status']}"
+            if job.get('error'):
+                msg += f" - {job['error']}"
+            elif job['status'] == 'completed' and job['result'].get('cached'):
+                msg += ' (train cache)'
+            self.log.append(msg)
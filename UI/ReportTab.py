@@ -14,6 +14,7 @@ try:
 except Exception:
     from integration import get_db_connector, get_query_service
 import json
+import time
 try:
     from services.model_management_service import ModelManagementService
     _HaveModelMgmt = True
@@ -24,6 +25,7 @@ try:
     from ml.evaluation import load_evaluation_data
 except Exception:
     load_evaluation_data = None
+from ml.eval_store import get_settings_store
 
 class ReportTab(QWidget):
     def __init__(self, user: User):
@@ -31,6 +33,12 @@ class ReportTab(QWidget):
         self.user = user
         self.view_mode = 'own_data_only' if self.user.is_user() else 'all'
         self._model_labels = {}
+        # refresh_report: generation hiện tại, nhóm task đang chạy, thời gian từng section (ms)
+        self._refresh_gen = 0
+        self._refresh_group = None
+        self._refresh_t0 = 0.0
+        self._section_ms = {}
+        self._qs = None
         self.setup_ui()
         self.refresh_report()
 
@@ -214,136 +222,250 @@ class ReportTab(QWidget):
         except Exception:
             pass
 
+    # Section của refresh_report: _fetch_<section> chạy ở worker (không đụng widget),
+    # _render_<section> vẽ ở GUI thread ngay khi section đó xong
+    USER_SECTIONS = ('stats', 'series', 'demographics', 'top', 'latest')
+    ADMIN_SECTIONS = ('model_activity', 'health')
+
     def refresh_report(self):
+        """
+        Làm mới báo cáo: các section chạy song song trên TaskExecutor, mỗi section 1 kết nối pool.
+        Mỗi lần gọi tăng generation; kết quả của lần refresh cũ (bộ lọc đổi giữa chừng) bị bỏ qua
+        """
+        from ui.task_executor import get_task_executor
+        self._refresh_gen += 1
+        gen = self._refresh_gen
+        if self._refresh_group is not None:
+            self._refresh_group.cancel()
         try:
-            db = get_db_connector()
-            qs = get_query_service(db)
-            if hasattr(self.user, 'is_admin') and self.user.is_admin():
-                try:
-                    self._update_model_activity(db)
-                except Exception:
-                    pass
-                try:
-                    self._update_health_card(db)
-                except Exception:
-                    pass
-                db.close()
-                return
-            # KPI
-            tr = self.cmb_time.currentText()
-            sf = self.cmb_status.currentText()
-            uid = self.user.id if self.view_mode == 'own_data_only' else None
-            start_iso = self.date_start.date().toString('yyyy-MM-dd') if hasattr(self, 'date_start') else None
-            end_iso = self.date_end.date().toString('yyyy-MM-dd') if hasattr(self, 'date_end') else None
-            s = qs.get_prediction_stats_range(start_iso, end_iso, sf, uid)
-            if s.get('total_predictions', 0) == 0:
-                s = qs.get_prediction_stats_filtered(tr, sf, uid)
-            if s.get('total_predictions', 0) == 0:
-                s = qs.get_prediction_stats()
-            self.lbl_total.setText(f"Tổng dự báo: {s.get('total_predictions',0)}")
-            self.lbl_high.setText(f"Nguy cơ cao: {s.get('high_risk_count',0)}")
-            self.lbl_avg.setText(f"Xác suất TB: {s.get('avg_probability',0.0):.2f}")
-            if not (hasattr(self.user, 'is_admin') and self.user.is_admin()):
-                monthly = qs.get_monthly_default_rate_recent(months=12)
-                self.tbl_monthly.setRowCount(len(monthly))
-                for i, row in enumerate(monthly):
-                    self.tbl_monthly.setItem(i, 0, QTableWidgetItem(row['period']))
-                    self.tbl_monthly.setItem(i, 1, QTableWidgetItem(f"{row['rate']*100:.1f}%"))
-                if self.tbl_monthly.rowCount() == 0:
-                    self.tbl_monthly.setRowCount(1)
-                    self.tbl_monthly.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_monthly.setItem(0, 1, QTableWidgetItem('-'))
-                quarterly = qs.get_quarterly_high_risk_rate_recent(quarters=8)
-                self.tbl_quarterly.setRowCount(len(quarterly))
-                for i, row in enumerate(quarterly):
-                    self.tbl_quarterly.setItem(i, 0, QTableWidgetItem(row['period']))
-                    self.tbl_quarterly.setItem(i, 1, QTableWidgetItem(f"{row['rate']*100:.1f}%"))
-                if self.tbl_quarterly.rowCount() == 0:
-                    self.tbl_quarterly.setRowCount(1)
-                    self.tbl_quarterly.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_quarterly.setItem(0, 1, QTableWidgetItem('-'))
-            if not (hasattr(self.user, 'is_admin') and self.user.is_admin()):
-                g, m, e = qs.get_demographics_counts_filtered(tr, uid)
-                if not g and not m and not e:
-                    g, m, e = qs.get_demographics_counts()
-                def fill_map(tbl, mp):
-                    items = list(mp.items())
-                    tbl.setRowCount(len(items))
-                    for i, (k, v) in enumerate(items):
-                        tbl.setItem(i, 0, QTableWidgetItem(str(k)))
-                        tbl.setItem(i, 1, QTableWidgetItem(str(v)))
-                fill_map(self.tbl_gender, g); fill_map(self.tbl_marriage, m); fill_map(self.tbl_edu, e)
-                if self.tbl_gender.rowCount() == 0:
-                    self.tbl_gender.setRowCount(1)
-                    self.tbl_gender.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_gender.setItem(0, 1, QTableWidgetItem('-'))
-                if self.tbl_marriage.rowCount() == 0:
-                    self.tbl_marriage.setRowCount(1)
-                    self.tbl_marriage.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_marriage.setItem(0, 1, QTableWidgetItem('-'))
-                if self.tbl_edu.rowCount() == 0:
-                    self.tbl_edu.setRowCount(1)
-                    self.tbl_edu.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_edu.setItem(0, 1, QTableWidgetItem('-'))
-            if not (hasattr(self.user, 'is_admin') and self.user.is_admin()):
-                top = qs.get_top_predictions_join_customers_filtered(ascending=False, time_range=tr, limit=10, user_id=uid)
-                if not top:
-                    top = qs.get_top_predictions_join_customers(limit=10, ascending=False)
-                self.tbl_top.setRowCount(len(top))
-                for i, r in enumerate(top):
-                    self.tbl_top.setItem(i, 0, QTableWidgetItem(str(r.get('customer_name') or '-')))
-                    self.tbl_top.setItem(i, 1, QTableWidgetItem(str(r.get('customer_id_card') or '-')))
-                    self.tbl_top.setItem(i, 2, QTableWidgetItem(f"{r.get('probability',0.0):.2f}"))
-                    self.tbl_top.setItem(i, 3, QTableWidgetItem('Cao' if r.get('label')==1 else 'Thấp'))
-                bottom = qs.get_top_predictions_join_customers_filtered(ascending=True, time_range=tr, limit=10, user_id=uid)
-                if not bottom:
-                    bottom = qs.get_top_predictions_join_customers(limit=10, ascending=True)
-                self.tbl_bottom.setRowCount(len(bottom))
-                for i, r in enumerate(bottom):
-                    self.tbl_bottom.setItem(i, 0, QTableWidgetItem(str(r.get('customer_name') or '-')))
-                    self.tbl_bottom.setItem(i, 1, QTableWidgetItem(str(r.get('customer_id_card') or '-')))
-                    self.tbl_bottom.setItem(i, 2, QTableWidgetItem(f"{r.get('probability',0.0):.2f}"))
-                    self.tbl_bottom.setItem(i, 3, QTableWidgetItem('Cao' if r.get('label')==1 else 'Thấp'))
-                if self.tbl_top.rowCount() == 0:
-                    self.tbl_top.setRowCount(1)
-                    self.tbl_top.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_top.setItem(0, 1, QTableWidgetItem('-'))
-                    self.tbl_top.setItem(0, 2, QTableWidgetItem('-'))
-                    self.tbl_top.setItem(0, 3, QTableWidgetItem('-'))
-                if self.tbl_bottom.rowCount() == 0:
-                    self.tbl_bottom.setRowCount(1)
-                    self.tbl_bottom.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
-                    self.tbl_bottom.setItem(0, 1, QTableWidgetItem('-'))
-                    self.tbl_bottom.setItem(0, 2, QTableWidgetItem('-'))
-                    self.tbl_bottom.setItem(0, 3, QTableWidgetItem('-'))
-            # Latest detail by range or time filter
-            latest = qs.get_predictions_join_customers_range(start_iso, end_iso, sf, limit=50, user_id=uid)
-            if not latest:
-                latest = qs.get_predictions_join_customers(time_range=tr, status_filter=sf, limit=50, user_id=uid)
-            if not latest:
-                latest = qs.get_latest_day_predictions_join_customers(limit=50)
-            self.tbl_latest.setRowCount(len(latest))
-            for i, r in enumerate(latest):
-                self.tbl_latest.setItem(i, 0, QTableWidgetItem(str(r.get('customer_name') or '-')))
-                self.tbl_latest.setItem(i, 1, QTableWidgetItem(str(r.get('customer_id_card') or '-')))
-                self.tbl_latest.setItem(i, 2, QTableWidgetItem(f"{r.get('probability',0.0):.2f}"))
-                self.tbl_latest.setItem(i, 3, QTableWidgetItem('Cao' if r.get('label')==1 else 'Thấp'))
-                self.tbl_latest.setItem(i, 4, QTableWidgetItem(str(r.get('LIMIT_BAL') or '-')))
-                self.tbl_latest.setItem(i, 5, QTableWidgetItem(str(r.get('AGE') or '-')))
-                self.tbl_latest.setItem(i, 6, QTableWidgetItem(str(r.get('PAY_0') or '-')))
-                self.tbl_latest.setItem(i, 7, QTableWidgetItem(str(r.get('BILL_AMT1') or '-')))
-            if self.tbl_latest.rowCount() == 0:
-                self.tbl_latest.setRowCount(1)
-                for c in range(8):
-                    self.tbl_latest.setItem(0, c, QTableWidgetItem('-'))
-            self.info.setText(f"Chế độ: {'dữ liệu của tôi' if self.view_mode=='own_data_only' else 'tất cả'} · Bộ lọc: {tr}, {sf} · Bản ghi: {self.tbl_latest.rowCount()}")
-            pass
-            db.close()
+            qs = self._report_query_service()
+        except Exception as e:
+            print(f"✗ ReportTab: không tạo được QueryService: {e}")
+            return
+        is_admin = hasattr(self.user, 'is_admin') and self.user.is_admin()
+        sections = self.ADMIN_SECTIONS if is_admin else self.USER_SECTIONS
+        self._section_ms = {}
+        self._refresh_t0 = time.perf_counter()
+        self._refresh_group = get_task_executor().map(
+            self._fetch_section, sections,
+            qs=qs, filters=self._report_filters(),
+            on_item=lambda key, value, error, gen=gen: self._on_section_done(gen, key, value, error),
+            on_finished=lambda results, gen=gen: self._on_refresh_finished(gen, results),
+        )
+
+    def _report_query_service(self):
+        """QueryService trên connector mặc định (chế độ pool: mỗi section chạy đồng thời lấy 1 kết nối riêng)"""
+        if self._qs is None:
+            self._qs = get_query_service(get_db_connector())
+        return self._qs
+
+    def _report_filters(self) -> dict:
+        """Đọc bộ lọc từ widget (GUI thread) để truyền cho worker"""
+        return {
+            'time_range': self.cmb_time.currentText(),
+            'status': self.cmb_status.currentText(),
+            'user_id': self.user.id if self.view_mode == 'own_data_only' else None,
+            'start_date': self.date_start.date().toString('yyyy-MM-dd') if hasattr(self, 'date_start') else None,
+            'end_date': self.date_end.date().toString('yyyy-MM-dd') if hasattr(self, 'date_end') else None,
+        }
+
+    def _fetch_section(self, section, qs=None, filters=None, cancel_token=None):
+        """
+        Lấy dữ liệu 1 section (worker thread)
+
+        Returns:
+            Tuple (elapsed_ms, data)
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        t0 = time.perf_counter()
+        data = getattr(self, f'_fetch_{section}')(qs, dict(filters or {}))
+        return (time.perf_counter() - t0) * 1000, data
+
+    def _on_section_done(self, gen, section, value, error):
+        if gen != self._refresh_gen:
+            # Refresh cũ: bỏ qua, refresh mới sẽ vẽ lại
+            return
+        if value is None:
+            # Section lỗi/bị hủy: xóa nội dung cũ thay vì giữ số liệu của bộ lọc trước
+            if error:
+                print(f"✗ ReportTab: section {section} lỗi: {error}")
+            self._clear_section(section)
+            return
+        elapsed_ms, data = value
+        self._section_ms[section] = elapsed_ms
+        try:
+            getattr(self, f'_render_{section}')(data)
+        except Exception as e:
+            print(f"⚠ ReportTab: lỗi hiển thị section {section}: {e}")
+
+    def _clear_section(self, section):
+        """Đưa section về trạng thái 'Không có dữ liệu'"""
+        try:
+            if section == 'stats':
+                self.lbl_total.setText("Tổng dự báo: -")
+                self.lbl_high.setText("Nguy cơ cao: -")
+                self.lbl_avg.setText("Xác suất TB: -")
+            elif section == 'health':
+                for item in getattr(self, 'health_labels', {}).values():
+                    item['desc'].setText("Không có dữ liệu")
+                    item['chip'].setText("")
+                    item['chip'].setStyleSheet("")
+            else:
+                empty = {
+                    'series': ([], []),
+                    'demographics': ({}, {}, {}),
+                    'top': ([], []),
+                    'latest': [],
+                    'model_activity': {'audit': None, 'activity': None},
+                }
+                getattr(self, f'_render_{section}')(empty[section])
+        except Exception as e:
+            print(f"⚠ ReportTab: lỗi xóa section {section}: {e}")
+
+    def _on_refresh_finished(self, gen, results):
+        if gen != self._refresh_gen:
+            return
+        self._refresh_group = None
+        total_ms = (time.perf_counter() - self._refresh_t0) * 1000
+        # Tổng thời gian các section = thời gian nếu chạy tuần tự như trước
+        sequential_ms = sum(self._section_ms.values())
+        text = f"Chế độ: {'dữ liệu của tôi' if self.view_mode=='own_data_only' else 'tất cả'}"
+        if 'latest' in results:
+            f = self._report_filters()
+            text += f" · Bộ lọc: {f['time_range']}, {f['status']} · Bản ghi: {self.tbl_latest.rowCount()}"
+        text += f" · Làm mới: {total_ms:.0f} ms (tuần tự ~{sequential_ms:.0f} ms)"
+        try:
+            self.info.setText(text)
         except Exception:
-            try:
-                db.close()
-            except Exception:
-                pass
+            pass
+        print(f"✓ ReportTab refresh: {len(results)} section, {total_ms:.0f} ms (tuần tự ~{sequential_ms:.0f} ms)")
+
+    def _snapshot_filters(self, f: dict, sections: set) -> dict:
+        return {
+            'time_range': f.get('time_range'), 'start_date': f.get('start_date'), 'end_date': f.get('end_date'),
+            'status': f.get('status'), 'user_id': f.get('user_id'),
+            'months': 12, 'quarters': 8, 'top_n': 10, 'sections': sections,
+        }
+
+    def _fetch_stats(self, qs, f):
+        # Khoảng ngày -> bộ lọc thời gian -> toàn bộ (khi kết quả trước rỗng)
+        return qs.get_dashboard_snapshot(self._snapshot_filters(f, {'stats'})).effective_stats()
+
+    def _render_stats(self, s):
+        self.lbl_total.setText(f"Tổng dự báo: {s.get('total_predictions',0)}")
+        self.lbl_high.setText(f"Nguy cơ cao: {s.get('high_risk_count',0)}")
+        self.lbl_avg.setText(f"Xác suất TB: {s.get('avg_probability',0.0):.2f}")
+
+    def _fetch_series(self, qs, f):
+        snap = qs.get_dashboard_snapshot(self._snapshot_filters(f, {'series'}))
+        return snap.monthly_default_rate_recent, snap.quarterly_high_risk_rate_recent
+
+    def _render_series(self, data):
+        monthly, quarterly = data
+        self.tbl_monthly.setRowCount(len(monthly))
+        for i, row in enumerate(monthly):
+            self.tbl_monthly.setItem(i, 0, QTableWidgetItem(row['period']))
+            self.tbl_monthly.setItem(i, 1, QTableWidgetItem(f"{row['rate']*100:.1f}%"))
+        if self.tbl_monthly.rowCount() == 0:
+            self.tbl_monthly.setRowCount(1)
+            self.tbl_monthly.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_monthly.setItem(0, 1, QTableWidgetItem('-'))
+        self.tbl_quarterly.setRowCount(len(quarterly))
+        for i, row in enumerate(quarterly):
+            self.tbl_quarterly.setItem(i, 0, QTableWidgetItem(row['period']))
+            self.tbl_quarterly.setItem(i, 1, QTableWidgetItem(f"{row['rate']*100:.1f}%"))
+        if self.tbl_quarterly.rowCount() == 0:
+            self.tbl_quarterly.setRowCount(1)
+            self.tbl_quarterly.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_quarterly.setItem(0, 1, QTableWidgetItem('-'))
+
+    def _fetch_demographics(self, qs, f):
+        g, m, e = qs.get_dashboard_snapshot(self._snapshot_filters(f, {'demographics'})).demographics()
+        if not g and not m and not e:
+            g, m, e = qs.get_demographics_counts()
+        return g, m, e
+
+    def _render_demographics(self, data):
+        g, m, e = data
+        def fill_map(tbl, mp):
+            items = list(mp.items())
+            tbl.setRowCount(len(items))
+            for i, (k, v) in enumerate(items):
+                tbl.setItem(i, 0, QTableWidgetItem(str(k)))
+                tbl.setItem(i, 1, QTableWidgetItem(str(v)))
+        fill_map(self.tbl_gender, g); fill_map(self.tbl_marriage, m); fill_map(self.tbl_edu, e)
+        if self.tbl_gender.rowCount() == 0:
+            self.tbl_gender.setRowCount(1)
+            self.tbl_gender.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_gender.setItem(0, 1, QTableWidgetItem('-'))
+        if self.tbl_marriage.rowCount() == 0:
+            self.tbl_marriage.setRowCount(1)
+            self.tbl_marriage.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_marriage.setItem(0, 1, QTableWidgetItem('-'))
+        if self.tbl_edu.rowCount() == 0:
+            self.tbl_edu.setRowCount(1)
+            self.tbl_edu.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_edu.setItem(0, 1, QTableWidgetItem('-'))
+
+    def _fetch_top(self, qs, f):
+        snap = qs.get_dashboard_snapshot(self._snapshot_filters(f, {'top'}))
+        top = snap.top or qs.get_top_predictions_join_customers(limit=10, ascending=False)
+        bottom = snap.bottom or qs.get_top_predictions_join_customers(limit=10, ascending=True)
+        return top, bottom
+
+    def _render_top(self, data):
+        top, bottom = data
+        self.tbl_top.setRowCount(len(top))
+        for i, r in enumerate(top):
+            self.tbl_top.setItem(i, 0, QTableWidgetItem(str(r.get('customer_name') or '-')))
+            self.tbl_top.setItem(i, 1, QTableWidgetItem(str(r.get('customer_id_card') or '-')))
+            self.tbl_top.setItem(i, 2, QTableWidgetItem(f"{r.get('probability',0.0):.2f}"))
+            self.tbl_top.setItem(i, 3, QTableWidgetItem('Cao' if r.get('label')==1 else 'Thấp'))
+        self.tbl_bottom.setRowCount(len(bottom))
+        for i, r in enumerate(bottom):
+            self.tbl_bottom.setItem(i, 0, QTableWidgetItem(str(r.get('customer_name') or '-')))
+            self.tbl_bottom.setItem(i, 1, QTableWidgetItem(str(r.get('customer_id_card') or '-')))
+            self.tbl_bottom.setItem(i, 2, QTableWidgetItem(f"{r.get('probability',0.0):.2f}"))
+            self.tbl_bottom.setItem(i, 3, QTableWidgetItem('Cao' if r.get('label')==1 else 'Thấp'))
+        if self.tbl_top.rowCount() == 0:
+            self.tbl_top.setRowCount(1)
+            self.tbl_top.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_top.setItem(0, 1, QTableWidgetItem('-'))
+            self.tbl_top.setItem(0, 2, QTableWidgetItem('-'))
+            self.tbl_top.setItem(0, 3, QTableWidgetItem('-'))
+        if self.tbl_bottom.rowCount() == 0:
+            self.tbl_bottom.setRowCount(1)
+            self.tbl_bottom.setItem(0, 0, QTableWidgetItem('Không có dữ liệu'))
+            self.tbl_bottom.setItem(0, 1, QTableWidgetItem('-'))
+            self.tbl_bottom.setItem(0, 2, QTableWidgetItem('-'))
+            self.tbl_bottom.setItem(0, 3, QTableWidgetItem('-'))
+
+    def _fetch_latest(self, qs, f):
+        # Latest detail by range or time filter
+        uid, sf = f.get('user_id'), f.get('status')
+        latest = qs.get_predictions_join_customers_range(f.get('start_date'), f.get('end_date'), sf, limit=50, user_id=uid)
+        if not latest:
+            latest = qs.get_predictions_join_customers(time_range=f.get('time_range'), status_filter=sf, limit=50, user_id=uid)
+        if not latest:
+            latest = qs.get_latest_day_predictions_join_customers(limit=50)
+        return latest
+
+    def _render_latest(self, latest):
+        self.tbl_latest.setRowCount(len(latest))
+        for i, r in enumerate(latest):
+            self.tbl_latest.setItem(i, 0, QTableWidgetItem(str(r.get('customer_name') or '-')))
+            self.tbl_latest.setItem(i, 1, QTableWidgetItem(str(r.get('customer_id_card') or '-')))
+            self.tbl_latest.setItem(i, 2, QTableWidgetItem(f"{r.get('probability',0.0):.2f}"))
+            self.tbl_latest.setItem(i, 3, QTableWidgetItem('Cao' if r.get('label')==1 else 'Thấp'))
+            self.tbl_latest.setItem(i, 4, QTableWidgetItem(str(r.get('LIMIT_BAL') or '-')))
+            self.tbl_latest.setItem(i, 5, QTableWidgetItem(str(r.get('AGE') or '-')))
+            self.tbl_latest.setItem(i, 6, QTableWidgetItem(str(r.get('PAY_0') or '-')))
+            self.tbl_latest.setItem(i, 7, QTableWidgetItem(str(r.get('BILL_AMT1') or '-')))
+        if self.tbl_latest.rowCount() == 0:
+            self.tbl_latest.setRowCount(1)
+            for c in range(8):
+                self.tbl_latest.setItem(0, c, QTableWidgetItem('-'))
 
     def export_csv(self):
         try:
@@ -448,70 +570,71 @@ class ReportTab(QWidget):
         except Exception:
             pass
 
-    def _update_model_activity(self, db):
-        name = None; thr = None; auc = None; acc = None; f1 = None; at = None; by = None
+    # Mô hình hiển thị ở bảng hoạt động (NeuralNet lưu trong registry là 'Neural Network')
+    ACTIVITY_MODELS = ['XGBoost','LightGBM','LogisticRegression','CatBoost','RandomForest','NeuralNet','Voting','Stacking']
+
+    # Số dự báo hôm nay / 7 ngày / tháng này của từng model: 1 câu GROUP BY thay cho 3 COUNT mỗi model
+    _ACTIVITY_COUNTS_SQL = """
+        SELECT model_name,
+               SUM(created_at >= CURDATE() AND created_at < CURDATE() + INTERVAL 1 DAY),
+               SUM(created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)),
+               SUM(created_at >= DATE_SUB(CURDATE(), INTERVAL DAYOFMONTH(CURDATE()) - 1 DAY)
+                   AND created_at < DATE_SUB(CURDATE(), INTERVAL DAYOFMONTH(CURDATE()) - 1 DAY) + INTERVAL 1 MONTH)
+        FROM predictions_log
+        WHERE model_name IN ({placeholders})
+          AND created_at >= LEAST(DATE_SUB(CURDATE(), INTERVAL 7 DAY), DATE_SUB(CURDATE(), INTERVAL DAYOFMONTH(CURDATE()) - 1 DAY))
+        GROUP BY model_name
+    """
+
+    def _fetch_model_activity(self, qs, f):
+        """Model active, audit và bảng hoạt động của các model (worker thread)"""
+        db = qs.db
+        data = {'name': None, 'thr': None, 'auc': None, 'acc': None, 'f1': None, 'at': None, 'by': None,
+                'audit': None, 'activity': None}
         try:
             if _HaveModelMgmt:
                 svc = ModelManagementService(db)
                 active = svc.get_active_model()
-                name = active.get('model_name') if active else None
+                data['name'] = active.get('model_name') if active else None
             else:
                 row = db.fetch_one("SELECT model_name FROM model_registry WHERE is_active = 1 LIMIT 1")
-                name = row[0] if row and row[0] else None
+                data['name'] = row[0] if row and row[0] else None
         except Exception:
-            name = None
+            data['name'] = None
+        name = data['name']
         try:
             if name:
                 row = db.fetch_one("SELECT auc_score, accuracy, f1_score, trained_at, trained_by, threshold FROM model_registry WHERE model_name = %s", (name,))
                 if row:
-                    auc = float(row[0]) if row[0] is not None else None
-                    acc = float(row[1]) if row[1] is not None else None
-                    f1 = float(row[2]) if row[2] is not None else None
-                    at = str(row[3]) if row[3] is not None else None
-                    by = str(row[4]) if row[4] is not None else None
+                    data['auc'] = float(row[0]) if row[0] is not None else None
+                    data['acc'] = float(row[1]) if row[1] is not None else None
+                    data['f1'] = float(row[2]) if row[2] is not None else None
+                    data['at'] = str(row[3]) if row[3] is not None else None
+                    data['by'] = str(row[4]) if row[4] is not None else None
                     try:
-                        tdb = float(row[5]) if row[5] is not None else None
-                        if tdb is not None:
-                            thr = tdb
+                        if row[5] is not None:
+                            data['thr'] = float(row[5])
                     except Exception:
                         pass
         except Exception:
             pass
         try:
-            if name and thr is None:
-                import numpy as np
-                eval_path = Path(__file__).resolve().parents[1] / 'outputs' / 'evaluation' / 'evaluation_data.npz'
-                if eval_path.exists():
-                    data = np.load(eval_path, allow_pickle=True)
-                    best = data.get('best_thresholds', None)
-                    if best is not None:
-                        d = best.item() if hasattr(best, 'item') else best
-                        val = d.get(name, None)
-                        thr = float(val) if val is not None else None
+            if name and data['thr'] is None:
+                val = get_settings_store().get_thresholds().get(name, None)
+                data['thr'] = float(val) if val is not None else None
         except Exception:
-            thr = None
+            data['thr'] = None
         try:
             rows = []
             try:
-                import numpy as np
-                eval_path = Path(__file__).resolve().parents[1] / 'outputs' / 'evaluation' / 'evaluation_data.npz'
-                if eval_path.exists():
-                    data = np.load(eval_path, allow_pickle=True)
-                    audit = data.get('threshold_audit', None)
-                    if audit is not None:
-                        arr = audit if not hasattr(audit, 'tolist') else audit.tolist()
-                        if isinstance(arr, np.ndarray):
-                            arr = arr.tolist()
-                        if isinstance(arr, list):
-                            last = arr[-5:] if len(arr) > 5 else arr
-                            for item in last:
-                                try:
-                                    ev = 'Threshold update'
-                                    det = f"{item.get('model','')} → {float(item.get('value',0.0)):.2f} by {item.get('user','')}"
-                                    ts = str(item.get('ts',''))
-                                    rows.append((ev, det, ts))
-                                except Exception:
-                                    pass
+                for item in get_settings_store().get_audit()[-5:]:
+                    try:
+                        ev = 'Threshold update'
+                        det = f"{item.get('model','')} → {float(item.get('value',0.0)):.2f} by {item.get('user','')}"
+                        ts = str(item.get('ts',''))
+                        rows.append((ev, det, ts))
+                    except Exception:
+                        pass
             except Exception:
                 pass
             try:
@@ -524,123 +647,125 @@ class ReportTab(QWidget):
                     rows.append((ev, det, ts))
             except Exception:
                 pass
-            self.tbl_model_audit.setRowCount(len(rows))
-            for i, (ev, det, ts) in enumerate(rows):
-                self.tbl_model_audit.setItem(i, 0, QTableWidgetItem(ev))
-                self.tbl_model_audit.setItem(i, 1, QTableWidgetItem(det))
-                self.tbl_model_audit.setItem(i, 2, QTableWidgetItem(ts))
+            data['audit'] = rows
         except Exception:
-            try:
-                self.tbl_model_audit.setRowCount(1)
-                self.tbl_model_audit.setItem(0,0,QTableWidgetItem('—'))
-                self.tbl_model_audit.setItem(0,1,QTableWidgetItem('—'))
-                self.tbl_model_audit.setItem(0,2,QTableWidgetItem('—'))
-            except Exception:
-                pass
+            data['audit'] = None
         try:
-            models = ['XGBoost','LightGBM','LogisticRegression','CatBoost','RandomForest','NeuralNet','Voting','Stacking']
-            name_map = {'NeuralNet':'Neural Network'}
-            # Models that exist vs demo models
-            trained_models = {'XGBoost', 'LightGBM', 'LogisticRegression'}
+            data['activity'] = self._activity_rows(db)
+        except Exception:
+            data['activity'] = None
+        return data
+
+    def _activity_rows(self, db):
+        name_map = {'NeuralNet':'Neural Network'}
+        # Models that exist vs demo models
+        trained_models = {'XGBoost', 'LightGBM', 'LogisticRegression'}
+        names = [name_map.get(m, m) for m in self.ACTIVITY_MODELS]
+        placeholders = ', '.join(['%s'] * len(names))
+        eval_thr = {}
+        try:
+            eval_thr = get_settings_store().get_thresholds()
+        except Exception:
             eval_thr = {}
-            try:
-                import numpy as np
-                eval_path = Path(__file__).resolve().parents[1] / 'outputs' / 'evaluation' / 'evaluation_data.npz'
-                if eval_path.exists():
-                    data = np.load(eval_path, allow_pickle=True)
-                    best = data.get('best_thresholds', None)
-                    if best is not None:
-                        d = best.item() if hasattr(best, 'item') else best
-                        if isinstance(d, dict):
-                            eval_thr = {str(k): float(v) for k, v in d.items() if v is not None}
-            except Exception:
-                eval_thr = {}
-            rows = []
-            for m in models:
-                mn = name_map.get(m, m)
-                is_active = ''
-                auc_v = None; acc_v = None; f1_v = None; at_v = None; by_v = None; file_v = ''; tdb_v = None
+        registry = {}
+        try:
+            q = f"SELECT model_name, is_active, auc_score, accuracy, f1_score, trained_at, trained_by, threshold, model_path FROM model_registry WHERE model_name IN ({placeholders})"
+            for row in db.fetch_all(q, tuple(names)):
+                registry[row[0]] = row[1:]
+        except Exception:
+            registry = {}
+        counts = {}
+        try:
+            for row in db.fetch_all(self._ACTIVITY_COUNTS_SQL.format(placeholders=placeholders), tuple(names)):
+                counts[row[0]] = tuple(int(v or 0) for v in row[1:4])
+        except Exception:
+            counts = {}
+        rows = []
+        for m, mn in zip(self.ACTIVITY_MODELS, names):
+            is_active = ''
+            auc_v = None; acc_v = None; f1_v = None; at_v = None; by_v = None; file_v = ''; tdb_v = None
+            row = registry.get(mn)
+            if row:
                 try:
-                    row = db.fetch_one("SELECT is_active, auc_score, accuracy, f1_score, trained_at, trained_by, threshold, model_path FROM model_registry WHERE model_name = %s", (mn,))
-                    if row:
-                        is_active = '✓' if bool(row[0]) else ''
-                        auc_v = float(row[1]) if row[1] is not None else None
-                        acc_v = float(row[2]) if row[2] is not None else None
-                        f1_v = float(row[3]) if row[3] is not None else None
-                        at_v = str(row[4]) if row[4] is not None else ''
-                        by_v = str(row[5]) if row[5] is not None else ''
-                        tdb_v = float(row[6]) if row[6] is not None else None
-                        mp = row[7]
-                        try:
-                            from pathlib import Path
-                            file_v = '✓' if (mp and Path(mp).exists()) else ''
-                        except Exception:
-                            file_v = ''
+                    is_active = '✓' if bool(row[0]) else ''
+                    auc_v = float(row[1]) if row[1] is not None else None
+                    acc_v = float(row[2]) if row[2] is not None else None
+                    f1_v = float(row[3]) if row[3] is not None else None
+                    at_v = str(row[4]) if row[4] is not None else ''
+                    by_v = str(row[5]) if row[5] is not None else ''
+                    tdb_v = float(row[6]) if row[6] is not None else None
+                    mp = row[7]
+                    try:
+                        from pathlib import Path
+                        file_v = '✓' if (mp and Path(mp).exists()) else ''
+                    except Exception:
+                        file_v = ''
                 except Exception:
                     pass
-                thr_v = tdb_v if tdb_v is not None else eval_thr.get(mn, None)
-                try:
-                    row = db.fetch_one("SELECT COUNT(*) FROM predictions_log WHERE model_name = %s AND DATE(created_at) = CURDATE()", (mn,))
-                    day_v = int(row[0]) if row and row[0] is not None else 0
-                except Exception:
-                    day_v = 0
-                try:
-                    row = db.fetch_one("SELECT COUNT(*) FROM predictions_log WHERE model_name = %s AND created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)", (mn,))
-                    week_v = int(row[0]) if row and row[0] is not None else 0
-                except Exception:
-                    week_v = 0
-                try:
-                    row = db.fetch_one("SELECT COUNT(*) FROM predictions_log WHERE model_name = %s AND DATE_FORMAT(created_at,'%Y-%m') = DATE_FORMAT(CURDATE(),'%Y-%m')", (mn,))
-                    month_v = int(row[0]) if row and row[0] is not None else 0
-                except Exception:
-                    month_v = 0
-                status_parts = []
-                if not file_v:
-                    status_parts.append('Thiếu file')
-                if acc_v is None and auc_v is None and f1_v is None:
-                    status_parts.append('Chưa train')
-                if thr_v is None:
-                    status_parts.append('Thiếu threshold')
-                if day_v == 0 and week_v == 0 and month_v == 0:
-                    status_parts.append('Không có hoạt động')
-                if is_active != '✓':
-                    status_parts.append('Không hoạt động')
-                status_text = ', '.join(status_parts) if status_parts else 'Ổn định'
-                # Add DEMO label for fake models
-                model_display = m if mn in trained_models else f"{m} (DEMO)"
-                rows.append([
-                    model_display,
-                    is_active,
-                    f"{thr_v:.2f}" if isinstance(thr_v, float) else '—',
-                    f"{auc_v:.3f}" if isinstance(auc_v, float) else '—',
-                    f"{acc_v:.3f}" if isinstance(acc_v, float) else '—',
-                    f"{f1_v:.3f}" if isinstance(f1_v, float) else '—',
-                    str(day_v),
-                    str(week_v),
-                    str(month_v),
-                    at_v or '—',
-                    by_v or '—',
-                    file_v or '—',
-                    status_text
-                ])
+            thr_v = tdb_v if tdb_v is not None else eval_thr.get(mn, None)
+            day_v, week_v, month_v = counts.get(mn, (0, 0, 0))
+            status_parts = []
+            if not file_v:
+                status_parts.append('Thiếu file')
+            if acc_v is None and auc_v is None and f1_v is None:
+                status_parts.append('Chưa train')
+            if thr_v is None:
+                status_parts.append('Thiếu threshold')
+            if day_v == 0 and week_v == 0 and month_v == 0:
+                status_parts.append('Không có hoạt động')
+            if is_active != '✓':
+                status_parts.append('Không hoạt động')
+            status_text = ', '.join(status_parts) if status_parts else 'Ổn định'
+            # Add DEMO label for fake models
+            model_display = m if mn in trained_models else f"{m} (DEMO)"
+            rows.append([
+                model_display,
+                is_active,
+                f"{thr_v:.2f}" if isinstance(thr_v, float) else '—',
+                f"{auc_v:.3f}" if isinstance(auc_v, float) else '—',
+                f"{acc_v:.3f}" if isinstance(acc_v, float) else '—',
+                f"{f1_v:.3f}" if isinstance(f1_v, float) else '—',
+                str(day_v),
+                str(week_v),
+                str(month_v),
+                at_v or '—',
+                by_v or '—',
+                file_v or '—',
+                status_text
+            ])
+        return rows
+
+    def _render_model_activity(self, data):
+        rows = data.get('audit')
+        if rows is not None:
+            self.tbl_model_audit.setRowCount(len(rows))
+            for i, (ev, det, ts) in enumerate(rows):
+                self.tbl_model_audit.setItem(i, 0, QTableWidgetItem(ev))
+                self.tbl_model_audit.setItem(i, 1, QTableWidgetItem(det))
+                self.tbl_model_audit.setItem(i, 2, QTableWidgetItem(ts))
+        else:
+            self.tbl_model_audit.setRowCount(1)
+            self.tbl_model_audit.setItem(0,0,QTableWidgetItem('—'))
+            self.tbl_model_audit.setItem(0,1,QTableWidgetItem('—'))
+            self.tbl_model_audit.setItem(0,2,QTableWidgetItem('—'))
+        rows = data.get('activity')
+        if rows is not None:
             self.tbl_model_activity.setRowCount(len(rows))
             for i, cols in enumerate(rows):
                 for j, val in enumerate(cols):
                     self.tbl_model_activity.setItem(i, j, QTableWidgetItem(val))
-        except Exception:
-            try:
-                self.tbl_model_activity.setRowCount(1)
-                for j in range(13):
-                    self.tbl_model_activity.setItem(0, j, QTableWidgetItem('—'))
-            except Exception:
-                pass
+        else:
+            self.tbl_model_activity.setRowCount(1)
+            for j in range(13):
+                self.tbl_model_activity.setItem(0, j, QTableWidgetItem('—'))
+        name, thr, auc, acc, f1 = data.get('name'), data.get('thr'), data.get('auc'), data.get('acc'), data.get('f1')
         self._model_labels['name'].setText(str(name or '—'))
         self._model_labels['thr'].setText(f"{thr:.2f}" if isinstance(thr, float) else '—')
         self._model_labels['auc'].setText(f"{auc:.3f}" if isinstance(auc, float) else '—')
         self._model_labels['acc'].setText(f"{acc:.3f}" if isinstance(acc, float) else '—')
         self._model_labels['f1'].setText(f"{f1:.3f}" if isinstance(f1, float) else '—')
-        self._model_labels['at'].setText(str(at or '—'))
-        self._model_labels['by'].setText(str(by or '—'))
+        self._model_labels['at'].setText(str(data.get('at') or '—'))
+        self._model_labels['by'].setText(str(data.get('by') or '—'))
 
     def _apply_table_row_heights(self):
         try:
@@ -654,82 +779,64 @@ class ReportTab(QWidget):
         except Exception:
             pass
 
-    def _update_health_card(self, db):
+    def _fetch_health(self, qs, f):
+        """Độ lệch tỷ lệ vỡ nợ / dự báo / high-risk theo quý và độ chính xác trên tập đánh giá (worker thread)"""
+        snap = qs.get_dashboard_snapshot({'months': 12, 'quarters': 8, 'sections': {'stats', 'series'}})
+        # Default rate drift (monthly series)
+        monthly = snap.monthly_default_rate_recent
+        delta = 0.0
+        if monthly and len(monthly) >= 2:
+            delta = (monthly[-1]['rate'] - monthly[-2]['rate']) * 100
+        # Prediction drift (avg probability vs previous month rate)
+        avg_prob = float(snap.overall_stats.get('avg_probability', 0.0))
+        prev_rate = monthly[-2]['rate'] if monthly and len(monthly) >= 2 else avg_prob
+        pred_delta = (avg_prob - prev_rate) * 100
+        # Feature drift proxy (quarterly high-risk rate changes)
+        quarterly = snap.quarterly_high_risk_rate_recent
+        feat_delta = 0.0
+        if quarterly and len(quarterly) >= 2:
+            feat_delta = (quarterly[-1]['rate'] - quarterly[-2]['rate']) * 100
+        # Model accuracy (from evaluation data)
+        acc_pct = None
+        try:
+            if load_evaluation_data:
+                eval_data = load_evaluation_data()
+                y_test = eval_data.get('y_test') if isinstance(eval_data, dict) else None
+                preds_dict = eval_data.get('predictions', {}) if isinstance(eval_data, dict) else {}
+                preds = preds_dict.get('XGBoost', None)
+                if preds is None and preds_dict:
+                    k = next(iter(preds_dict))
+                    preds = preds_dict.get(k)
+                import numpy as np
+                if y_test is not None and preds is not None and len(y_test) == len(preds):
+                    labels = (np.array(preds) >= 0.5).astype(int)
+                    acc_pct = float((labels == np.array(y_test)).mean()) * 100.0
+        except Exception:
+            acc_pct = None
+        return {'delta': delta, 'pred_delta': pred_delta, 'feat_delta': feat_delta, 'acc_pct': acc_pct}
+
+    def _render_health(self, data):
         if not hasattr(self, 'health_labels') or not self.health_labels:
             return
-        try:
-            # Default rate drift (monthly series)
+        def set_chip(key, desc, status):
+            self.health_labels[key]['desc'].setText(desc)
+            self.health_labels[key]['chip'].setText(status)
+            self.health_labels[key]['chip'].setObjectName('ChipWarning' if status=='Cảnh báo' else 'ChipStable')
             try:
-                from services.integration import get_query_service
-            except Exception:
-                from integration import get_query_service
-            qs = get_query_service(db)
-            monthly = qs.get_monthly_default_rate_recent(months=12)
-            delta = 0.0
-            if monthly and len(monthly) >= 2:
-                delta = (monthly[-1]['rate'] - monthly[-2]['rate']) * 100
-            status = 'Cảnh báo' if abs(delta) >= 5.0 else 'Ổn định'
-            self.health_labels['data']['desc'].setText(f"Độ lệch tỷ lệ vỡ nợ: {delta:+.1f}%")
-            self.health_labels['data']['chip'].setText(status)
-            self.health_labels['data']['chip'].setObjectName('ChipWarning' if status=='Cảnh báo' else 'ChipStable')
-            try:
-                self.health_labels['data']['chip'].setStyleSheet("")
-            except Exception:
-                pass
-            # Prediction drift (avg probability vs previous month rate)
-            cur = qs.get_prediction_stats() if hasattr(qs, 'get_prediction_stats') else {}
-            avg_prob = float(cur.get('avg_probability', 0.0))
-            prev_rate = monthly[-2]['rate'] if monthly and len(monthly) >= 2 else avg_prob
-            pred_delta = (avg_prob - prev_rate) * 100
-            pstatus = 'Cảnh báo' if abs(pred_delta) >= 5.0 else 'Ổn định'
-            self.health_labels['pred']['desc'].setText(f"Độ lệch dự báo: {pred_delta:+.1f}%")
-            self.health_labels['pred']['chip'].setText(pstatus)
-            self.health_labels['pred']['chip'].setObjectName('ChipWarning' if pstatus=='Cảnh báo' else 'ChipStable')
-            try:
-                self.health_labels['pred']['chip'].setStyleSheet("")
-            except Exception:
-                pass
-            # Feature drift proxy (quarterly high-risk rate changes)
-            quarterly = qs.get_quarterly_high_risk_rate_recent(quarters=8)
-            feat_delta = 0.0
-            if quarterly and len(quarterly) >= 2:
-                feat_delta = (quarterly[-1]['rate'] - quarterly[-2]['rate']) * 100
-            fstatus = 'Cảnh báo' if abs(feat_delta) >= 10.0 else 'Ổn định'
-            self.health_labels['feat']['desc'].setText(f"Độ lệch PAY_0: {feat_delta:+.1f}%")
-            self.health_labels['feat']['chip'].setText(fstatus)
-            self.health_labels['feat']['chip'].setObjectName('ChipWarning' if fstatus=='Cảnh báo' else 'ChipStable')
-            try:
-                self.health_labels['feat']['chip'].setStyleSheet("")
+                self.health_labels[key]['chip'].setStyleSheet("")
             except Exception:
                 pass
-            # Model accuracy (from evaluation data)
-            acc_pct = None
-            try:
-                if load_evaluation_data:
-                    eval_data = load_evaluation_data()
-                    y_test = eval_data.get('y_test') if isinstance(eval_data, dict) else None
-                    preds_dict = eval_data.get('predictions', {}) if isinstance(eval_data, dict) else {}
-                    preds = preds_dict.get('XGBoost', None)
-                    if preds is None and preds_dict:
-                        k = next(iter(preds_dict))
-                        preds = preds_dict.get(k)
-                    import numpy as np
-                    if y_test is not None and preds is not None and len(y_test) == len(preds):
-                        labels = (np.array(preds) >= 0.5).astype(int)
-                        acc_pct = float((labels == np.array(y_test)).mean()) * 100.0
-            except Exception:
-                acc_pct = None
-            if acc_pct is not None:
-                self.health_labels['acc']['desc'].setText(f"Độ chính xác mô hình: {acc_pct:.1f}%")
-                astatus = 'Ổn định' if acc_pct >= 75.0 else 'Cảnh báo'
-                self.health_labels['acc']['chip'].setText(astatus)
-                self.health_labels['acc']['chip'].setObjectName('ChipStable' if astatus=='Ổn định' else 'ChipWarning')
-            else:
-                self.health_labels['acc']['desc'].setText("Độ chính xác mô hình: N/A")
-                self.health_labels['acc']['chip'].setText("")
+        delta, pred_delta, feat_delta = data['delta'], data['pred_delta'], data['feat_delta']
+        set_chip('data', f"Độ lệch tỷ lệ vỡ nợ: {delta:+.1f}%", 'Cảnh báo' if abs(delta) >= 5.0 else 'Ổn định')
+        set_chip('pred', f"Độ lệch dự báo: {pred_delta:+.1f}%", 'Cảnh báo' if abs(pred_delta) >= 5.0 else 'Ổn định')
+        set_chip('feat', f"Độ lệch PAY_0: {feat_delta:+.1f}%", 'Cảnh báo' if abs(feat_delta) >= 10.0 else 'Ổn định')
+        acc_pct = data.get('acc_pct')
+        if acc_pct is not None:
+            set_chip('acc', f"Độ chính xác mô hình: {acc_pct:.1f}%", 'Ổn định' if acc_pct >= 75.0 else 'Cảnh báo')
+        else:
+            self.health_labels['acc']['desc'].setText("Độ chính xác mô hình: N/A")
+            self.health_labels['acc']['chip'].setText("")
             try:
                 self.health_labels['acc']['chip'].setStyleSheet("")
             except Exception:
                 pass
-        except Exception:
-            pass
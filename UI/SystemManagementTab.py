@@ -17,6 +17,9 @@ class SystemManagementTab(QWidget):
     def _init_paths(self):
         self.project_root = Path(__file__).resolve().parents[1]
         self.eval_path = self.project_root / 'outputs' / 'evaluation' / 'evaluation_data.npz'
+        # Threshold / overlay / audit nằm trong settings.json riêng, không ghi lại evaluation artifacts
+        from ml.eval_store import get_settings_store
+        self.settings = get_settings_store(self.eval_path.parent)
         self.support_path = self.project_root / 'outputs' / 'system' / 'forgot_requests.json'
         # Integration helpers
         try:
@@ -230,11 +233,10 @@ class SystemManagementTab(QWidget):
                    [f'BILL_AMT{i}' for i in range(1,13)] + [f'PAY_AMT{i}' for i in range(1,13)]
             sel = ','.join([c for c in cols if c != 'ID'])
             # Some schemas may not have sequential columns fully; fetch what exists
-            rows = db.fetch_all(f"SELECT id, {sel} FROM customers")
+            # fetch_frame: cột NumPy có kiểu dựng thẳng thành DataFrame (không qua list tuple / Decimal)
+            dtypes = {c: 'int8' for c in cols if c.startswith('PAY_') and not c.startswith('PAY_AMT')}
+            df = db.fetch_frame(f"SELECT id AS ID, {sel} FROM customers", dtypes=dtypes)
             db.close()
-            if not rows:
-                return pd.DataFrame()
-            df = pd.DataFrame(rows, columns=['ID'] + [c for c in cols if c != 'ID'])
             return df
         except Exception as e:
             print(f"✗ Load dataset from DB failed: {e}")
@@ -243,59 +245,13 @@ class SystemManagementTab(QWidget):
     # ======== Model Settings Helpers ========
     def _load_threshold(self, model_name: str) -> float:
         try:
-            import numpy as np
-            if not self.eval_path.exists():
-                return 0.6
-            data = np.load(self.eval_path, allow_pickle=True)
-            best = data.get('best_thresholds', None)
-            if best is None:
-                return 0.6
-            thr_dict = best.item() if hasattr(best, 'item') else best
-            val = thr_dict.get(model_name, 0.6)
-            return float(val)
+            return self.settings.get_threshold(model_name, 0.6)
         except Exception:
             return 0.6
 
     def _save_threshold(self, model_name: str, value: float) -> bool:
         try:
-            import numpy as np
-            self.eval_path.parent.mkdir(parents=True, exist_ok=True)
-            store = {}
-            if self.eval_path.exists():
-                data = np.load(self.eval_path, allow_pickle=True)
-                for k in data.files:
-                    store[k] = data[k]
-            # Load previous thresholds robustly
-            prev_best = store.get('best_thresholds', None)
-            thr_dict = {}
-            try:
-                if prev_best is not None:
-                    if hasattr(prev_best, 'item') and prev_best.ndim == 0:
-                        obj = prev_best.item()
-                        if isinstance(obj, dict):
-                            thr_dict = dict(obj)
-                    elif isinstance(prev_best, dict):
-                        thr_dict = dict(prev_best)
-            except Exception:
-                thr_dict = {}
-            thr_dict[model_name] = float(value)
-            store['best_thresholds'] = np.array(thr_dict, dtype=object)
-            # Audit robustly
-            prev_audit = store.get('threshold_audit', None)
-            audit_list = []
-            try:
-                if prev_audit is not None:
-                    if hasattr(prev_audit, 'item') and getattr(prev_audit, 'ndim', 0) == 0:
-                        obj = prev_audit.item()
-                        if isinstance(obj, list):
-                            audit_list = list(obj)
-                    elif isinstance(prev_audit, list):
-                        audit_list = list(prev_audit)
-            except Exception:
-                audit_list = []
-            audit_list.append({'model': model_name, 'value': float(value), 'user': 'admin', 'ts': datetime.datetime.now().isoformat()})
-            store['threshold_audit'] = np.array(audit_list, dtype=object)
-            np.savez(self.eval_path, **store)
+            self.settings.set_threshold(model_name, float(value), user='admin')
             return True
         except Exception as e:
             print(f"✗ Save threshold failed: {e}")
@@ -347,27 +303,8 @@ class SystemManagementTab(QWidget):
 
     def _load_threshold_audit(self):
         try:
-            import numpy as np
             self.tblAudit.setRowCount(0)
-            if not self.eval_path.exists():
-                return
-            data = np.load(self.eval_path, allow_pickle=True)
-            audit = data.get('threshold_audit', None)
-            items = []
-            if audit is not None:
-                # np.ndarray cases: 0-D object or 1-D list-like
-                if isinstance(audit, np.ndarray):
-                    if getattr(audit, 'ndim', 0) == 0:
-                        obj = audit.item()
-                        if isinstance(obj, list):
-                            items = obj
-                    else:
-                        # Convert to list of dicts if available
-                        lst = audit.tolist()
-                        if isinstance(lst, list):
-                            items = [x for x in lst if isinstance(x, dict)]
-                elif isinstance(audit, list):
-                    items = [x for x in audit if isinstance(x, dict)]
+            items = self.settings.get_audit()
             self.tblAudit.setRowCount(len(items))
             for i, r in enumerate(items[::-1]):
                 self.tblAudit.setItem(i,0, QTableWidgetItem(str(r.get('ts',''))))
@@ -379,16 +316,8 @@ class SystemManagementTab(QWidget):
 
     def recompute_dashboard_metrics(self):
         try:
-            import numpy as np
-            self.eval_path.parent.mkdir(parents=True, exist_ok=True)
-            store = {}
-            if self.eval_path.exists():
-                data = np.load(self.eval_path, allow_pickle=True)
-                for k in data.files:
-                    store[k] = data[k]
             thr = float(self._load_threshold(self.cmbModel.currentText()))
-            store['dashboard_threshold'] = np.array({'value': thr, 'ts': datetime.datetime.now().isoformat(), 'user': 'admin'}, dtype=object)
-            np.savez(self.eval_path, **store)
+            self.settings.set_dashboard_threshold(thr, user='admin')
             # Trigger dashboard refresh if available
             try:
                 mw = self.window()
@@ -619,28 +548,14 @@ class SystemManagementTab(QWidget):
             self._show_msg(f'Không thể cập nhật: {e}', 'Lỗi', 'error')
     def _load_overlay(self):
         try:
-            import numpy as np
-            if not self.eval_path.exists():
-                return (1.0,0.0,'NONE',False)
-            data = np.load(self.eval_path, allow_pickle=True)
-            cfg = data.get('overlay_config', None)
-            if cfg is None:
-                return (1.0,0.0,'NONE',False)
-            d = cfg.item() if hasattr(cfg, 'item') else cfg
-            return (float(d.get('alpha',1.0)), float(d.get('beta',0.0)), str(d.get('feature','NONE')), bool(d.get('enabled',True)))
+            d = self.settings.get_overlay()
+            return (d['alpha'], d['beta'], d['feature'], d['enabled'])
         except Exception:
             return (1.0,0.0,'NONE',False)
 
     def _save_overlay(self, alpha: float, beta: float, feature: str) -> bool:
         try:
-            import numpy as np
-            store = {}
-            if self.eval_path.exists():
-                data = np.load(self.eval_path, allow_pickle=True)
-                for k in data.files:
-                    store[k] = data[k]
-            store['overlay_config'] = np.array({'alpha': float(alpha), 'beta': float(beta), 'feature': feature, 'enabled': True}, dtype=object)
-            np.savez(self.eval_path, **store)
+            self.settings.set_overlay(alpha, beta, feature, enabled=True)
             return True
         except Exception as e:
             print(f"✗ Save overlay failed: {e}")
@@ -648,14 +563,7 @@ class SystemManagementTab(QWidget):
 
     def reset_overlay(self):
         try:
-            import numpy as np
-            store = {}
-            if self.eval_path.exists():
-                data = np.load(self.eval_path, allow_pickle=True)
-                for k in data.files:
-                    store[k] = data[k]
-            store['overlay_config'] = np.array({'alpha': 1.0, 'beta': 0.0, 'feature': 'NONE', 'enabled': False}, dtype=object)
-            np.savez(self.eval_path, **store)
+            self.settings.reset_overlay()
             self.spnAlpha.setValue(1.0)
             self.spnBeta.setValue(0.0)
             self.cmbOverlayFeature.setCurrentIndex(self.cmbOverlayFeature.findText('NONE'))
@@ -674,14 +582,7 @@ class SystemManagementTab(QWidget):
             # Load thresholds mapping
             thr_map = {}
             try:
-                import numpy as np
-                if self.eval_path.exists():
-                    data = np.load(self.eval_path, allow_pickle=True)
-                    best = data.get('best_thresholds', None)
-                    if best is not None:
-                        d = best.item() if hasattr(best, 'item') else best
-                        if hasattr(d, 'items'):
-                            thr_map = {str(k): float(v) for k, v in d.items()}
+                thr_map = self.settings.get_thresholds()
             except Exception:
                 thr_map = {}
 
@@ -135,11 +135,18 @@ class UserReportTab(QWidget):
                 print(f"   ✓ Đã load {self.table.rowCount()} dòng vào bảng")
                 self.table.setVisible(True)
                 self.empty_message.setVisible(False)
-                # Calculate stats
-                high_count = sum(1 for i in range(len(rows)) if int(rows[i].get('predicted_label') or rows[i].get('label') or 0) == 1)
-                low_count = len(rows) - high_count
-                avg_prob = sum(float(r.get('probability') or 0.0) for r in rows) / len(rows) if rows else 0
-                self.lbl_total.setText(f'Tổng dự báo: {len(rows)}')
+                # KPI trên toàn bộ dự báo hôm nay (snapshot từ predictions_daily_agg), không chỉ 20 dòng hiển thị
+                stats = qs.get_dashboard_snapshot({'time_range': 'Hôm nay', 'user_id': uid, 'sections': {'stats'}}).period_stats
+                if stats.get('total_predictions', 0):
+                    total = stats['total_predictions']
+                    high_count = stats['high_risk_count']
+                    avg_prob = stats['avg_probability']
+                else:
+                    total = len(rows)
+                    high_count = sum(1 for i in range(len(rows)) if int(rows[i].get('predicted_label') or rows[i].get('label') or 0) == 1)
+                    avg_prob = sum(float(r.get('probability') or 0.0) for r in rows) / len(rows) if rows else 0
+                low_count = total - high_count
+                self.lbl_total.setText(f'Tổng dự báo: {total}')
                 self.lbl_high.setText(f'Nguy cơ cao: {high_count}')
                 self.lbl_low.setText(f'Nguy cơ thấp: {low_count}')
                 self.lbl_avg.setText(f'Trung bình: {avg_prob:.0%}')
@@ -1,9 +1,22 @@
 from PyQt6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QFrame, QLabel, QListWidget, QListWidgetItem, QPushButton, QSlider, QSpinBox, QDoubleSpinBox
 from PyQt6.QtCore import Qt
+from pathlib import Path
+import sys
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+try:
+    from ..integration import get_db_connector
+except Exception:
+    from integration import get_db_connector
+
+# Thuật toán dùng được spinner (tên tham số sklearn) và tìm siêu tham số
+TUNABLE = ('XGBoost', 'LightGBM')
 
 class ModelLabPage(QWidget):
-    def __init__(self):
+    def __init__(self, username: str = 'admin'):
         super().__init__()
+        self.username = username
+        self._task = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -42,6 +55,10 @@ class ModelLabPage(QWidget):
         self.btnTrain = QPushButton('Huấn luyện mô hình'); self.btnSaveVer = QPushButton('Lưu thành phiên bản'); self.btnDelete = QPushButton('Xóa mô hình')
         btns.addWidget(self.btnTrain); btns.addWidget(self.btnSaveVer); btns.addWidget(self.btnDelete)
         rl.addLayout(btns)
+        self.btnSearch = QPushButton('Tìm siêu tham số')
+        rl.addWidget(self.btnSearch)
+        self.lblStatus = QLabel(''); self.lblStatus.setWordWrap(True)
+        rl.addWidget(self.lblStatus)
         rl.addWidget(QLabel('Ngưỡng θ'))
         self.th = QSlider(Qt.Orientation.Horizontal); self.th.setRange(0,100); self.th.setValue(50)
         rl.addWidget(self.th)
@@ -50,4 +67,89 @@ class ModelLabPage(QWidget):
         self.btnOpt = QPushButton('Tính lại ngưỡng tối ưu'); self.btnApply = QPushButton('Áp dụng ngưỡng')
         op = QHBoxLayout(); op.addWidget(self.btnOpt); op.addWidget(self.btnApply); rl.addLayout(op)
         root.addWidget(left,1); root.addWidget(center,2); root.addWidget(right,1)
+        self.btnTrain.clicked.connect(self.train_selected)
+        self.btnSearch.clicked.connect(self.search_selected)
+
+    def _selected_algorithm(self):
+        item = self.list.currentItem()
+        if item is None:
+            return None
+        # 'XGBoost_v3' -> 'XGBoost'
+        return item.text().replace('🟢 ', '').split('_')[0]
+
+    def _spinner_params(self):
+        return {
+            'learning_rate': self.lr.value(), 'max_depth': self.depth.value(), 'n_estimators': self.est.value(),
+            'subsample': self.subs.value(), 'colsample_bytree': self.cols.value(),
+        }
+
+    def _apply_params(self, params):
+        self.lr.setValue(float(params.get('learning_rate', self.lr.value())))
+        if int(params.get('max_depth', 0)) > 0:  # LightGBM: -1 = không giới hạn
+            self.depth.setValue(int(params['max_depth']))
+        self.est.setValue(int(params.get('n_estimators', self.est.value())))
+        self.subs.setValue(float(params.get('subsample', self.subs.value())))
+        self.cols.setValue(float(params.get('colsample_bytree', self.cols.value())))
+
+    def _run(self, name, job, on_result):
+        from ui.task_executor import get_task_executor
+        algorithm = self._selected_algorithm()
+        if algorithm not in TUNABLE:
+            self.lblStatus.setText(f"Chọn mô hình {' / '.join(TUNABLE)}")
+            return
+
+        def run(progress=None, cancel_token=None):
+            from ml.train_models import load_and_preprocess
+            from services.model_management_service import ModelManagementService
+            X_train, X_valid, X_test, y_train, y_valid, y_test = load_and_preprocess()
+            db = get_db_connector()
+            try:
+                service = ModelManagementService(db)
+                return job(service, algorithm, X_train, y_train, X_test, y_test,
+                           lambda pct: progress(pct, name) if progress else None, cancel_token)
+            finally:
+                db.close()
+
+        def done(result):
+            if not result.get('success'):
+                self.lblStatus.setText(f"{name} lỗi: {result.get('error')}")
+                return
+            on_result(result)
+
+        def finished():
+            self.btnTrain.setEnabled(True); self.btnSearch.setEnabled(True)
+
+        self.btnTrain.setEnabled(False); self.btnSearch.setEnabled(False)
+        self.lblStatus.setText(f'{name} {algorithm}...')
+        self._task = get_task_executor().submit(
+            run,
+            name=name,
+            on_progress=lambda pct, msg: self.lblStatus.setText(f'{msg} {algorithm} {pct}%'),
+            on_result=done,
+            on_error=lambda e: self.lblStatus.setText(f'{name} lỗi: {e}'),
+            on_finished=finished,
+        )
+
+    def train_selected(self):
+        params = self._spinner_params()
+
+        def job(service, algorithm, X_train, y_train, X_test, y_test, progress, cancel_token):
+            return service.train_model(algorithm, X_train, y_train, X_test, y_test, self.username,
+                                       progress_callback=progress, params=params)
+
+        self._run('Huấn luyện', job, lambda r: self.lblStatus.setText(
+            f"AUC {r['metrics']['auc']:.4f} • F1 {r['metrics']['f1']:.4f} • {r['training_time']}s"))
+
+    def search_selected(self):
+        def job(service, algorithm, X_train, y_train, X_test, y_test, progress, cancel_token):
+            return service.search_hyperparameters(algorithm, X_train, y_train, X_test, y_test, self.username,
+                                                  progress_callback=progress, cancel_token=cancel_token)
+
+        def done(r):
+            self._apply_params(r['best_params'])
+            search = r['search']
+            self.lblStatus.setText(
+                f"CV AUC {r['best_cv_auc']:.4f} • Test AUC {r['metrics']['auc']:.4f} • "
+                f"{search['n_candidates']} ứng viên, {search['fits']} fit, {search['cache_hits']} cache • {r['training_time']}s")
 
+        self._run('Tìm siêu tham số', job, done)
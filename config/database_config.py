@@ -16,7 +16,12 @@ class DatabaseConfig:
         port: int = 3306,
         user: str = 'root',
         password: str = '@Obama123',
-        database: str = 'credit_risk_db'
+        database: str = 'credit_risk_db',
+        use_pool: bool = True,
+        pool_size: int = 5,
+        pool_timeout: float = 10.0,
+        pool_recycle: float = 3600.0,
+        pool_ping: bool = True
     ):
         """
         Khởi tạo cấu hình database
@@ -27,12 +32,22 @@ class DatabaseConfig:
             user: MySQL username
             password: MySQL password
             database: Tên database
+            use_pool: Dùng connection pool dùng chung (database/pool.py)
+            pool_size: Số kết nối tối đa trong pool
+            pool_timeout: Thời gian chờ tối đa (giây) khi pool đầy
+            pool_recycle: Tuổi tối đa (giây) của 1 kết nối trước khi tạo lại (0 = không recycle)
+            pool_ping: Ping kiểm tra kết nối mỗi lần lấy từ pool
         """
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.database = database
+        self.use_pool = use_pool
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_ping = pool_ping
     
     def to_dict(self) -> Dict[str, any]:
         """
@@ -51,6 +66,15 @@ class DatabaseConfig:
             'collation': 'utf8mb4_unicode_ci'
         }
     
+    def pool_key(self) -> tuple:
+        """
+        Khóa nhận diện pool dùng chung (cùng server/user/database -> cùng pool)
+        
+        Returns:
+            Tuple (host, port, user, database)
+        """
+        return (self.host, int(self.port), self.user, self.database)
+    
     @classmethod
     def default(cls) -> 'DatabaseConfig':
         """
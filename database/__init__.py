@@ -2,5 +2,6 @@
 Database package - Connector và SQL scripts
 """
 from .connector import DatabaseConnector
+from .pool import ConnectionPool, PoolTimeoutError, get_pool, close_all_pools
 
-__all__ = ['DatabaseConnector']
+__all__ = ['DatabaseConnector', 'ConnectionPool', 'PoolTimeoutError', 'get_pool', 'close_all_pools']
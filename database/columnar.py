@@ -0,0 +1,150 @@
+"""
+Columnar Fetch
+Chuyển kết quả cursor raw (bytes) thành các cột NumPy có kiểu, không tạo Decimal/int Python cho từng ô
+
+- Cột số (DECIMAL, INT, FLOAT, ...) được nối thành 1 chuỗi và parse 1 lần bằng np.fromstring
+- NULL -> NaN với cột float; cột int có NULL mặc định chuyển sang float64
+- DATE/DATETIME -> datetime64[s] (NULL và ngày 0 '0000-00-00' -> NaT), chuỗi -> object (str), BLOB/VARBINARY -> object (bytes)
+- dtype int chỉ định nhỏ hơn dữ liệu (vd. 300 với int8) -> ValueError, không wrap âm thầm
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from mysql.connector import FieldFlag, FieldType
+
+
+_FLOAT_TYPES = {FieldType.DECIMAL, FieldType.NEWDECIMAL, FieldType.FLOAT, FieldType.DOUBLE}
+_INT_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR}
+_DATETIME_TYPES = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+_BLOB_TYPES = {
+    FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB, FieldType.BLOB,
+    FieldType.VAR_STRING, FieldType.STRING, FieldType.VARCHAR,
+}
+
+DATETIME_DTYPE = np.dtype('datetime64[s]')
+STR_DTYPE = np.dtype(object)
+BYTES_DTYPE = 'bytes'
+# DATE/DATETIME "zero" của MySQL (sql_mode không có NO_ZERO_DATE) - numpy không parse được
+ZERO_DATE = b'0000-00-00'
+
+# (tên cột, dtype đích, dtype parse) - dtype parse: int64/float64 cho cột số, None cho cột khác
+ColumnPlan = List[Tuple[str, object, Optional[np.dtype]]]
+
+
+def plan_columns(description: Sequence[tuple], dtypes: Optional[Dict[str, object]] = None) -> ColumnPlan:
+    """
+    Chọn dtype cho từng cột từ cursor.description (ghi đè bằng dtypes)
+
+    Args:
+        description: cursor.description
+        dtypes: Dict {tên cột: dtype numpy | 'bytes'}, vd. {'PAY_0': 'int8', 'BILL_AMT1': 'float32'}
+
+    Returns:
+        ColumnPlan
+    """
+    dtypes = dtypes or {}
+    plan: ColumnPlan = []
+    for desc in description:
+        name, type_code = desc[0], desc[1]
+        null_ok = bool(desc[6]) if len(desc) > 6 else True
+        flags = desc[7] if len(desc) > 7 and desc[7] else 0
+        numeric_source = np.dtype(np.int64) if type_code in _INT_TYPES else np.dtype(np.float64)
+
+        target = dtypes.get(name)
+        if target is None:
+            if type_code in _FLOAT_TYPES:
+                target = np.dtype(np.float64)
+            elif type_code in _INT_TYPES:
+                target = np.dtype(np.float64) if null_ok else np.dtype(np.int64)
+            elif type_code in _DATETIME_TYPES:
+                target = DATETIME_DTYPE
+            elif type_code in _BLOB_TYPES and flags & FieldFlag.BINARY:
+                target = BYTES_DTYPE
+            else:
+                target = STR_DTYPE
+        elif not _is_bytes(target):
+            target = np.dtype(target)
+
+        if not _is_bytes(target) and target.kind in 'iuf':
+            parse = np.dtype(np.float64) if target.kind == 'f' else numeric_source
+            plan.append((name, target, parse))
+        else:
+            plan.append((name, target, None))
+    return plan
+
+
+def convert_rows(rows: Sequence[tuple], plan: ColumnPlan) -> Dict[str, np.ndarray]:
+    """
+    Chuyển 1 lô dòng raw (bytes / None) thành dict các cột NumPy theo plan
+
+    Args:
+        rows: Dòng từ cursor raw=True
+        plan: Kết quả plan_columns
+
+    Returns:
+        Dict {tên cột: ndarray (n,)}
+
+    Raises:
+        ValueError: Nếu cột int (dtype chỉ định) có NULL, giá trị không parse được,
+            số lẻ hoặc nằm ngoài phạm vi dtype
+    """
+    n = len(rows)
+    if n == 0:
+        return {name: np.empty(0, dtype=object if _is_bytes(target) else target) for name, target, _ in plan}
+    columns = list(zip(*rows))
+    out: Dict[str, np.ndarray] = {}
+    for (name, target, parse), col in zip(plan, columns):
+        if parse is not None:
+            out[name] = _parse_numeric(name, col, target, parse)
+        elif _is_bytes(target):
+            arr = np.empty(n, dtype=object)
+            arr[:] = [None if v is None else bytes(v) for v in col]
+            out[name] = arr
+        elif target.kind == 'M':
+            text = [('NaT' if v is None or bytes(v).startswith(ZERO_DATE) else bytes(v).decode('ascii')) for v in col]
+            out[name] = np.array(text, dtype=target)
+        else:
+            values = [None if v is None else (v.decode('utf-8') if isinstance(v, (bytes, bytearray)) else v) for v in col]
+            arr = np.empty(n, dtype=object)
+            arr[:] = values
+            out[name] = arr if target == STR_DTYPE else arr.astype(target)
+    return out
+
+
+def _is_bytes(target) -> bool:
+    return isinstance(target, str) and target == BYTES_DTYPE
+
+
+def _parse_numeric(name: str, col: tuple, target: np.dtype, parse: np.dtype) -> np.ndarray:
+    """Parse cả cột số trong 1 lần (np.fromstring trên chuỗi nối)"""
+    if None in col:
+        if target.kind != 'f':
+            raise ValueError(f"Cột {name} có NULL - dùng dtype float")
+        col = [b'nan' if v is None else v for v in col]
+        parse = np.dtype(np.float64)
+    text = b' '.join(col).decode('ascii')
+    arr = np.fromstring(text, dtype=parse, sep=' ')
+    if arr.shape[0] != len(col):
+        raise ValueError(f"Cột {name}: không parse được giá trị số")
+    if arr.dtype == target:
+        return arr
+    if target.kind in 'iu' and arr.size:
+        if arr.dtype.kind == 'f' and not np.array_equal(arr, np.trunc(arr)):
+            raise ValueError(f"Cột {name} có số lẻ - không ép được sang {target}")
+        info = np.iinfo(target)
+        lo, hi = arr.min(), arr.max()
+        if lo < info.min or hi > info.max:
+            raise ValueError(f"Cột {name}: giá trị [{lo}, {hi}] vượt phạm vi {target} [{info.min}, {info.max}]")
+    return arr.astype(target)
+
+
+def concat_columns(chunks: List[Dict[str, np.ndarray]], names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Ghép các lô cột thành cột hoàn chỉnh
+
+    Returns:
+        Dict {tên cột: ndarray}
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    return {name: np.concatenate([c[name] for c in chunks]) for name in names}
@@ -2,172 +2,516 @@
 Database Connector
 Lớp kết nối và thao tác với MySQL database
 """
-import mysql.connector
+import threading
 from mysql.connector import Error
-from typing import List, Tuple, Optional, Any
+from mysql.connector.errors import InterfaceError, OperationalError
+from typing import List, Tuple, Optional, Any, Sequence, Iterator, Dict
+import numpy as np
+import pandas as pd
 from config.database_config import DatabaseConfig
+from database.columnar import concat_columns, convert_rows, plan_columns
+from database.pool import ConnectionPool, create_connection, get_pool
 
 
 class DatabaseConnector:
     """
     Lớp quản lý kết nối và truy vấn MySQL database
     Sử dụng parameterized queries để tránh SQL injection
+
+    Khi config.use_pool = True, mỗi lời gọi lấy 1 kết nối từ pool dùng chung và
+    tạo cursor riêng, nên 1 connector có thể dùng đồng thời từ nhiều thread.
+    Các lệnh chạy với commit=False được giữ trên cùng 1 kết nối của thread đó
+    cho tới khi gọi commit()/rollback().
     """
-    
-    def __init__(self, config: DatabaseConfig):
+
+    def __init__(self, config: DatabaseConfig, use_pool: Optional[bool] = None):
         """
         Khởi tạo connector với cấu hình
-        
+
         Args:
             config: Instance DatabaseConfig
+            use_pool: Ghi đè config.use_pool (None = theo config)
         """
         self.config = config
+        self.use_pool = bool(getattr(config, 'use_pool', False)) if use_pool is None else use_pool
+        self.pool: Optional[ConnectionPool] = None
         self.connection = None
-        self.cursor = None
         self.last_error = None
-    
+        # Kết nối đang giữ transaction (commit=False) của từng thread - chỉ dùng ở chế độ pool
+        self._local = threading.local()
+
     def connect(self) -> bool:
         """
-        Tạo kết nối tới MySQL database
-        
+        Tạo kết nối tới MySQL database (chế độ pool: khởi tạo pool và kiểm tra 1 kết nối)
+
         Returns:
             True nếu kết nối thành công, False nếu thất bại
         """
+        if self.use_pool:
+            try:
+                self.pool = get_pool(self.config)
+                conn = self.pool.acquire()
+                self.pool.release(conn)
+                print(f"✓ Đã kết nối tới database: {self.config.database} (pool size={self.pool.size})")
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"✗ Lỗi kết nối database: {e}")
+                return False
+
         try:
-            self.connection = mysql.connector.connect(**self.config.to_dict())
-            self.cursor = self.connection.cursor()
+            self.connection = create_connection(self.config)
             print(f"✓ Đã kết nối tới database: {self.config.database}")
             return True
         except Error as e:
-            # Unknown database -> tạo database rồi kết nối lại
-            if getattr(e, 'errno', None) == 1049:
-                try:
-                    base_cfg = self.config.to_dict().copy()
-                    base_cfg.pop('database', None)
-                    temp_conn = mysql.connector.connect(**base_cfg)
-                    temp_cursor = temp_conn.cursor()
-                    temp_cursor.execute(
-                        f"CREATE DATABASE IF NOT EXISTS `{self.config.database}` "
-                        f"DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
-                    )
-                    temp_conn.close()
-                    self.connection = mysql.connector.connect(**self.config.to_dict())
-                    self.cursor = self.connection.cursor()
-                    print(f"✓ Đã tạo và kết nối database: {self.config.database}")
-                    return True
-                except Error as create_err:
-                    print(f"✗ Không thể tạo database: {create_err}")
-                    return False
+            self.last_error = str(e)
             print(f"✗ Lỗi kết nối database: {e}")
             return False
-    
-    def execute_query(self, query: str, params: Optional[Tuple] = None) -> bool:
+
+    # ===================== Connection checkout =====================
+    def _checkout(self, pin: bool = False):
+        """
+        Lấy kết nối cho 1 lời gọi
+
+        Args:
+            pin: Giữ kết nối cho thread hiện tại tới khi commit()/rollback()
+
+        Returns:
+            Tuple (connection, owned) - owned=True nếu caller phải trả kết nối về pool;
+            (None, False) nếu không kết nối được
+        """
+        if not self.use_pool:
+            if not self.connection:
+                self.connect()
+            else:
+                try:
+                    # Reconnect if connection dropped
+                    if hasattr(self.connection, 'is_connected') and not self.connection.is_connected():
+                        self.connect()
+                except Exception:
+                    pass
+            return self.connection, False
+
+        pinned = getattr(self._local, 'conn', None)
+        if pinned is not None:
+            return pinned, False
+        try:
+            if self.pool is None:
+                self.pool = get_pool(self.config)
+            conn = self.pool.acquire()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"✗ Không lấy được kết nối từ pool: {e}")
+            return None, False
+        if pin:
+            self._local.conn = conn
+            return conn, False
+        return conn, True
+
+    def _checkin(self, conn, owned: bool, error: Optional[Exception] = None):
+        """Trả kết nối về pool; bỏ kết nối nếu lỗi mất kết nối"""
+        if owned and self.pool is not None:
+            discard = isinstance(error, (InterfaceError, OperationalError))
+            self.pool.release(conn, discard=discard)
+
+    def _release_pinned(self, error: Optional[Exception] = None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        self._checkin(conn, True, error)
+
+    # ===================== Write =====================
+    def execute_query(self, query: str, params: Optional[Tuple] = None, commit: bool = True) -> bool:
         """
         Thực thi câu lệnh INSERT/UPDATE/DELETE và tự động commit
-        
+
         Args:
             query: Câu SQL query (dùng %s cho placeholder)
             params: Tuple các tham số cho query
-        
+            commit: False để giữ trong transaction hiện tại (gọi commit() sau)
+
         Returns:
             True nếu thành công, False nếu thất bại
         """
-        if not self.connection or not self.cursor:
-            try:
-                self.connect()
-            except Exception:
-                print("✗ Chưa có kết nối database")
-                return False
-        try:
-            # Reconnect if connection dropped
-            if hasattr(self.connection, 'is_connected') and not self.connection.is_connected():
-                self.connect()
-        except Exception:
-            pass
-        
+        conn, owned = self._checkout(pin=not commit)
+        if conn is None:
+            print("✗ Chưa có kết nối database")
+            return False
+
+        cursor = None
+        err = None
         try:
+            cursor = conn.cursor()
             if params:
-                self.cursor.execute(query, params)
+                cursor.execute(query, params)
             else:
-                self.cursor.execute(query)
-            self.connection.commit()
+                cursor.execute(query)
+            if commit:
+                conn.commit()
             return True
         except Error as e:
+            err = e
             self.last_error = str(e)
             print(f"✗ Lỗi execute query: {e}")
             try:
-                self.connection.rollback()
+                conn.rollback()
             except Exception:
                 pass
             return False
-    
+        finally:
+            self._close_cursor(cursor)
+            self._checkin(conn, owned, err)
+            if err is not None and self.use_pool:
+                # Transaction đã rollback -> trả kết nối đang giữ về pool
+                self._release_pinned(err)
+
+    def execute_many(self, query: str, params_seq: Sequence[Tuple], commit: bool = True) -> bool:
+        """
+        Thực thi 1 câu INSERT/UPDATE cho nhiều bộ tham số
+        (mysql.connector gộp INSERT ... VALUES thành 1 câu multi-row)
+
+        Args:
+            query: Câu SQL query (dùng %s cho placeholder)
+            params_seq: List các tuple tham số
+            commit: False để giữ trong transaction hiện tại (gọi commit() sau)
+
+        Returns:
+            True nếu thành công, False nếu thất bại (đã rollback)
+        """
+        if not params_seq:
+            return True
+        conn, owned = self._checkout(pin=not commit)
+        if conn is None:
+            print("✗ Chưa có kết nối database")
+            return False
+
+        cursor = None
+        err = None
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(query, list(params_seq))
+            if commit:
+                conn.commit()
+            return True
+        except Error as e:
+            err = e
+            self.last_error = str(e)
+            print(f"✗ Lỗi execute_many: {e}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return False
+        finally:
+            self._close_cursor(cursor)
+            self._checkin(conn, owned, err)
+            if err is not None and self.use_pool:
+                # Transaction đã rollback -> trả kết nối đang giữ về pool
+                self._release_pinned(err)
+
+    def commit(self) -> bool:
+        """
+        Commit transaction hiện tại (chế độ pool: của thread hiện tại)
+
+        Returns:
+            True nếu thành công
+        """
+        conn = getattr(self._local, 'conn', None) if self.use_pool else self.connection
+        if conn is None:
+            return True
+        try:
+            conn.commit()
+            return True
+        except Error as e:
+            self.last_error = str(e)
+            print(f"✗ Lỗi commit: {e}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return False
+        finally:
+            if self.use_pool:
+                self._release_pinned()
+
+    def rollback(self):
+        """Rollback transaction hiện tại (bỏ qua lỗi)"""
+        conn = getattr(self._local, 'conn', None) if self.use_pool else self.connection
+        try:
+            if conn:
+                conn.rollback()
+        except Exception:
+            pass
+        finally:
+            if self.use_pool:
+                self._release_pinned()
+
+    # ===================== Read =====================
     def fetch_all(self, query: str, params: Optional[Tuple] = None) -> List[Tuple]:
         """
         Thực thi SELECT query và trả về tất cả kết quả
-        
+
         Args:
             query: Câu SQL SELECT query
             params: Tuple các tham số cho query
-        
+
         Returns:
             List các tuple kết quả, hoặc list rỗng nếu lỗi
         """
-        if not self.connection or not self.cursor:
+        if not self.use_pool and not self.connection:
             print("✗ Chưa có kết nối database")
             return []
-        
+        conn, owned = self._checkout()
+        if conn is None:
+            return []
+
+        cursor = None
+        err = None
         try:
+            cursor = conn.cursor()
             if params:
-                self.cursor.execute(query, params)
+                cursor.execute(query, params)
             else:
-                self.cursor.execute(query)
-            results = self.cursor.fetchall()
+                cursor.execute(query)
+            results = cursor.fetchall()
             return results
         except Error as e:
+            err = e
+            self.last_error = str(e)
             print(f"✗ Lỗi fetch_all: {e}")
             return []
-    
+        finally:
+            self._close_cursor(cursor)
+            self._checkin(conn, owned, err)
+
     def fetch_one(self, query: str, params: Optional[Tuple] = None) -> Optional[Tuple]:
         """
         Thực thi SELECT query và trả về 1 kết quả duy nhất
-        
+
         Args:
             query: Câu SQL SELECT query
             params: Tuple các tham số cho query
-        
+
         Returns:
             Tuple kết quả hoặc None nếu không có/lỗi
         """
-        if not self.connection or not self.cursor:
+        if not self.use_pool and not self.connection:
             print("✗ Chưa có kết nối database")
             return None
-        
+        conn, owned = self._checkout()
+        if conn is None:
+            return None
+
+        cursor = None
+        err = None
         try:
+            # Buffered để có thể đóng cursor khi còn dòng chưa đọc
+            cursor = conn.cursor(buffered=True)
             if params:
-                self.cursor.execute(query, params)
+                cursor.execute(query, params)
             else:
-                self.cursor.execute(query)
-            result = self.cursor.fetchone()
+                cursor.execute(query)
+            result = cursor.fetchone()
             return result
         except Error as e:
+            err = e
+            self.last_error = str(e)
             print(f"✗ Lỗi fetch_one: {e}")
             return None
-    
+        finally:
+            self._close_cursor(cursor)
+            self._checkin(conn, owned, err)
+
+    def stream(self, query: str, params: Optional[Tuple] = None, batch_size: int = 1000) -> Iterator[List[Tuple]]:
+        """
+        Thực thi SELECT với cursor không buffer, trả kết quả theo từng lô (stream từ server)
+
+        Args:
+            query: Câu SQL SELECT query
+            params: Tuple các tham số cho query
+            batch_size: Số dòng mỗi lô (fetchmany)
+
+        Yields:
+            List các tuple kết quả (tối đa batch_size dòng)
+        """
+        conn, owned = self._checkout()
+        if conn is None:
+            return
+
+        cursor = None
+        err = None
+        try:
+            cursor = conn.cursor(buffered=False)
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        except Error as e:
+            err = e
+            self.last_error = str(e)
+            print(f"✗ Lỗi stream: {e}")
+            raise
+        finally:
+            self._close_cursor(cursor)
+            self._checkin(conn, owned, err)
+
+    # ===================== Columnar read =====================
+    def iter_numpy(
+        self,
+        query: str,
+        params: Optional[Tuple] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 10000
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Stream SELECT theo lô, mỗi lô là dict các cột NumPy có kiểu (xem database/columnar.py)
+
+        Cursor chạy ở chế độ raw: DECIMAL/INT không đi qua Decimal/int Python mà được parse
+        cả cột 1 lần, nên không còn vòng float(...) từng ô
+
+        Args:
+            query: Câu SQL SELECT query
+            params: Tuple các tham số cho query
+            dtypes: Dict {tên cột: dtype} ghi đè dtype mặc định, vd. {'PAY_0': 'int8', 'BILL_AMT1': 'float32'};
+                'bytes' cho cột nhị phân
+            chunk_size: Số dòng mỗi lô
+
+        Yields:
+            Dict {tên cột: ndarray (n,)} theo thứ tự cột của SELECT
+        """
+        conn, owned = self._checkout()
+        if conn is None:
+            return
+
+        cursor = None
+        err = None
+        completed = False
+        try:
+            cursor = conn.cursor(buffered=False, raw=True)
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            plan = plan_columns(cursor.description, dtypes)
+            emitted = False
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                emitted = True
+                yield convert_rows(rows, plan)
+            if not emitted:
+                yield convert_rows([], plan)
+            completed = True
+        except Error as e:
+            err = e
+            self.last_error = str(e)
+            print(f"✗ Lỗi iter_numpy: {e}")
+            raise
+        finally:
+            if not completed and err is None:
+                # Dừng giữa chừng (lỗi convert / caller bỏ generator): đọc bỏ phần còn lại
+                # để kết nối trả về pool không còn result chưa đọc
+                try:
+                    conn.consume_results()
+                except Exception:
+                    pass
+            self._close_cursor(cursor)
+            self._checkin(conn, owned, err)
+
+    def fetch_numpy(
+        self,
+        query: str,
+        params: Optional[Tuple] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 10000
+    ) -> Dict[str, np.ndarray]:
+        """
+        Thực thi SELECT và trả về toàn bộ kết quả dạng cột NumPy
+
+        Args:
+            Giống iter_numpy
+
+        Returns:
+            Dict {tên cột: ndarray (n,)}, hoặc dict rỗng nếu lỗi
+        """
+        if not self.use_pool and not self.connection:
+            print("✗ Chưa có kết nối database")
+            return {}
+        try:
+            chunks = list(self.iter_numpy(query, params, dtypes, chunk_size))
+        except (Error, ValueError) as e:
+            self.last_error = str(e)
+            print(f"✗ Lỗi fetch_numpy: {e}")
+            return {}
+        if not chunks:
+            return {}
+        return concat_columns(chunks, list(chunks[0]))
+
+    def fetch_frame(
+        self,
+        query: str,
+        params: Optional[Tuple] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 10000
+    ) -> pd.DataFrame:
+        """
+        Thực thi SELECT và trả về DataFrame dựng trực tiếp từ các cột NumPy (không qua list of tuples)
+
+        Args:
+            Giống iter_numpy
+
+        Returns:
+            DataFrame (rỗng nếu lỗi)
+        """
+        columns = self.fetch_numpy(query, params, dtypes, chunk_size)
+        return pd.DataFrame(columns, copy=False)
+
+    @staticmethod
+    def _close_cursor(cursor):
+        if cursor is None:
+            return
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Thống kê connection pool (wait time, in-use, created, recycled...)
+
+        Returns:
+            Dict thống kê, hoặc dict rỗng nếu không dùng pool
+        """
+        if not self.use_pool:
+            return {}
+        if self.pool is None:
+            self.pool = get_pool(self.config)
+        return self.pool.get_stats()
+
     def close(self):
         """
-        Đóng kết nối database
+        Đóng kết nối database (chế độ pool: trả kết nối đang giữ về pool, pool vẫn dùng chung)
         """
-        if self.cursor:
-            self.cursor.close()
+        if self.use_pool:
+            self.rollback()
+            return
         if self.connection:
             self.connection.close()
+            self.connection = None
             print("✓ Đã đóng kết nối database")
-    
+
     def __enter__(self):
         """Context manager enter"""
         self.connect()
         return self
-    
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
         self.close()
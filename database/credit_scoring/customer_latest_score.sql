@@ -0,0 +1,15 @@
+-- ================================================
+-- Bảng CUSTOMER_LATEST_SCORE - Điểm mới nhất mỗi (khách hàng, model) (services/latest_score.py)
+-- Cập nhật cùng transaction với INSERT predictions_log; nạp lại: python -m services.latest_score
+-- ================================================
+
+CREATE TABLE IF NOT EXISTS `customer_latest_score` (
+    `customer_id` INT NOT NULL,
+    `model_name` VARCHAR(50) NOT NULL,
+    `probability` DECIMAL(5, 4) NOT NULL COMMENT 'Xác suất vỡ nợ của lần chấm mới nhất',
+    `predicted_label` TINYINT NOT NULL,
+    `scored_at` DATETIME NOT NULL COMMENT 'Thời điểm của dòng predictions_log tương ứng',
+    PRIMARY KEY (`customer_id`, `model_name`),
+    INDEX idx_model_probability (`model_name`, `probability`) COMMENT 'Tier (range scan) và top-N (index scan + LIMIT)',
+    FOREIGN KEY (`customer_id`) REFERENCES `customers`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,23 @@
+-- ================================================
+-- Bảng HYPERPARAM_SEARCH - Lịch sử tìm siêu tham số (ml/hyperparam_search.py)
+-- ================================================
+
+CREATE TABLE IF NOT EXISTS `hyperparam_search` (
+    `id` INT AUTO_INCREMENT PRIMARY KEY,
+    `model_name` VARCHAR(50) NOT NULL COMMENT 'model_registry.model_name của model tốt nhất',
+    `algorithm` VARCHAR(50) NOT NULL,
+    `best_params` JSON NOT NULL,
+    `best_rounds` INT COMMENT 'Số boosting round của model tốt nhất',
+    `best_cv_auc` DECIMAL(6,5),
+    `test_auc` DECIMAL(6,5),
+    `n_candidates` INT,
+    `n_fits` INT COMMENT 'Số fold đã train (không tính cache hit)',
+    `cache_hits` INT,
+    `search_time` DECIMAL(10,2) COMMENT 'seconds',
+    `fit_time` DECIMAL(10,2) COMMENT 'seconds - fit cuối trên toàn bộ tập train',
+    `history` LONGTEXT COMMENT 'JSON: mỗi phần tử 1 ứng viên ở 1 rung',
+    `searched_by` VARCHAR(50),
+    `searched_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    INDEX idx_model (`model_name`, `searched_at` DESC)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
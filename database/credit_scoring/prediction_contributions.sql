@@ -0,0 +1,14 @@
+-- ================================================
+-- Bảng PREDICTION_CONTRIBUTIONS - Top-k đóng góp feature của từng dự báo (services/explanation_service.py)
+-- ================================================
+
+CREATE TABLE IF NOT EXISTS `prediction_contributions` (
+    `prediction_id` INT PRIMARY KEY COMMENT 'predictions_log.id',
+    `model_name` VARCHAR(50) NOT NULL,
+    `model_hash` CHAR(64) NOT NULL COMMENT 'SHA-256 file model đã dùng để giải thích',
+    `output_space` VARCHAR(20) NOT NULL DEFAULT 'log_odds',
+    `base_value` DOUBLE NOT NULL COMMENT 'base_value + tổng contribution = margin của model',
+    `top_k_json` TEXT NOT NULL COMMENT '[[feature, contribution], ...] giảm dần theo trị tuyệt đối',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (`prediction_id`) REFERENCES `predictions_log`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
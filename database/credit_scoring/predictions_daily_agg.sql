@@ -0,0 +1,24 @@
+-- ================================================
+-- Bảng PREDICTIONS_DAILY_AGG - Tổng hợp predictions_log theo ngày (services/prediction_aggregate_service.py)
+-- 1 dòng / (ngày, model, user, bucket xác suất 0.01); dashboard roll-up lên tuần/tháng/quý
+-- ================================================
+
+CREATE TABLE IF NOT EXISTS `predictions_daily_agg` (
+    `day` DATE NOT NULL,
+    `model_name` VARCHAR(50) NOT NULL,
+    `user_id` INT NOT NULL DEFAULT 0 COMMENT '0 = predictions_log.user_id NULL',
+    `prob_bucket` TINYINT UNSIGNED NOT NULL COMMENT 'FLOOR(probability*100), 0..99',
+    `n_total` INT NOT NULL DEFAULT 0,
+    `n_default` INT NOT NULL DEFAULT 0 COMMENT 'Số dòng predicted_label=1',
+    `sum_probability` DECIMAL(16, 4) NOT NULL DEFAULT 0,
+    `sum_probability_default` DECIMAL(16, 4) NOT NULL DEFAULT 0 COMMENT 'Tổng probability của các dòng predicted_label=1',
+    PRIMARY KEY (`day`, `model_name`, `user_id`, `prob_bucket`),
+    INDEX idx_user_day (`user_id`, `day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- High-water mark: predictions_log.id lớn nhất đã cộng vào predictions_daily_agg
+CREATE TABLE IF NOT EXISTS `predictions_agg_watermark` (
+    `agg_name` VARCHAR(50) PRIMARY KEY,
+    `last_id` INT NOT NULL DEFAULT 0,
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
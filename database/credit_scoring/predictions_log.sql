@@ -12,7 +12,9 @@ CREATE TABLE IF NOT EXISTS `predictions_log` (
     `probability` DECIMAL(5, 4) NOT NULL COMMENT 'Xác suất vỡ nợ (0-1)',
     `confidence_score` DECIMAL(5, 4) COMMENT 'Độ tin cậy của dự báo',
     `cluster_id` INT COMMENT 'Cluster của khách hàng',
-    `raw_input_json` TEXT COMMENT 'Dữ liệu input dạng JSON',
+    `raw_input_json` TEXT COMMENT 'Dữ liệu input dạng JSON (legacy, NULL khi lưu nhị phân)',
+    `features_f32` VARBINARY(164) NULL COMMENT '41 features float32 theo FEATURE_NAMES',
+    `extras_blob` BLOB NULL COMMENT 'Trường ngoài features, JSON nén zstd/zlib',
     `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_customer (`customer_id`),
     INDEX idx_user (`user_id`),
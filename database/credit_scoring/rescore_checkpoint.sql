@@ -0,0 +1,13 @@
+-- ================================================
+-- Bảng RESCORE_CHECKPOINT - Checkpoint cho job chấm điểm lại (services/rescore.py)
+-- ================================================
+
+CREATE TABLE IF NOT EXISTS `rescore_checkpoint` (
+    `job_key` VARCHAR(100) PRIMARY KEY COMMENT 'model_name@mtime của file model',
+    `model_name` VARCHAR(50) NOT NULL,
+    `last_customer_id` INT NOT NULL DEFAULT 0 COMMENT 'customers.id lớn nhất đã ghi predictions_log',
+    `rows_scored` INT NOT NULL DEFAULT 0,
+    `status` ENUM('running', 'completed', 'failed') DEFAULT 'running',
+    `started_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
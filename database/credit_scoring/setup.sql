@@ -15,6 +15,12 @@ USE `credit_risk_db`;
 SOURCE user.sql;
 SOURCE customers.sql;
 SOURCE predictions_log.sql;
+SOURCE rescore_checkpoint.sql;
+SOURCE customer_latest_score.sql;
+SOURCE predictions_daily_agg.sql;
+SOURCE prediction_contributions.sql;
+SOURCE hyperparam_search.sql;
+SOURCE training_jobs.sql;
 
 -- Hiển thị danh sách bảng đã tạo
 SHOW TABLES;
@@ -0,0 +1,24 @@
+-- ================================================
+-- Bảng TRAINING_JOBS - Job train nền (services/training_jobs.py)
+-- ================================================
+
+CREATE TABLE IF NOT EXISTS `training_jobs` (
+    `job_id` CHAR(16) PRIMARY KEY,
+    `model_name` VARCHAR(50) NOT NULL,
+    `status` ENUM('queued', 'running', 'completed', 'failed', 'cancelled') DEFAULT 'queued',
+    `params` JSON,
+    `progress` TINYINT UNSIGNED NOT NULL DEFAULT 0 COMMENT '0-100',
+    `current_round` INT COMMENT 'Boosting round gần nhất',
+    `total_rounds` INT,
+    `eval_auc` DECIMAL(6,5) COMMENT 'AUC trên tập test ở round gần nhất',
+    `test_auc` DECIMAL(6,5),
+    `cached` BOOLEAN DEFAULT FALSE COMMENT 'Kết quả lấy từ train cache',
+    `worker_pid` INT,
+    `error` TEXT,
+    `submitted_by` VARCHAR(50),
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    `started_at` DATETIME,
+    `finished_at` DATETIME,
+
+    INDEX idx_status (`status`, `created_at` DESC)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
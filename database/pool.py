@@ -0,0 +1,269 @@
+"""
+Connection Pool
+Pool kết nối MySQL dùng chung cho toàn process (thread-safe)
+- Giới hạn số kết nối theo DatabaseConfig.pool_size, chờ tối đa pool_timeout khi pool đầy
+- Ping (reconnect) khi checkout, recycle kết nối quá pool_recycle giây
+- Thống kê: thời gian chờ, số kết nối đang dùng, đã tạo, đã recycle
+"""
+import time
+import threading
+from collections import deque
+from typing import Dict, Any
+
+import mysql.connector
+from mysql.connector import Error
+
+from config.database_config import DatabaseConfig
+
+
+class PoolTimeoutError(Exception):
+    """Không lấy được kết nối trong thời gian pool_timeout"""
+
+
+def create_connection(config: DatabaseConfig):
+    """
+    Tạo 1 kết nối MySQL mới, tự tạo database nếu chưa có (errno 1049)
+
+    Args:
+        config: Instance DatabaseConfig
+
+    Returns:
+        MySQLConnection
+    """
+    try:
+        return mysql.connector.connect(**config.to_dict())
+    except Error as e:
+        if getattr(e, 'errno', None) != 1049:
+            raise
+        base_cfg = config.to_dict().copy()
+        base_cfg.pop('database', None)
+        temp_conn = mysql.connector.connect(**base_cfg)
+        try:
+            temp_cursor = temp_conn.cursor()
+            temp_cursor.execute(
+                f"CREATE DATABASE IF NOT EXISTS `{config.database}` "
+                f"DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+            )
+            temp_cursor.close()
+        finally:
+            temp_conn.close()
+        print(f"✓ Đã tạo database: {config.database}")
+        return mysql.connector.connect(**config.to_dict())
+
+
+class ConnectionPool:
+    """
+    Pool kết nối MySQL với health-check và metrics
+    """
+
+    def __init__(self, config: DatabaseConfig):
+        """
+        Khởi tạo pool (chưa mở kết nối nào cho tới lần checkout đầu tiên)
+
+        Args:
+            config: Instance DatabaseConfig (dùng pool_size, pool_timeout, pool_recycle, pool_ping)
+        """
+        self.config = config
+        self.size = max(1, int(config.pool_size))
+        self.timeout = float(config.pool_timeout)
+        self.recycle = float(config.pool_recycle)
+        self.ping_on_checkout = bool(config.pool_ping)
+        self._cond = threading.Condition()
+        # Kết nối rảnh: deque[(connection, created_at)]
+        self._idle: deque = deque()
+        self._created_at: Dict[int, float] = {}
+        self._open = 0
+        self._in_use = 0
+        self._closed = False
+        # Metrics
+        self._created = 0
+        self._recycled = 0
+        self._ping_failures = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self):
+        """
+        Lấy 1 kết nối từ pool (chờ nếu pool đầy)
+
+        Returns:
+            MySQLConnection đã được ping
+
+        Raises:
+            PoolTimeoutError: Nếu chờ quá pool_timeout
+            mysql.connector.Error: Nếu không tạo được kết nối mới
+        """
+        t0 = time.perf_counter()
+        deadline = t0 + self.timeout
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Pool đã đóng")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    # Giữ chỗ rồi tạo kết nối ngoài lock
+                    self._open += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Hết thời gian chờ kết nối ({self.timeout:.1f}s, pool_size={self.size})"
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is None:
+                conn = self._new_connection()
+            else:
+                conn = self._check_health(conn)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.perf_counter() - t0
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """
+        Trả kết nối về pool (rollback transaction còn dở)
+
+        Args:
+            conn: Kết nối lấy từ acquire()
+            discard: True để đóng hẳn kết nối (ví dụ sau lỗi mất kết nối)
+        """
+        if conn is None:
+            return
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._open -= 1
+                self._created_at.pop(id(conn), None)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+        if discard or self._closed:
+            self._close_quietly(conn)
+
+    def _new_connection(self):
+        conn = create_connection(self.config)
+        with self._cond:
+            self._created += 1
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _check_health(self, conn):
+        """Recycle kết nối quá hạn và ping kết nối trước khi trả cho caller"""
+        created = self._created_at.get(id(conn), 0.0)
+        if self.recycle > 0 and time.monotonic() - created > self.recycle:
+            self._drop(conn)
+            with self._cond:
+                self._recycled += 1
+            return self._new_connection()
+        if self.ping_on_checkout:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._drop(conn)
+                with self._cond:
+                    self._ping_failures += 1
+                    self._recycled += 1
+                return self._new_connection()
+        return conn
+
+    def _drop(self, conn):
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Đóng toàn bộ kết nối rảnh; kết nối đang dùng sẽ bị đóng khi được trả về"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._drop(conn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Thống kê pool
+
+        Returns:
+            Dict: size, open, in_use, idle, created, recycled, ping_failures,
+                  checkouts, timeouts, wait_avg_ms, wait_max_ms
+        """
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_avg_ms': (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                'wait_max_ms': self._wait_max * 1000,
+            }
+
+
+_pools: Dict[tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config: DatabaseConfig) -> ConnectionPool:
+    """
+    Lấy pool dùng chung cho cấu hình (1 pool / host-port-user-database)
+
+    Args:
+        config: Instance DatabaseConfig
+
+    Returns:
+        ConnectionPool
+    """
+    key = config.pool_key()
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(config)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """Đóng mọi pool (gọi khi thoát ứng dụng)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
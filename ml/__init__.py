@@ -3,6 +3,10 @@ ML package - Machine Learning utilities
 """
 from .preprocess import preprocess_input
 from .predictor import ModelPredictor
+from .model_cache import ModelCache, get_model_cache, invalidate_model
+from .explain import ModelExplainer, top_contributions
+from .native import compile_model, get_native_kernel
+from .artifacts import export_artifact, load_artifact
 
 # Avoid hard dependency on sklearn at import time
 try:
@@ -17,7 +21,11 @@ try:
 except Exception:
     _HAVE_EVAL = False
 
-__all__ = ['preprocess_input', 'ModelPredictor']
+__all__ = [
+    'preprocess_input', 'ModelPredictor', 'ModelCache', 'get_model_cache', 'invalidate_model',
+    'ModelExplainer', 'top_contributions', 'compile_model', 'get_native_kernel',
+    'export_artifact', 'load_artifact',
+]
 if _HAVE_EVAL:
     __all__ += [
         'load_evaluation_data',
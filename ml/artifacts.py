@@ -0,0 +1,440 @@
+"""
+Model Artifacts
+Xuất model sang định dạng gốc của thư viện kèm manifest JSON - load nhanh, không unpickle wrapper sklearn
+
+outputs/models/
+    xgb_model.pkl                   # joblib (vẫn giữ, dùng làm fallback)
+    xgb_model.native/
+        manifest.json               # kind, feature_names, sha256 từng file, metadata train (ghi sau cùng)
+        <run_id>/model.ubj          # XGBoost UBJSON
+    lgbm_model.native/<run_id>/model.txt         # LightGBM text (model_to_string, cắt tới best_iteration)
+    lr_cal_model.native/<run_id>/p0_*.npy        # LR + calibrator đã rút gọn (ml.native.LinearCalibratedKernel)
+
+- Artifact chỉ được ghi khi predict_proba của bản load lại khớp model gốc (PARITY_ATOL) trên probe_matrix
+- Khi load: kiểm tra feature_names, sha256 từng file và chữ ký (mtime, size) của .pkl nguồn;
+  .pkl bị ghi lại sau khi xuất -> artifact cũ, dùng .pkl
+- Mảng .npy load bằng np.load(mmap_mode='r')
+- Ngưỡng quyết định không nằm trong manifest: nguồn duy nhất là settings.json (ml.eval_store)
+- load_cached_artifact: cùng 1 entry ModelCache cho ModelPredictor và ModelExplainer
+
+Xuất lại các model hiện có:
+    python -m ml.artifacts [outputs/models/xgb_model.pkl ...]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from .model_cache import get_model_cache
+from .native import PARITY_ATOL, LinearCalibratedKernel, check_parity, compile_linear, probe_matrix
+from .preprocess import FEATURE_NAMES
+from .utils import as_matrix, atomic_write_json, file_sig, jsonable, load_arrays, save_arrays
+
+
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.native'
+MANIFEST_FILE = 'manifest.json'
+
+
+def artifacts_enabled() -> bool:
+    """ML_LOAD_ARTIFACTS=0 buộc ModelPredictor load .pkl"""
+    return os.environ.get('ML_LOAD_ARTIFACTS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def artifact_dir(model_path) -> Path:
+    """outputs/models/xgb_model.pkl -> outputs/models/xgb_model.native"""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + ARTIFACT_SUFFIX)
+
+
+def manifest_path(model_path) -> Path:
+    return artifact_dir(model_path) / MANIFEST_FILE
+
+
+def has_artifact(model_path) -> bool:
+    return manifest_path(model_path).exists()
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def detect_kind(model) -> str:
+    """
+    Returns:
+        'xgboost' | 'lightgbm' | 'linear'
+
+    Raises:
+        ValueError: Nếu model không có định dạng gốc được hỗ trợ
+    """
+    module = type(model).__module__ or ''
+    if hasattr(model, 'get_booster'):
+        return 'xgboost'
+    if module.startswith('lightgbm') or isinstance(model, LightGBMArtifactModel):
+        return 'lightgbm'
+    if isinstance(model, LinearCalibratedKernel):
+        return 'linear'
+    try:
+        compile_linear(model)
+        return 'linear'
+    except Exception:
+        raise ValueError(f"Chưa có định dạng artifact cho {type(model).__name__}")
+
+
+class _BoosterModel(ABC):
+    """
+    Booster load từ file gốc, cung cấp predict_proba / predict như wrapper sklearn
+    """
+
+    def __init__(self, booster):
+        self.booster = booster
+        self.classes_ = np.array([0, 1])
+
+    @abstractmethod
+    def _positive(self, X: np.ndarray) -> np.ndarray:
+        """Xác suất lớp 1 cho ma trận (n, 41) theo FEATURE_NAMES"""
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Returns:
+            Mảng (n, 2): [1 - p, p]
+        """
+        p = np.asarray(self._positive(as_matrix(X)), dtype=np.float64).ravel()
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+
+class XGBoostArtifactModel(_BoosterModel):
+    """xgboost.Booster từ model.ubj (get_booster() như XGBClassifier - dùng được với ml.native / ml.explain)"""
+
+    def get_booster(self):
+        return self.booster
+
+    @property
+    def n_estimators(self) -> int:
+        return int(self.booster.num_boosted_rounds())
+
+    def _positive(self, X: np.ndarray) -> np.ndarray:
+        # Cột đã theo FEATURE_NAMES (manifest đã kiểm tra) - bỏ qua so khớp tên feature
+        return self.booster.inplace_predict(X, validate_features=False)
+
+
+class LightGBMArtifactModel(_BoosterModel):
+    """lightgbm.Booster từ model.txt (thuộc tính booster_ như LGBMClassifier)"""
+
+    @property
+    def booster_(self):
+        return self.booster
+
+    @property
+    def n_estimators(self) -> int:
+        return int(self.booster.current_iteration())
+
+    def _positive(self, X: np.ndarray) -> np.ndarray:
+        return self.booster.predict(X)
+
+
+def _export_xgboost(model, run_dir: Path) -> Dict[str, Any]:
+    booster = model.get_booster()
+    # predict_proba của XGBClassifier chỉ dùng tới best_iteration khi có early stopping
+    best = getattr(model, 'best_iteration', None)
+    if best is not None and int(best) + 1 < booster.num_boosted_rounds():
+        booster = booster[:int(best) + 1]
+    booster.save_model(str(run_dir / 'model.ubj'))
+    return {'model': 'model.ubj'}
+
+
+def _export_lightgbm(model, run_dir: Path) -> Dict[str, Any]:
+    booster = getattr(model, 'booster_', model)
+    # num_iteration=None: có best_iteration thì chỉ lưu tới đó (giống predict_proba)
+    (run_dir / 'model.txt').write_text(booster.model_to_string(num_iteration=None), encoding='utf-8')
+    return {'model': 'model.txt'}
+
+
+def _export_linear(model, run_dir: Path) -> Dict[str, Any]:
+    kernel = model if isinstance(model, LinearCalibratedKernel) else compile_linear(model)
+
+    def put(name: str, values) -> str:
+        return save_arrays(run_dir, {name: values})[name]
+
+    parts = []
+    for i, part in enumerate(kernel.parts):
+        spec = {
+            'num_idx': put(f'p{i}_num_idx.npy', np.asarray(part['num_idx'], dtype=np.int64)),
+            'num_weight': put(f'p{i}_num_weight.npy', np.asarray(part['num_weight'], dtype=np.float64)),
+            'bias': float(part['bias']),
+            'cats': [
+                {
+                    'feature': int(f),
+                    'categories': put(f'p{i}_cat{k}_categories.npy', np.asarray(cats, dtype=np.float64)),
+                    'weights': put(f'p{i}_cat{k}_weights.npy', np.asarray(weights, dtype=np.float64)),
+                }
+                for k, (f, cats, weights) in enumerate(part['cats'])
+            ],
+            'calibrator': None,
+        }
+        cal = part['calibrator']
+        if cal is not None and cal[0] == 'isotonic':
+            spec['calibrator'] = {
+                'kind': 'isotonic',
+                'x': put(f'p{i}_iso_x.npy', np.asarray(cal[1], dtype=np.float64)),
+                'y': put(f'p{i}_iso_y.npy', np.asarray(cal[2], dtype=np.float64)),
+            }
+        elif cal is not None:
+            spec['calibrator'] = {'kind': 'sigmoid', 'a': float(cal[1]), 'b': float(cal[2])}
+        parts.append(spec)
+    return {'parts': parts}
+
+
+_EXPORTERS = {'xgboost': _export_xgboost, 'lightgbm': _export_lightgbm, 'linear': _export_linear}
+
+
+def export_artifact(
+    model,
+    model_path,
+    metadata: Optional[Dict[str, Any]] = None,
+    verify: bool = True
+) -> Optional[Path]:
+    """
+    Xuất model sang định dạng gốc + manifest cạnh file .pkl
+
+    Args:
+        model: Model đã train (XGBClassifier, LGBMClassifier, CalibratedClassifierCV logistic)
+        model_path: Đường dẫn file .pkl của model (đã ghi xong)
+        metadata: Thông tin train (metrics, số dòng, tham số, ...) - phải serialize được JSON
+        verify: Load lại và so predict_proba với model gốc trên probe_matrix
+
+    Returns:
+        Đường dẫn manifest, hoặc None nếu model không hỗ trợ / không đạt parity (.pkl vẫn dùng được)
+    """
+    model_path = Path(model_path)
+    root = artifact_dir(model_path)
+    try:
+        kind = detect_kind(model)
+    except ValueError as e:
+        print(f"⚠ Bỏ qua artifact cho {model_path.name}: {e}")
+        return None
+
+    root.mkdir(parents=True, exist_ok=True)
+    # Mỗi lần xuất 1 thư mục mới: không ghi đè file đang được mmap / load
+    run_dir = Path(tempfile.mkdtemp(prefix=time.strftime('%Y%m%d_%H%M%S_'), dir=str(root)))
+    try:
+        payload = _EXPORTERS[kind](model, run_dir)
+        files = {
+            p.name: {'sha256': _sha256(p), 'bytes': p.stat().st_size}
+            for p in sorted(run_dir.iterdir())
+        }
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'kind': kind,
+            'model_class': type(model).__name__,
+            'run_dir': run_dir.name,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'feature_names': list(FEATURE_NAMES),
+            'files': files,
+            'payload': payload,
+            'source': _source_signature(model_path),
+            'libraries': _library_versions(kind),
+            'metadata': jsonable(metadata or {}),
+        }
+        if verify:
+            diff = check_parity(_load_payload(manifest, run_dir), model, probe_matrix())
+            manifest['parity_max_abs_diff'] = diff
+            if diff > PARITY_ATOL:
+                raise ValueError(f"artifact lệch {diff:.2e} so với model gốc")
+        atomic_write_json(root / MANIFEST_FILE, manifest)
+    except Exception as e:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        print(f"⚠ Không xuất được artifact cho {model_path.name}: {e}")
+        return None
+
+    _prune_runs(root, keep=run_dir.name)
+    size_kb = sum(f['bytes'] for f in files.values()) / 1024
+    print(f"✓ Saved artifact: {root} ({kind}, {size_kb:.0f} KB)")
+    return root / MANIFEST_FILE
+
+
+def remove_artifact(model_path) -> bool:
+    """Xóa thư mục artifact của model (khi xóa model)"""
+    root = artifact_dir(model_path)
+    if not root.exists():
+        return False
+    shutil.rmtree(root, ignore_errors=True)
+    return True
+
+
+def _prune_runs(root: Path, keep: str):
+    """Xóa payload của các lần xuất cũ (bỏ qua thư mục còn đang được mmap, ví dụ trên Windows)"""
+    for child in root.iterdir():
+        if child.is_dir() and child.name != keep:
+            shutil.rmtree(child, ignore_errors=True)
+
+
+def _source_signature(model_path: Path) -> Optional[Dict[str, Any]]:
+    sig = file_sig(model_path)
+    if sig is None:
+        return None
+    return {'file': model_path.name, 'mtime_ns': sig[0], 'bytes': sig[1]}
+
+
+def _library_versions(kind: str) -> Dict[str, str]:
+    versions = {'numpy': np.__version__}
+    module = {'xgboost': 'xgboost', 'lightgbm': 'lightgbm'}.get(kind)
+    if module:
+        versions[module] = sys.modules[module].__version__ if module in sys.modules else 'unknown'
+    return versions
+
+
+def read_manifest(model_path) -> Dict[str, Any]:
+    """
+    Đọc manifest của model
+
+    Raises:
+        FileNotFoundError: Nếu chưa có artifact
+    """
+    return json.loads(manifest_path(model_path).read_text(encoding='utf-8'))
+
+
+def validate_manifest(model_path) -> Dict[str, Any]:
+    """
+    Đọc manifest và kiểm tra phiên bản định dạng, thứ tự feature, .pkl nguồn chưa bị ghi lại
+    (không đọc payload - đủ rẻ để gọi mỗi lần load, kể cả khi model đã nằm trong ModelCache)
+
+    Returns:
+        Manifest
+
+    Raises:
+        FileNotFoundError: Nếu chưa có artifact
+        ValueError: Nếu artifact không dùng được
+    """
+    model_path = Path(model_path)
+    manifest = read_manifest(model_path)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"format_version {manifest.get('format_version')} không được hỗ trợ")
+    if manifest.get('feature_names') != list(FEATURE_NAMES):
+        raise ValueError("feature_names trong manifest khác FEATURE_NAMES hiện tại")
+    source = manifest.get('source')
+    current = _source_signature(model_path)
+    if source and current and (source['mtime_ns'], source['bytes']) != (current['mtime_ns'], current['bytes']):
+        raise ValueError(f"{model_path.name} đã thay đổi sau khi xuất artifact")
+    return manifest
+
+
+def load_artifact(model_path, verify_checksum: bool = True):
+    """
+    Load model từ artifact gốc
+
+    Args:
+        model_path: Đường dẫn .pkl (artifact nằm ở <stem>.native/ bên cạnh)
+        verify_checksum: Kiểm tra sha256 từng file payload
+
+    Returns:
+        XGBoostArtifactModel / LightGBMArtifactModel hoặc LinearCalibratedKernel (linear) - đều có predict_proba
+
+    Raises:
+        FileNotFoundError: Nếu chưa có artifact
+        ValueError: Manifest không hợp lệ, lệch feature order, sai checksum hoặc .pkl mới hơn artifact
+    """
+    model_path = Path(model_path)
+    manifest = validate_manifest(model_path)
+    run_dir = artifact_dir(model_path) / manifest['run_dir']
+    if verify_checksum:
+        for name, info in manifest['files'].items():
+            if _sha256(run_dir / name) != info['sha256']:
+                raise ValueError(f"Sai checksum: {name}")
+    return _load_payload(manifest, run_dir)
+
+
+def load_cached_artifact(model_path):
+    """
+    Load artifact qua ModelCache dùng chung (key = manifest.json, ngân sách byte = tổng payload)
+
+    Returns:
+        Model như load_artifact
+
+    Raises:
+        FileNotFoundError / ValueError: như load_artifact
+    """
+    info = validate_manifest(model_path)
+    payload_bytes = sum(int(f.get('bytes', 0)) for f in info.get('files', {}).values())
+    return get_model_cache().get(
+        manifest_path(model_path), loader=lambda _: load_artifact(model_path), size=payload_bytes
+    )
+
+
+def _load_payload(manifest: Dict[str, Any], run_dir: Path):
+    kind = manifest['kind']
+    payload = manifest['payload']
+    if kind == 'xgboost':
+        import xgboost as xgb
+        booster = xgb.Booster()
+        booster.load_model(str(run_dir / payload['model']))
+        return XGBoostArtifactModel(booster)
+    if kind == 'lightgbm':
+        import lightgbm as lgb
+        return LightGBMArtifactModel(lgb.Booster(model_file=str(run_dir / payload['model'])))
+    if kind == 'linear':
+        return LinearCalibratedKernel([_load_linear_part(spec, run_dir) for spec in payload['parts']])
+    raise ValueError(f"Không hỗ trợ artifact kind={kind}")
+
+
+def _load_linear_part(spec: Dict[str, Any], run_dir: Path) -> Dict[str, Any]:
+    def arr(name: str) -> np.ndarray:
+        return load_arrays(run_dir, {name: name})[name]
+
+    cal = spec.get('calibrator')
+    if cal is None:
+        calibrator = None
+    elif cal['kind'] == 'isotonic':
+        calibrator = ('isotonic', arr(cal['x']), arr(cal['y']))
+    else:
+        calibrator = ('sigmoid', float(cal['a']), float(cal['b']))
+    return {
+        'num_idx': arr(spec['num_idx']),
+        'num_weight': arr(spec['num_weight']),
+        'bias': float(spec['bias']),
+        'cats': [(int(c['feature']), arr(c['categories']), arr(c['weights'])) for c in spec['cats']],
+        'calibrator': calibrator,
+    }
+
+
+def export_existing(paths: List[Path]) -> int:
+    """Xuất artifact cho các file .pkl đã có, in thời gian load .pkl so với artifact"""
+    failed = 0
+    for path in paths:
+        t0 = time.perf_counter()
+        model = joblib.load(path)
+        pkl_ms = (time.perf_counter() - t0) * 1000
+        manifest = export_artifact(model, path, metadata={'exported_from': path.name})
+        if manifest is None:
+            failed += 1
+            continue
+        t0 = time.perf_counter()
+        load_artifact(path)
+        native_ms = (time.perf_counter() - t0) * 1000
+        print(f"  load .pkl {pkl_ms:.0f} ms -> artifact {native_ms:.0f} ms")
+    return failed
+
+
+if __name__ == '__main__':
+    models_dir = Path(__file__).resolve().parent.parent / 'outputs' / 'models'
+    targets = [Path(p) for p in sys.argv[1:]] or sorted(models_dir.glob('*.pkl'))
+    if not targets:
+        print(f"⚠ Không có file .pkl trong {models_dir}")
+        sys.exit(1)
+    sys.exit(1 if export_existing(targets) else 0)
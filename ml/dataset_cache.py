@@ -0,0 +1,299 @@
+"""
+Dataset Cache
+Cache dạng cột trên đĩa cho các file CSV UCI_Credit_Card*: parse CSV 1 lần, các lần sau mmap từng cột
+
+outputs/cache/datasets/
+    index.json                          # (đường dẫn, mtime_ns, size) -> sha256 nguồn: không phải hash lại file chưa đổi
+    <stem>-v<CACHE_VERSION>-<sha256[:16]>/
+        meta.json                       # nguồn, số dòng, danh sách cột (tên, dtype, file, kind)
+        c000.npy, c001.npy, ...         # 1 file / cột, np.load(mmap_mode='r')
+
+- Key theo sha256 nội dung file nguồn (+ CACHE_VERSION): sửa CSV -> thư mục cache mới
+- dtype gọn: PAY_* / SEX / EDUCATION / MARRIAGE / target int8, AGE int16, ID int32,
+  LIMIT_BAL / BILL_AMT* / PAY_AMT* int32 nếu toàn số nguyên, ngược lại (có NaN / số lẻ) float32;
+  cột không ép được giữ dtype pandas đọc ra
+- float32 chỉ đúng tuyệt đối với số nguyên |x| <= 2^24; số lẻ có thể lệch nhẹ so với float64 của
+  read_csv. XGBoost vốn so ngưỡng trên float32 nên không đổi kết quả, LightGBM bin trên float64
+  nên cột số lẻ có thể ra bin khác chút ít
+- Ghi lại CSV (to_csv) không giống hệt byte với bản read_csv: cột int32 ra '20000' thay vì '20000.0'
+  (cùng giá trị khi đọc lại)
+- Cột text (FULL NAME, CITIZEN ID, ...) lưu dạng unicode cố định độ dài, không pickle; ô trống -> NaN khi load
+
+Dùng:
+    df = load_dataset('UCI_Credit_Card.csv')                # DataFrame trên memmap (chỉ đọc)
+    python -m ml.dataset_cache UCI_Credit_Card.csv          # build sẵn cache
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .utils import atomic_write_json, file_sig
+
+
+CACHE_VERSION = 1
+CACHE_DIR = Path(__file__).resolve().parent.parent / 'outputs' / 'cache' / 'datasets'
+INDEX_FILE = 'index.json'
+META_FILE = 'meta.json'
+
+TARGET_COLUMN = 'default.payment.next.month'
+# Đọc như chuỗi (CITIZEN ID có thể bắt đầu bằng 0)
+TEXT_COLUMNS = ('FULL NAME', 'CITIZEN ID', 'customer_name', 'customer_id_card')
+
+
+def target_dtype(name: str) -> Optional[np.dtype]:
+    """dtype mong muốn theo tên cột UCI (None = giữ dtype pandas)"""
+    if name in ('SEX', 'EDUCATION', 'MARRIAGE', TARGET_COLUMN) or (
+        name.startswith('PAY_') and 'AMT' not in name
+    ):
+        return np.dtype(np.int8)
+    if name == 'AGE':
+        return np.dtype(np.int16)
+    if name == 'ID':
+        return np.dtype(np.int32)
+    if name == 'LIMIT_BAL' or name.startswith('BILL_AMT') or name.startswith('PAY_AMT'):
+        return np.dtype(np.int32)
+    return None
+
+
+def _fits(values: np.ndarray, dtype: np.dtype) -> bool:
+    info = np.iinfo(dtype)
+    if not len(values):
+        return True
+    return bool(np.isfinite(values).all() and (values == np.round(values)).all()
+                and values.min() >= info.min and values.max() <= info.max)
+
+
+def downcast_column(name: str, series: pd.Series) -> np.ndarray:
+    """
+    Ép 1 cột về dtype gọn nhất không mất thông tin
+
+    Returns:
+        ndarray (số) hoặc ndarray unicode 'U' (text)
+    """
+    if name in TEXT_COLUMNS or not pd.api.types.is_numeric_dtype(series):
+        text = series.astype(object).where(series.notna(), '')
+        return np.asarray(text.astype(str).to_numpy(), dtype=np.str_)
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    wanted = target_dtype(name)
+    if wanted is not None and _fits(values, wanted):
+        return values.astype(wanted)
+    if wanted is not None:
+        # Có NaN / số lẻ: float32 (số nguyên <= 2^24 vẫn đúng tuyệt đối, số lẻ có thể lệch nhẹ so với float64)
+        return values.astype(np.float32)
+    return series.to_numpy()
+
+
+class DatasetCache:
+    """
+    Cache CSV -> cột .npy, thread-safe trong process, build atomic giữa các process
+    """
+
+    def __init__(self, root: Path = CACHE_DIR):
+        """
+        Args:
+            root: Thư mục chứa cache
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._builds = 0
+
+    # ---------- key ----------
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def _index(self) -> Dict[str, Any]:
+        try:
+            return json.loads((self.root / INDEX_FILE).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def source_hash(self, path) -> str:
+        """sha256 của file nguồn (dùng lại từ index.json nếu mtime/size không đổi)"""
+        path = Path(path).resolve()
+        sig = file_sig(path)
+        if sig is None:
+            raise FileNotFoundError(f"Không tìm thấy file data: {path}")
+        entry = self._index().get(str(path))
+        if entry and (entry['mtime_ns'], entry['size']) == sig:
+            return entry['sha256']
+        digest = self.file_hash(path)
+        index = self._index()
+        index[str(path)] = {'mtime_ns': sig[0], 'size': sig[1], 'sha256': digest}
+        atomic_write_json(self.root / INDEX_FILE, index)
+        return digest
+
+    def entry_dir(self, path, digest: Optional[str] = None) -> Path:
+        digest = digest or self.source_hash(path)
+        return self.root / f"{Path(path).stem}-v{CACHE_VERSION}-{digest[:16]}"
+
+    # ---------- build / load ----------
+    def build(self, path, chunk_size: int = 100000) -> Path:
+        """
+        Parse CSV (C engine, bỏ dòng lỗi) và ghi cache nếu chưa có
+
+        Returns:
+            Thư mục cache
+        """
+        path = Path(path)
+        digest = self.source_hash(path)
+        target = self.entry_dir(path, digest)
+        if (target / META_FILE).exists():
+            return target
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        df = self._read_csv(path, chunk_size)
+        tmp = Path(tempfile.mkdtemp(prefix=target.name + '.', dir=str(self.root)))
+        try:
+            columns = []
+            for i, name in enumerate(df.columns):
+                arr = downcast_column(str(name), df[name])
+                fname = f"c{i:03d}.npy"
+                np.save(tmp / fname, arr, allow_pickle=False)
+                columns.append({
+                    'name': str(name), 'file': fname, 'dtype': arr.dtype.str,
+                    'kind': 'text' if arr.dtype.kind == 'U' else 'numeric',
+                })
+            meta = {
+                'version': CACHE_VERSION,
+                'source': {'name': path.name, 'sha256': digest, 'bytes': path.stat().st_size},
+                'rows': int(len(df)),
+                'columns': columns,
+            }
+            atomic_write_json(tmp / META_FILE, meta)
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # Process khác vừa build xong cùng nguồn
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        with self._lock:
+            self._builds += 1
+        size_mb = sum(f.stat().st_size for f in target.iterdir()) / (1024 * 1024)
+        print(f"✓ Dataset cache: {path.name} -> {target.name} ({len(df):,} dòng, {size_mb:.1f} MB)")
+        return target
+
+    @staticmethod
+    def _read_csv(path: Path, chunk_size: int) -> pd.DataFrame:
+        dtype = {c: str for c in TEXT_COLUMNS}
+        try:
+            reader = pd.read_csv(path, dtype=dtype, on_bad_lines='skip', chunksize=chunk_size, low_memory=False)
+            return pd.concat(list(reader), ignore_index=True)
+        except pd.errors.ParserError:
+            # File lỗi định dạng nặng: parser python chậm nhưng chịu lỗi tốt hơn
+            return pd.read_csv(path, dtype=dtype, engine='python', on_bad_lines='skip')
+
+    def load(self, path, columns: Optional[Sequence[str]] = None, build: bool = True) -> Optional[pd.DataFrame]:
+        """
+        DataFrame từ cache (mmap chỉ đọc), build nếu chưa có
+
+        Args:
+            path: File CSV nguồn
+            columns: Chỉ lấy các cột này (mặc định tất cả, theo thứ tự trong file)
+            build: False = trả None nếu chưa có cache
+
+        Returns:
+            DataFrame - cột số là memmap, không sửa tại chỗ (gán cột mới / copy() trước khi sửa)
+        """
+        target = self.entry_dir(path)
+        if not (target / META_FILE).exists():
+            if not build:
+                return None
+            target = self.build(path)
+        else:
+            with self._lock:
+                self._hits += 1
+        meta = json.loads((target / META_FILE).read_text(encoding='utf-8'))
+        wanted = None if columns is None else set(columns)
+        data = {}
+        for col in meta['columns']:
+            if wanted is not None and col['name'] not in wanted:
+                continue
+            arr = np.load(target / col['file'], mmap_mode='r', allow_pickle=False)
+            if col['kind'] == 'text':
+                arr = np.where(arr == '', None, arr)
+            data[col['name']] = arr
+        if columns is not None:
+            missing = [c for c in columns if c not in data]
+            if missing:
+                raise KeyError(f"Cache không có cột: {', '.join(missing)}")
+            data = {c: data[c] for c in columns}
+        return pd.DataFrame(data, copy=False)
+
+    def prune(self, keep_sources: Optional[List[Path]] = None) -> int:
+        """
+        Xóa thư mục cache không còn ứng với file nguồn hiện tại
+
+        Args:
+            keep_sources: Các file nguồn cần giữ cache (mặc định: mọi file còn trong index.json)
+
+        Returns:
+            Số thư mục đã xóa
+        """
+        if not self.root.exists():
+            return 0
+        sources = keep_sources if keep_sources is not None else [Path(p) for p in self._index()]
+        keep = {self.entry_dir(p).name for p in sources if Path(p).exists()}
+        removed = 0
+        for child in self.root.iterdir():
+            if child.is_dir() and child.name not in keep:
+                shutil.rmtree(child, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'root': str(self.root), 'hits': self._hits, 'builds': self._builds}
+
+
+_default_cache: Optional[DatasetCache] = None
+_default_lock = threading.Lock()
+
+
+def get_dataset_cache() -> DatasetCache:
+    """DatasetCache dùng chung (outputs/cache/datasets)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DatasetCache()
+        return _default_cache
+
+
+def load_dataset(path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Đọc CSV qua cache dạng cột (lần đầu parse + ghi cache, các lần sau mmap)
+
+    Args:
+        path: File CSV
+        columns: Chỉ lấy các cột này
+
+    Returns:
+        DataFrame (chỉ đọc)
+    """
+    return get_dataset_cache().load(path, columns)
+
+
+if __name__ == '__main__':
+    root = Path(__file__).resolve().parent.parent
+    targets = [Path(p) for p in sys.argv[1:]] or sorted(root.glob('UCI_Credit_Card*.csv'))
+    if not targets:
+        print(f"⚠ Không có file UCI_Credit_Card*.csv trong {root}")
+        sys.exit(1)
+    for t in targets:
+        get_dataset_cache().build(t)
@@ -0,0 +1,375 @@
+"""
+Evaluation Store
+Lưu / đọc dữ liệu evaluation cho Dashboard, Report và System tab
+
+outputs/evaluation/
+    artifacts.json          # manifest: feature_importance, confusion_matrices, AUC, tên file .npy (ghi sau cùng)
+    artifacts/<run_id>/     # y_test.npy, pred_<model>.npy, roc_<model>_fpr.npy, roc_<model>_tpr.npy
+    settings.json           # thresholds, threshold_audit, overlay, dashboard_threshold (ghi atomic)
+    evaluation_data.npz     # định dạng cũ (chỉ đọc, dùng khi chưa có artifacts.json)
+
+- Mảng lớn load bằng np.load(mmap_mode='r'), không pickle
+- Kết quả load được cache trong process, invalidate theo mtime_ns + size của manifest
+- Thay đổi thiết lập chỉ ghi lại settings.json nhỏ (file tạm + os.replace), không đụng tới mảng
+"""
+import json
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .utils import atomic_write_json, file_sig, jsonable, load_arrays, save_arrays
+
+
+EVAL_DIR = Path(__file__).resolve().parent.parent / 'outputs' / 'evaluation'
+MANIFEST_FILE = 'artifacts.json'
+ARTIFACTS_DIR = 'artifacts'
+SETTINGS_FILE = 'settings.json'
+LEGACY_FILE = 'evaluation_data.npz'
+
+# Các key thiết lập trước đây nằm trong evaluation_data.npz
+SETTING_KEYS = ('best_thresholds', 'threshold_audit', 'overlay_config', 'dashboard_threshold')
+DEFAULT_OVERLAY = {'alpha': 1.0, 'beta': 0.0, 'feature': 'NONE', 'enabled': False}
+MAX_AUDIT_ENTRIES = 500
+
+
+def _unwrap(value: Any) -> Any:
+    """0-d object array (np.savez dict/list) -> object Python"""
+    if isinstance(value, np.ndarray) and value.dtype == object and value.ndim == 0:
+        return value.item()
+    if isinstance(value, np.ndarray) and value.dtype == object:
+        return value.tolist()
+    return value
+
+
+def _safe_name(model_name: str) -> str:
+    return ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in str(model_name))
+
+
+class EvaluationStore:
+    """
+    Artifact evaluation (feature importance, confusion matrix, ROC, predictions) - load 1 lần, cache theo mtime
+    """
+
+    def __init__(self, eval_dir: Path = EVAL_DIR):
+        """
+        Args:
+            eval_dir: Thư mục outputs/evaluation
+        """
+        self.eval_dir = Path(eval_dir)
+        self.manifest_path = self.eval_dir / MANIFEST_FILE
+        self.legacy_path = self.eval_dir / LEGACY_FILE
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict] = None
+        self._cache_key: Optional[tuple] = None
+        self._loads = 0
+
+    def _source(self) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+        sig = file_sig(self.manifest_path)
+        if sig is not None:
+            return 'manifest', sig
+        sig = file_sig(self.legacy_path)
+        if sig is not None:
+            return 'legacy', sig
+        return None, None
+
+    def exists(self) -> bool:
+        return self._source()[0] is not None
+
+    def load(self) -> Optional[Dict]:
+        """
+        Dữ liệu evaluation (cache, tự load lại khi file thay đổi)
+
+        Returns:
+            Dict feature_importance, confusion_matrices, roc_data {model: (fpr, tpr, auc)}, y_test, predictions;
+            None nếu chưa có dữ liệu. Mảng là memmap chỉ đọc - không sửa tại chỗ
+        """
+        kind, sig = self._source()
+        if kind is None:
+            return None
+        key = (kind, sig)
+        with self._lock:
+            if self._cache is None or self._cache_key != key:
+                self._cache = self._load_manifest() if kind == 'manifest' else self._load_legacy()
+                self._cache_key = key
+                self._loads += 1
+                print(f"✓ Đã load evaluation data từ: {self.manifest_path if kind == 'manifest' else self.legacy_path}")
+            cached = self._cache
+        # Copy nông để caller gán key mới không ảnh hưởng cache dùng chung
+        return {k: (dict(v) if isinstance(v, dict) else v) for k, v in cached.items()}
+
+    def _load_manifest(self) -> Dict:
+        manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        run_dir = self.eval_dir / manifest['run_dir']
+
+        def arr(name: Optional[str]) -> np.ndarray:
+            if not name:
+                return np.array([])
+            return load_arrays(run_dir, {name: name})[name]
+
+        roc_data = {}
+        for model, info in manifest.get('roc', {}).items():
+            roc_data[model] = (arr(info.get('fpr')), arr(info.get('tpr')), float(info.get('auc', 0.0)))
+        return {
+            'feature_importance': {k: float(v) for k, v in manifest.get('feature_importance', {}).items()},
+            'confusion_matrices': {k: np.asarray(v) for k, v in manifest.get('confusion_matrices', {}).items()},
+            'roc_data': roc_data,
+            'y_test': arr(manifest.get('y_test')),
+            'predictions': {k: arr(v) for k, v in manifest.get('predictions', {}).items()},
+            'training_stats': manifest.get('training_stats', {}),
+        }
+
+    def _load_legacy(self) -> Dict:
+        with np.load(self.legacy_path, allow_pickle=True) as data:
+            return {
+                'feature_importance': _unwrap(data['feature_importance']) if 'feature_importance' in data.files else {},
+                'confusion_matrices': _unwrap(data['confusion_matrices']) if 'confusion_matrices' in data.files else {},
+                'roc_data': _unwrap(data['roc_data']) if 'roc_data' in data.files else {},
+                'y_test': np.asarray(data['y_test']) if 'y_test' in data.files else np.array([]),
+                'predictions': _unwrap(data['predictions']) if 'predictions' in data.files else {},
+                'training_stats': {},
+            }
+
+    def save(
+        self,
+        feature_importance: Dict,
+        confusion_matrices: Dict,
+        roc_data: Dict,
+        y_test,
+        predictions: Dict,
+        training_stats: Optional[Dict] = None
+    ) -> Path:
+        """
+        Ghi artifact mới: mảng vào artifacts/<run_id>/*.npy, manifest ghi atomic sau cùng
+
+        Args:
+            training_stats: {stage: wall_s, cpu_s, peak_rss_mb, ...} của lần train (ml.train_orchestrator)
+
+        Returns:
+            Đường dẫn manifest
+        """
+        # Mỗi lần ghi 1 thư mục mới: không ghi đè file .npy đang được mmap
+        root = self.eval_dir / ARTIFACTS_DIR
+        root.mkdir(parents=True, exist_ok=True)
+        run_dir = Path(tempfile.mkdtemp(prefix=time.strftime('%Y%m%d_%H%M%S_'), dir=str(root)))
+        run_id = run_dir.name
+
+        def put(name: str, values) -> str:
+            return save_arrays(run_dir, {name: np.asarray(values)})[name]
+
+        manifest = {
+            'version': 1,
+            'run_dir': f'{ARTIFACTS_DIR}/{run_id}',
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'feature_importance': jsonable(feature_importance or {}),
+            'confusion_matrices': jsonable(confusion_matrices or {}),
+            'y_test': put('y_test.npy', y_test),
+            'predictions': {
+                m: put(f'pred_{_safe_name(m)}.npy', p) for m, p in (predictions or {}).items()
+            },
+            'roc': {},
+            'training_stats': jsonable(training_stats or {}),
+        }
+        for m, (fpr, tpr, auc) in (roc_data or {}).items():
+            manifest['roc'][m] = {
+                'fpr': put(f'roc_{_safe_name(m)}_fpr.npy', fpr),
+                'tpr': put(f'roc_{_safe_name(m)}_tpr.npy', tpr),
+                'auc': float(auc),
+            }
+        atomic_write_json(self.manifest_path, manifest)
+        self._prune_runs(keep=run_id)
+        return self.manifest_path
+
+    def _prune_runs(self, keep: str):
+        """Xóa artifact của các lần train cũ (bỏ qua thư mục còn đang được mmap, ví dụ trên Windows)"""
+        root = self.eval_dir / ARTIFACTS_DIR
+        for child in root.iterdir():
+            if child.is_dir() and child.name != keep:
+                shutil.rmtree(child, ignore_errors=True)
+
+    def migrate_legacy(self) -> bool:
+        """
+        Chuyển evaluation_data.npz sang artifacts + settings.json (không xóa file cũ)
+
+        Returns:
+            True nếu đã chuyển
+        """
+        if not self.legacy_path.exists():
+            return False
+        data = self._load_legacy()
+        self.save(
+            data['feature_importance'], data['confusion_matrices'], data['roc_data'],
+            data['y_test'], data['predictions']
+        )
+        get_settings_store(self.eval_dir).get_all()  # seed settings.json từ npz nếu chưa có
+        return True
+
+    def get_stats(self) -> Dict:
+        kind, sig = self._source()
+        return {'source': kind, 'loads': self._loads, 'cached': self._cache is not None}
+
+
+class SettingsStore:
+    """
+    Thiết lập nhỏ, thay đổi thường xuyên (threshold, audit, overlay, dashboard threshold) trong settings.json
+    """
+
+    def __init__(self, eval_dir: Path = EVAL_DIR):
+        """
+        Args:
+            eval_dir: Thư mục outputs/evaluation
+        """
+        self.eval_dir = Path(eval_dir)
+        self.path = self.eval_dir / SETTINGS_FILE
+        self.legacy_path = self.eval_dir / LEGACY_FILE
+        self._lock = threading.RLock()
+        self._cache: Optional[Dict] = None
+        self._cache_sig: Optional[Tuple[int, int]] = None
+
+    def _read(self) -> Dict:
+        sig = file_sig(self.path)
+        if sig is None:
+            if self._cache is None:
+                self._cache = self._seed_from_legacy()
+                if self._cache:
+                    self._write(self._cache)
+            return self._cache
+        if self._cache is None or sig != self._cache_sig:
+            try:
+                self._cache = json.loads(self.path.read_text(encoding='utf-8'))
+            except Exception as e:
+                print(f"✗ Không đọc được {self.path}: {e}")
+                self._cache = self._cache or {}
+            self._cache_sig = sig
+        return self._cache
+
+    def _seed_from_legacy(self) -> Dict:
+        """Lần đầu chạy: lấy thiết lập đang nằm trong evaluation_data.npz"""
+        if not self.legacy_path.exists():
+            return {}
+        try:
+            with np.load(self.legacy_path, allow_pickle=True) as data:
+                return {k: jsonable(_unwrap(data[k])) for k in SETTING_KEYS if k in data.files}
+        except Exception as e:
+            print(f"✗ Không đọc được thiết lập từ {self.legacy_path}: {e}")
+            return {}
+
+    def _write(self, settings: Dict):
+        atomic_write_json(self.path, settings)
+        self._cache = settings
+        self._cache_sig = file_sig(self.path)
+
+    def get_all(self) -> Dict:
+        with self._lock:
+            return json.loads(json.dumps(self._read()))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._read().get(key, default)
+            return json.loads(json.dumps(value)) if isinstance(value, (dict, list)) else value
+
+    def update(self, **values) -> None:
+        """Cập nhật 1 hoặc nhiều key rồi ghi atomic"""
+        with self._lock:
+            settings = dict(self._read())
+            settings.update(jsonable(values))
+            self._write(settings)
+
+    # ---------- threshold ----------
+    def get_thresholds(self) -> Dict[str, float]:
+        d = self.get('best_thresholds', {}) or {}
+        out = {}
+        for k, v in d.items():
+            try:
+                out[str(k)] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+    def get_threshold(self, model_name: str, default: float = 0.6) -> float:
+        return float(self.get_thresholds().get(model_name, default))
+
+    def set_thresholds(self, thresholds: Dict[str, float]):
+        """Ghi đè toàn bộ threshold (sau khi train)"""
+        self.update(best_thresholds={str(k): float(v) for k, v in thresholds.items()})
+
+    def set_threshold(self, model_name: str, value: float, user: str = 'admin'):
+        """Cập nhật threshold 1 model và ghi audit trong cùng 1 lần ghi"""
+        with self._lock:
+            settings = dict(self._read())
+            thr = dict(settings.get('best_thresholds') or {})
+            thr[model_name] = float(value)
+            audit = list(settings.get('threshold_audit') or [])
+            audit.append({'model': model_name, 'value': float(value), 'user': user,
+                          'ts': time.strftime('%Y-%m-%dT%H:%M:%S')})
+            settings['best_thresholds'] = thr
+            settings['threshold_audit'] = audit[-MAX_AUDIT_ENTRIES:]
+            self._write(settings)
+
+    def get_audit(self) -> List[Dict]:
+        return [x for x in (self.get('threshold_audit', []) or []) if isinstance(x, dict)]
+
+    # ---------- overlay / dashboard ----------
+    def get_overlay(self) -> Dict:
+        d = self.get('overlay_config', None)
+        if not isinstance(d, dict):
+            return dict(DEFAULT_OVERLAY)
+        return {
+            'alpha': float(d.get('alpha', 1.0)),
+            'beta': float(d.get('beta', 0.0)),
+            'feature': str(d.get('feature', 'NONE')),
+            'enabled': bool(d.get('enabled', True)),
+        }
+
+    def set_overlay(self, alpha: float, beta: float, feature: str, enabled: bool = True):
+        self.update(overlay_config={'alpha': float(alpha), 'beta': float(beta), 'feature': feature, 'enabled': bool(enabled)})
+
+    def reset_overlay(self):
+        self.update(overlay_config=dict(DEFAULT_OVERLAY))
+
+    def get_dashboard_threshold(self, default: float = 0.60) -> float:
+        d = self.get('dashboard_threshold', None)
+        if not isinstance(d, dict):
+            return float(default)
+        try:
+            return float(d.get('value', default))
+        except (TypeError, ValueError):
+            return float(default)
+
+    def set_dashboard_threshold(self, value: float, user: str = 'admin'):
+        self.update(dashboard_threshold={'value': float(value), 'ts': time.strftime('%Y-%m-%dT%H:%M:%S'), 'user': user})
+
+
+_stores: Dict[tuple, Any] = {}
+_stores_lock = threading.Lock()
+
+
+def get_evaluation_store(eval_dir: Path = EVAL_DIR) -> EvaluationStore:
+    """EvaluationStore dùng chung theo thư mục"""
+    key = ('eval', str(Path(eval_dir).resolve()))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EvaluationStore(eval_dir)
+        return _stores[key]
+
+
+def get_settings_store(eval_dir: Path = EVAL_DIR) -> SettingsStore:
+    """SettingsStore dùng chung theo thư mục"""
+    key = ('settings', str(Path(eval_dir).resolve()))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SettingsStore(eval_dir)
+        return _stores[key]
+
+
+if __name__ == '__main__':
+    # python -m ml.eval_store  -> chuyển evaluation_data.npz sang định dạng mới
+    store = get_evaluation_store()
+    if store.migrate_legacy():
+        print(f"✓ Đã chuyển {store.legacy_path} -> {store.manifest_path}")
+    else:
+        print(f"⚠ Không có {store.legacy_path}")
@@ -6,19 +6,16 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from pathlib import Path
 from typing import Dict, Tuple, Optional
 from matplotlib.figure import Figure
 from sklearn.metrics import confusion_matrix
 
-
-# Đường dẫn tới thư mục evaluation
-EVAL_DIR = Path(__file__).parent.parent / 'outputs' / 'evaluation'
+from .eval_store import EVAL_DIR, get_evaluation_store
 
 
 def load_evaluation_data() -> Dict:
     """
-    Load dữ liệu evaluation đã lưu sẵn từ file .npz
+    Load dữ liệu evaluation đã lưu sẵn (cache trong process, tự load lại khi file đổi - xem ml.eval_store)
     
     Returns:
         Dict chứa các dữ liệu evaluation:
@@ -27,26 +24,15 @@ def load_evaluation_data() -> Dict:
         - roc_data: dict {model_name: (fpr, tpr, auc)}
         - risk_distribution: DataFrame
     """
-    eval_file = EVAL_DIR / 'evaluation_data.npz'
+    store = get_evaluation_store(EVAL_DIR)
     
-    if not eval_file.exists():
-        print(f"⚠ Không tìm thấy file evaluation: {eval_file}")
+    if not store.exists():
+        print(f"⚠ Không tìm thấy file evaluation: {store.manifest_path}")
         print("⚠ Sử dụng dữ liệu demo mặc định")
         return load_demo_data()
     
     try:
-        data = np.load(eval_file, allow_pickle=True)
-        
-        result = {
-            'feature_importance': data.get('feature_importance', {}).item(),
-            'confusion_matrices': data.get('confusion_matrices', {}).item(),
-            'roc_data': data.get('roc_data', {}).item(),
-            'y_test': data.get('y_test', np.array([])),
-            'predictions': data.get('predictions', {}).item()
-        }
-        
-        print(f"✓ Đã load evaluation data từ: {eval_file}")
-        return result
+        return store.load()
         
     except Exception as e:
         print(f"✗ Lỗi load evaluation data: {e}")
@@ -3,112 +3,98 @@ Expand Dataset from 6 to 12 months
 Mở rộng UCI Credit Card dataset từ 6 tháng (PAY_0-6, BILL_AMT1-6, PAY_AMT1-6)
 lên 12 tháng (thêm tháng 7-12) bằng cách sinh dữ liệu giả lập hợp lý
 """
+import sys
 import numpy as np
 import pandas as pd
 from pathlib import Path
 
 ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from ml.dataset_cache import load_dataset
+
 INPUT_FILE = ROOT / 'UCI_Credit_Card.csv'
 OUTPUT_FILE = ROOT / 'UCI_Credit_Card_12months.csv'
+SEED = 42
+
+NEW_MONTHS = range(7, 13)
+FIRST_NAMES = np.array([
+    'An','Binh','Chi','Duc','Huy','Khanh','Lam','Minh','Nam','Phong',
+    'Quang','Son','Tuan','Viet','Yen','Anh','Trang','Linh','Hoa','Ngoc'
+])
+LAST_NAMES = np.array([
+    'Nguyen','Tran','Le','Pham','Hoang','Huynh','Phan','Vu','Vo','Dang',
+    'Bui','Do','Ngo','Duong','Ly'
+])
 
-def expand_to_12_months(df: pd.DataFrame) -> pd.DataFrame:
+
+def expand_months(pay6: np.ndarray, bill6: np.ndarray, rng: np.random.Generator):
     """
-    Mở rộng dataset từ 6 tháng lên 12 tháng
-    
+    Sinh tháng 7-12 (vector hóa trên cả ma trận)
+
     Chiến lược:
-    - PAY_7-12: Giảm dần delay (giả sử xa hơn thì thanh toán tốt hơn)
-    - BILL_AMT7-12: Giảm dần từ BILL_AMT6 (giả sử số dư giảm dần)
-    - PAY_AMT7-12: Tương quan với BILL_AMT tương ứng
+    - PAY_7-12: Mỗi tháng 70% giữ như tháng trước, 20% cải thiện (giảm 1, không dưới -2),
+      10% xấu đi (tăng 1, không quá 9)
+    - BILL_AMT7-12: BILL_AMT tháng trước * U(0.85, 1.05), không âm
+    - PAY_AMT7-12: BILL_AMT cùng tháng * tỷ lệ trả, U(0.6, 1.0) nếu PAY <= 0 (đúng hạn), U(0.1, 0.5) nếu trễ
+
+    Args:
+        pay6: PAY_6, shape (n,)
+        bill6: BILL_AMT6, shape (n,)
+        rng: np.random.Generator
+
+    Returns:
+        (pay, bill, pay_amt) - mỗi mảng shape (n, 6), cột k = tháng 7 + k
     """
-    df_expanded = df.copy()
-    
-    # ========================================
-    # 1. Expand PAY_7-12 (Payment Status)
-    # ========================================
-    # Giả lập: Các tháng càng xa thì payment status trung bình tốt hơn
-    # PAY_7 base on PAY_6, PAY_8 base on PAY_7, ...
-    
-    for month in [7, 8, 9, 10, 11, 12]:
-        prev_month = month - 1 if month > 7 else 6
-        prev_col = f'PAY_{prev_month}'
-        new_col = f'PAY_{month}'
-        
-        # Base on previous month with random noise
-        # Giả lập: 70% giống tháng trước, 20% cải thiện (giảm 1), 10% xấu đi (tăng 1)
-        df_expanded[new_col] = df_expanded[prev_col].copy()
-        
-        n = len(df_expanded)
-        rand = np.random.rand(n)
-        
-        # 20% cases: improve (decrease by 1, but not below -2)
-        improve_mask = rand < 0.20
-        df_expanded.loc[improve_mask, new_col] = np.maximum(
-            df_expanded.loc[improve_mask, new_col] - 1, -2
-        )
-        
-        # 10% cases: worsen (increase by 1, but not above 9)
-        worsen_mask = rand >= 0.90
-        df_expanded.loc[worsen_mask, new_col] = np.minimum(
-            df_expanded.loc[worsen_mask, new_col] + 1, 9
-        )
-    
-    # ========================================
-    # 2. Expand BILL_AMT7-12 (Bill Amount)
-    # ========================================
-    # Giả lập: Số dư giảm dần theo thời gian
-    # BILL_AMT7 = BILL_AMT6 * random(0.85, 1.05)
-    
-    for month in [7, 8, 9, 10, 11, 12]:
-        prev_month = month - 1 if month > 7 else 6
-        prev_col = f'BILL_AMT{prev_month}'
-        new_col = f'BILL_AMT{month}'
-        
-        # Random factor between 0.85-1.05
-        factors = np.random.uniform(0.85, 1.05, size=len(df_expanded))
-        df_expanded[new_col] = df_expanded[prev_col] * factors
-        
-        # Ensure non-negative
-        df_expanded[new_col] = df_expanded[new_col].clip(lower=0)
-    
-    # ========================================
-    # 3. Expand PAY_AMT7-12 (Payment Amount)
-    # ========================================
-    # Giả lập: Payment amount tương quan với bill amount
-    # PAY_AMT = BILL_AMT * payment_ratio
-    # payment_ratio depends on PAY status
-    
-    for month in [7, 8, 9, 10, 11, 12]:
-        bill_col = f'BILL_AMT{month}'
-        pay_status_col = f'PAY_{month}'
-        new_col = f'PAY_AMT{month}'
-        
-        # Base ratio between 0-1
-        payment_ratios = np.random.uniform(0.05, 0.95, size=len(df_expanded))
-        
-        # Adjust based on PAY status:
-        # - If PAY <= 0 (paid on time): higher payment ratio
-        # - If PAY > 0 (delayed): lower payment ratio
-        pay_status = df_expanded[pay_status_col]
-        
-        # On-time payers (PAY <= 0): ratio between 0.6-1.0
-        on_time_mask = pay_status <= 0
-        payment_ratios[on_time_mask] = np.random.uniform(
-            0.6, 1.0, size=on_time_mask.sum()
-        )
-        
-        # Late payers (PAY > 0): ratio between 0.1-0.5
-        late_mask = pay_status > 0
-        payment_ratios[late_mask] = np.random.uniform(
-            0.1, 0.5, size=late_mask.sum()
-        )
-        
-        # Calculate PAY_AMT
-        df_expanded[new_col] = df_expanded[bill_col] * payment_ratios
-        
-        # Ensure non-negative
-        df_expanded[new_col] = df_expanded[new_col].clip(lower=0)
-    
-    return df_expanded
+    n = len(pay6)
+    u = rng.random((n, 6))
+    pay = np.empty((n, 6), dtype=np.int8)
+    prev = np.asarray(pay6, dtype=np.int8)
+    for k in range(6):
+        prev = np.where(u[:, k] < 0.20, np.maximum(prev - 1, -2),
+                        np.where(u[:, k] >= 0.90, np.minimum(prev + 1, 9), prev)).astype(np.int8)
+        pay[:, k] = prev
+
+    # Hệ số dương nên clip sau tích lũy = clip từng tháng
+    factors = rng.uniform(0.85, 1.05, size=(n, 6))
+    bill = np.clip(np.asarray(bill6, dtype=np.float64)[:, None] * np.cumprod(factors, axis=1), 0, None)
+
+    r = rng.random((n, 6))
+    ratios = np.where(pay <= 0, 0.6 + 0.4 * r, 0.1 + 0.4 * r)
+    pay_amt = np.clip(bill * ratios, 0, None)
+    return pay, bill, pay_amt
+
+
+def synth_identities(n: int, rng: np.random.Generator):
+    """
+    Họ tên + số CCCD 12 chữ số giả lập
+
+    Returns:
+        (names, citizen_ids) - ndarray chuỗi shape (n,)
+    """
+    names = np.char.add(np.char.add(LAST_NAMES[rng.integers(0, len(LAST_NAMES), size=n)], ' '),
+                        FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), size=n)])
+    citizen_ids = np.char.zfill(rng.integers(0, 10 ** 12, size=n, dtype=np.int64).astype('U12'), 12)
+    return names, citizen_ids
+
+
+def expand_to_12_months(df: pd.DataFrame, rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Mở rộng dataset từ 6 tháng lên 12 tháng (xem expand_months)
+
+    Args:
+        df: DataFrame UCI 6 tháng
+        rng: np.random.Generator (mặc định np.random.default_rng())
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    pay, bill, pay_amt = expand_months(df['PAY_6'].to_numpy(), df['BILL_AMT6'].to_numpy(dtype=np.float64), rng)
+    new_cols = {}
+    for k, month in enumerate(NEW_MONTHS):
+        new_cols[f'PAY_{month}'] = pay[:, k]
+    for k, month in enumerate(NEW_MONTHS):
+        new_cols[f'BILL_AMT{month}'] = bill[:, k]
+    for k, month in enumerate(NEW_MONTHS):
+        new_cols[f'PAY_AMT{month}'] = pay_amt[:, k]
+    return pd.concat([df.reset_index(drop=True), pd.DataFrame(new_cols)], axis=1)
 
 
 def main():
@@ -122,13 +108,14 @@ def main():
     if not INPUT_FILE.exists():
         raise FileNotFoundError(f"❌ File not found: {INPUT_FILE}")
     
-    df = pd.read_csv(INPUT_FILE)
+    df = load_dataset(INPUT_FILE)
     print(f"   ✓ Original shape: {df.shape}")
     print(f"   ✓ Original columns: {df.shape[1]}")
     
     # Expand to 12 months
     print(f"\n2. Expanding to 12 months...")
-    df_expanded = expand_to_12_months(df)
+    rng = np.random.default_rng(SEED)
+    df_expanded = expand_to_12_months(df, rng)
     print(f"   ✓ Expanded shape: {df_expanded.shape}")
     print(f"   ✓ Expanded columns: {df_expanded.shape[1]}")
     
@@ -140,26 +127,12 @@ def main():
         print(f"   - {col}")
     
     # Insert new columns after ID
-    np.random.seed(42)
-    first_names = np.array([
-        'An','Binh','Chi','Duc','Huy','Khanh','Lam','Minh','Nam','Phong',
-        'Quang','Son','Tuan','Viet','Yen','Anh','Trang','Linh','Hoa','Ngoc'
-    ])
-    last_names = np.array([
-        'Nguyen','Tran','Le','Pham','Hoang','Huynh','Phan','Vu','Vo','Dang',
-        'Bui','Do','Ngo','Duong','Ly'
-    ])
-    n = len(df_expanded)
-    names = (
-        last_names[np.random.randint(0, len(last_names), size=n)] + ' ' +
-        first_names[np.random.randint(0, len(first_names), size=n)]
-    )
-    digits = np.array(list('0123456789'))
-    citizen_ids = [''.join(np.random.choice(digits, 12)) for _ in range(n)]
+    names, citizen_ids = synth_identities(len(df_expanded), rng)
     df_expanded.insert(1, 'FULL NAME', names)
     df_expanded.insert(2, 'CITIZEN ID', citizen_ids)
 
     print(f"\n4. Saving expanded dataset to: {OUTPUT_FILE}")
+    # Cột số tiền toàn số nguyên load ra int32 -> ghi '20000' thay vì '20000.0' (cùng giá trị, khác byte)
     df_expanded.to_csv(OUTPUT_FILE, index=False)
     print(f"   ✓ Saved successfully!")
     
@@ -0,0 +1,461 @@
+"""
+Explain Module
+Đóng góp (contribution) chính xác của từng feature cho từng dự báo, tính theo batch
+
+- XGBoost: Booster.predict(pred_contribs=True)
+- LightGBM: predict(pred_contrib=True)
+- CatBoost: get_feature_importance(type='ShapValues')
+- Logistic Regression: phân rã tuyến tính logit = intercept + Σ w_j * x'_j, gộp các cột one-hot về feature gốc
+- lr_cal_model (CalibratedClassifierCV + Pipeline): phân rã logit của LR bên trong, TRƯỚC calibration.
+  Xác suất app trả ra đi qua isotonic/sigmoid nên không bằng sigmoid(base + Σ contributions):
+  output_space = 'lr_margin' - chỉ dùng để xếp hạng / so chiều tác động của feature
+- Model cây khác: shap.TreeExplainer nếu cài gói shap (tùy chọn)
+- Artifact gốc (ml.artifacts - cùng entry ModelCache với ModelPredictor): XGBoost/LightGBM như trên;
+  LinearCalibratedKernel: contribution = w_j * x_j (scaler đã gộp vào hệ số, không trừ trung bình)
+  + bảng tra one-hot, base = bias - cùng margin nhưng phân bổ khác bản .pkl
+
+ModelExplainer.output_space cho biết không gian của contribution:
+- 'log_odds': base_value + Σ contributions = margin (log-odds) của chính model đang chấm
+- 'lr_margin': như trên nhưng là margin của LR chưa calibrate
+- 'model_output': fallback shap cho model không phải boosting
+Kết quả được cache theo (hash file model - manifest.json với artifact, hash vector feature).
+Kết quả được cache theo (hash file model, hash vector feature).
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .model_cache import ModelCache, get_model_cache
+from .preprocess import FEATURE_NAMES, BatchInput, preprocess_matrix
+
+try:
+    import shap
+    HAVE_SHAP = True
+except ImportError:
+    HAVE_SHAP = False
+
+
+DEFAULT_CACHE_ROWS = int(os.environ.get('EXPLAIN_CACHE_MAX_ROWS', 100000))
+N_FEATURES = len(FEATURE_NAMES)
+
+# Hash nội dung file model, nhớ theo (path, mtime_ns, size)
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+_file_hashes_lock = threading.Lock()
+
+
+def model_file_hash(model_path) -> str:
+    """
+    SHA-256 nội dung file model (tính lại khi file thay đổi)
+
+    Args:
+        model_path: Đường dẫn file model
+
+    Returns:
+        Chuỗi hex digest
+    """
+    key = ModelCache._make_key(model_path)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(key[0], 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[key] = digest
+    return digest
+
+
+class ContributionCache:
+    """
+    Cache LRU thread-safe: (model_hash, hash vector feature) -> (contributions (41,), base_value)
+    """
+
+    def __init__(self, max_rows: int = DEFAULT_CACHE_ROWS):
+        """
+        Args:
+            max_rows: Số dòng tối đa giữ trong cache
+        """
+        self.max_rows = int(max_rows)
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, bytes], Tuple[np.ndarray, float]]' = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(self, model_hash: str, digests: List[bytes]) -> List[Optional[Tuple[np.ndarray, float]]]:
+        out = []
+        with self._lock:
+            for d in digests:
+                key = (model_hash, d)
+                hit = self._entries.get(key)
+                if hit is not None:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                else:
+                    self._misses += 1
+                out.append(hit)
+        return out
+
+    def put_many(self, model_hash: str, digests: List[bytes], contribs: np.ndarray, base: np.ndarray):
+        with self._lock:
+            for d, c, b in zip(digests, contribs, base):
+                self._entries[(model_hash, d)] = (c, float(b))
+                self._entries.move_to_end((model_hash, d))
+            while len(self._entries) > self.max_rows:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict rows, max_rows, hits, misses, hit_rate
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'rows': len(self._entries),
+                'max_rows': self.max_rows,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / total) if total else 0.0,
+            }
+
+
+_default_cache: Optional[ContributionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_contribution_cache() -> ContributionCache:
+    """Lấy ContributionCache dùng chung của process"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ContributionCache()
+        return _default_cache
+
+
+def _row_digests(X: np.ndarray) -> List[bytes]:
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in X]
+
+
+def _unwrap_calibrated(model) -> List[Any]:
+    """CalibratedClassifierCV -> list estimator gốc (prefit: 1 estimator)"""
+    if not hasattr(model, 'calibrated_classifiers_'):
+        return [model]
+    estimators = []
+    for cal in model.calibrated_classifiers_:
+        est = getattr(cal, 'estimator', None)
+        if est is None:
+            est = getattr(cal, 'base_estimator', None)
+        estimators.append(est)
+    return estimators
+
+
+def _split_linear(estimator) -> Tuple[Any, Any]:
+    """Pipeline(prep..., clf) -> (prep hoặc None, clf có coef_)"""
+    if hasattr(estimator, 'steps'):
+        prep = estimator[:-1] if len(estimator.steps) > 1 else None
+        return prep, estimator.steps[-1][1]
+    return None, estimator
+
+
+def _column_map(prep, n_out: int) -> np.ndarray:
+    """
+    Ma trận (n_out, 41) gộp các cột sau transform về feature gốc
+
+    Hỗ trợ ColumnTransformer (OneHotEncoder -> nhiều cột / feature, transformer khác phải 1-1)
+    và transformer theo từng cột (StandardScaler...) khi n_out == 41.
+
+    Raises:
+        ValueError: Nếu có transformer sinh số cột khác số feature đầu vào (PolynomialFeatures, PCA...)
+            hoặc tổng số cột không khớp n_out
+    """
+    M = np.zeros((n_out, N_FEATURES), dtype=np.float64)
+    ct = prep
+    if ct is not None and hasattr(ct, 'steps'):
+        # Pipeline tiền xử lý: chỉ hỗ trợ 1 ColumnTransformer hoặc các bước 1-1
+        cts = [step for _, step in ct.steps if hasattr(step, 'transformers_')]
+        ct = cts[0] if len(cts) == 1 else None
+    if ct is None or not hasattr(ct, 'transformers_'):
+        if n_out != N_FEATURES:
+            raise ValueError(f"Không ánh xạ được {n_out} cột đã transform về {N_FEATURES} features")
+        np.fill_diagonal(M, 1.0)
+        return M
+
+    total = max((sl.stop for sl in ct.output_indices_.values()), default=0)
+    if total != n_out:
+        raise ValueError(f"ColumnTransformer sinh {total} cột nhưng model có {n_out} hệ số")
+    for name, trans, cols in ct.transformers_:
+        if trans == 'drop' or name not in ct.output_indices_:
+            continue
+        sl = ct.output_indices_[name]
+        if sl.stop <= sl.start:
+            continue
+        idx = [FEATURE_NAMES.index(c) if isinstance(c, str) else int(c) for c in np.atleast_1d(cols)]
+        if hasattr(trans, 'categories_'):
+            drop_idx = getattr(trans, 'drop_idx_', None)
+            pos = sl.start
+            for k, f in enumerate(idx):
+                width = len(trans.categories_[k])
+                if drop_idx is not None and drop_idx[k] is not None:
+                    width -= 1
+                M[pos:pos + width, f] = 1.0
+                pos += width
+        else:
+            if sl.stop - sl.start != len(idx):
+                raise ValueError(
+                    f"Transformer '{name}' sinh {sl.stop - sl.start} cột từ {len(idx)} feature - không phân rã được"
+                )
+            for k, f in enumerate(idx):
+                M[sl.start + k, f] = 1.0
+    if not M.any(axis=1).all():
+        raise ValueError(f"Không ánh xạ được toàn bộ {n_out} cột đã transform về {N_FEATURES} features")
+    return M
+
+
+def detect_method(model) -> str:
+    """
+    Chọn cách tính contribution cho model
+
+    Returns:
+        'xgboost' | 'lightgbm' | 'catboost' | 'linear' | 'kernel' | 'tree_shap'
+
+    Raises:
+        ValueError: Nếu model không được hỗ trợ
+    """
+    # Import muộn: ml.artifacts / ml.native import module này
+    from .artifacts import LightGBMArtifactModel
+    from .native import LinearCalibratedKernel
+
+    module = type(model).__module__ or ''
+    if hasattr(model, 'get_booster'):
+        return 'xgboost'
+    if module.startswith('lightgbm') or isinstance(model, LightGBMArtifactModel):
+        return 'lightgbm'
+    if module.startswith('catboost'):
+        return 'catboost'
+    if isinstance(model, LinearCalibratedKernel):
+        return 'kernel'
+    base = _unwrap_calibrated(model)[0]
+    if hasattr(_split_linear(base)[1], 'coef_'):
+        return 'linear'
+    if HAVE_SHAP:
+        return 'tree_shap'
+    raise ValueError(f"Không hỗ trợ giải thích model {type(model).__name__} (cài gói shap để dùng TreeSHAP)")
+
+
+class ModelExplainer:
+    """
+    Tính contribution theo batch cho 1 model, có cache theo dòng
+    """
+
+    def __init__(self, model, model_hash: Optional[str] = None, cache: Optional[ContributionCache] = None):
+        """
+        Args:
+            model: Model đã load (XGBClassifier, LGBMClassifier, CalibratedClassifierCV, ...)
+            model_hash: Định danh nội dung model (mặc định: theo id object, chỉ có nghĩa trong process)
+            cache: ContributionCache (mặc định: cache dùng chung)
+        """
+        self.model = model
+        self.model_hash = model_hash or f"obj-{id(model):x}"
+        self.cache = cache if cache is not None else get_contribution_cache()
+        self.method = detect_method(model)
+        if self.method == 'kernel':
+            calibrated = any(part['calibrator'] is not None for part in model.parts)
+        else:
+            calibrated = self.method == 'linear' and hasattr(model, 'calibrated_classifiers_')
+        self.output_space = 'lr_margin' if calibrated else 'log_odds'
+        self._shap_explainer = None
+        self._linear_parts = None
+
+    @classmethod
+    def from_path(cls, model_path, cache: Optional[ContributionCache] = None) -> 'ModelExplainer':
+        """
+        Tạo explainer từ file model, dùng chung model đã load với ModelPredictor
+        (artifact gốc nếu có, ngược lại .pkl - không unpickle thêm 1 bản khi đã có artifact)
+
+        Args:
+            model_path: Đường dẫn file .pkl
+        """
+        from .artifacts import artifacts_enabled, has_artifact, load_cached_artifact, manifest_path
+
+        if artifacts_enabled() and has_artifact(model_path):
+            try:
+                model = load_cached_artifact(model_path)
+                return cls(model, model_file_hash(manifest_path(model_path)), cache)
+            except Exception as e:
+                print(f"⚠ Không dùng được artifact để giải thích {model_path}: {e} - load .pkl")
+        return cls(get_model_cache().get(model_path), model_file_hash(model_path), cache)
+
+    # ---------- public ----------
+    def explain(self, X: BatchInput) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Contribution của 41 features cho từng dòng
+
+        Args:
+            X: DataFrame đã chuẩn hóa, hoặc list dict / ndarray (n, 41) thô (sẽ chuẩn hóa như predict_batch)
+
+        Returns:
+            Tuple (contributions (n, 41), base_values (n,))
+        """
+        if isinstance(X, pd.DataFrame):
+            Xm = np.ascontiguousarray(X[FEATURE_NAMES].to_numpy(dtype=np.float64))
+        else:
+            Xm = preprocess_matrix(X)
+        n = Xm.shape[0]
+        contribs = np.empty((n, N_FEATURES), dtype=np.float64)
+        base = np.empty(n, dtype=np.float64)
+        if n == 0:
+            return contribs, base
+
+        digests = _row_digests(Xm)
+        hits = self.cache.get_many(self.model_hash, digests)
+        miss = [i for i, h in enumerate(hits) if h is None]
+        for i, h in enumerate(hits):
+            if h is not None:
+                contribs[i], base[i] = h
+        if miss:
+            c, b = self._compute(Xm[miss])
+            contribs[miss] = c
+            base[miss] = b
+            self.cache.put_many(self.model_hash, [digests[i] for i in miss], c, b)
+        return contribs, base
+
+    def explain_top_k(self, X: BatchInput, k: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k feature có |contribution| lớn nhất cho từng dòng
+
+        Returns:
+            List (mỗi dòng) các tuple (feature, contribution), giảm dần theo trị tuyệt đối
+        """
+        contribs, _ = self.explain(X)
+        return top_contributions(contribs, k)
+
+    # ---------- backends ----------
+    def _frame(self, X: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(X, columns=FEATURE_NAMES)
+
+    def _compute(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.method == 'xgboost':
+            import xgboost as xgb
+            booster = self.model.get_booster()
+            dm = xgb.DMatrix(X, feature_names=booster.feature_names)
+            out = booster.predict(dm, pred_contribs=True)
+            return np.asarray(out[:, :-1], dtype=np.float64), np.asarray(out[:, -1], dtype=np.float64)
+
+        if self.method == 'lightgbm':
+            if type(self.model).__module__.startswith('lightgbm'):
+                out = self.model.predict(self._frame(X), pred_contrib=True)
+            else:
+                out = self.model.booster_.predict(X, pred_contrib=True)
+            out = np.asarray(out, dtype=np.float64)
+            return out[:, :-1], out[:, -1]
+
+        if self.method == 'catboost':
+            from catboost import Pool
+            out = np.asarray(
+                self.model.get_feature_importance(Pool(self._frame(X)), type='ShapValues'), dtype=np.float64
+            )
+            return out[:, :-1], out[:, -1]
+
+        if self.method == 'linear':
+            return self._linear(X)
+
+        if self.method == 'kernel':
+            return self._kernel(X)
+
+        return self._tree_shap(X)
+
+    def _linear(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Phân rã logit của LR (trung bình trên các estimator nếu CalibratedClassifierCV có nhiều fold)
+
+        Với CalibratedClassifierCV đây là margin của LR trước calibration (output_space='lr_margin'),
+        không phải xác suất đã calibrate mà app trả ra
+        """
+        if self._linear_parts is None:
+            parts = []
+            for est in _unwrap_calibrated(self.model):
+                prep, clf = _split_linear(est)
+                coef = np.asarray(clf.coef_, dtype=np.float64).ravel()
+                intercept = float(np.ravel(getattr(clf, 'intercept_', [0.0]))[0])
+                parts.append((prep, coef, intercept, _column_map(prep, coef.shape[0])))
+            self._linear_parts = parts
+
+        frame = self._frame(X)
+        contribs = np.zeros((X.shape[0], N_FEATURES), dtype=np.float64)
+        base = 0.0
+        for prep, coef, intercept, M in self._linear_parts:
+            Xt = prep.transform(frame) if prep is not None else X
+            if hasattr(Xt, 'multiply'):
+                weighted = np.asarray(Xt.multiply(coef).todense())
+            else:
+                weighted = np.asarray(Xt, dtype=np.float64) * coef
+            contribs += weighted @ M
+            base += intercept
+        k = len(self._linear_parts)
+        return contribs / k, np.full(X.shape[0], base / k)
+
+    def _kernel(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Phân rã margin của LinearCalibratedKernel (trung bình trên các part)"""
+        contribs = np.zeros((X.shape[0], N_FEATURES), dtype=np.float64)
+        base = 0.0
+        for part in self.model.parts:
+            num_idx = np.asarray(part['num_idx'], dtype=np.int64)
+            contribs[:, num_idx] += X[:, num_idx] * part['num_weight']
+            for f, cats, weights in part['cats']:
+                x = X[:, f]
+                pos = np.searchsorted(cats, x)
+                pos_c = np.minimum(pos, len(cats) - 1)
+                hit = (pos < len(cats)) & (cats[pos_c] == x)
+                contribs[:, f] += np.where(hit, weights[pos_c], 0.0)
+            base += float(part['bias'])
+        k = len(self.model.parts)
+        return contribs / k, np.full(X.shape[0], base / k)
+
+    def _tree_shap(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self._shap_explainer is None:
+            self._shap_explainer = shap.TreeExplainer(self.model)
+            self.output_space = 'model_output'
+        sv = self._shap_explainer.shap_values(self._frame(X))
+        expected = np.ravel(self._shap_explainer.expected_value)
+        if isinstance(sv, list):
+            sv, expected = sv[-1], expected[-1:]
+        sv = np.asarray(sv, dtype=np.float64)
+        if sv.ndim == 3:
+            sv = sv[:, :, -1]
+        return sv, np.full(X.shape[0], float(expected[-1]))
+
+
+def top_contributions(contribs: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+    """
+    Top-k contribution theo trị tuyệt đối cho từng dòng (vector hóa)
+
+    Args:
+        contribs: Ma trận (n, 41)
+        k: Số feature mỗi dòng
+
+    Returns:
+        List (mỗi dòng) các tuple (feature, contribution)
+    """
+    if contribs.size == 0:
+        return [[] for _ in range(contribs.shape[0])]
+    k = max(1, min(int(k), contribs.shape[1]))
+    order = np.argsort(-np.abs(contribs), axis=1, kind='stable')[:, :k]
+    values = np.take_along_axis(contribs, order, axis=1)
+    return [
+        [(FEATURE_NAMES[j], float(v)) for j, v in zip(idx_row, val_row)]
+        for idx_row, val_row in zip(order, values)
+    ]
+
@@ -0,0 +1,471 @@
+"""
+Hyperparameter Search
+Successive halving cho XGBoost / LightGBM, đánh giá ứng viên trên process pool
+
+- Tài nguyên là số boosting round: rung k train tới min_rounds * eta^k round, chỉ giữ 1/eta ứng viên tốt nhất
+  (mean AUC trên n_folds fold) để đi tiếp
+- Ứng viên đi tiếp train nối từ checkpoint booster của rung trước (xgb_model / init_model), không train lại từ đầu
+- Kết quả từng fold (AUC + checkpoint) cache trên đĩa theo (hash dữ liệu, thuật toán, tham số, fold, số round):
+  chạy lại cùng dữ liệu / cùng ứng viên không phải fit lại; tổng dung lượng giới hạn bởi HPO_CACHE_MAX_BYTES
+  (mặc định 2 GB), xóa entry dùng lâu nhất trước (LRU theo mtime)
+- Dữ liệu ghi 1 lần ra .npy, worker (spawn) np.load(mmap_mode='r'); DMatrix / Dataset của từng fold cache trong worker
+
+Dùng:
+    search = SuccessiveHalvingSearch('XGBoost', n_candidates=27)
+    result = search.run(X_train, y_train)
+    result['best_params'], result['best_rounds'], result['history']
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+from .utils import load_arrays, save_arrays
+
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / 'outputs' / 'cache' / 'hyperparam_search'
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get('HPO_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+# (kiểu, min, max) - 'log' lấy mẫu đều trên thang log; 'choice' chọn trong list
+SEARCH_SPACES: Dict[str, Dict[str, tuple]] = {
+    'XGBoost': {
+        'learning_rate': ('log', 0.01, 0.3),
+        'max_depth': ('int', 3, 10),
+        'min_child_weight': ('log', 1.0, 20.0),
+        'subsample': ('float', 0.5, 1.0),
+        'colsample_bytree': ('float', 0.5, 1.0),
+        'reg_lambda': ('log', 0.1, 10.0),
+    },
+    'LightGBM': {
+        'learning_rate': ('log', 0.01, 0.3),
+        'num_leaves': ('int', 15, 127),
+        'max_depth': ('choice', [-1, 5, 7, 9]),
+        'min_child_samples': ('int', 10, 100),
+        'subsample': ('float', 0.5, 1.0),
+        'colsample_bytree': ('float', 0.5, 1.0),
+        'reg_lambda': ('log', 0.1, 10.0),
+    },
+}
+ALGORITHMS = tuple(SEARCH_SPACES)
+
+
+def sample_params(space: Dict[str, tuple], rng: np.random.Generator) -> Dict[str, Any]:
+    """1 bộ tham số ngẫu nhiên từ search space"""
+    params = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == 'log':
+            value = float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+        elif kind == 'float':
+            value = float(rng.uniform(spec[1], spec[2]))
+        elif kind == 'int':
+            value = int(rng.integers(spec[1], spec[2] + 1))
+        elif kind == 'choice':
+            value = spec[1][int(rng.integers(len(spec[1])))]
+        else:
+            raise ValueError(f"Kiểu search space không hợp lệ: {kind}")
+        params[name] = round(value, 6) if isinstance(value, float) else value
+    return params
+
+
+def rung_schedule(min_rounds: int, max_rounds: int, eta: int) -> List[int]:
+    """Số round của từng rung: min_rounds, min_rounds*eta, ... (rung cuối = max_rounds)"""
+    rounds = []
+    r = max(1, int(min_rounds))
+    while r < max_rounds:
+        rounds.append(r)
+        r *= eta
+    rounds.append(int(max_rounds))
+    return rounds
+
+
+def data_hash(X: np.ndarray, y: np.ndarray) -> str:
+    """sha256 của ma trận float64 + nhãn (key cache fold)"""
+    h = hashlib.sha256()
+    h.update(str(X.shape).encode())
+    h.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(y, dtype=np.int8).tobytes())
+    return h.hexdigest()
+
+
+def folds_key(fold_ids: np.ndarray) -> str:
+    """sha256 của phân fold (n_folds, seed và nhãn quyết định dòng nào nằm ở fold nào)"""
+    return hashlib.sha256(np.ascontiguousarray(fold_ids, dtype=np.int8).tobytes()).hexdigest()
+
+
+def params_key(algorithm: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps({'algorithm': algorithm, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def stratified_folds(y: np.ndarray, n_folds: int, seed: int) -> np.ndarray:
+    """fold id (0..n_folds-1) cho từng dòng, giữ tỷ lệ nhãn"""
+    rng = np.random.default_rng(seed)
+    fold_ids = np.empty(len(y), dtype=np.int8)
+    for label in np.unique(y):
+        idx = np.flatnonzero(y == label)
+        rng.shuffle(idx)
+        fold_ids[idx] = np.arange(len(idx)) % n_folds
+    return fold_ids
+
+
+class FoldResultCache:
+    """
+    Kết quả fold trên đĩa: <root>/<data_hash[:16]>/<folds_key[:16]>/<params_key[:16]>/f<fold>_r<rounds>.json + .ckpt
+    (folds_key: AUC / checkpoint chỉ dùng lại khi cùng phân fold - tránh rò dòng validation vào train)
+
+    LRU theo mtime: get() chạm lại file khi hit, prune() xóa entry cũ nhất tới khi <= max_bytes
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+
+    def _base(self, dhash: str, fkey: str, pkey: str, fold: int, rounds: int) -> Path:
+        return self.root / dhash[:16] / fkey[:16] / pkey[:16] / f"f{fold}_r{rounds}"
+
+    def get(self, dhash: str, fkey: str, pkey: str, fold: int, rounds: int) -> Optional[Dict[str, Any]]:
+        base = self._base(dhash, fkey, pkey, fold, rounds)
+        try:
+            entry = json.loads(base.with_suffix('.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        ckpt = base.with_suffix('.ckpt')
+        entry['checkpoint_path'] = str(ckpt) if ckpt.exists() else None
+        try:
+            os.utime(base.with_suffix('.json'))
+        except OSError:
+            pass
+        return entry
+
+    def put(self, dhash: str, fkey: str, pkey: str, fold: int, rounds: int, auc: float, seconds: float, checkpoint: bytes):
+        base = self._base(dhash, fkey, pkey, fold, rounds)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        # Checkpoint trước, json sau: json tồn tại => checkpoint đã ghi xong
+        tmp = base.with_suffix('.ckpt.tmp')
+        tmp.write_bytes(checkpoint)
+        os.replace(tmp, base.with_suffix('.ckpt'))
+        base.with_suffix('.json').write_text(json.dumps({'auc': auc, 'seconds': seconds}), encoding='utf-8')
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Xóa entry (json + ckpt) dùng lâu nhất tới khi tổng dung lượng <= max_bytes
+
+        Returns:
+            Số entry đã xóa
+        """
+        limit = self.max_bytes if max_bytes is None else int(max_bytes)
+        entries = []
+        total = 0
+        for meta in self.root.rglob('*.json'):
+            ckpt = meta.with_suffix('.ckpt')
+            try:
+                st = meta.stat()
+                size = st.st_size + (ckpt.stat().st_size if ckpt.exists() else 0)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, size, meta, ckpt))
+            total += size
+        removed = 0
+        for _, size, meta, ckpt in sorted(entries, key=lambda e: e[0]):
+            if total <= limit:
+                break
+            # json trước: không còn entry trỏ tới checkpoint đang xóa
+            for path in (meta, ckpt):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self, dhash: Optional[str] = None):
+        target = self.root / dhash[:16] if dhash else self.root
+        shutil.rmtree(target, ignore_errors=True)
+
+
+# ---------- worker ----------
+_worker_data: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+_worker_folds: Dict[tuple, Any] = {}
+
+
+def _load_data(data_dir: str):
+    if data_dir not in _worker_data:
+        arrays = load_arrays(data_dir, ('X', 'y', 'folds'))
+        _worker_data[data_dir] = (arrays['X'], arrays['y'], arrays['folds'])
+    return _worker_data[data_dir]
+
+
+def native_params(algorithm: str, params: Dict[str, Any], pos_weight: float, n_jobs: int, seed: int) -> Dict[str, Any]:
+    """Tham số kiểu sklearn -> tham số xgb.train / lgb.train"""
+    if algorithm == 'XGBoost':
+        return {
+            **params, 'objective': 'binary:logistic', 'eval_metric': 'auc', 'tree_method': 'hist',
+            'scale_pos_weight': pos_weight, 'nthread': n_jobs, 'seed': seed, 'verbosity': 0,
+        }
+    out = {
+        **params, 'objective': 'binary', 'scale_pos_weight': pos_weight,
+        'num_threads': n_jobs, 'seed': seed, 'verbose': -1,
+    }
+    if out.get('subsample', 1.0) < 1.0:
+        out['subsample_freq'] = 1
+    return out
+
+
+def _fit_fold(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Train 1 fold từ rounds_from tới rounds_to (nối checkpoint nếu có), trả AUC + checkpoint mới"""
+    t0 = time.perf_counter()
+    X, y, fold_ids = _load_data(task['data_dir'])
+    fold = task['fold']
+    key = (task['data_dir'], task['algorithm'], fold)
+    valid = fold_ids == fold
+    train = ~valid
+    pos = float(y[train].sum())
+    pos_weight = (float(train.sum()) - pos) / max(pos, 1.0)
+    params = native_params(task['algorithm'], task['params'], pos_weight, task['n_jobs'], task['seed'])
+    delta = task['rounds_to'] - task['rounds_from']
+
+    if task['algorithm'] == 'XGBoost':
+        import xgboost as xgb
+        if key not in _worker_folds:
+            _worker_folds[key] = (xgb.DMatrix(X[train], label=y[train]), xgb.DMatrix(X[valid]))
+        dtrain, dvalid = _worker_folds[key]
+        booster = None
+        if task['checkpoint'] is not None:
+            booster = xgb.Booster()
+            booster.load_model(bytearray(task['checkpoint']))
+        booster = xgb.train(params, dtrain, num_boost_round=delta, xgb_model=booster)
+        scores = booster.predict(dvalid)
+        checkpoint = bytes(booster.save_raw(raw_format='ubj'))
+    else:
+        import lightgbm as lgb
+        if key not in _worker_folds:
+            _worker_folds[key] = (lgb.Dataset(np.asarray(X[train]), label=y[train], free_raw_data=False), np.asarray(X[valid]))
+        dtrain, X_valid = _worker_folds[key]
+        init = lgb.Booster(model_str=task['checkpoint'].decode('utf-8')) if task['checkpoint'] is not None else None
+        booster = lgb.train(params, dtrain, num_boost_round=delta, init_model=init, keep_training_booster=True)
+        scores = booster.predict(X_valid)
+        checkpoint = booster.model_to_string().encode('utf-8')
+
+    return {
+        'config_id': task['config_id'],
+        'fold': fold,
+        'auc': roc_auc_score(y[valid], scores) if len(np.unique(y[valid])) == 2 else float('nan'),
+        'checkpoint': checkpoint,
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+# ---------- driver ----------
+class SuccessiveHalvingSearch:
+    """
+    Successive halving trên số boosting round, đánh giá k-fold trên process pool
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        n_candidates: int = 27,
+        eta: int = 3,
+        min_rounds: int = 50,
+        max_rounds: int = 1000,
+        n_folds: int = 3,
+        max_workers: Optional[int] = None,
+        total_cpus: Optional[int] = None,
+        seed: int = 42,
+        space: Optional[Dict[str, tuple]] = None,
+        base_params: Optional[Dict[str, Any]] = None,
+        cache: Optional[FoldResultCache] = None
+    ):
+        """
+        Args:
+            algorithm: 'XGBoost' | 'LightGBM'
+            n_candidates: Số bộ tham số ở rung đầu
+            eta: Hệ số giảm (giữ 1/eta ứng viên, tăng eta lần số round mỗi rung)
+            min_rounds / max_rounds: Số round ở rung đầu / rung cuối
+            n_folds: Số fold cross-validation
+            max_workers: Số process (mặc định min(số CPU, 4), 1 = chạy trong process hiện tại)
+            total_cpus: Tổng thread chia cho các worker (mặc định os.cpu_count())
+            space: Ghi đè search space (mặc định SEARCH_SPACES[algorithm])
+            base_params: Tham số cố định ghi đè lên mọi ứng viên (vd. từ ModelLabPage)
+            cache: FoldResultCache (mặc định outputs/cache/hyperparam_search), False = không cache
+        """
+        if algorithm not in SEARCH_SPACES:
+            raise ValueError(f"Chưa hỗ trợ tìm siêu tham số cho {algorithm} (hỗ trợ: {', '.join(ALGORITHMS)})")
+        self.algorithm = algorithm
+        self.n_candidates = max(1, int(n_candidates))
+        self.eta = max(2, int(eta))
+        self.rounds = rung_schedule(min_rounds, max_rounds, self.eta)
+        self.n_folds = max(2, int(n_folds))
+        cpus = int(total_cpus or os.cpu_count() or 1)
+        self.max_workers = max(1, int(max_workers or min(cpus, 4)))
+        self.n_jobs = max(1, cpus // self.max_workers)
+        self.seed = int(seed)
+        self.space = space or SEARCH_SPACES[algorithm]
+        self.base_params = dict(base_params or {})
+        self.cache = FoldResultCache() if cache is None else (cache or None)
+
+    def candidates(self) -> List[Dict[str, Any]]:
+        rng = np.random.default_rng(self.seed)
+        configs = []
+        seen = set()
+        while len(configs) < self.n_candidates and len(seen) < self.n_candidates * 10:
+            params = {**sample_params(self.space, rng), **self.base_params}
+            key = params_key(self.algorithm, params)
+            if key not in seen:
+                seen.add(key)
+                configs.append(params)
+        return configs
+
+    def run(
+        self,
+        X,
+        y,
+        progress: Optional[Callable[[int, str], None]] = None,
+        cancel_token=None
+    ) -> Dict[str, Any]:
+        """
+        Chạy tìm kiếm
+
+        Args:
+            X: DataFrame / ndarray (n, p) dữ liệu train
+            y: Nhãn 0/1
+            progress: callback(percent, message)
+            cancel_token: Có is_cancelled() - dừng sau fold đang chạy
+
+        Returns:
+            Dict algorithm, best_params, best_rounds, best_cv_auc, history (mỗi dòng 1 ứng viên ở 1 rung),
+            rungs, n_candidates, fits, cache_hits, elapsed_s, cancelled
+        """
+        started = time.perf_counter()
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float64))
+        y = np.ascontiguousarray(np.asarray(y).astype(np.int8))
+        dhash = data_hash(X, y)
+        fold_ids = stratified_folds(y, self.n_folds, self.seed)
+        fkey = folds_key(fold_ids)
+
+        configs = self.candidates()
+        keys = [params_key(self.algorithm, p) for p in configs]
+        alive = list(range(len(configs)))
+        # checkpoint mới nhất của (config, fold) và số round tương ứng
+        checkpoints: Dict[Tuple[int, int], Tuple[int, Any]] = {}
+        history: List[Dict[str, Any]] = []
+        total_units = sum(self._rung_sizes(len(configs))) * self.n_folds
+        done_units = 0
+        fits = cache_hits = 0
+        cancelled = False
+
+        data_dir = Path(tempfile.mkdtemp(prefix='hpo_data_'))
+        try:
+            save_arrays(data_dir, {'X': X, 'y': y, 'folds': fold_ids})
+            with self._pool() as pool:
+                for rung, rounds in enumerate(self.rounds):
+                    fold_auc: Dict[int, Dict[int, float]] = {c: {} for c in alive}
+                    cached_configs = set()
+                    futures = {}
+                    for c in alive:
+                        for fold in range(self.n_folds):
+                            hit = self.cache.get(dhash, fkey, keys[c], fold, rounds) if self.cache else None
+                            if hit is not None and hit.get('checkpoint_path'):
+                                fold_auc[c][fold] = hit['auc']
+                                checkpoints[(c, fold)] = (rounds, Path(hit['checkpoint_path']))
+                                cache_hits += 1
+                                done_units += 1
+                                cached_configs.add(c)
+                                continue
+                            prev_rounds, prev = checkpoints.get((c, fold), (0, None))
+                            if isinstance(prev, Path):
+                                prev = prev.read_bytes()
+                            task = {
+                                'data_dir': str(data_dir), 'algorithm': self.algorithm, 'params': configs[c],
+                                'config_id': c, 'fold': fold, 'rounds_from': prev_rounds, 'rounds_to': rounds,
+                                'checkpoint': prev, 'n_jobs': self.n_jobs, 'seed': self.seed,
+                            }
+                            futures[pool.submit(_fit_fold, task)] = task
+                    for future in as_completed(futures):
+                        if cancel_token is not None and cancel_token.is_cancelled():
+                            cancelled = True
+                            for f in futures:
+                                f.cancel()
+                            break
+                        r = future.result()
+                        c, fold = r['config_id'], r['fold']
+                        fold_auc[c][fold] = r['auc']
+                        checkpoints[(c, fold)] = (rounds, r['checkpoint'])
+                        if self.cache:
+                            self.cache.put(dhash, fkey, keys[c], fold, rounds, r['auc'], r['seconds'], r['checkpoint'])
+                        fits += 1
+                        done_units += 1
+                        if progress:
+                            progress(int(100 * done_units / max(total_units, 1)),
+                                     f"Rung {rung + 1}/{len(self.rounds)} ({rounds} rounds): {done_units}/{total_units} fold")
+                    if cancelled:
+                        break
+
+                    scores = {c: float(np.nanmean(list(fold_auc[c].values()))) for c in alive}
+                    ranked = sorted(alive, key=lambda c: scores[c], reverse=True)
+                    is_last = rung == len(self.rounds) - 1
+                    keep = ranked if is_last else ranked[:max(1, len(ranked) // self.eta)]
+                    for c in ranked:
+                        history.append({
+                            'rung': rung, 'rounds': rounds, 'config_id': c, 'params': configs[c],
+                            'fold_auc': [fold_auc[c].get(f) for f in range(self.n_folds)],
+                            'mean_auc': scores[c], 'kept': c in keep, 'cached': c in cached_configs,
+                        })
+                    print(f"✓ Rung {rung + 1}/{len(self.rounds)} ({rounds} rounds): "
+                          f"best AUC {scores[ranked[0]]:.4f}, giữ {len(keep)}/{len(ranked)}")
+                    # Giải phóng checkpoint của ứng viên bị loại
+                    for c in set(alive) - set(keep):
+                        for fold in range(self.n_folds):
+                            checkpoints.pop((c, fold), None)
+                    alive = keep
+        finally:
+            # max_workers=1: cache worker nằm trong process hiện tại
+            _worker_data.pop(str(data_dir), None)
+            for key in [k for k in _worker_folds if k[0] == str(data_dir)]:
+                del _worker_folds[key]
+            shutil.rmtree(data_dir, ignore_errors=True)
+            if self.cache:
+                self.cache.prune()
+
+        last = [h for h in history if h['rung'] == max((h['rung'] for h in history), default=0)]
+        best = max(last, key=lambda h: h['mean_auc']) if last else None
+        return {
+            'algorithm': self.algorithm,
+            'best_params': best['params'] if best else None,
+            'best_rounds': best['rounds'] if best else None,
+            'best_cv_auc': best['mean_auc'] if best else None,
+            'history': history,
+            'rungs': self.rounds,
+            'n_candidates': len(configs),
+            'n_folds': self.n_folds,
+            'fits': fits,
+            'cache_hits': cache_hits,
+            'elapsed_s': round(time.perf_counter() - started, 3),
+            'cancelled': cancelled,
+        }
+
+    def _rung_sizes(self, n: int) -> List[int]:
+        sizes = []
+        for i in range(len(self.rounds)):
+            sizes.append(n)
+            if i < len(self.rounds) - 1:
+                n = max(1, n // self.eta)
+        return sizes
+
+    def _pool(self) -> Executor:
+        if self.max_workers == 1:
+            return ThreadPoolExecutor(max_workers=1)
+        # spawn: không fork process đã khởi tạo OpenMP; worker giữ DMatrix/Dataset giữa các rung
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
@@ -0,0 +1,215 @@
+"""
+Model Cache Module
+Cache dùng chung (process-wide) cho các model đã load từ file .pkl
+- Key theo đường dẫn tuyệt đối + mtime + kích thước file (file bị ghi đè -> key mới)
+- LRU eviction theo ngân sách bộ nhớ (ước lượng bằng kích thước file)
+- Thread-safe, mỗi file chỉ load đúng 1 lần dù nhiều thread cùng yêu cầu
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+
+
+# Ngân sách mặc định: 1 GB, có thể override bằng biến môi trường
+DEFAULT_MAX_BYTES = int(os.environ.get('MODEL_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('MODEL_CACHE_MAX_ENTRIES', 16))
+
+
+class ModelCache:
+    """
+    Cache LRU thread-safe cho model objects
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        loader: Callable[[str], Any] = joblib.load
+    ):
+        """
+        Khởi tạo ModelCache
+
+        Args:
+            max_bytes: Tổng dung lượng tối đa (ước lượng theo kích thước file)
+            max_entries: Số model tối đa giữ trong cache
+            loader: Hàm load model từ đường dẫn (mặc định joblib.load)
+        """
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self._loader = loader
+        self._lock = threading.RLock()
+        # key -> (model, size_bytes)
+        self._entries: 'OrderedDict[Tuple[str, int, int], Tuple[Any, int]]' = OrderedDict()
+        # Lock riêng cho từng path để tránh load trùng khi nhiều thread cùng miss
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._load_time_total = 0.0
+        self._last_load_time = 0.0
+
+    @staticmethod
+    def _make_key(model_path) -> Tuple[str, int, int]:
+        """Tạo cache key từ path + mtime_ns + size (raise FileNotFoundError nếu không có file)"""
+        path = str(Path(model_path).resolve())
+        st = os.stat(path)
+        return path, int(st.st_mtime_ns), int(st.st_size)
+
+    def _path_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            lock = self._path_locks.get(path)
+            if lock is None:
+                lock = threading.Lock()
+                self._path_locks[path] = lock
+            return lock
+
+    def get(self, model_path, loader: Optional[Callable[[str], Any]] = None, size: Optional[int] = None) -> Any:
+        """
+        Lấy model từ cache, load từ đĩa nếu chưa có hoặc file đã thay đổi
+
+        Args:
+            model_path: Đường dẫn tới file model
+            loader: Hàm load riêng cho file này (mặc định loader của cache),
+                vd. ml.artifacts.load_artifact với key là manifest.json
+            size: Số byte tính vào max_bytes (mặc định kích thước file model_path);
+                truyền kích thước payload thật khi model_path chỉ là manifest
+
+        Returns:
+            Model object
+
+        Raises:
+            FileNotFoundError: Nếu file model không tồn tại
+        """
+        key = self._make_key(model_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+
+        path = key[0]
+        with self._path_lock(path):
+            # Kiểm tra lại: thread khác có thể vừa load xong
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[0]
+                self._misses += 1
+
+            t0 = time.perf_counter()
+            model = (loader or self._loader)(path)
+            elapsed = time.perf_counter() - t0
+
+            with self._lock:
+                self._load_time_total += elapsed
+                self._last_load_time = elapsed
+                # Bỏ các phiên bản cũ của cùng file (mtime/size khác)
+                self._drop_path_locked(path)
+                entry_size = key[2] if size is None else int(size)
+                self._entries[key] = (model, entry_size)
+                self._bytes += entry_size
+                self._evict_locked()
+            print(f"✓ ModelCache: loaded {Path(path).name} in {elapsed * 1000:.0f} ms")
+            return model
+
+    def _drop_path_locked(self, path: str) -> int:
+        stale = [k for k in self._entries if k[0] == path]
+        for k in stale:
+            _, size = self._entries.pop(k)
+            self._bytes -= size
+        return len(stale)
+
+    def _evict_locked(self):
+        # Luôn giữ lại entry mới nhất kể cả khi nó lớn hơn ngân sách
+        while len(self._entries) > 1 and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+
+    def invalidate(self, model_path=None) -> int:
+        """
+        Xóa model khỏi cache
+
+        Args:
+            model_path: Đường dẫn model cần xóa (None = xóa toàn bộ)
+
+        Returns:
+            Số entry đã bị xóa
+        """
+        with self._lock:
+            if model_path is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                removed = self._drop_path_locked(str(Path(model_path).resolve()))
+            self._invalidations += removed
+            return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Thống kê hit/miss/load time của cache
+
+        Returns:
+            Dict chứa các chỉ số thống kê
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'load_time_total_s': self._load_time_total,
+                'last_load_time_s': self._last_load_time,
+                'cached_paths': [k[0] for k in self._entries],
+            }
+
+
+_default_cache: Optional[ModelCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_model_cache() -> ModelCache:
+    """
+    Lấy instance ModelCache dùng chung cho toàn process
+
+    Returns:
+        ModelCache singleton
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ModelCache()
+    return _default_cache
+
+
+def invalidate_model(model_path=None) -> int:
+    """
+    Xóa model khỏi cache dùng chung (gọi sau khi ghi đè/xóa file model)
+
+    Args:
+        model_path: Đường dẫn model (None = xóa toàn bộ)
+
+    Returns:
+        Số entry đã bị xóa
+    """
+    return get_model_cache().invalidate(model_path)
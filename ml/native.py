@@ -0,0 +1,585 @@
+"""
+Native Inference Module
+Chế độ suy luận "biên dịch" cho XGBoost, LightGBM và lr_cal_model - chỉ dùng NumPy
+
+- Tree ensemble: mọi cây được trải phẳng thành các mảng node liên tục
+  (feature, threshold, left, right, default_left, missing, value); duyệt vector hóa
+  cho (n dòng × T cây) cùng lúc, mỗi vòng lặp đi xuống 1 tầng
+- Logistic (CalibratedClassifierCV + Pipeline ColumnTransformer): gộp StandardScaler vào hệ số,
+  OneHotEncoder thành bảng tra trọng số theo category, rồi dot product -> np.interp (isotonic)
+  hoặc sigmoid (Platt)
+- Kernel được kiểm tra parity với model gốc trên bộ dữ liệu probe khi compile,
+  lệch quá PARITY_ATOL thì ModelPredictor quay về predict_proba gốc
+
+Bật bằng ModelPredictor(..., native=True) hoặc biến môi trường ML_NATIVE_INFERENCE=1
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .explain import _split_linear, _unwrap_calibrated
+from .model_cache import ModelCache
+from .preprocess import FEATURE_NAMES
+from .utils import as_matrix
+
+N_FEATURES = len(FEATURE_NAMES)
+PARITY_ATOL = float(os.environ.get('ML_NATIVE_PARITY_ATOL', 1e-5))
+# Số phần tử tối đa của ma trận (dòng × cây) duyệt trong 1 block
+BLOCK_ELEMENTS = 1 << 20
+# Batch lớn hơn ngưỡng này đi qua predict_proba gốc (C++ đa luồng nhanh hơn duyệt NumPy)
+NATIVE_MAX_ROWS = int(os.environ.get('ML_NATIVE_MAX_ROWS', 512))
+
+# Cách xử lý giá trị thiếu tại node
+MISSING_AS_ZERO = 0   # LightGBM missing_type=None: NaN -> 0 rồi so sánh bình thường
+MISSING_ZERO = 1      # LightGBM missing_type=Zero: 0 / NaN -> nhánh default
+MISSING_NAN = 2       # XGBoost, LightGBM missing_type=NaN: NaN -> nhánh default
+
+
+def native_enabled() -> bool:
+    """ML_NATIVE_INFERENCE=1/true/yes bật chế độ native mặc định cho ModelPredictor"""
+    return os.environ.get('ML_NATIVE_INFERENCE', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _feature_index(name) -> int:
+    """Tên feature trong dump ('PAY_0', 'f5' hoặc số) -> vị trí trong FEATURE_NAMES"""
+    if isinstance(name, (int, np.integer)):
+        return int(name)
+    if name in FEATURE_NAMES:
+        return FEATURE_NAMES.index(name)
+    if isinstance(name, str) and name[:1] == 'f' and name[1:].isdigit():
+        return int(name[1:])
+    raise ValueError(f"Feature không có trong FEATURE_NAMES: {name}")
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class TreeEnsembleKernel:
+    """
+    Tree ensemble đã trải phẳng (binary classification, output = sigmoid(scale * Σ leaf + base))
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        missing: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        base_margin: float = 0.0,
+        sigmoid_scale: float = 1.0,
+        strict_less: bool = True,
+        compute_dtype=np.float64,
+        source: str = 'tree'
+    ):
+        """
+        Args:
+            feature/threshold/left/right/default_left/missing/value: Mảng theo node (leaf: left = right = chính nó)
+            roots: Node gốc của từng cây
+            max_depth: Số tầng tối đa (số vòng duyệt)
+            base_margin: Margin cộng thêm (XGBoost base_score ở không gian logit)
+            sigmoid_scale: Hệ số sigmoid (LightGBM 'sigmoid:k')
+            strict_less: True: x < threshold đi trái (XGBoost); False: x <= threshold (LightGBM)
+            compute_dtype: float32 cho XGBoost (DMatrix lưu float32), float64 cho LightGBM
+            source: Tên loại model gốc
+        """
+        self.compute_dtype = np.dtype(compute_dtype)
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=self.compute_dtype)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.missing = np.ascontiguousarray(missing, dtype=np.int8)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.base_margin = float(base_margin)
+        self.sigmoid_scale = float(sigmoid_scale)
+        self.strict_less = bool(strict_less)
+        self.source = source
+        self._is_leaf = self.left == np.arange(self.left.shape[0])
+        # children[2 * node + go_right]: 1 lần gather thay cho where(left, right)
+        self._children = np.column_stack([self.left, self.right]).ravel()
+        # Node coi 0 là missing (LightGBM zero_as_missing) cần xử lý cả khi input không có NaN
+        self._has_zero_missing = bool(np.any(self.missing == MISSING_ZERO))
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.roots.shape[0])
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.feature.shape[0])
+
+    def leaf_indices(self, X) -> np.ndarray:
+        """
+        Node lá mà từng dòng rơi vào ở từng cây
+
+        Returns:
+            Mảng (n, n_trees) chỉ số node
+        """
+        Xc = np.ascontiguousarray(as_matrix(X), dtype=self.compute_dtype)
+        n = Xc.shape[0]
+        out = np.empty((n, self.n_trees), dtype=np.int32)
+        block = max(1, BLOCK_ELEMENTS // max(self.n_trees, 1))
+        for start in range(0, n, block):
+            out[start:start + block] = self._traverse(Xc[start:start + block])
+        return out
+
+    def _traverse(self, Xb: np.ndarray) -> np.ndarray:
+        nb = Xb.shape[0]
+        idx = np.broadcast_to(self.roots, (nb, self.n_trees)).copy()
+        # Gather trên mảng phẳng (np.take) nhanh hơn fancy index 2 chiều
+        flat = Xb.ravel()
+        row_offset = (np.arange(nb, dtype=np.int32) * Xb.shape[1])[:, None]
+        handle_missing = self._has_zero_missing or bool(np.isnan(Xb).any())
+        for _ in range(self.max_depth):
+            if np.take(self._is_leaf, idx).all():
+                break
+            x = np.take(flat, row_offset + np.take(self.feature, idx))
+            thr = np.take(self.threshold, idx)
+            if handle_missing:
+                mode = np.take(self.missing, idx)
+                nan = np.isnan(x)
+                x = np.where(nan & (mode == MISSING_AS_ZERO), 0, x)
+                is_missing = (nan & (mode == MISSING_NAN)) | ((mode == MISSING_ZERO) & (nan | (x == 0)))
+                go_right = (x >= thr) if self.strict_less else (x > thr)
+                go_right = np.where(is_missing, ~np.take(self.default_left, idx), go_right)
+            else:
+                go_right = (x >= thr) if self.strict_less else (x > thr)
+            idx = np.take(self._children, 2 * idx + go_right)
+        return idx
+
+    def decision_function(self, X) -> np.ndarray:
+        """Margin (log-odds) cho từng dòng"""
+        leaves = self.leaf_indices(X)
+        return self.base_margin + self.value[leaves].sum(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Xác suất 2 lớp như sklearn
+
+        Returns:
+            Mảng (n, 2): [1 - p, p]
+        """
+        p = _sigmoid(self.sigmoid_scale * self.decision_function(X))
+        return np.column_stack([1.0 - p, p])
+
+
+class _TreeBuilder:
+    """Gom node của nhiều cây vào các list phẳng"""
+
+    def __init__(self):
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.default_left: List[bool] = []
+        self.missing: List[int] = []
+        self.value: List[float] = []
+        self.roots: List[int] = []
+        self.max_depth = 0
+
+    def new_node(self) -> int:
+        self.feature.append(0)
+        self.threshold.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.default_left.append(True)
+        self.missing.append(MISSING_NAN)
+        self.value.append(0.0)
+        return len(self.feature) - 1
+
+    def set_leaf(self, i: int, value: float, depth: int):
+        self.left[i] = self.right[i] = i
+        self.value[i] = float(value)
+        self.max_depth = max(self.max_depth, depth)
+
+    def set_split(self, i: int, feature: int, threshold: float, left: int, right: int, default_left: bool, missing: int):
+        self.feature[i] = int(feature)
+        self.threshold[i] = float(threshold)
+        self.left[i] = left
+        self.right[i] = right
+        self.default_left[i] = bool(default_left)
+        self.missing[i] = int(missing)
+
+    def build(self, **kwargs) -> TreeEnsembleKernel:
+        return TreeEnsembleKernel(
+            np.array(self.feature), np.array(self.threshold), np.array(self.left), np.array(self.right),
+            np.array(self.default_left), np.array(self.missing), np.array(self.value), np.array(self.roots),
+            self.max_depth, **kwargs
+        )
+
+
+def compile_xgboost_dump(trees: Sequence[Dict], base_margin: float) -> TreeEnsembleKernel:
+    """
+    Trải phẳng dump JSON của XGBoost (Booster.get_dump(dump_format='json'))
+
+    Args:
+        trees: List cây (dict đã json.loads), mỗi node có nodeid, split, split_condition, yes, no, missing, children
+        base_margin: base_score ở không gian margin
+
+    Returns:
+        TreeEnsembleKernel (x < threshold đi nhánh yes, so sánh float32)
+    """
+    b = _TreeBuilder()
+    for tree in trees:
+        b.roots.append(_add_xgb_node(b, tree, 0))
+    return b.build(base_margin=base_margin, strict_less=True, compute_dtype=np.float32, source='xgboost')
+
+
+def _add_xgb_node(b: _TreeBuilder, node: Dict, depth: int) -> int:
+    i = b.new_node()
+    if 'leaf' in node:
+        b.set_leaf(i, node['leaf'], depth)
+        return i
+    children = {c['nodeid']: c for c in node['children']}
+    yes = _add_xgb_node(b, children[node['yes']], depth + 1)
+    no = _add_xgb_node(b, children[node['no']], depth + 1)
+    b.set_split(
+        i, _feature_index(node['split']), float(np.float32(node['split_condition'])),
+        yes, no, node.get('missing', node['yes']) == node['yes'], MISSING_NAN
+    )
+    return i
+
+
+def compile_xgboost(model) -> TreeEnsembleKernel:
+    """XGBClassifier / Booster (binary:logistic) -> TreeEnsembleKernel"""
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    config = json.loads(booster.save_config())
+    learner = config['learner']
+    objective = learner['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Chỉ hỗ trợ binary:logistic, model dùng {objective}")
+    base_score = float(learner['learner_model_param']['base_score'])
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    trees = [json.loads(t) for t in booster.get_dump(dump_format='json')]
+    # predict_proba của XGBClassifier chỉ dùng tới best_iteration khi có early stopping
+    best = getattr(model, 'best_iteration', None) if hasattr(model, 'get_booster') else None
+    if best is not None:
+        per_round = max(1, len(trees) // max(booster.num_boosted_rounds(), 1))
+        trees = trees[:(int(best) + 1) * per_round]
+    return compile_xgboost_dump(trees, base_margin)
+
+
+def compile_lightgbm_dump(dump: Dict) -> TreeEnsembleKernel:
+    """
+    Trải phẳng dump JSON của LightGBM (Booster.dump_model())
+
+    Args:
+        dump: Dict có tree_info, feature_names, objective ('binary sigmoid:1')
+
+    Returns:
+        TreeEnsembleKernel (x <= threshold đi trái, so sánh float64)
+    """
+    objective = str(dump.get('objective', 'binary'))
+    if not objective.startswith('binary'):
+        raise ValueError(f"Chỉ hỗ trợ objective binary, model dùng {objective}")
+    if dump.get('average_output'):
+        raise ValueError("Không hỗ trợ LightGBM boosting=rf (average_output)")
+    scale = 1.0
+    for part in objective.split():
+        if part.startswith('sigmoid:'):
+            scale = float(part.split(':', 1)[1])
+    names = dump.get('feature_names') or []
+    fmap = [_feature_index(n) for n in names] if names else None
+
+    b = _TreeBuilder()
+    for info in dump['tree_info']:
+        b.roots.append(_add_lgbm_node(b, info['tree_structure'], 0, fmap))
+    return b.build(sigmoid_scale=scale, strict_less=False, compute_dtype=np.float64, source='lightgbm')
+
+
+_LGBM_MISSING = {'None': MISSING_AS_ZERO, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+
+def _add_lgbm_node(b: _TreeBuilder, node: Dict, depth: int, fmap: Optional[List[int]]) -> int:
+    i = b.new_node()
+    if 'split_index' not in node:
+        b.set_leaf(i, node.get('leaf_value', 0.0), depth)
+        return i
+    if node.get('decision_type', '<=') != '<=':
+        raise ValueError("Không hỗ trợ split categorical của LightGBM")
+    left = _add_lgbm_node(b, node['left_child'], depth + 1, fmap)
+    right = _add_lgbm_node(b, node['right_child'], depth + 1, fmap)
+    f = int(node['split_feature'])
+    b.set_split(
+        i, fmap[f] if fmap else f, float(node['threshold']), left, right,
+        bool(node.get('default_left', True)), _LGBM_MISSING.get(node.get('missing_type', 'None'), MISSING_AS_ZERO)
+    )
+    return i
+
+
+def compile_lightgbm(model) -> TreeEnsembleKernel:
+    """LGBMClassifier / Booster -> TreeEnsembleKernel (dump tới best_iteration nếu có)"""
+    booster = getattr(model, 'booster_', model)
+    return compile_lightgbm_dump(booster.dump_model())
+
+
+class LinearCalibratedKernel:
+    """
+    Logistic regression + calibrator rút gọn: margin = b + X[:, num] @ w + Σ bảng tra one-hot,
+    p = calibrator(margin), trung bình trên các fold của CalibratedClassifierCV
+    """
+
+    def __init__(self, parts: List[Dict[str, Any]]):
+        """
+        Args:
+            parts: Mỗi phần tử 1 estimator: num_idx, num_weight, bias, cats [(feature, categories, weights)],
+                calibrator ('isotonic', x, y) | ('sigmoid', a, b) | None
+        """
+        self.parts = parts
+        self.source = 'linear'
+
+    def decision_function(self, X) -> np.ndarray:
+        """Margin của estimator đầu tiên (không qua calibrator)"""
+        return self._margin(self.parts[0], as_matrix(X))
+
+    @staticmethod
+    def _margin(part: Dict[str, Any], X: np.ndarray) -> np.ndarray:
+        z = X[:, part['num_idx']] @ part['num_weight'] + part['bias']
+        for f, cats, weights in part['cats']:
+            x = X[:, f]
+            pos = np.searchsorted(cats, x)
+            pos_c = np.minimum(pos, len(cats) - 1)
+            hit = (pos < len(cats)) & (cats[pos_c] == x)
+            z += np.where(hit, weights[pos_c], 0.0)
+        return z
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Returns:
+            Mảng (n, 2): [1 - p, p]
+        """
+        Xm = as_matrix(X)
+        p = np.zeros(Xm.shape[0], dtype=np.float64)
+        for part in self.parts:
+            z = self._margin(part, Xm)
+            cal = part['calibrator']
+            if cal is None:
+                p += _sigmoid(z)
+            elif cal[0] == 'isotonic':
+                p += np.interp(z, cal[1], cal[2])
+            else:
+                p += 1.0 / (1.0 + np.exp(cal[1] * z + cal[2]))
+        p /= len(self.parts)
+        p = np.clip(p, 0.0, 1.0)
+        return np.column_stack([1.0 - p, p])
+
+
+def _reduce_linear(estimator) -> Dict[str, Any]:
+    """Pipeline(ColumnTransformer[StandardScaler, OneHotEncoder], LogisticRegression) -> hệ số rút gọn"""
+    prep, clf = _split_linear(estimator)
+    coef = np.asarray(clf.coef_, dtype=np.float64)
+    if coef.shape[0] != 1:
+        raise ValueError("Chỉ hỗ trợ logistic nhị phân")
+    coef = coef.ravel()
+    bias = float(np.ravel(getattr(clf, 'intercept_', [0.0]))[0])
+
+    weight = np.zeros(N_FEATURES, dtype=np.float64)
+    cats: List[Tuple[int, np.ndarray, np.ndarray]] = []
+    ct = prep
+    if ct is not None and hasattr(ct, 'steps'):
+        steps = [step for _, step in ct.steps]
+        if len(steps) != 1 or not hasattr(steps[0], 'transformers_'):
+            raise ValueError("Chỉ hỗ trợ tiền xử lý bằng 1 ColumnTransformer")
+        ct = steps[0]
+
+    if ct is None:
+        if coef.shape[0] != N_FEATURES:
+            raise ValueError(f"Model tuyến tính cần {N_FEATURES} hệ số")
+        weight[:] = coef
+    elif hasattr(ct, 'transformers_'):
+        for name, trans, cols in ct.transformers_:
+            if trans == 'drop' or name not in ct.output_indices_:
+                continue
+            sl = ct.output_indices_[name]
+            if sl.stop <= sl.start:
+                continue
+            idx = [_feature_index(c) for c in np.atleast_1d(cols)]
+            w = coef[sl]
+            kind = type(trans).__name__
+            if trans == 'passthrough':
+                weight[idx] += w
+            elif kind == 'StandardScaler':
+                scale = trans.scale_ if getattr(trans, 'scale_', None) is not None else np.ones(len(idx))
+                mean = trans.mean_ if getattr(trans, 'with_mean', False) else np.zeros(len(idx))
+                weight[idx] += w / scale
+                bias -= float(np.sum(w * mean / scale))
+            elif kind == 'OneHotEncoder':
+                if getattr(trans, 'handle_unknown', 'error') not in ('ignore', 'error'):
+                    raise ValueError("Không hỗ trợ OneHotEncoder với infrequent categories")
+                drop_idx = getattr(trans, 'drop_idx_', None)
+                pos = 0
+                for k, f in enumerate(idx):
+                    categories = np.asarray(trans.categories_[k], dtype=np.float64)
+                    cw = np.zeros(len(categories), dtype=np.float64)
+                    for c in range(len(categories)):
+                        if drop_idx is not None and drop_idx[k] is not None and c == drop_idx[k]:
+                            continue
+                        cw[c] = w[pos]
+                        pos += 1
+                    order = np.argsort(categories)
+                    cats.append((f, categories[order], cw[order]))
+            else:
+                raise ValueError(f"Không hỗ trợ transformer {kind}")
+    else:
+        raise ValueError(f"Không hỗ trợ tiền xử lý {type(ct).__name__}")
+
+    num_idx = np.flatnonzero(weight)
+    return {'num_idx': num_idx, 'num_weight': weight[num_idx], 'bias': bias, 'cats': cats}
+
+
+def _calibrator_of(cal) -> Optional[tuple]:
+    """_CalibratedClassifier -> ('isotonic', x, y) | ('sigmoid', a, b)"""
+    calibrators = getattr(cal, 'calibrators', None) or getattr(cal, 'calibrators_', None)
+    if not calibrators:
+        return None
+    c = calibrators[-1]
+    if hasattr(c, 'X_thresholds_'):
+        return ('isotonic', np.asarray(c.X_thresholds_, dtype=np.float64), np.asarray(c.y_thresholds_, dtype=np.float64))
+    if hasattr(c, 'a_') and hasattr(c, 'b_'):
+        return ('sigmoid', float(c.a_), float(c.b_))
+    raise ValueError(f"Không hỗ trợ calibrator {type(c).__name__}")
+
+
+def compile_linear(model) -> LinearCalibratedKernel:
+    """CalibratedClassifierCV(Pipeline) hoặc Pipeline/LogisticRegression -> LinearCalibratedKernel"""
+    parts = []
+    if hasattr(model, 'calibrated_classifiers_'):
+        for cal, est in zip(model.calibrated_classifiers_, _unwrap_calibrated(model)):
+            part = _reduce_linear(est)
+            part['calibrator'] = _calibrator_of(cal)
+            parts.append(part)
+    else:
+        part = _reduce_linear(model)
+        part['calibrator'] = None
+        parts.append(part)
+    return LinearCalibratedKernel(parts)
+
+
+def compile_model(model):
+    """
+    Biên dịch model đã load thành kernel NumPy
+
+    Returns:
+        TreeEnsembleKernel hoặc LinearCalibratedKernel
+
+    Raises:
+        ValueError: Nếu model không được hỗ trợ
+    """
+    if isinstance(model, (TreeEnsembleKernel, LinearCalibratedKernel)):
+        return model
+    module = type(model).__module__ or ''
+    if hasattr(model, 'get_booster') or module.startswith('xgboost'):
+        return compile_xgboost(model)
+    # LGBMClassifier hoặc ml.artifacts.LightGBMArtifactModel
+    if module.startswith('lightgbm') or hasattr(model, 'booster_'):
+        return compile_lightgbm(model)
+    base = _unwrap_calibrated(model)[0]
+    if hasattr(_split_linear(base)[1], 'coef_'):
+        return compile_linear(model)
+    raise ValueError(f"Chưa có native kernel cho {type(model).__name__}")
+
+
+def probe_matrix(n: int = 256, seed: int = 0) -> np.ndarray:
+    """
+    Dữ liệu giả hợp lệ (n, 41) theo FEATURE_NAMES để kiểm tra parity
+
+    Returns:
+        Ma trận float64
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n, N_FEATURES), dtype=np.float64)
+    for j, name in enumerate(FEATURE_NAMES):
+        if name == 'LIMIT_BAL':
+            X[:, j] = rng.integers(1, 100, n) * 10000
+        elif name == 'SEX':
+            X[:, j] = rng.integers(1, 3, n)
+        elif name == 'EDUCATION':
+            X[:, j] = rng.integers(1, 5, n)
+        elif name == 'MARRIAGE':
+            X[:, j] = rng.integers(1, 4, n)
+        elif name == 'AGE':
+            X[:, j] = rng.integers(21, 76, n)
+        elif name.startswith('PAY_AMT'):
+            X[:, j] = np.round(rng.exponential(5000, n), 2)
+        elif name.startswith('PAY_'):
+            X[:, j] = rng.integers(-2, 9, n)
+        else:
+            X[:, j] = np.round(rng.normal(50000, 60000, n), 2)
+    return X
+
+
+def check_parity(kernel, model, X: Optional[np.ndarray] = None) -> float:
+    """
+    Sai lệch lớn nhất giữa xác suất của kernel và predict_proba của model gốc
+
+    Args:
+        X: Ma trận (n, 41) (mặc định probe_matrix())
+
+    Returns:
+        max |p_kernel - p_model|
+    """
+    X = probe_matrix() if X is None else as_matrix(X)
+    expected = np.asarray(model.predict_proba(pd.DataFrame(X, columns=FEATURE_NAMES)))[:, 1]
+    got = kernel.predict_proba(X)[:, 1]
+    return float(np.max(np.abs(got - expected))) if len(X) else 0.0
+
+
+_kernels: 'OrderedDict[tuple, Any]' = OrderedDict()
+_kernels_lock = threading.Lock()
+MAX_KERNELS = 16
+
+
+def get_native_kernel(model_path, model, verify: bool = True):
+    """
+    Kernel đã biên dịch cho file model (cache theo path + mtime + size như ModelCache)
+
+    Args:
+        model_path: Đường dẫn file model
+        model: Model đã load từ file đó
+        verify: Kiểm tra parity trên probe_matrix, lệch > PARITY_ATOL thì trả None
+
+    Returns:
+        Kernel, hoặc None nếu model không hỗ trợ / không đạt parity (caller dùng model gốc)
+    """
+    key = ModelCache._make_key(model_path)
+    with _kernels_lock:
+        if key in _kernels:
+            _kernels.move_to_end(key)
+            return _kernels[key]
+    try:
+        kernel = compile_model(model)
+        if verify:
+            diff = check_parity(kernel, model)
+            if diff > PARITY_ATOL:
+                print(f"⚠ Native kernel lệch {diff:.2e} so với model gốc ({key[0]}) - dùng predict_proba gốc")
+                kernel = None
+            else:
+                print(f"✓ Native kernel {kernel.source}: {key[0]} (parity {diff:.1e})")
+    except Exception as e:
+        print(f"⚠ Không biên dịch được native kernel cho {key[0]}: {e}")
+        kernel = None
+    with _kernels_lock:
+        _kernels[key] = kernel
+        while len(_kernels) > MAX_KERNELS:
+            _kernels.popitem(last=False)
+    return kernel
+
+
+def clear_native_kernels():
+    """Xóa cache kernel (vd. sau khi train lại)"""
+    with _kernels_lock:
+        _kernels.clear()
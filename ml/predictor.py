@@ -8,36 +8,68 @@ import pandas as pd
 from pathlib import Path
 from typing import Tuple, Optional
 
+from .artifacts import artifacts_enabled, has_artifact, load_artifact, load_cached_artifact, manifest_path
+from .model_cache import get_model_cache
+from .native import NATIVE_MAX_ROWS, get_native_kernel, native_enabled
+from .preprocess import BatchInput, batch_preprocess_inputs
+
 
 class ModelPredictor:
     """
     Lớp quản lý việc load và predict bằng ML model
     """
     
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        use_cache: bool = True,
+        native: Optional[bool] = None,
+        prefer_artifact: Optional[bool] = None
+    ):
         """
         Khởi tạo Predictor
         
         Args:
             model_path: Đường dẫn tới file model .pkl
+            use_cache: Dùng ModelCache chung của process (mặc định True)
+            native: Dùng kernel NumPy của ml.native thay cho predict_proba gốc
+                (None = theo biến môi trường ML_NATIVE_INFERENCE)
+            prefer_artifact: Load từ artifact gốc <stem>.native/ nếu có, .pkl làm fallback
+                (None = theo biến môi trường ML_LOAD_ARTIFACTS, mặc định bật)
         """
         self.model_path = Path(model_path)
+        self.use_cache = use_cache
+        self.native = native_enabled() if native is None else bool(native)
+        self.prefer_artifact = artifacts_enabled() if prefer_artifact is None else bool(prefer_artifact)
         self.model = None
+        self.kernel = None
+        self.source = None
     
     def load_model(self) -> bool:
         """
-        Load model từ file .pkl
+        Load model từ artifact gốc (nếu có) hoặc file .pkl
         
         Returns:
             True nếu load thành công, False nếu thất bại
         """
         try:
-            if not self.model_path.exists():
-                print(f"✗ Không tìm thấy model: {self.model_path}")
-                return False
+            loaded_from = None
+            if self.prefer_artifact and has_artifact(self.model_path):
+                loaded_from = self._load_artifact()
             
-            self.model = joblib.load(self.model_path)
-            print(f"✓ Đã load model: {self.model_path}")
+            if loaded_from is None:
+                if not self.model_path.exists():
+                    print(f"✗ Không tìm thấy model: {self.model_path}")
+                    return False
+                if self.use_cache:
+                    self.model = get_model_cache().get(self.model_path)
+                else:
+                    self.model = joblib.load(self.model_path)
+                self.source = 'pickle'
+                loaded_from = self.model_path
+            print(f"✓ Đã load model: {loaded_from}")
+            # Kernel native (None nếu model không hỗ trợ / lệch parity -> dùng predict_proba gốc)
+            self.kernel = get_native_kernel(loaded_from, self.model) if self.native else None
             return True
             
         except Exception as e:
@@ -64,7 +96,7 @@ class ModelPredictor:
         
         try:
             # Predict probability
-            proba = self.model.predict_proba(X)
+            proba = self._predict_proba(X)
             
             # Lấy xác suất class 1 (vỡ nợ)
             prob_default = proba[0, 1]
@@ -78,12 +110,14 @@ class ModelPredictor:
             print(f"✗ Lỗi predict: {e}")
             raise
     
-    def predict_batch(self, X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    def predict_batch(self, X: BatchInput, threshold: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
         """
         Dự đoán cho nhiều mẫu cùng lúc
         
         Args:
-            X: DataFrame chứa nhiều hàng
+            X: DataFrame features đã chuẩn hóa, hoặc list các dict / ndarray (n, 41)
+               thô - sẽ được chuẩn hóa vector hóa qua batch_preprocess_inputs
+            threshold: Ngưỡng xác suất để gán nhãn 1
         
         Returns:
             Tuple (labels, probabilities)
@@ -94,9 +128,14 @@ class ModelPredictor:
             raise ValueError("Model chưa được load")
         
         try:
-            proba = self.model.predict_proba(X)
+            if not isinstance(X, pd.DataFrame):
+                X = batch_preprocess_inputs(X)
+            if len(X) == 0:
+                return np.empty(0, dtype=int), np.empty(0, dtype=np.float64)
+            
+            proba = self._predict_proba(X)
             prob_defaults = proba[:, 1]
-            labels = (prob_defaults >= 0.5).astype(int)
+            labels = (prob_defaults >= threshold).astype(int)
             
             return labels, prob_defaults
             
@@ -104,6 +143,28 @@ class ModelPredictor:
             print(f"✗ Lỗi predict_batch: {e}")
             raise
     
+    def _load_artifact(self) -> Optional[Path]:
+        """Load model từ <stem>.native/ - trả về đường dẫn manifest, None nếu artifact không dùng được"""
+        manifest = manifest_path(self.model_path)
+        try:
+            if self.use_cache:
+                # Ngân sách byte theo payload (các file trong manifest), không theo manifest.json vài KB
+                self.model = load_cached_artifact(self.model_path)
+            else:
+                self.model = load_artifact(self.model_path)
+        except Exception as e:
+            print(f"⚠ Không dùng được artifact {manifest.parent.name}: {e} - load .pkl")
+            self.model = None
+            return None
+        self.source = 'artifact'
+        return manifest
+    
+    def _predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        """predict_proba qua kernel native nếu có (batch tối đa NATIVE_MAX_ROWS dòng), ngược lại qua model gốc"""
+        if self.kernel is not None and len(X) <= NATIVE_MAX_ROWS:
+            return self.kernel.predict_proba(X)
+        return self.model.predict_proba(X)
+    
     def get_model_info(self) -> dict:
         """
         Lấy thông tin về model
@@ -119,7 +180,9 @@ class ModelPredictor:
         info = {
             'loaded': True,
             'path': str(self.model_path),
-            'type': model_type
+            'type': model_type,
+            'source': self.source,
+            'native': self.kernel is not None
         }
         
         # Thêm thông tin đặc thù nếu có
@@ -2,9 +2,16 @@
 Preprocess Module
 Chuẩn hóa dữ liệu input trước khi đưa vào ML model - Mở rộng lên 41 features (12 tháng)
 """
+import json
+import zlib
 import numpy as np
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Union
+
+try:
+    import zstandard as _zstd
+except ImportError:  # zstandard là tùy chọn - thiếu thì sidecar nén bằng zlib
+    _zstd = None
 
 
 # Thứ tự chuẩn của 41 features (mở rộng từ UCI dataset lên 12 tháng)
@@ -18,6 +25,22 @@ FEATURE_NAMES = [
     'PAY_AMT7', 'PAY_AMT8', 'PAY_AMT9', 'PAY_AMT10', 'PAY_AMT11', 'PAY_AMT12'
 ]
 
+PAY_FIELDS = ['PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6',
+              'PAY_7', 'PAY_8', 'PAY_9', 'PAY_10', 'PAY_11', 'PAY_12']
+
+# Vị trí cột trong ma trận features (dùng cho xử lý vector hóa)
+_EDUCATION_IDX = FEATURE_NAMES.index('EDUCATION')
+_MARRIAGE_IDX = FEATURE_NAMES.index('MARRIAGE')
+_PAY_IDX = np.array([FEATURE_NAMES.index(f) for f in PAY_FIELDS])
+_FEATURE_SET = frozenset(FEATURE_NAMES)
+
+BatchInput = Union[List[Dict], pd.DataFrame, np.ndarray]
+
+# Vector features đóng gói: 41 float32 little-endian theo đúng thứ tự FEATURE_NAMES (164 bytes)
+FEATURE_VECTOR_DTYPE = np.dtype('<f4')
+FEATURE_VECTOR_BYTES = len(FEATURE_NAMES) * FEATURE_VECTOR_DTYPE.itemsize
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
 
 def validate_input(input_dict: Dict) -> bool:
     """
@@ -59,9 +82,7 @@ def clean_input(input_dict: Dict) -> Dict:
         cleaned['MARRIAGE'] = 3
     
     # 3. Clip PAY_* về dải [-2, 9] cho tất cả 12 tháng
-    pay_fields = ['PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6',
-                  'PAY_7', 'PAY_8', 'PAY_9', 'PAY_10', 'PAY_11', 'PAY_12']
-    for field in pay_fields:
+    for field in PAY_FIELDS:
         cleaned[field] = max(-2, min(9, cleaned[field]))
     
     return cleaned
@@ -95,22 +116,228 @@ def preprocess_input(input_dict: Dict) -> pd.DataFrame:
     return df
 
 
-def batch_preprocess_inputs(input_list: List[Dict]) -> pd.DataFrame:
+def to_feature_matrix(data: BatchInput) -> np.ndarray:
+    """
+    Chuyển input batch thành ma trận float64 (n, 41) theo thứ tự FEATURE_NAMES
+    
+    Args:
+        data: List các dict, DataFrame có đủ 41 cột, hoặc ndarray 2 chiều (n, 41)
+            đã sắp theo FEATURE_NAMES
+    
+    Returns:
+        Ma trận numpy mới (không dùng chung bộ nhớ với input)
+    
+    Raises:
+        ValueError: Nếu thiếu trường hoặc sai kích thước
+    """
+    n_features = len(FEATURE_NAMES)
+    
+    if isinstance(data, pd.DataFrame):
+        missing = [f for f in FEATURE_NAMES if f not in data.columns]
+        if missing:
+            raise ValueError(f"Input không hợp lệ - thiếu các cột: {missing}")
+        return data[FEATURE_NAMES].to_numpy(dtype=np.float64, copy=True)
+    
+    if isinstance(data, np.ndarray):
+        X = np.array(data, dtype=np.float64, copy=True)
+        if X.ndim == 1 and X.shape[0] == n_features:
+            X = X.reshape(1, n_features)
+        if X.ndim != 2 or X.shape[1] != n_features:
+            raise ValueError(f"Ma trận input phải có shape (n, {n_features}), nhận được {data.shape}")
+        return X
+    
+    rows = list(data)
+    X = np.empty((len(rows), n_features), dtype=np.float64)
+    for i, input_dict in enumerate(rows):
+        try:
+            X[i] = [input_dict[f] for f in FEATURE_NAMES]
+        except KeyError:
+            missing = [f for f in FEATURE_NAMES if f not in input_dict]
+            raise ValueError(f"Input không hợp lệ ở dòng {i} - thiếu các trường: {missing}")
+    return X
+
+
+def clean_matrix(X: np.ndarray) -> np.ndarray:
+    """
+    Phiên bản vector hóa của clean_input cho ma trận (n, 41) - xử lý in-place
+    
+    Args:
+        X: Ma trận features theo thứ tự FEATURE_NAMES
+    
+    Returns:
+        Chính ma trận X đã được clean
+    """
+    # 1. EDUCATION: {0,4,5,6} -> 4
+    edu = X[:, _EDUCATION_IDX]
+    edu[np.isin(edu, (0, 4, 5, 6))] = 4
+    
+    # 2. MARRIAGE: {0} -> 3
+    mar = X[:, _MARRIAGE_IDX]
+    mar[mar == 0] = 3
+    
+    # 3. Clip PAY_* về [-2, 9]
+    X[:, _PAY_IDX] = np.clip(X[:, _PAY_IDX], -2, 9)
+    return X
+
+
+def preprocess_matrix(data: BatchInput) -> np.ndarray:
+    """
+    Chuẩn hóa batch input thành ma trận numpy đã clean (1 lần, không tạo DataFrame từng dòng)
+    
+    Args:
+        data: List các dict, DataFrame hoặc ndarray 2 chiều
+    
+    Returns:
+        Ma trận float64 (n, 41)
+    """
+    return clean_matrix(to_feature_matrix(data))
+
+
+def batch_preprocess_inputs(input_list: BatchInput) -> pd.DataFrame:
     """
     Chuẩn hóa nhiều input cùng lúc
     
     Args:
-        input_list: List các dict input
+        input_list: List các dict input, DataFrame hoặc ndarray 2 chiều
     
     Returns:
         DataFrame với nhiều hàng
     """
-    dfs = []
-    for input_dict in input_list:
-        df = preprocess_input(input_dict)
-        dfs.append(df)
+    return pd.DataFrame(preprocess_matrix(input_list), columns=FEATURE_NAMES)
+
+
+def encode_features(input_dict: Dict) -> bytes:
+    """
+    Đóng gói 41 features thành vector float32 cố định (lưu vào predictions_log.features_f32)
+    
+    Args:
+        input_dict: Dict input; trường thiếu hoặc không phải số được ghi là NaN
+    
+    Returns:
+        FEATURE_VECTOR_BYTES bytes theo thứ tự FEATURE_NAMES
+    
+    Note:
+        float32 giữ chính xác số nguyên tới 16,777,216 - số tiền lớn hơn bị làm tròn
+        (sai số tương đối < 6e-8), không ảnh hưởng tới điểm của model
+    """
+    values = []
+    for field in FEATURE_NAMES:
+        try:
+            values.append(float(input_dict[field]))
+        except (KeyError, TypeError, ValueError):
+            values.append(np.nan)
+    return np.asarray(values, dtype=FEATURE_VECTOR_DTYPE).tobytes()
+
+
+def decode_features(blob: bytes) -> Dict[str, float]:
+    """
+    Giải mã 1 vector features_f32 thành dict {feature: value}
+    
+    Args:
+        blob: Bytes do encode_features tạo ra
+    
+    Returns:
+        Dict 41 trường; giá trị nguyên được trả về dạng int, NaN bị bỏ qua
+    
+    Raises:
+        ValueError: Nếu blob sai kích thước
+    """
+    if len(blob) != FEATURE_VECTOR_BYTES:
+        raise ValueError(f"features_f32 phải dài {FEATURE_VECTOR_BYTES} bytes, nhận được {len(blob)}")
+    row = np.frombuffer(blob, dtype=FEATURE_VECTOR_DTYPE).astype(np.float64)
+    return _row_to_dict(row)
+
+
+def decode_feature_matrix(blobs: Sequence[Optional[bytes]]) -> np.ndarray:
+    """
+    Giải mã cả cột features_f32 của 1 result set thành ma trận (n, 41) trong 1 lần
+    
+    Args:
+        blobs: List bytes (None / sai kích thước -> hàng NaN)
+    
+    Returns:
+        Ma trận float64 (n, 41) theo thứ tự FEATURE_NAMES
+    """
+    n = len(blobs)
+    X = np.full((n, len(FEATURE_NAMES)), np.nan, dtype=np.float64)
+    ok = [i for i, b in enumerate(blobs) if b is not None and len(b) == FEATURE_VECTOR_BYTES]
+    if ok:
+        buf = b''.join(bytes(blobs[i]) for i in ok)
+        X[ok] = np.frombuffer(buf, dtype=FEATURE_VECTOR_DTYPE).reshape(len(ok), len(FEATURE_NAMES))
+    return X
+
+
+def encode_extras(input_dict: Dict) -> Optional[bytes]:
+    """
+    Nén các trường không thuộc FEATURE_NAMES (tên khách hàng, CMND, ...) thành sidecar
+    
+    Args:
+        input_dict: Dict input đầy đủ
+    
+    Returns:
+        JSON nén zstd (zlib nếu không có package zstandard), None nếu không có trường phụ
+    """
+    extras = {k: v for k, v in input_dict.items() if k not in _FEATURE_SET}
+    if not extras:
+        return None
+    raw = json.dumps(extras, ensure_ascii=False, default=str).encode('utf-8')
+    if _zstd is not None:
+        return _zstd.ZstdCompressor(level=3).compress(raw)
+    return zlib.compress(raw, 6)
+
+
+def decode_extras(blob: Optional[bytes]) -> Dict:
+    """
+    Giải nén sidecar do encode_extras tạo ra (tự nhận biết zstd / zlib)
+    
+    Args:
+        blob: Bytes hoặc None
     
-    return pd.concat(dfs, ignore_index=True)
+    Returns:
+        Dict các trường phụ ({} nếu None)
+    """
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    if blob[:4] == _ZSTD_MAGIC:
+        if _zstd is None:
+            raise ValueError("Sidecar nén zstd nhưng chưa cài package zstandard")
+        raw = _zstd.ZstdDecompressor().decompress(blob)
+    else:
+        raw = zlib.decompress(blob)
+    return json.loads(raw.decode('utf-8'))
+
+
+def decode_raw_input(features: Optional[bytes], extras: Optional[bytes] = None) -> Dict:
+    """
+    Dựng lại raw input dict (tương đương raw_input_json cũ) từ features_f32 + extras_blob
+    
+    Returns:
+        Dict features + trường phụ
+    """
+    result = decode_features(features) if features is not None else {}
+    result.update(decode_extras(extras))
+    return result
+
+
+def _row_to_dict(row: np.ndarray) -> Dict[str, float]:
+    """1 hàng float64 -> dict, giữ int cho giá trị nguyên, bỏ NaN"""
+    out = {}
+    for field, v in zip(FEATURE_NAMES, row.tolist()):
+        if v != v:
+            continue
+        out[field] = int(v) if v.is_integer() else v
+    return out
+
+
+def matrix_to_dicts(X: np.ndarray) -> List[Dict[str, float]]:
+    """
+    Chuyển ma trận (n, 41) (vd. từ decode_feature_matrix) thành list dict theo FEATURE_NAMES
+    
+    Returns:
+        List dict, mỗi hàng 1 dict (bỏ các giá trị NaN)
+    """
+    return [_row_to_dict(row) for row in np.asarray(X, dtype=np.float64)]
 
 
 def get_feature_names() -> List[str]:
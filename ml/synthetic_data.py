@@ -0,0 +1,271 @@
+"""
+Synthetic Data
+Sinh dữ liệu khách hàng 12 tháng giả lập quy mô lớn (hàng triệu dòng) để benchmark toàn hệ thống
+
+Chạy:
+    python -m ml.synthetic_data --rows 5000000 --out outputs/synthetic/uci_5m.parquet
+    python -m ml.synthetic_data --rows 1000000 --out outputs/synthetic/uci_1m.csv --workers 4
+    python -m ml.synthetic_data --rows 2000000 --mysql --method load_data
+
+- Mỗi dòng: 1 dòng UCI 6 tháng lấy mẫu có hoàn lại (giữ phân phối chung LIMIT_BAL/PAY/BILL/target),
+  tháng 7-12 + họ tên / CCCD sinh bằng ml.expand_dataset.expand_months / synth_identities (cùng động lực)
+- Sinh theo chunk cố định; chunk i dùng Generator riêng từ SeedSequence(seed, spawn_key=(i,)):
+  cùng seed -> cùng dữ liệu, bất kể số worker hay thứ tự chunk được tính
+- Chunk tính trên process pool (spawn), ghi theo đúng thứ tự; số chunk đang chờ ghi có giới hạn (RAM cố định)
+- Đích: Parquet (pyarrow, 1 row group / chunk), CSV (append), hoặc bảng customers qua CustomerImportService.import_chunks
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from ml.dataset_cache import load_dataset
+from ml.expand_dataset import NEW_MONTHS, expand_months, synth_identities
+
+BASE_FILE = ROOT / 'UCI_Credit_Card.csv'
+OUTPUT_DIR = ROOT / 'outputs' / 'synthetic'
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_SEED = 42
+TARGET = 'default.payment.next.month'
+
+# Cột nguồn 6 tháng (thứ tự như UCI_Credit_Card.csv, sau ID)
+BASE_COLUMNS = (
+    ['LIMIT_BAL', 'SEX', 'EDUCATION', 'MARRIAGE', 'AGE', 'PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6']
+    + [f'BILL_AMT{i}' for i in range(1, 7)] + [f'PAY_AMT{i}' for i in range(1, 7)] + [TARGET]
+)
+# Thứ tự cột như UCI_Credit_Card_12months.csv (ml/expand_dataset.py)
+OUTPUT_COLUMNS = (
+    ['ID', 'FULL NAME', 'CITIZEN ID'] + BASE_COLUMNS
+    + [f'PAY_{m}' for m in NEW_MONTHS] + [f'BILL_AMT{m}' for m in NEW_MONTHS] + [f'PAY_AMT{m}' for m in NEW_MONTHS]
+)
+
+_base: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+def _base_arrays(base_path: str) -> Dict[str, np.ndarray]:
+    """Cột nguồn 6 tháng (memmap từ dataset cache), cache theo process"""
+    if base_path not in _base:
+        df = load_dataset(base_path, columns=BASE_COLUMNS)
+        _base[base_path] = {c: df[c].to_numpy() for c in BASE_COLUMNS}
+    return _base[base_path]
+
+
+def chunk_rng(seed: int, index: int) -> np.random.Generator:
+    """Generator độc lập của chunk index (không phụ thuộc chunk khác / worker nào tính)"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def generate_chunk(
+    index: int,
+    n_rows: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = DEFAULT_SEED,
+    base_path: str = str(BASE_FILE)
+) -> pd.DataFrame:
+    """
+    Sinh chunk thứ index của bộ n_rows dòng
+
+    Returns:
+        DataFrame cột OUTPUT_COLUMNS, ID = index * chunk_size + 1 ...
+    """
+    start = index * chunk_size
+    rows = max(0, min(chunk_size, n_rows - start))
+    rng = chunk_rng(seed, index)
+    base = _base_arrays(base_path)
+    pick = rng.integers(0, len(base[TARGET]), size=rows)
+
+    data = {'ID': np.arange(start + 1, start + rows + 1, dtype=np.int64)}
+    names, citizen_ids = synth_identities(rows, rng)
+    data['FULL NAME'] = names
+    data['CITIZEN ID'] = citizen_ids
+    for col in BASE_COLUMNS:
+        data[col] = base[col].take(pick)
+    pay, bill, pay_amt = expand_months(data['PAY_6'], data['BILL_AMT6'], rng)
+    for k, month in enumerate(NEW_MONTHS):
+        data[f'PAY_{month}'] = pay[:, k]
+    for k, month in enumerate(NEW_MONTHS):
+        data[f'BILL_AMT{month}'] = bill[:, k].round(2)
+    for k, month in enumerate(NEW_MONTHS):
+        data[f'PAY_AMT{month}'] = pay_amt[:, k].round(2)
+    return pd.DataFrame(data, columns=OUTPUT_COLUMNS)
+
+
+def iter_chunks(
+    n_rows: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = DEFAULT_SEED,
+    workers: int = 1,
+    base_path=BASE_FILE,
+    prefetch: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Các chunk theo thứ tự 0, 1, 2, ...
+
+    Args:
+        n_rows: Tổng số dòng
+        chunk_size: Số dòng mỗi chunk
+        seed: Seed gốc
+        workers: Số process sinh chunk (1 = trong process hiện tại)
+        base_path: CSV UCI 6 tháng làm nguồn lấy mẫu
+        prefetch: Số chunk tối đa đã gửi cho pool nhưng chưa ghi (mặc định 2 * workers)
+    """
+    n_chunks = -(-int(n_rows) // int(chunk_size))
+    base_path = str(base_path)
+    if workers <= 1:
+        for i in range(n_chunks):
+            yield generate_chunk(i, n_rows, chunk_size, seed, base_path)
+        return
+
+    window = max(1, int(prefetch or 2 * workers))
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending = deque()
+        next_index = 0
+        while pending or next_index < n_chunks:
+            while next_index < n_chunks and len(pending) < window:
+                pending.append(pool.submit(generate_chunk, next_index, n_rows, chunk_size, seed, base_path))
+                next_index += 1
+            yield pending.popleft().result()
+
+
+def write_parquet(chunks: Iterator[pd.DataFrame], path: Path, on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """Ghi các chunk vào 1 file Parquet (1 row group / chunk)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Ghi Parquet cần pyarrow (pip install pyarrow), hoặc dùng --out *.csv")
+    writer = None
+    rows = 0
+    try:
+        for df in chunks:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(str(path), table.schema, compression='zstd')
+            writer.write_table(table)
+            rows += len(df)
+            if on_chunk:
+                on_chunk(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_csv(chunks: Iterator[pd.DataFrame], path: Path, on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """Ghi các chunk vào 1 file CSV (header ở chunk đầu)"""
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for df in chunks:
+            df.to_csv(f, index=False, header=(rows == 0))
+            rows += len(df)
+            if on_chunk:
+                on_chunk(rows)
+    return rows
+
+
+def generate(
+    n_rows: int,
+    out=None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = DEFAULT_SEED,
+    workers: Optional[int] = None,
+    base_path=BASE_FILE,
+    db_connector=None,
+    method: str = 'auto'
+) -> Dict[str, Any]:
+    """
+    Sinh n_rows dòng và ghi ra file (.parquet / .csv) hoặc bảng customers
+
+    Args:
+        n_rows: Tổng số dòng
+        out: File đích (.parquet / .csv); None khi ghi MySQL
+        chunk_size: Số dòng mỗi chunk
+        seed: Seed gốc (cùng seed + chunk_size -> cùng dữ liệu)
+        workers: Số process sinh chunk (mặc định min(số CPU, 4))
+        base_path: CSV UCI 6 tháng làm nguồn
+        db_connector: DatabaseConnector đã connect - ghi bảng customers thay vì file
+        method: Cách ghi MySQL ('auto' | 'executemany' | 'load_data')
+
+    Returns:
+        Dict rows, seconds, rows_per_sec, target
+    """
+    workers = int(workers or min(os.cpu_count() or 1, 4))
+    chunks = iter_chunks(n_rows, chunk_size, seed, workers, base_path)
+    t0 = time.perf_counter()
+
+    def on_chunk(rows: int):
+        elapsed = time.perf_counter() - t0
+        print(f"  ✓ {rows:,}/{n_rows:,} dòng ({rows / elapsed if elapsed > 0 else 0:,.0f} rows/s)")
+
+    print(f"▶ Sinh {n_rows:,} dòng (chunk {chunk_size:,}, {workers} worker, seed {seed})")
+    if db_connector is not None:
+        from services.customer_import import COLUMN_ALIASES, CustomerImportService
+        stats = CustomerImportService(db_connector).import_chunks(
+            (df.rename(columns=COLUMN_ALIASES) for df in chunks),
+            total=n_rows, method=method,
+            rejects_path=OUTPUT_DIR / 'synthetic_rejects.csv',
+        )
+        rows, target = stats['rows'], 'customers'
+    else:
+        path = Path(out) if out else OUTPUT_DIR / f'uci_synthetic_{n_rows}.parquet'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix.lower() in ('.parquet', '.pq'):
+            rows = write_parquet(chunks, path, on_chunk)
+        elif path.suffix.lower() == '.csv':
+            rows = write_csv(chunks, path, on_chunk)
+        else:
+            raise ValueError(f"Định dạng không hỗ trợ: {path.suffix} (dùng .parquet hoặc .csv)")
+        target = str(path)
+
+    elapsed = time.perf_counter() - t0
+    stats = {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0, 'target': target}
+    print(f"✓ Đã sinh {rows:,} dòng -> {target} trong {elapsed:.1f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu khách hàng 12 tháng giả lập quy mô lớn")
+    parser.add_argument('--rows', type=int, required=True, help="Tổng số dòng")
+    parser.add_argument('--out', default=None, help="File .parquet / .csv (mặc định outputs/synthetic/uci_synthetic_<rows>.parquet)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--workers', type=int, default=None, help="Số process sinh chunk (mặc định min(CPU, 4))")
+    parser.add_argument('--base', default=str(BASE_FILE), help="CSV UCI 6 tháng làm nguồn lấy mẫu")
+    parser.add_argument('--mysql', action='store_true', help="Ghi thẳng vào bảng customers")
+    parser.add_argument('--method', choices=['auto', 'executemany', 'load_data'], default='auto')
+    args = parser.parse_args(argv)
+
+    if not Path(args.base).exists():
+        print(f"✗ Không tìm thấy file nguồn: {args.base}")
+        return 1
+    db = None
+    if args.mysql:
+        from config.database_config import DatabaseConfig
+        from database.connector import DatabaseConnector
+        db = DatabaseConnector(DatabaseConfig.default())
+        if not db.connect():
+            return 1
+    try:
+        generate(args.rows, args.out, args.chunk_size, args.seed, args.workers, args.base, db, args.method)
+        return 0
+    except Exception as e:
+        print(f"✗ Sinh dữ liệu lỗi: {e}")
+        return 1
+    finally:
+        if db is not None:
+            db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+Train Cache
+Cache kết quả train theo nội dung: cùng dữ liệu + cùng thuật toán/tham số + cùng phiên bản thư viện -> dùng lại model cũ
+
+outputs/cache/train/
+    <key[:2]>/<key>/
+        model.pkl                 # bản sao .pkl đã train
+        arrays/<name>.npy         # mảng kết quả (vd. dự báo trên tập test), np.load(mmap_mode='r')
+        result.json               # metrics, output JSON, thời gian train, sha256 model (ghi sau cùng)
+
+- Key = sha256(thuật toán, tham số, phiên bản numpy/pandas/sklearn/xgboost/lightgbm, fingerprint dữ liệu)
+- mtime của result.json = lần dùng gần nhất; vượt TRAIN_CACHE_MAX_BYTES thì xóa entry ít dùng nhất trước
+- TRAIN_CACHE=0 tắt cache (luôn train lại)
+
+Dùng:
+    cache = get_train_cache()
+    key = cache.key('XGBoost', params, X_train, y_train, X_test, y_test)
+    entry = cache.get(key)
+    if entry is None:
+        ... train, joblib.dump(model, model_path) ...
+        cache.put(key, model_path, result={'metrics': metrics})
+    else:
+        cache.restore(entry, model_path)
+
+    python -m ml.train_cache list
+    python -m ml.train_cache prune --max-mb 500 --older-than 30
+    python -m ml.train_cache clear
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .utils import atomic_write_json, jsonable
+
+
+CACHE_VERSION = 1
+CACHE_DIR = Path(__file__).resolve().parent.parent / 'outputs' / 'cache' / 'train'
+RESULT_FILE = 'result.json'
+MODEL_FILE = 'model.pkl'
+DEFAULT_MAX_BYTES = int(os.environ.get('TRAIN_CACHE_MAX_BYTES', 1 << 30))
+LIBRARIES = ('numpy', 'pandas', 'scikit-learn', 'xgboost', 'lightgbm', 'catboost')
+
+
+def train_cache_enabled() -> bool:
+    """TRAIN_CACHE=0 buộc train lại"""
+    return os.environ.get('TRAIN_CACHE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def library_versions() -> Dict[str, Optional[str]]:
+    """Phiên bản các thư viện ảnh hưởng tới model (None nếu chưa cài)"""
+    versions = {'python': platform.python_version()}
+    for name in LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def fingerprint(obj: Any) -> str:
+    """
+    sha256 của dữ liệu train: DataFrame (tên cột + giá trị), Series, ndarray, hoặc giá trị JSON được
+
+    Cột số hash theo giá trị float64: cùng dữ liệu ở dtype gọn (dataset cache) hay float64 (memmap của
+    train_orchestrator) cho cùng key
+    """
+    h = hashlib.sha256()
+    if isinstance(obj, pd.DataFrame):
+        h.update(json.dumps([str(c) for c in obj.columns]).encode('utf-8'))
+        # Hash từng cột: không tạo ma trận copy của cả DataFrame
+        for col in obj.columns:
+            h.update(fingerprint(obj[col].to_numpy()).encode())
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        h.update(fingerprint(obj.to_numpy()).encode())
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.kind in 'biuf':
+            obj = np.ascontiguousarray(obj, dtype=np.float64)
+            h.update(f"f8{obj.shape}".encode())
+            h.update(obj.tobytes())
+        else:
+            h.update(f"{obj.dtype.kind}{obj.shape}".encode())
+            h.update(json.dumps(obj.tolist(), default=str).encode('utf-8'))
+    else:
+        h.update(json.dumps(jsonable(obj), sort_keys=True, default=repr).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+class TrainCache:
+    """
+    Cache model đã train theo key nội dung, giới hạn dung lượng (LRU)
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            root: Thư mục cache
+            max_bytes: Dung lượng tối đa (tự prune sau mỗi put)
+        """
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, algorithm: str, params: Dict[str, Any], *data) -> str:
+        """
+        Key của 1 lần train
+
+        Args:
+            algorithm: Tên thuật toán / stage
+            params: Tham số model (đủ để tái tạo model, không gồm n_jobs)
+            *data: Dữ liệu train / valid / test theo thứ tự cố định
+        """
+        payload = {
+            'version': CACHE_VERSION,
+            'algorithm': algorithm,
+            'params': jsonable(params),
+            'libraries': library_versions(),
+            'data': [fingerprint(d) for d in data],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    # ---------- get / put ----------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Entry của key (None nếu chưa có / đã tắt cache)
+
+        Returns:
+            Dict key, dir, model_file, result (result.json), arrays {tên: memmap}
+        """
+        if not train_cache_enabled():
+            return None
+        target = self._entry_dir(key)
+        try:
+            result = json.loads((target / RESULT_FILE).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            with self._lock:
+                self._misses += 1
+            return None
+        arrays = {
+            name: np.load(target / 'arrays' / f'{name}.npy', mmap_mode='r', allow_pickle=False)
+            for name in result.get('arrays', [])
+        }
+        # Đánh dấu lần dùng gần nhất (thứ tự LRU khi prune)
+        os.utime(target / RESULT_FILE)
+        with self._lock:
+            self._hits += 1
+        return {'key': key, 'dir': target, 'model_file': target / MODEL_FILE, 'result': result, 'arrays': arrays}
+
+    def put(
+        self,
+        key: str,
+        model_file,
+        result: Dict[str, Any],
+        arrays: Optional[Dict[str, np.ndarray]] = None
+    ) -> Optional[Path]:
+        """
+        Lưu kết quả train (copy .pkl đã dump, không serialize lại model)
+
+        Args:
+            key: Từ key()
+            model_file: .pkl vừa joblib.dump
+            result: Metrics / output JSON được
+            arrays: Mảng kết quả
+
+        Returns:
+            Thư mục entry (None nếu cache tắt)
+        """
+        if not train_cache_enabled():
+            return None
+        target = self._entry_dir(key)
+        if (target / RESULT_FILE).exists():
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=key[:16] + '.', dir=str(target.parent)))
+        try:
+            shutil.copyfile(model_file, tmp / MODEL_FILE)
+            names = []
+            if arrays:
+                (tmp / 'arrays').mkdir()
+                for name, arr in arrays.items():
+                    np.save(tmp / 'arrays' / f'{name}.npy', np.asarray(arr), allow_pickle=False)
+                    names.append(name)
+            atomic_write_json(tmp / RESULT_FILE, {
+                **jsonable(result),
+                'arrays': names,
+                'model_sha256': _file_sha256(tmp / MODEL_FILE),
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # Process khác vừa ghi cùng key
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.prune(max_bytes=self.max_bytes)
+        return target
+
+    def restore(self, entry: Dict[str, Any], model_path) -> bool:
+        """
+        Đưa .pkl từ cache về model_path (bỏ qua nếu file hiện tại đã giống hệt)
+
+        Returns:
+            True nếu đã ghi lại model_path (caller cần invalidate ModelCache / xuất lại artifact)
+        """
+        model_path = Path(model_path)
+        if model_path.exists() and _file_sha256(model_path) == entry['result'].get('model_sha256'):
+            return False
+        model_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=model_path.name + '.', suffix='.tmp', dir=str(model_path.parent))
+        os.close(fd)
+        try:
+            shutil.copyfile(entry['model_file'], tmp)
+            os.replace(tmp, model_path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return True
+
+    # ---------- quản lý ----------
+    def entries(self) -> List[Dict[str, Any]]:
+        """Các entry, mới dùng nhất trước"""
+        if not self.root.exists():
+            return []
+        out = []
+        for result_file in self.root.glob(f'*/*/{RESULT_FILE}'):
+            try:
+                result = json.loads(result_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            out.append({
+                'key': result_file.parent.name,
+                'dir': result_file.parent,
+                'algorithm': result.get('algorithm'),
+                'created_at': result.get('created_at'),
+                'last_used': result_file.stat().st_mtime,
+                'bytes': _dir_bytes(result_file.parent),
+                'metrics': result.get('metrics', {}),
+            })
+        return sorted(out, key=lambda e: e['last_used'], reverse=True)
+
+    def prune(self, max_bytes: Optional[int] = None, older_than_days: Optional[float] = None) -> int:
+        """
+        Xóa entry quá hạn, rồi entry ít dùng nhất tới khi tổng dung lượng <= max_bytes
+
+        Returns:
+            Số entry đã xóa
+        """
+        with self._lock:
+            entries = self.entries()
+            removed = 0
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 86400
+                for e in [e for e in entries if e['last_used'] < cutoff]:
+                    shutil.rmtree(e['dir'], ignore_errors=True)
+                    entries.remove(e)
+                    removed += 1
+            if max_bytes is not None:
+                total = sum(e['bytes'] for e in entries)
+                for e in reversed(entries):
+                    if total <= max_bytes:
+                        break
+                    shutil.rmtree(e['dir'], ignore_errors=True)
+                    total -= e['bytes']
+                    removed += 1
+            return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'root': str(self.root), 'hits': self._hits, 'misses': self._misses, 'max_bytes': self.max_bytes}
+
+
+_default_cache: Optional[TrainCache] = None
+_default_lock = threading.Lock()
+
+
+def get_train_cache() -> TrainCache:
+    """TrainCache dùng chung (outputs/cache/train)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TrainCache()
+        return _default_cache
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m ml.train_cache', description="Xem / dọn cache kết quả train")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="Liệt kê entry (mới dùng nhất trước)")
+    prune = sub.add_parser('prune', help="Xóa entry cũ / vượt dung lượng")
+    prune.add_argument('--max-mb', type=float, default=None, help="Giữ tổng dung lượng <= N MB (LRU)")
+    prune.add_argument('--older-than', type=float, default=None, help="Xóa entry không dùng trong N ngày")
+    sub.add_parser('clear', help="Xóa toàn bộ cache")
+    args = parser.parse_args(argv)
+
+    cache = get_train_cache()
+    if args.command == 'list':
+        entries = cache.entries()
+        if not entries:
+            print(f"⚠ Cache trống ({cache.root})")
+            return 0
+        print(f"{'key':<18}{'algorithm':<14}{'created':<21}{'last used':<21}{'MB':>8}{'AUC':>8}")
+        for e in entries:
+            auc = e['metrics'].get('auc')
+            print(f"{e['key'][:16]:<18}{str(e['algorithm']):<14}{str(e['created_at']):<21}"
+                  f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e['last_used'])):<21}"
+                  f"{e['bytes'] / (1024 * 1024):>8.1f}{(f'{auc:.4f}' if auc is not None else '-'):>8}")
+        print(f"✓ {len(entries)} entry, {sum(e['bytes'] for e in entries) / (1024 * 1024):.1f} MB")
+    elif args.command == 'prune':
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else cache.max_bytes
+        removed = cache.prune(max_bytes=max_bytes, older_than_days=args.older_than)
+        print(f"✓ Đã xóa {removed} entry")
+    else:
+        cache.clear()
+        print(f"✓ Đã xóa {cache.root}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,11 +6,14 @@ và lưu models + evaluation data
 Chạy script này trước khi sử dụng ứng dụng:
     python ml/train_models.py
 """
+import os
+import sys
+import time
+import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
 import numpy as np
-import pandas as pd
 import joblib
 from pathlib import Path
 from sklearn.model_selection import train_test_split
@@ -46,10 +49,49 @@ EVAL_DIR = ROOT / 'outputs' / 'evaluation'
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 EVAL_DIR.mkdir(parents=True, exist_ok=True)
 
+sys.path.insert(0, str(ROOT))
+from ml.eval_store import get_evaluation_store, get_settings_store
+from ml.artifacts import export_artifact
+from ml.train_orchestrator import format_stats, measure, run_stages
+from ml.dataset_cache import load_dataset
+from ml.train_cache import get_train_cache
+
 TARGET = 'default.payment.next.month'
 ID_COL = 'ID'
 SEED = 42
 
+# Tham số cố định của từng model (scale_pos_weight / n_jobs tính lúc train) - cũng là 1 phần key của train cache
+XGB_PARAMS = {
+    'objective': 'binary:logistic',
+    'learning_rate': 0.05,
+    'n_estimators': 1000,
+    'max_depth': 6,
+    'min_child_weight': 1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'eval_metric': 'auc',
+    'early_stopping_rounds': 100,
+}
+LGBM_PARAMS = {
+    'objective': 'binary',
+    'learning_rate': 0.05,
+    'n_estimators': 1000,
+    'num_leaves': 31,
+    'min_child_samples': 20,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'metric': 'None',
+}
+LGBM_EARLY_STOPPING = 100
+LR_PARAMS = {
+    'solver': 'saga',
+    'penalty': 'elasticnet',
+    'l1_ratio': 1.0,
+    'C': 0.01,
+    'max_iter': 5000,
+    'class_weight': 'balanced',
+}
+
 
 # ========================================
 # 1. Load và Preprocess Data
@@ -63,7 +105,8 @@ def load_and_preprocess():
     if not DATA_PATH.exists():
         raise FileNotFoundError(f"Không tìm thấy file data: {DATA_PATH}")
     
-    df = pd.read_csv(DATA_PATH, engine='python', on_bad_lines='skip')
+    # Parse CSV 1 lần vào outputs/cache/datasets, các lần train sau mmap các cột đã ép dtype
+    df = load_dataset(DATA_PATH)
     print(f"✓ Loaded data: {df.shape}")
     
     # Preprocess theo notebook
@@ -103,10 +146,23 @@ def load_and_preprocess():
     return X_train, X_valid, X_test, y_train, y_valid, y_test
 
 
+def training_metadata(X_train, X_valid, X_test, auc, acc) -> dict:
+    """Metadata train ghi vào manifest artifact"""
+    return {
+        'data_path': DATA_PATH.name,
+        'seed': SEED,
+        'n_train': len(X_train),
+        'n_valid': len(X_valid),
+        'n_test': len(X_test),
+        'test_auc': float(auc),
+        'test_accuracy': float(acc),
+    }
+
+
 # ========================================
 # 2. Train XGBoost
 # ========================================
-def train_xgboost(X_train, X_valid, X_test, y_train, y_valid, y_test):
+def train_xgboost(X_train, X_valid, X_test, y_train, y_valid, y_test, n_jobs=-1):
     """Train XGBoost model"""
     print("\n" + "="*60)
     print("STEP 2: TRAIN XGBOOST")
@@ -117,17 +173,10 @@ def train_xgboost(X_train, X_valid, X_test, y_train, y_valid, y_test):
     scale_pos_weight = neg / max(pos, 1)
     
     xgb_model = xgb.XGBClassifier(
-        objective='binary:logistic',
-        learning_rate=0.05,
-        n_estimators=1000,
-        max_depth=6,
-        min_child_weight=1,
-        subsample=0.8,
-        colsample_bytree=0.8,
+        **XGB_PARAMS,
         scale_pos_weight=scale_pos_weight,
         random_state=SEED,
-        n_jobs=-1,
-        eval_metric='auc'
+        n_jobs=n_jobs
     )
     
     xgb_model.fit(
@@ -141,12 +190,13 @@ def train_xgboost(X_train, X_valid, X_test, y_train, y_valid, y_test):
     auc = roc_auc_score(y_test, y_pred_proba)
     acc = accuracy_score(y_test, (y_pred_proba >= 0.5).astype(int))
     
-    print(f"✓ XGBoost - Test AUC: {auc:.4f}, Accuracy: {acc:.4f}")
+    print(f"✓ XGBoost - Test AUC: {auc:.4f}, Accuracy: {acc:.4f}, best_iteration: {xgb_model.best_iteration}")
     
     # Save
     model_path = MODELS_DIR / 'xgb_model.pkl'
     joblib.dump(xgb_model, model_path)
     print(f"✓ Saved: {model_path}")
+    export_artifact(xgb_model, model_path, metadata=training_metadata(X_train, X_valid, X_test, auc, acc))
     
     # Feature importance
     feat_imp = dict(zip(X_train.columns, xgb_model.feature_importances_))
@@ -157,7 +207,7 @@ def train_xgboost(X_train, X_valid, X_test, y_train, y_valid, y_test):
 # ========================================
 # 3. Train LightGBM
 # ========================================
-def train_lightgbm(X_train, X_valid, X_test, y_train, y_valid, y_test):
+def train_lightgbm(X_train, X_valid, X_test, y_train, y_valid, y_test, n_jobs=-1):
     """Train LightGBM model"""
     print("\n" + "="*60)
     print("STEP 3: TRAIN LIGHTGBM")
@@ -168,24 +218,17 @@ def train_lightgbm(X_train, X_valid, X_test, y_train, y_valid, y_test):
     scale_pos_weight = neg / max(pos, 1)
     
     lgb_model = lgb.LGBMClassifier(
-        objective='binary',
-        learning_rate=0.05,
-        n_estimators=1000,
-        num_leaves=31,
-        min_child_samples=20,
-        subsample=0.8,
-        colsample_bytree=0.8,
+        **LGBM_PARAMS,
         scale_pos_weight=scale_pos_weight,
         random_state=SEED,
-        n_jobs=-1,
-        metric='None'
+        n_jobs=n_jobs
     )
     
     lgb_model.fit(
         X_train, y_train,
         eval_set=[(X_valid, y_valid)],
         eval_metric='auc',
-        callbacks=[lgb.early_stopping(stopping_rounds=100, verbose=False)]
+        callbacks=[lgb.early_stopping(stopping_rounds=LGBM_EARLY_STOPPING, verbose=False)]
     )
     
     # Evaluate
@@ -199,6 +242,7 @@ def train_lightgbm(X_train, X_valid, X_test, y_train, y_valid, y_test):
     model_path = MODELS_DIR / 'lgbm_model.pkl'
     joblib.dump(lgb_model, model_path)
     print(f"✓ Saved: {model_path}")
+    export_artifact(lgb_model, model_path, metadata=training_metadata(X_train, X_valid, X_test, auc, acc))
     
     return lgb_model, y_pred_proba
 
@@ -206,7 +250,7 @@ def train_lightgbm(X_train, X_valid, X_test, y_train, y_valid, y_test):
 # ========================================
 # 4. Train Logistic Regression (Calibrated)
 # ========================================
-def train_logistic(X_train, X_valid, X_test, y_train, y_valid, y_test):
+def train_logistic(X_train, X_valid, X_test, y_train, y_valid, y_test, n_jobs=-1):
     """Train Logistic Regression with Elastic Net"""
     print("\n" + "="*60)
     print("STEP 4: TRAIN LOGISTIC REGRESSION")
@@ -223,13 +267,8 @@ def train_logistic(X_train, X_valid, X_test, y_train, y_valid, y_test):
     lr_pipe = Pipeline([
         ("prep", preprocess),
         ("clf", LogisticRegression(
-            solver="saga",
-            penalty="elasticnet",
-            l1_ratio=1.0,
-            C=0.01,
-            max_iter=5000,
-            class_weight="balanced",
-            n_jobs=-1,
+            **LR_PARAMS,
+            n_jobs=n_jobs,
             random_state=SEED
         ))
     ])
@@ -251,6 +290,7 @@ def train_logistic(X_train, X_valid, X_test, y_train, y_valid, y_test):
     model_path = MODELS_DIR / 'lr_cal_model.pkl'
     joblib.dump(lr_cal, model_path)
     print(f"✓ Saved: {model_path}")
+    export_artifact(lr_cal, model_path, metadata=training_metadata(X_train, X_valid, X_test, auc, acc))
     
     return lr_cal, y_pred_proba
 
@@ -261,7 +301,8 @@ def train_logistic(X_train, X_valid, X_test, y_train, y_valid, y_test):
 def save_evaluation_data(
     X_test, y_test,
     xgb_pred, lgb_pred, lr_pred,
-    xgb_model, feat_imp
+    xgb_model, feat_imp,
+    training_stats=None
 ):
     """Save evaluation data for Dashboard"""
     print("\n" + "="*60)
@@ -314,45 +355,141 @@ def save_evaluation_data(
         'LogisticRegression': lr_pred
     }
     
-    # Save to .npz
-    eval_file = EVAL_DIR / 'evaluation_data.npz'
-    np.savez(
-        eval_file,
+    # Mảng -> .npy (mmap khi đọc); threshold -> settings.json (giữ overlay/audit hiện có)
+    eval_file = get_evaluation_store(EVAL_DIR).save(
         feature_importance=feat_imp,
         confusion_matrices=confusion_matrices,
         roc_data=roc_data,
-        y_test=y_test,
+        y_test=np.asarray(y_test),
         predictions=predictions,
-        best_thresholds=best_thresholds
+        training_stats=training_stats
     )
+    get_settings_store(EVAL_DIR).set_thresholds(best_thresholds)
     
     print(f"✓ Saved evaluation data: {eval_file}")
 
 
+# ========================================
+# Stages (chạy qua ml.train_orchestrator)
+# ========================================
+# stage -> (file model, tham số ảnh hưởng kết quả)
+STAGE_MODELS = {
+    'xgboost': ('xgb_model.pkl', {'params': XGB_PARAMS}),
+    'lightgbm': ('lgbm_model.pkl', {'params': LGBM_PARAMS, 'early_stopping': LGBM_EARLY_STOPPING}),
+    'logistic': ('lr_cal_model.pkl', {'params': LR_PARAMS, 'calibration': 'isotonic'}),
+}
+
+
+def _cached_stage(stage, train_fn, splits, n_jobs):
+    """
+    Chạy stage qua train cache: cùng dữ liệu chia + tham số + phiên bản thư viện -> khôi phục model và dự báo đã lưu
+
+    Returns:
+        {'pred': dự báo trên tập test, ...output JSON của stage}
+    """
+    cache = get_train_cache()
+    model_file, params = STAGE_MODELS[stage]
+    model_path = MODELS_DIR / model_file
+    key = cache.key(stage, {**params, 'seed': SEED}, *splits)
+    entry = cache.get(key)
+    if entry is not None:
+        if cache.restore(entry, model_path):
+            export_artifact(joblib.load(model_path), model_path, metadata=entry['result'].get('metadata'))
+        print(f"✓ {stage}: train cache hit ({key[:16]}), Test AUC {entry['result']['metrics']['auc']:.4f}")
+        return {'pred': np.array(entry['arrays']['pred']), **entry['result'].get('output', {})}
+
+    output = train_fn(*splits, n_jobs=n_jobs)
+    X_train, X_valid, X_test, y_train, y_valid, y_test = splits
+    pred = output['pred']
+    auc = roc_auc_score(y_test, pred)
+    acc = accuracy_score(y_test, (pred >= 0.5).astype(int))
+    cache.put(key, model_path, result={
+        'algorithm': stage,
+        'metrics': {'auc': float(auc), 'accuracy': float(acc)},
+        'metadata': training_metadata(X_train, X_valid, X_test, auc, acc),
+        'output': {k: v for k, v in output.items() if k != 'pred'},
+    }, arrays={'pred': pred})
+    return output
+
+
+def _train_xgboost_stage(*splits, n_jobs=-1):
+    _, pred, feat_imp = train_xgboost(*splits, n_jobs=n_jobs)
+    return {'pred': pred, 'feat_imp': feat_imp}
+
+
+def _train_lightgbm_stage(*splits, n_jobs=-1):
+    _, pred = train_lightgbm(*splits, n_jobs=n_jobs)
+    return {'pred': pred}
+
+
+def _train_logistic_stage(*splits, n_jobs=-1):
+    _, pred = train_logistic(*splits, n_jobs=n_jobs)
+    return {'pred': pred}
+
+
+def stage_xgboost(*splits, n_jobs=-1):
+    return _cached_stage('xgboost', _train_xgboost_stage, splits, n_jobs)
+
+
+def stage_lightgbm(*splits, n_jobs=-1):
+    return _cached_stage('lightgbm', _train_lightgbm_stage, splits, n_jobs)
+
+
+def stage_logistic(*splits, n_jobs=-1):
+    return _cached_stage('logistic', _train_logistic_stage, splits, n_jobs)
+
+
+# Model được lưu trong stage (joblib + artifact), chỉ trả dự báo trên tập test về process chính
+STAGE_FUNCTIONS = {
+    'xgboost': stage_xgboost,
+    'lightgbm': stage_lightgbm,
+    'logistic': stage_logistic,
+}
+
+
 # ========================================
 # Main
 # ========================================
-def main():
+def main(argv=None):
     """Main training pipeline"""
+    parser = argparse.ArgumentParser(description="Train XGBoost, LightGBM, Logistic và lưu evaluation data")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Số model train đồng thời (mặc định 3, 1 = tuần tự trong process hiện tại)")
+    parser.add_argument('--cpus', type=int, default=None, help="Tổng CPU chia cho các model (mặc định tất cả)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Train lại kể cả khi dữ liệu / tham số không đổi (bỏ qua outputs/cache/train)")
+    args = parser.parse_args(argv)
+    if args.no_cache:
+        # Worker spawn kế thừa biến môi trường
+        os.environ['TRAIN_CACHE'] = '0'
+
     print("\n" + "="*60)
     print("CREDIT RISK MODEL TRAINING PIPELINE")
     print("="*60)
+    started = time.perf_counter()
     
-    # Load data
-    X_train, X_valid, X_test, y_train, y_valid, y_test = load_and_preprocess()
+    # Load data (1 lần, các stage dùng chung qua memmap)
+    splits, load_stats = measure(load_and_preprocess)
+    X_train, X_valid, X_test, y_train, y_valid, y_test = splits
     
     # Train models
-    xgb_model, xgb_pred, feat_imp = train_xgboost(X_train, X_valid, X_test, y_train, y_valid, y_test)
-    lgb_model, lgb_pred = train_lightgbm(X_train, X_valid, X_test, y_train, y_valid, y_test)
-    lr_model, lr_pred = train_logistic(X_train, X_valid, X_test, y_train, y_valid, y_test)
+    outputs, stage_stats = run_stages(splits, max_workers=args.workers, total_cpus=args.cpus)
+    training_stats = {'load_data': load_stats, **stage_stats}
+    training_stats['total'] = {
+        'wall_s': round(time.perf_counter() - started, 3),
+        'cpu_s': round(sum(s['cpu_s'] for s in training_stats.values()), 3),
+        'peak_rss_mb': max((s['peak_rss_mb'] or 0) for s in training_stats.values()) or None,
+    }
     
     # Save evaluation data
     save_evaluation_data(
         X_test, y_test,
-        xgb_pred, lgb_pred, lr_pred,
-        xgb_model, feat_imp
+        outputs['xgboost']['pred'], outputs['lightgbm']['pred'], outputs['logistic']['pred'],
+        None, outputs['xgboost']['feat_imp'],
+        training_stats=training_stats
     )
     
+    print("\n" + format_stats(training_stats))
     print("\n" + "="*60)
     print("✓ TRAINING COMPLETED SUCCESSFULLY!")
     print("="*60)
@@ -0,0 +1,244 @@
+"""
+Training Orchestrator
+Chạy song song các bước train của ml/train_models.py trên process pool
+
+- Dataset đọc + chia 1 lần, ghi thành .npy trong thư mục tạm; mỗi worker np.load(mmap_mode='r')
+  nên dữ liệu không bị copy / pickle qua pipe
+- Mỗi stage có ngân sách CPU riêng (n_jobs của model + thread BLAS/OpenMP của worker, giới hạn lúc chạy
+  qua threadpoolctl vì numpy đã load BLAS trước khi stage chạy), tổng các stage chạy cùng lúc không vượt số CPU
+- Worker được spawn mới cho từng stage (không fork sau khi OpenMP đã khởi tạo)
+- Mỗi stage ghi wall time, CPU time, peak RSS -> training_stats trong manifest evaluation
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .utils import load_arrays, save_arrays
+
+try:
+    import resource
+    HAVE_RESOURCE = True
+except ImportError:  # Windows
+    HAVE_RESOURCE = False
+
+try:
+    from threadpoolctl import threadpool_limits
+    HAVE_THREADPOOLCTL = True
+except ImportError:  # đi kèm scikit-learn
+    HAVE_THREADPOOLCTL = False
+
+
+# Trọng số chia CPU: boosting tận dụng nhiều thread, saga của LogisticRegression gần như đơn luồng
+STAGE_WEIGHTS = {'xgboost': 2, 'lightgbm': 2, 'logistic': 1}
+DEFAULT_STAGES = ('xgboost', 'lightgbm', 'logistic')
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+SPLITS = ('X_train', 'X_valid', 'X_test', 'y_train', 'y_valid', 'y_test')
+
+
+def plan_cpu_budget(stages: List[str], total_cpus: Optional[int] = None) -> Dict[str, int]:
+    """
+    Chia số CPU cho các stage chạy đồng thời theo STAGE_WEIGHTS (mỗi stage ít nhất 1)
+
+    Args:
+        stages: Tên các stage
+        total_cpus: Tổng CPU được dùng (mặc định os.cpu_count())
+
+    Returns:
+        Dict {stage: số thread}
+    """
+    total = max(int(total_cpus or os.cpu_count() or 1), 1)
+    weights = {s: STAGE_WEIGHTS.get(s, 1) for s in stages}
+    weight_sum = sum(weights.values()) or 1
+    budget = {s: max(1, (total * w) // weight_sum) for s, w in weights.items()}
+    # Phần dư chia cho stage nặng nhất trước
+    spare = total - sum(budget.values())
+    for s in sorted(stages, key=lambda s: -weights[s]):
+        if spare <= 0:
+            break
+        budget[s] += 1
+        spare -= 1
+    return budget
+
+
+def share_dataset(splits: Tuple, directory: Path) -> Dict[str, Any]:
+    """
+    Ghi 6 phần dữ liệu (X_train, X_valid, X_test, y_train, y_valid, y_test) ra .npy để worker mmap
+
+    Returns:
+        Spec (dict JSON được) truyền cho open_dataset
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    X_train = splits[0]
+    files = save_arrays(directory, {
+        name: part.to_numpy(dtype=np.float64 if name.startswith('X') else np.int8)
+        for name, part in zip(SPLITS, splits)
+    })
+    spec = {'dir': str(directory), 'columns': [str(c) for c in X_train.columns], 'files': files}
+    (directory / 'dataset.json').write_text(json.dumps(spec), encoding='utf-8')
+    return spec
+
+
+def open_dataset(spec: Dict[str, Any]) -> Tuple:
+    """
+    Mở dataset đã chia sẻ (mmap chỉ đọc)
+
+    Returns:
+        (X_train, X_valid, X_test, y_train, y_valid, y_test) - DataFrame / Series trên memmap
+    """
+    arrays = load_arrays(spec['dir'], spec['files'])
+    parts = []
+    for name in SPLITS:
+        arr = arrays[name]
+        if name.startswith('X'):
+            parts.append(pd.DataFrame(arr, columns=spec['columns'], copy=False))
+        else:
+            parts.append(pd.Series(arr, name='target', copy=False))
+    return tuple(parts)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if not HAVE_RESOURCE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Chạy fn và đo wall time, CPU time (mọi thread của process), peak RSS của process
+
+    Returns:
+        (kết quả fn, stats)
+    """
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    result = fn()
+    return result, {
+        'wall_s': round(time.perf_counter() - wall0, 3),
+        'cpu_s': round(time.process_time() - cpu0, 3),
+        'peak_rss_mb': _peak_rss_mb(),
+        'pid': os.getpid(),
+    }
+
+
+def limit_threads(n_jobs: int):
+    """
+    Context giới hạn thread của các pool BLAS/OpenMP đã load trong process (threadpoolctl)
+
+    Returns:
+        Context manager (nullcontext nếu thiếu threadpoolctl)
+    """
+    if not HAVE_THREADPOOLCTL:
+        return nullcontext()
+    return threadpool_limits(limits=int(n_jobs))
+
+
+def _run_stage(stage: str, spec: Dict[str, Any], n_jobs: int) -> Dict[str, Any]:
+    """Chạy 1 stage trong worker: giới hạn thread, mmap dữ liệu, train + lưu model"""
+    # Worker đã import numpy/pandas (module này) trước khi hàm chạy: BLAS đã đọc biến môi trường.
+    # Biến môi trường chỉ còn tác dụng với thư viện load sau; pool đã load giới hạn qua limit_threads
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_jobs)
+    from ml import train_models
+
+    splits = open_dataset(spec)
+    fn = train_models.STAGE_FUNCTIONS[stage]
+    with limit_threads(n_jobs):
+        output, stats = measure(lambda: fn(*splits, n_jobs=n_jobs))
+    stats['n_jobs'] = n_jobs
+    return {'stage': stage, 'output': output, 'stats': stats}
+
+
+def run_stages(
+    splits: Tuple,
+    stages: Tuple[str, ...] = DEFAULT_STAGES,
+    max_workers: Optional[int] = None,
+    total_cpus: Optional[int] = None
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Train các stage (song song nếu max_workers > 1)
+
+    Args:
+        splits: Kết quả load_and_preprocess()
+        stages: Các stage trong train_models.STAGE_FUNCTIONS
+        max_workers: Số process chạy đồng thời (mặc định = số stage, 1 = tuần tự trong process hiện tại)
+        total_cpus: Tổng CPU chia cho các stage chạy đồng thời (mặc định os.cpu_count())
+
+    Returns:
+        (outputs {stage: giá trị trả về của hàm train, bỏ model}, stats {stage: wall_s, cpu_s, peak_rss_mb, n_jobs, pid})
+
+    Raises:
+        Exception: Lỗi đầu tiên của stage nào đó (các stage còn lại vẫn chạy xong)
+    """
+    stages = tuple(stages)
+    workers = max(1, min(int(max_workers or len(stages)), len(stages)))
+    total = int(total_cpus or os.cpu_count() or 1)
+
+    if workers == 1:
+        from ml import train_models
+        outputs, stats = {}, {}
+        for stage in stages:
+            output, stats[stage] = measure(lambda: train_models.STAGE_FUNCTIONS[stage](*splits, n_jobs=total))
+            stats[stage]['n_jobs'] = total
+            outputs[stage] = output
+        return outputs, stats
+
+    # Các stage xếp hàng theo nhóm `workers` - ngân sách CPU tính cho nhóm chạy cùng lúc
+    budget = plan_cpu_budget(list(stages[:workers]), total)
+    for stage in stages[workers:]:
+        budget[stage] = max(1, total // workers)
+
+    data_dir = Path(tempfile.mkdtemp(prefix='train_data_'))
+    try:
+        spec = share_dataset(splits, data_dir)
+        print(f"✓ Shared dataset: {data_dir} | CPU budget: {budget}")
+        outputs, stats = {}, {}
+        errors = []
+        with _process_pool(workers) as pool:
+            futures = {pool.submit(_run_stage, s, spec, budget[s]): s for s in stages}
+            for future in as_completed(futures):
+                stage = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"✗ Stage {stage} lỗi: {e}")
+                    errors.append(e)
+                    continue
+                outputs[stage] = result['output']
+                stats[stage] = result['stats']
+                print(f"✓ Stage {stage}: {stats[stage]['wall_s']:.1f}s wall, {stats[stage]['cpu_s']:.1f}s CPU")
+        if errors:
+            raise errors[0]
+        return outputs, stats
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        # Process mới cho mỗi stage: peak RSS đo đúng stage, bộ nhớ trả lại OS khi xong
+        return ProcessPoolExecutor(max_workers=workers, mp_context=ctx, max_tasks_per_child=1)
+    except TypeError:  # Python < 3.11
+        return ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+
+
+def format_stats(stats: Dict[str, Dict[str, Any]]) -> str:
+    """Bảng tóm tắt stats theo stage"""
+    lines = [f"{'Stage':<12}{'Wall (s)':>10}{'CPU (s)':>10}{'Peak RSS (MB)':>15}{'Threads':>9}"]
+    for stage, s in stats.items():
+        rss = f"{s['peak_rss_mb']:.0f}" if s.get('peak_rss_mb') is not None else '-'
+        lines.append(f"{stage:<12}{s['wall_s']:>10.1f}{s['cpu_s']:>10.1f}{rss:>15}{str(s.get('n_jobs', '-')):>9}")
+    return '\n'.join(lines)
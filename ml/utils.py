@@ -0,0 +1,115 @@
+"""
+ML Utilities
+Helper dùng chung cho các module ml/ (cache, artifact, evaluation store, native)
+
+- file_sig: chữ ký (mtime_ns, size) để invalidate cache theo file
+- atomic_write_bytes / atomic_write_json: ghi file tạm cùng thư mục rồi os.replace
+- jsonable: dict/list/ndarray/np scalar -> kiểu JSON thuần
+- as_matrix: DataFrame / ndarray theo FEATURE_NAMES -> ma trận float64 (n, 41)
+- save_arrays / load_arrays: mảng <-> <thư mục>/<tên>.npy (không pickle, đọc lại bằng mmap chỉ đọc) -
+  dùng để chia dữ liệu cho process worker và lưu artifact
+"""
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .preprocess import FEATURE_NAMES
+
+
+def file_sig(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) của file, None nếu không có file"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return int(st.st_mtime_ns), int(st.st_size)
+
+
+def atomic_write_bytes(path: Path, payload: bytes):
+    """Ghi file tạm cùng thư mục rồi os.replace (reader không bao giờ thấy file ghi dở)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: Path, obj: Any):
+    atomic_write_bytes(path, json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def jsonable(value: Any) -> Any:
+    """Đổi đệ quy ndarray / np scalar / tuple sang kiểu json.dumps ghi được (key dict -> str)"""
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def as_matrix(X) -> np.ndarray:
+    """DataFrame (theo tên cột) hoặc ndarray (n, 41) theo FEATURE_NAMES -> float64 2 chiều"""
+    if isinstance(X, pd.DataFrame):
+        return X[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != len(FEATURE_NAMES):
+        raise ValueError(f"Ma trận input phải có shape (n, {len(FEATURE_NAMES)}), nhận được {X.shape}")
+    return X
+
+
+def save_arrays(directory: Path, arrays: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Ghi từng mảng ra <directory>/<tên>.npy (C-contiguous, allow_pickle=False)
+
+    Args:
+        directory: Thư mục đích (tạo nếu chưa có)
+        arrays: Dict {tên: mảng}; tên đã có đuôi .npy được giữ nguyên làm tên file
+
+    Returns:
+        Dict {tên: tên file} - truyền lại cho load_arrays
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for name, values in arrays.items():
+        fname = name if name.endswith('.npy') else f'{name}.npy'
+        np.save(directory / fname, np.ascontiguousarray(values), allow_pickle=False)
+        files[name] = fname
+    return files
+
+
+def load_arrays(directory: Path, files: Union[Dict[str, str], Iterable[str]]) -> Dict[str, np.ndarray]:
+    """
+    Mở các mảng đã ghi bằng save_arrays (np.load mmap_mode='r', không pickle)
+
+    Args:
+        directory: Thư mục chứa file .npy
+        files: Dict {tên: tên file} từ save_arrays, hoặc list tên (file <tên>.npy)
+
+    Returns:
+        Dict {tên: memmap chỉ đọc}
+    """
+    directory = Path(directory)
+    if not isinstance(files, dict):
+        files = {name: f'{name}.npy' for name in files}
+    return {name: np.load(directory / fname, mmap_mode='r', allow_pickle=False) for name, fname in files.items()}
@@ -3,6 +3,7 @@ Models package - Data models (pure Python classes)
 """
 from .user import User
 from .customer import Customer
-from .prediction_result import PredictionResult
+from .prediction_result import PredictionResult, PredictionBatch
+from .dashboard_snapshot import DashboardSnapshot
 
-__all__ = ['User', 'Customer', 'PredictionResult']
+__all__ = ['User', 'Customer', 'PredictionResult', 'PredictionBatch', 'DashboardSnapshot']
@@ -0,0 +1,110 @@
+"""
+Dashboard Snapshot Model
+Model cho toàn bộ số liệu của 1 lần refresh Dashboard / Report (QueryService.get_dashboard_snapshot)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _empty_stats() -> Dict:
+    return {'total_predictions': 0, 'high_risk_count': 0, 'avg_probability': 0.0}
+
+
+class DashboardSnapshot:
+    """
+    Lớp chứa KPI, chuỗi thời gian, phân bổ và danh sách top của 1 lần refresh.
+    Section không được yêu cầu giữ giá trị rỗng.
+    """
+
+    SECTIONS = ('stats', 'buckets', 'series', 'demographics', 'payment_status', 'top', 'late', 'active_model')
+
+    def __init__(self, filters: Optional[Dict] = None):
+        """
+        Khởi tạo DashboardSnapshot rỗng
+
+        Args:
+            filters: Bộ lọc đã dùng để tính snapshot
+        """
+        self.filters: Dict[str, Any] = dict(filters or {})
+        self.active_model: Optional[str] = None
+
+        # stats: khoảng ngày start_date..end_date (nếu có, ngược lại = period_stats)
+        # period_stats: kỳ lọc (time_range / since); overall_stats: toàn bộ, nguy cơ cao = probability >= 0.60
+        self.stats: Dict = _empty_stats()
+        self.period_stats: Dict = _empty_stats()
+        self.overall_stats: Dict = _empty_stats()
+        self.risk_buckets: Dict[str, int] = {}
+
+        self.monthly_default_rate: List[Dict] = []
+        self.monthly_default_rate_recent: List[Dict] = []
+        self.quarterly_high_risk_rate: List[Dict] = []
+        self.quarterly_high_risk_rate_recent: List[Dict] = []
+        self.weekly_default_rate: List[Dict] = []
+
+        self.gender: Dict[str, int] = {}
+        self.marriage: Dict[str, int] = {}
+        self.education: Dict[str, int] = {}
+        self.payment_status: Dict[str, int] = {}
+
+        self.top: List[Dict] = []
+        self.bottom: List[Dict] = []
+        self.late_customers: List[Dict] = []
+
+        # Số câu SQL đã chạy và thời gian tính snapshot
+        self.queries = 0
+        self.elapsed_ms = 0.0
+
+    def effective_stats(self) -> Dict:
+        """
+        Thống kê KPI: khoảng ngày, nếu rỗng thì kỳ lọc, nếu vẫn rỗng thì toàn bộ
+
+        Returns:
+            Dict total_predictions, high_risk_count, avg_probability
+        """
+        for s in (self.stats, self.period_stats, self.overall_stats):
+            if s.get('total_predictions', 0):
+                return s
+        return self.overall_stats
+
+    def demographics(self) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int]]:
+        """Tuple (gender, marriage, education) như QueryService.get_demographics_counts"""
+        return self.gender, self.marriage, self.education
+
+    def top_list(self, ascending: bool = False) -> List[Dict]:
+        """Top (xác suất cao nhất) hoặc bottom (thấp nhất)"""
+        return self.bottom if ascending else self.top
+
+    def to_dict(self) -> Dict:
+        """
+        Chuyển thành dictionary
+
+        Returns:
+            Dict chứa mọi section của snapshot
+        """
+        return {
+            'filters': self.filters,
+            'active_model': self.active_model,
+            'stats': self.stats,
+            'period_stats': self.period_stats,
+            'overall_stats': self.overall_stats,
+            'risk_buckets': self.risk_buckets,
+            'monthly_default_rate': self.monthly_default_rate,
+            'monthly_default_rate_recent': self.monthly_default_rate_recent,
+            'quarterly_high_risk_rate': self.quarterly_high_risk_rate,
+            'quarterly_high_risk_rate_recent': self.quarterly_high_risk_rate_recent,
+            'weekly_default_rate': self.weekly_default_rate,
+            'gender': self.gender,
+            'marriage': self.marriage,
+            'education': self.education,
+            'payment_status': self.payment_status,
+            'top': self.top,
+            'bottom': self.bottom,
+            'late_customers': self.late_customers,
+            'queries': self.queries,
+            'elapsed_ms': self.elapsed_ms,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"DashboardSnapshot(total={self.effective_stats().get('total_predictions', 0)}, "
+            f"active_model='{self.active_model}', queries={self.queries}, elapsed_ms={self.elapsed_ms:.1f})"
+        )
@@ -2,7 +2,17 @@
 Prediction Result Model
 Model cho kết quả dự báo từ ML model
 """
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+# Kiểu bản ghi cho kết quả dự báo hàng loạt
+PREDICTION_DTYPE = np.dtype([('label', np.int8), ('probability', np.float64)])
+
+# Ngưỡng chia 5 tier rủi ro (giống PredictionResult.get_risk_tier)
+RISK_TIER_EDGES = np.array([0.2, 0.4, 0.6, 0.8])
+RISK_TIER_LABELS = np.array(["Rất thấp", "Thấp", "Trung bình", "Cao", "Rất cao"])
 
 
 class PredictionResult:
@@ -99,3 +109,77 @@ class PredictionResult:
     
     def __str__(self) -> str:
         return f"{self.get_risk_label()} ({self.get_probability_percentage()})"
+
+
+class PredictionBatch:
+    """
+    Kết quả dự báo cho nhiều mẫu, lưu trong structured numpy array (label, probability)
+    """
+    
+    def __init__(
+        self,
+        labels: np.ndarray,
+        probabilities: np.ndarray,
+        model_name: str
+    ):
+        """
+        Khởi tạo PredictionBatch
+        
+        Args:
+            labels: Array nhãn dự đoán (0/1)
+            probabilities: Array xác suất vỡ nợ
+            model_name: Tên mô hình đã dùng
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64).ravel()
+        labels = np.asarray(labels).ravel()
+        if labels.shape != probabilities.shape:
+            raise ValueError("labels và probabilities phải có cùng số phần tử")
+        self.records = np.empty(probabilities.shape[0], dtype=PREDICTION_DTYPE)
+        self.records['label'] = labels
+        self.records['probability'] = probabilities
+        self.model_name = model_name
+    
+    @property
+    def labels(self) -> np.ndarray:
+        return self.records['label']
+    
+    @property
+    def probabilities(self) -> np.ndarray:
+        return self.records['probability']
+    
+    def is_high_risk(self, threshold: float = 0.5) -> np.ndarray:
+        """Mask boolean các mẫu có probability >= threshold"""
+        return self.probabilities >= threshold
+    
+    def get_risk_tiers(self) -> np.ndarray:
+        """Array tên tier rủi ro cho từng mẫu (vector hóa get_risk_tier)"""
+        return RISK_TIER_LABELS[np.searchsorted(RISK_TIER_EDGES, self.probabilities, side='right')]
+    
+    def to_results(self) -> List[PredictionResult]:
+        """Chuyển thành list PredictionResult (chỉ nên dùng cho batch nhỏ)"""
+        return list(self)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'model_name': self.model_name,
+            'labels': self.labels.tolist(),
+            'probabilities': self.probabilities.tolist()
+        }
+    
+    def __len__(self) -> int:
+        return self.records.shape[0]
+    
+    def __getitem__(self, index: int) -> PredictionResult:
+        rec = self.records[index]
+        return PredictionResult(
+            label=int(rec['label']),
+            probability=float(rec['probability']),
+            model_name=self.model_name
+        )
+    
+    def __iter__(self) -> Iterator[PredictionResult]:
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __repr__(self) -> str:
+        return f"PredictionBatch(n={len(self)}, model='{self.model_name}')"
@@ -0,0 +1,97 @@
+"""
+Benchmark đọc dataset: pandas read_csv (python / C engine) so với ml.dataset_cache (mmap)
+
+Chạy:
+    python scripts/bench_dataset_cache.py                             # mọi UCI_Credit_Card*.csv ở thư mục gốc
+    python scripts/bench_dataset_cache.py UCI_Credit_Card.csv --repeat 5
+
+Mỗi cách đọc chạy trong 1 process con riêng để đo RSS độc lập:
+- load_ms: thời gian đọc (median qua --repeat lần, trong cùng process con)
+- rss_mb: RSS của process con sau khi đọc (DataFrame còn giữ) trừ RSS trước khi đọc
+- frame_mb: DataFrame.memory_usage(deep=True)
+"""
+import sys
+import json
+import argparse
+import subprocess
+import importlib.util
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from ml.dataset_cache import get_dataset_cache
+
+
+READERS = {
+    'read_csv (python)': "pd.read_csv(PATH, engine='python', on_bad_lines='skip')",
+    'read_csv (c)': "pd.read_csv(PATH)",
+    'dataset_cache': "load_dataset(PATH)",
+}
+
+CHILD = r'''
+import sys, json, time, resource
+sys.path.insert(0, {root!r})
+import numpy as np
+import pandas as pd
+from ml.dataset_cache import load_dataset
+PATH = {path!r}
+def rss():
+    # RSS hiện tại (Linux /proc), ngược lại peak RSS
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r / (1024 * 1024) if sys.platform == 'darwin' else r / 1024
+base = rss()
+times = []
+for _ in range({repeat}):
+    t0 = time.perf_counter()
+    df = {expr}
+    # Chạm vào mọi cột số để tính cả chi phí page-in của memmap
+    float(df.select_dtypes('number').to_numpy(dtype=np.float64).sum())
+    times.append(time.perf_counter() - t0)
+print(json.dumps({{
+    'load_ms': float(np.median(times) * 1000),
+    'rss_mb': rss() - base,
+    'frame_mb': df.memory_usage(deep=True).sum() / (1024 * 1024),
+    'shape': list(df.shape),
+}}))
+'''
+
+
+def run_reader(path: Path, expr: str, repeat: int) -> dict:
+    code = CHILD.format(root=str(project_root), path=str(path), repeat=repeat, expr=expr)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="So sánh thời gian / bộ nhớ đọc CSV và dataset cache")
+    parser.add_argument('files', nargs='*', help="File CSV (mặc định UCI_Credit_Card*.csv)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    files = [Path(f) for f in args.files] or sorted(project_root.glob('UCI_Credit_Card*.csv'))
+    if not files:
+        print("✗ Không tìm thấy file CSV")
+        return 1
+    # Process con cần module resource (Linux/macOS) để đo RSS
+    if importlib.util.find_spec('resource') is None:
+        print("✗ Cần module resource (Linux/macOS) để đo RSS")
+        return 1
+
+    for path in files:
+        # Build trước: lần đo dataset_cache là lần đọc "các lần sau"
+        get_dataset_cache().build(path)
+        print(f"\n{path.name} ({path.stat().st_size / (1024 * 1024):.1f} MB)")
+        print(f"  {'reader':<20}{'load (ms)':>12}{'RSS (MB)':>12}{'frame (MB)':>12}")
+        for name, expr in READERS.items():
+            r = run_reader(path, expr, args.repeat)
+            print(f"  {name:<20}{r['load_ms']:>12.1f}{r['rss_mb']:>12.1f}{r['frame_mb']:>12.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Parity + benchmark cho native inference (ml/native.py) so với predict_proba gốc
+
+Chạy:
+    python scripts/bench_native_inference.py                      # 3 model mặc định, dữ liệu probe
+    python scripts/bench_native_inference.py --csv UCI_Credit_Card.csv --rows 20000
+    python scripts/bench_native_inference.py --models outputs/models/xgb_model.pkl --repeat 2000
+
+- Parity: max |p_native - p_gốc| trên toàn bộ dữ liệu, lỗi (exit 1) nếu vượt --atol
+- Latency 1 dòng: đường cũ (preprocess_input -> DataFrame -> predict_proba) so với kernel trên ndarray (1, 41)
+- Batch: thời gian chấm --rows dòng 1 lần
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from ml.model_cache import get_model_cache
+from ml.native import PARITY_ATOL, compile_model, probe_matrix
+from ml.preprocess import FEATURE_NAMES, preprocess_input, preprocess_matrix
+
+DEFAULT_MODELS = [
+    project_root / 'outputs' / 'models' / 'xgb_model.pkl',
+    project_root / 'outputs' / 'models' / 'lgbm_model.pkl',
+    project_root / 'outputs' / 'models' / 'lr_cal_model.pkl',
+]
+
+
+def load_rows(csv_path, rows: int) -> np.ndarray:
+    """Ma trận (n, 41) đã chuẩn hóa từ CSV (cột thiếu -> 0), hoặc dữ liệu probe"""
+    if not csv_path:
+        return preprocess_matrix(probe_matrix(rows, seed=42))
+    df = pd.read_csv(csv_path, nrows=rows)
+    if 'PAY_1' in df.columns and 'PAY_0' not in df.columns:
+        df = df.rename(columns={'PAY_1': 'PAY_0'})
+    for f in FEATURE_NAMES:
+        if f not in df.columns:
+            df[f] = 0
+    return preprocess_matrix(df[FEATURE_NAMES])
+
+
+def percentile_ms(samples, q) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def time_single(fn, repeat: int):
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    return samples
+
+
+def bench_model(path: Path, X: np.ndarray, repeat: int, atol: float) -> bool:
+    model = get_model_cache().get(path)
+    t0 = time.perf_counter()
+    kernel = compile_model(model)
+    compile_ms = (time.perf_counter() - t0) * 1000
+
+    frame = pd.DataFrame(X, columns=FEATURE_NAMES)
+    t0 = time.perf_counter()
+    expected = np.asarray(model.predict_proba(frame))[:, 1]
+    batch_orig = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = kernel.predict_proba(X)[:, 1]
+    batch_native = time.perf_counter() - t0
+    diff = float(np.max(np.abs(got - expected)))
+    label_flips = int(np.sum((got >= 0.5) != (expected >= 0.5)))
+
+    row = dict(zip(FEATURE_NAMES, X[0].tolist()))
+    x1 = X[:1]
+    orig = time_single(lambda: model.predict_proba(preprocess_input(row)), repeat)
+    native = time_single(lambda: kernel.predict_proba(x1), repeat)
+
+    ok = diff <= atol
+    print(f"\n{path.name} ({kernel.source}, compile {compile_ms:.0f} ms)")
+    print(f"  {'✓' if ok else '✗'} parity: max |Δp| = {diff:.2e} trên {len(X)} dòng, {label_flips} nhãn đổi (atol {atol:.0e})")
+    print(f"  1 dòng  gốc   : p50 {percentile_ms(orig, 50):.3f} ms  p95 {percentile_ms(orig, 95):.3f} ms")
+    print(f"  1 dòng  native: p50 {percentile_ms(native, 50):.3f} ms  p95 {percentile_ms(native, 95):.3f} ms"
+          f"  (x{np.median(orig) / max(np.median(native), 1e-12):.1f})")
+    print(f"  batch {len(X)}: gốc {batch_orig * 1000:.1f} ms, native {batch_native * 1000:.1f} ms")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Parity + latency của native inference kernels")
+    parser.add_argument('--models', nargs='*', default=None, help="File model .pkl (mặc định 3 model trong outputs/models)")
+    parser.add_argument('--csv', default=None, help="CSV dữ liệu thật (mặc định dữ liệu probe)")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=500, help="Số lần đo latency 1 dòng")
+    parser.add_argument('--atol', type=float, default=PARITY_ATOL)
+    args = parser.parse_args(argv)
+
+    X = load_rows(args.csv, args.rows)
+    paths = [Path(p) for p in args.models] if args.models else [p for p in DEFAULT_MODELS if p.exists()]
+    if not paths:
+        print("✗ Không tìm thấy model nào - chạy python ml/train_models.py trước")
+        return 1
+
+    ok = True
+    for path in paths:
+        try:
+            ok = bench_model(path, X, args.repeat, args.atol) and ok
+        except Exception as e:
+            print(f"✗ {path.name}: {e}")
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Benchmark bộ lọc thời gian của Report: predicate cũ (DATE()/YEARWEEK()/DATE_FORMAT() trên created_at)
+so với khoảng nửa mở [start, end) của services.time_range
+
+Chạy:
+    python scripts/bench_time_range.py                 # seed bảng predictions_log_bench tới 1M dòng rồi đo
+    python scripts/bench_time_range.py --rows 200000
+    python scripts/bench_time_range.py --drop          # xóa bảng bench sau khi đo
+
+Rows examined = tổng delta Handler_read_* của session (FLUSH STATUS trước mỗi query).
+"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from services.time_range import resolve_time_range, time_where
+
+BENCH_TABLE = 'predictions_log_bench'
+SEED_BATCH = 10000
+
+LEGACY_WHERE = {
+    'Hôm nay': "DATE(p.created_at) = CURDATE()",
+    'Tuần này': "YEARWEEK(p.created_at) = YEARWEEK(CURDATE())",
+    'Tháng này': "DATE_FORMAT(p.created_at,'%Y-%m') = DATE_FORMAT(CURDATE(),'%Y-%m')",
+    'Quý này': "YEAR(p.created_at) = YEAR(CURDATE()) AND QUARTER(p.created_at) = QUARTER(CURDATE())",
+    'Năm nay': "YEAR(p.created_at) = YEAR(CURDATE())",
+}
+
+QUERY = """
+    SELECT COUNT(*), SUM(CASE WHEN p.predicted_label = 1 THEN 1 ELSE 0 END), AVG(p.probability)
+    FROM {table} p
+    WHERE {where}
+"""
+
+
+def seed(db: DatabaseConnector, rows: int, days: int = 730):
+    """Tạo bảng bench (cùng schema/index với predictions_log, không FK) và seed tới đủ số dòng"""
+    db.execute_query(f"CREATE TABLE IF NOT EXISTS {BENCH_TABLE} LIKE predictions_log")
+    row = db.fetch_one(f"SELECT COUNT(*) FROM {BENCH_TABLE}")
+    have = int(row[0] or 0) if row else 0
+    if have >= rows:
+        print(f"✓ {BENCH_TABLE} đã có {have:,} dòng")
+        return
+    rng = np.random.default_rng(42)
+    now = datetime.now()
+    query = f"""
+        INSERT INTO {BENCH_TABLE} (model_name, predicted_label, probability, created_at)
+        VALUES (%s, %s, %s, %s)
+    """
+    t0 = time.perf_counter()
+    todo = rows - have
+    while todo > 0:
+        n = min(SEED_BATCH, todo)
+        probs = np.round(rng.beta(2, 5, n), 4)
+        offsets = rng.integers(0, days * 86400, n)
+        batch = [
+            ('XGBoost', int(p >= 0.5), float(p), now - timedelta(seconds=int(o)))
+            for p, o in zip(probs, offsets)
+        ]
+        if not db.execute_many(query, batch):
+            raise RuntimeError(f"Seed thất bại: {db.last_error}")
+        todo -= n
+    db.execute_query(f"ANALYZE TABLE {BENCH_TABLE}")
+    print(f"✓ Đã seed {rows - have:,} dòng trong {time.perf_counter() - t0:.1f}s")
+
+
+def measure(db: DatabaseConnector, where: str, params=None):
+    """Chạy query, trả về (rows_examined, ms)"""
+    db.execute_query("FLUSH STATUS")
+    t0 = time.perf_counter()
+    db.fetch_all(QUERY.format(table=BENCH_TABLE, where=where), params)
+    ms = (time.perf_counter() - t0) * 1000
+    rows = db.fetch_all("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    examined = sum(int(v) for k, v in rows if k != 'Handler_read_key')
+    return examined, ms
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark predicate thời gian trên predictions_log")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3, help="Lấy thời gian tốt nhất sau N lần")
+    parser.add_argument('--drop', action='store_true', help=f"DROP {BENCH_TABLE} khi xong")
+    args = parser.parse_args(argv)
+
+    # Kết nối riêng (không pool) để FLUSH STATUS / SHOW STATUS cùng 1 session
+    db = DatabaseConnector(DatabaseConfig.default(), use_pool=False)
+    if not db.connect():
+        return 1
+    try:
+        seed(db, args.rows)
+        print(f"{'Bộ lọc':<12} {'cũ: rows':>12} {'ms':>9} {'mới: rows':>12} {'ms':>9}")
+        for label, legacy in LEGACY_WHERE.items():
+            parts, params = time_where(resolve_time_range(label))
+            best_old = min((measure(db, legacy) for _ in range(args.repeat)), key=lambda r: r[1])
+            best_new = min(
+                (measure(db, ' AND '.join(parts), tuple(params)) for _ in range(args.repeat)),
+                key=lambda r: r[1]
+            )
+            print(f"{label:<12} {best_old[0]:>12,} {best_old[1]:>9.1f} {best_new[0]:>12,} {best_new[1]:>9.1f}")
+        if args.drop:
+            db.execute_query(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,7 @@ sys.path.insert(0, str(project_root))
 
 from config.database_config import DatabaseConfig
 from database.connector import DatabaseConnector
+from services.latest_score import ensure_latest_score_table
 from services.query_service import QueryService
 
 def main():
@@ -15,36 +16,43 @@ def main():
         print("DB connect failed")
         return
     qs = QueryService(db)
+    ensure_latest_score_table(db)
+    # Tier đọc customer_latest_score -> dòng seed phải gắn với khách hàng có thật
+    ids = [int(r[0]) for r in db.fetch_all("SELECT id FROM customers ORDER BY id LIMIT 3")]
+    if len(ids) < 3:
+        print("Cần ít nhất 3 customers để seed tier")
+        db.close()
+        return
 
     def count_ge_lt(ge: float, lt: float) -> int:
         r = db.fetch_one(
-            "SELECT COUNT(*) FROM predictions_log WHERE probability >= %s AND probability < %s",
+            "SELECT COUNT(*) FROM customer_latest_score WHERE model_name = 'XGBoost' AND probability >= %s AND probability < %s",
             (ge, lt),
         )
         return int(r[0]) if r else 0
 
     def count_ge(ge: float) -> int:
         r = db.fetch_one(
-            "SELECT COUNT(*) FROM predictions_log WHERE probability >= %s",
+            "SELECT COUNT(*) FROM customer_latest_score WHERE model_name = 'XGBoost' AND probability >= %s",
             (ge,),
         )
         return int(r[0]) if r else 0
 
     inserted = 0
     if count_ge_lt(0.4, 0.6) == 0:
-        qs.save_prediction_log(None, "XGBoost", 0, 0.48, {})
+        qs.save_prediction_log(ids[0], "XGBoost", 0, 0.48, {})
         inserted += 1
     if count_ge_lt(0.6, 0.8) == 0:
-        qs.save_prediction_log(None, "XGBoost", 1, 0.72, {})
+        qs.save_prediction_log(ids[1], "XGBoost", 1, 0.72, {})
         inserted += 1
     if count_ge(0.8) == 0:
-        qs.save_prediction_log(None, "XGBoost", 1, 0.89, {})
+        qs.save_prediction_log(ids[2], "XGBoost", 1, 0.89, {})
         inserted += 1
 
     print(f"Seeded {inserted} records")
 
     def show_tier(name: str, tier_key: str):
-        rows = qs.get_customers_by_tier(tier_key, limit=20)
+        rows = qs.get_customers_by_tier(tier_key, limit=20, model_name="XGBoost")
         probs = [round(float(r.get("probability")), 4) for r in rows][:10]
         print(f"{name}: {len(rows)} records, probs={probs}")
 
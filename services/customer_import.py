@@ -0,0 +1,444 @@
+"""
+Customer Import Service
+Import khách hàng hàng loạt từ CSV / Parquet vào bảng customers
+
+Chạy:
+    python -m services.customer_import UCI_Credit_Card.csv
+    python -m services.customer_import data.parquet --chunk-size 20000 --method load_data
+
+- Đọc file theo chunk (pandas read_csv chunksize / pyarrow iter_batches), không load cả file vào RAM
+- Validate + clean vector hóa trên ma trận (n, 41): thiếu giá trị, SEX, AGE, LIMIT_BAL, tràn DECIMAL(12,2);
+  EDUCATION/MARRIAGE/PAY_* chuẩn hóa bằng ml.preprocess.clean_matrix
+- Ghi mỗi chunk trong 1 transaction: multi-row INSERT (executemany) hoặc LOAD DATA LOCAL INFILE
+- Dòng bị loại được ghi ra file *_rejects.csv kèm lý do
+- Cột 12 tháng (PAY_7..12, BILL_AMT7..12, PAY_AMT7..12) thiếu trong file 6 tháng -> 0 như import cũ
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from ml.dataset_cache import get_dataset_cache
+from ml.preprocess import FEATURE_NAMES, clean_matrix
+
+
+DEFAULT_CHUNK_SIZE = 10000
+INSERT_BATCH = 1000
+# CSV nhỏ hơn ngưỡng này đọc qua ml.dataset_cache (parse 1 lần, import lại thì mmap); lớn hơn thì stream read_csv
+CACHE_MAX_BYTES = int(os.environ.get('DATASET_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+REJECTS_DIR = project_root / 'outputs' / 'imports'
+
+# Cột bắt buộc (bộ dữ liệu UCI 6 tháng); các cột 12 tháng còn lại mặc định 0
+REQUIRED_COLUMNS = [
+    'LIMIT_BAL', 'SEX', 'EDUCATION', 'MARRIAGE', 'AGE',
+    'PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6',
+] + [f'BILL_AMT{i}' for i in range(1, 7)] + [f'PAY_AMT{i}' for i in range(1, 7)]
+
+COLUMN_ALIASES = {
+    'FULL NAME': 'customer_name',
+    'CITIZEN ID': 'customer_id_card',
+    'PAY_1': 'PAY_0',
+}
+TEXT_COLUMNS = ('customer_name', 'customer_id_card')
+
+_INT_COLUMNS = {'SEX', 'EDUCATION', 'MARRIAGE', 'AGE'} | {f for f in FEATURE_NAMES if f.startswith('PAY_') and 'AMT' not in f}
+_INT_IDX = np.array([i for i, f in enumerate(FEATURE_NAMES) if f in _INT_COLUMNS])
+_MONEY_IDX = np.array([i for i, f in enumerate(FEATURE_NAMES) if f not in _INT_COLUMNS])
+_COL = {f: i for i, f in enumerate(FEATURE_NAMES)}
+_MAX_DECIMAL = 9_999_999_999.99  # DECIMAL(12, 2)
+
+INSERT_COLUMNS = ['customer_name', 'customer_id_card'] + FEATURE_NAMES
+INSERT_CUSTOMERS = f"""
+    INSERT INTO customers ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})
+"""
+
+
+def _count_csv_rows(path: Path) -> int:
+    """Đếm số dòng dữ liệu (trừ header) bằng cách đếm '\\n' theo block - dùng cho % tiến độ"""
+    n = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            n += block.count(b'\n')
+    return max(n - 1, 0)
+
+
+def iter_file_chunks(path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Đọc CSV / Parquet theo chunk
+
+    Args:
+        path: Đường dẫn file (.csv, .csv.gz, .parquet)
+        chunk_size: Số dòng mỗi chunk
+
+    Yields:
+        DataFrame (tên cột đã áp alias)
+    """
+    path = Path(path)
+    wanted = set(FEATURE_NAMES) | set(TEXT_COLUMNS) | set(COLUMN_ALIASES)
+    if path.suffix.lower() in ('.parquet', '.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            pq = None
+        if pq is not None:
+            pf = pq.ParquetFile(str(path))
+            cols = [c for c in pf.schema_arrow.names if c in wanted]
+            for batch in pf.iter_batches(batch_size=chunk_size, columns=cols):
+                yield batch.to_pandas().rename(columns=COLUMN_ALIASES)
+            return
+        df = pd.read_parquet(path)
+        df = df[[c for c in df.columns if c in wanted]].rename(columns=COLUMN_ALIASES)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    if path.suffix.lower() == '.csv' and path.stat().st_size <= CACHE_MAX_BYTES:
+        df = get_dataset_cache().load(path)
+        df = df[[c for c in df.columns if c in wanted]].rename(columns=COLUMN_ALIASES)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    reader = pd.read_csv(
+        path,
+        chunksize=chunk_size,
+        usecols=lambda c: c in wanted,
+        dtype={'FULL NAME': str, 'CITIZEN ID': str, 'customer_name': str, 'customer_id_card': str},
+        low_memory=False,
+    )
+    for df in reader:
+        yield df.rename(columns=COLUMN_ALIASES)
+
+
+def normalize_chunk(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Validate + clean 1 chunk (vector hóa)
+
+    Args:
+        df: DataFrame thô của 1 chunk
+
+    Returns:
+        Tuple (X (n, 41) float64 đã clean, names, id_cards, reasons) - reasons[i] = '' nếu dòng hợp lệ
+    """
+    n = len(df)
+    missing_cols = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing_cols:
+        raise ValueError(f"File thiếu cột bắt buộc: {', '.join(missing_cols)}")
+
+    X = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float64)
+    for i, f in enumerate(FEATURE_NAMES):
+        if f in df.columns:
+            X[:, i] = pd.to_numeric(df[f], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    reasons = np.full(n, '', dtype=object)
+
+    def reject(mask: np.ndarray, reason: str):
+        mask = mask & (reasons == '')
+        reasons[mask] = reason
+
+    req_idx = [_COL[c] for c in REQUIRED_COLUMNS]
+    reject(np.isnan(X[:, req_idx]).any(axis=1), 'missing_or_non_numeric')
+    X[np.isnan(X)] = 0.0
+    reject(~np.isin(X[:, _COL['SEX']], (1, 2)), 'invalid_sex')
+    reject((X[:, _COL['AGE']] < 18) | (X[:, _COL['AGE']] > 100), 'invalid_age')
+    reject(X[:, _COL['LIMIT_BAL']] <= 0, 'invalid_limit_bal')
+    reject((np.abs(X[:, _MONEY_IDX]) > _MAX_DECIMAL).any(axis=1), 'amount_overflow')
+    reject((X[:, _INT_IDX] != np.round(X[:, _INT_IDX])).any(axis=1), 'non_integer_code')
+
+    clean_matrix(X)
+    X[:, _MONEY_IDX] = np.round(X[:, _MONEY_IDX], 2)
+
+    def text(col: str) -> np.ndarray:
+        if col not in df.columns:
+            return np.full(n, None, dtype=object)
+        s = df[col].astype(object)
+        s = s.where(s.notna(), None)
+        return np.array([str(v).strip() or None if v is not None else None for v in s], dtype=object)
+
+    return X, text('customer_name'), text('customer_id_card'), reasons
+
+
+class CustomerImportService:
+    """
+    Service import khách hàng hàng loạt
+    """
+
+    def __init__(self, db_connector: DatabaseConnector):
+        """
+        Khởi tạo CustomerImportService
+
+        Args:
+            db_connector: Instance DatabaseConnector đã connect
+        """
+        self.db = db_connector
+        self._infile_conn = None
+
+    # ---------- write ----------
+    @staticmethod
+    def _rows(X: np.ndarray, names: np.ndarray, cards: np.ndarray) -> List[tuple]:
+        cols = []
+        for i, f in enumerate(FEATURE_NAMES):
+            col = X[:, i]
+            cols.append(col.astype(np.int64).tolist() if f in _INT_COLUMNS else col.tolist())
+        return list(zip(names.tolist(), cards.tolist(), *cols))
+
+    def _write_executemany(self, rows: List[tuple]) -> bool:
+        """Ghi 1 chunk bằng multi-row INSERT, cả chunk trong 1 transaction"""
+        for start in range(0, len(rows), INSERT_BATCH):
+            if not self.db.execute_many(INSERT_CUSTOMERS, rows[start:start + INSERT_BATCH], commit=False):
+                return False
+        return self.db.commit()
+
+    def _get_infile_conn(self):
+        """Kết nối riêng bật allow_local_infile (kết nối pool không bật)"""
+        if self._infile_conn is None or not self._infile_conn.is_connected():
+            import mysql.connector
+            cfg = self.db.config.to_dict()
+            cfg['allow_local_infile'] = True
+            self._infile_conn = mysql.connector.connect(**cfg)
+        return self._infile_conn
+
+    @staticmethod
+    def _tsv_value(v) -> str:
+        if v is None:
+            return '\\N'
+        return str(v).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+    def _write_load_data(self, rows: List[tuple]) -> bool:
+        """Ghi 1 chunk bằng LOAD DATA LOCAL INFILE từ file TSV tạm"""
+        fd, tmp = tempfile.mkstemp(prefix='customers_', suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for r in rows:
+                    f.write('\t'.join([self._tsv_value(r[0]), self._tsv_value(r[1])] + [repr(v) for v in r[2:]]))
+                    f.write('\n')
+            conn = self._get_infile_conn()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE customers CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(INSERT_COLUMNS)})",
+                    (tmp,)
+                )
+                conn.commit()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            self.db.last_error = str(e)
+            print(f"✗ LOAD DATA LOCAL INFILE lỗi: {e}")
+            try:
+                if self._infile_conn is not None:
+                    self._infile_conn.rollback()
+            except Exception:
+                pass
+            return False
+        finally:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def close(self):
+        if self._infile_conn is not None:
+            try:
+                self._infile_conn.close()
+            except Exception:
+                pass
+            self._infile_conn = None
+
+    # ---------- run ----------
+    def import_file(
+        self,
+        path,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        method: str = 'auto',
+        limit: Optional[int] = None,
+        rejects_path=None,
+        progress: Optional[Callable[[int, str], None]] = None,
+        cancel_token=None
+    ) -> Dict:
+        """
+        Import toàn bộ file vào bảng customers
+
+        Args:
+            path: File CSV / Parquet
+            chunk_size: Số dòng mỗi chunk (= 1 transaction)
+            method: 'executemany', 'load_data' hoặc 'auto' (thử LOAD DATA, lỗi thì chuyển executemany)
+            limit: Chỉ import tối đa N dòng đầu (None = cả file)
+            rejects_path: File ghi dòng bị loại (None = outputs/imports/<tên file>_rejects.csv)
+            progress: Callback progress(percent, message) (tương thích TaskExecutor)
+            cancel_token: CancelToken - dừng sau chunk hiện tại (các chunk đã commit được giữ lại)
+
+        Returns:
+            Dict thống kê: rows, rejected, seconds, rows_per_sec, method, rejects_path
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"Không tìm thấy file: {path}")
+        if method not in ('auto', 'executemany', 'load_data'):
+            raise ValueError(f"method không hợp lệ: {method}")
+
+        total = None
+        if path.suffix.lower() in ('.parquet', '.pq'):
+            try:
+                import pyarrow.parquet as pq
+                total = pq.ParquetFile(str(path)).metadata.num_rows
+            except Exception:
+                total = None
+        elif path.suffix.lower() == '.csv':
+            total = _count_csv_rows(path)
+        if limit is not None:
+            total = min(total, limit) if total is not None else limit
+
+        if rejects_path is None:
+            rejects_path = REJECTS_DIR / f"{path.stem}_rejects.csv"
+        print(f"▶ Import {path.name} ({'?' if total is None else f'{total:,}'} dòng, chunk {chunk_size:,})")
+        return self.import_chunks(
+            iter_file_chunks(path, chunk_size),
+            total=total,
+            method=method,
+            limit=limit,
+            rejects_path=rejects_path,
+            progress=progress,
+            cancel_token=cancel_token
+        )
+
+    def import_chunks(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        total: Optional[int] = None,
+        method: str = 'auto',
+        limit: Optional[int] = None,
+        rejects_path=None,
+        progress: Optional[Callable[[int, str], None]] = None,
+        cancel_token=None
+    ) -> Dict:
+        """
+        Import các DataFrame (cột như file CSV, xem iter_file_chunks) vào bảng customers, mỗi chunk 1 transaction
+
+        Args:
+            chunks: Iterable DataFrame (vd. iter_file_chunks, ml.synthetic_data.iter_chunks)
+            total: Tổng số dòng dự kiến (cho % tiến độ)
+            method / limit / rejects_path / progress / cancel_token: Như import_file
+
+        Returns:
+            Dict thống kê như import_file
+        """
+        if method not in ('auto', 'executemany', 'load_data'):
+            raise ValueError(f"method không hợp lệ: {method}")
+        rejects_path = Path(rejects_path) if rejects_path is not None else REJECTS_DIR / 'stream_rejects.csv'
+        reject_writer = None
+        reject_file = None
+
+        use_load_data = method in ('auto', 'load_data')
+        written, rejected, seen = 0, 0, 0
+        t0 = time.perf_counter()
+        try:
+            for df in chunks:
+                if cancel_token is not None and cancel_token.is_cancelled():
+                    print("⚠ Import bị hủy")
+                    break
+                if limit is not None:
+                    df = df.iloc[:max(limit - seen, 0)]
+                    if df.empty:
+                        break
+                seen += len(df)
+
+                X, names, cards, reasons = normalize_chunk(df)
+                bad = reasons != ''
+                if bad.any():
+                    if reject_writer is None:
+                        rejects_path.parent.mkdir(parents=True, exist_ok=True)
+                        reject_file = open(rejects_path, 'w', encoding='utf-8', newline='')
+                        reject_writer = csv.writer(reject_file)
+                        reject_writer.writerow(['row_number', 'reason'] + list(df.columns))
+                    first_row = seen - len(df) + 1
+                    for i in np.flatnonzero(bad):
+                        reject_writer.writerow([first_row + int(i), reasons[i]] + df.iloc[int(i)].tolist())
+                    rejected += int(bad.sum())
+
+                ok = ~bad
+                if ok.any():
+                    rows = self._rows(X[ok], names[ok], cards[ok])
+                    done = False
+                    if use_load_data:
+                        done = self._write_load_data(rows)
+                        if not done and method == 'load_data':
+                            raise RuntimeError(f"LOAD DATA thất bại: {self.db.last_error}")
+                        if not done:
+                            print("⚠ Chuyển sang multi-row INSERT")
+                            use_load_data = False
+                    if not done and not self._write_executemany(rows):
+                        raise RuntimeError(f"Ghi customers thất bại: {self.db.last_error}")
+                    written += len(rows)
+
+                elapsed = time.perf_counter() - t0
+                rate = written / elapsed if elapsed > 0 else 0.0
+                msg = f"{written:,} dòng ({rejected:,} loại) - {rate:,.0f} rows/s"
+                print(f"  ✓ {msg}")
+                if progress is not None:
+                    pct = int(seen * 100 / total) if total else 0
+                    progress(min(pct, 100), msg)
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+            self.close()
+
+        elapsed = time.perf_counter() - t0
+        stats = {
+            'rows': written,
+            'rejected': rejected,
+            'seconds': elapsed,
+            'rows_per_sec': written / elapsed if elapsed > 0 else 0.0,
+            'method': 'load_data' if use_load_data else 'executemany',
+            'rejects_path': str(rejects_path) if rejected else None,
+        }
+        print(f"✓ Đã import {written:,} khách hàng trong {elapsed:.1f}s "
+              f"({stats['rows_per_sec']:,.0f} rows/s), loại {rejected:,} dòng")
+        return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import khách hàng hàng loạt từ CSV / Parquet")
+    parser.add_argument('path', help="File .csv hoặc .parquet")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--method', choices=['auto', 'executemany', 'load_data'], default='auto')
+    parser.add_argument('--limit', type=int, default=None, help="Chỉ import N dòng đầu")
+    parser.add_argument('--rejects', default=None, help="File CSV ghi dòng bị loại")
+    args = parser.parse_args(argv)
+
+    db = DatabaseConnector(DatabaseConfig.default())
+    if not db.connect():
+        return 1
+    try:
+        CustomerImportService(db).import_file(
+            args.path,
+            chunk_size=args.chunk_size,
+            method=args.method,
+            limit=args.limit,
+            rejects_path=args.rejects,
+        )
+        return 0
+    except Exception as e:
+        print(f"✗ Import lỗi: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
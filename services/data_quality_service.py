@@ -15,6 +15,23 @@ from scipy import stats
 from database.connector import DatabaseConnector
 
 
+FEATURE_COLUMNS = [
+    'LIMIT_BAL', 'SEX', 'EDUCATION', 'MARRIAGE', 'AGE',
+    'PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6',
+    'PAY_7', 'PAY_8', 'PAY_9', 'PAY_10', 'PAY_11', 'PAY_12',
+    'BILL_AMT1', 'BILL_AMT2', 'BILL_AMT3', 'BILL_AMT4', 'BILL_AMT5', 'BILL_AMT6',
+    'BILL_AMT7', 'BILL_AMT8', 'BILL_AMT9', 'BILL_AMT10', 'BILL_AMT11', 'BILL_AMT12',
+    'PAY_AMT1', 'PAY_AMT2', 'PAY_AMT3', 'PAY_AMT4', 'PAY_AMT5', 'PAY_AMT6',
+    'PAY_AMT7', 'PAY_AMT8', 'PAY_AMT9', 'PAY_AMT10', 'PAY_AMT11', 'PAY_AMT12'
+]
+
+# Cột mã (TINYINT) đọc thẳng thành int8, số tiền DECIMAL -> float64 (xem DatabaseConnector.fetch_frame)
+CUSTOMER_DTYPES = {
+    **{c: 'int8' for c in FEATURE_COLUMNS if c.startswith('PAY_') and not c.startswith('PAY_AMT')},
+    'SEX': 'int8', 'EDUCATION': 'int8', 'MARRIAGE': 'int8', 'AGE': 'int16',
+}
+
+
 class DataQualityService:
     """
     Service phân tích chất lượng dữ liệu
@@ -23,6 +40,27 @@ class DataQualityService:
     def __init__(self, db_connector: DatabaseConnector):
         self.db = db_connector
     
+    def _load_customers(self, customer_ids: Optional[List[int]] = None, limit: int = 5000) -> pd.DataFrame:
+        """
+        Đọc khách hàng thành DataFrame có kiểu (id, customer_name + 41 features)
+        
+        Args:
+            customer_ids: List ID khách hàng (None = tất cả, tối đa limit dòng)
+            limit: Giới hạn số dòng khi không truyền customer_ids
+        
+        Returns:
+            DataFrame (rỗng nếu không có dữ liệu / lỗi)
+        """
+        select = f"SELECT id, customer_name, {', '.join(FEATURE_COLUMNS)} FROM customers"
+        if customer_ids:
+            ids = [int(i) for i in customer_ids]
+            query = f"{select} WHERE id IN ({', '.join(['%s'] * len(ids))})"
+            params = tuple(ids)
+        else:
+            query = f"{select} LIMIT %s"  # Limit để tránh quá tải
+            params = (int(limit),)
+        return self.db.fetch_frame(query, params, dtypes=CUSTOMER_DTYPES)
+    
     def detect_outliers(
         self,
         method: str = 'IsolationForest',
@@ -41,35 +79,13 @@ class DataQualityService:
             Dict chứa outlier indices, scores, và issue descriptions
         """
         # Load customer data
-        if customer_ids:
-            query = f"""
-                SELECT * FROM customers 
-                WHERE id IN ({','.join(map(str, customer_ids))})
-            """
-        else:
-            query = "SELECT * FROM customers LIMIT 5000"  # Limit để tránh quá tải
-        
-        results = self.db.fetch_all(query)
+        df = self._load_customers(customer_ids)
         
-        if not results:
+        if df.empty:
             return {'error': 'No data found'}
         
-        # Convert to DataFrame
-        columns = [
-            'id', 'customer_name', 'LIMIT_BAL', 'SEX', 'EDUCATION', 'MARRIAGE', 'AGE',
-            'PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6',
-            'PAY_7', 'PAY_8', 'PAY_9', 'PAY_10', 'PAY_11', 'PAY_12',
-            'BILL_AMT1', 'BILL_AMT2', 'BILL_AMT3', 'BILL_AMT4', 'BILL_AMT5', 'BILL_AMT6',
-            'BILL_AMT7', 'BILL_AMT8', 'BILL_AMT9', 'BILL_AMT10', 'BILL_AMT11', 'BILL_AMT12',
-            'PAY_AMT1', 'PAY_AMT2', 'PAY_AMT3', 'PAY_AMT4', 'PAY_AMT5', 'PAY_AMT6',
-            'PAY_AMT7', 'PAY_AMT8', 'PAY_AMT9', 'PAY_AMT10', 'PAY_AMT11', 'PAY_AMT12'
-        ]
-        
-        df = pd.DataFrame(results, columns=columns)
-        
         # Features for outlier detection (numeric only)
-        feature_cols = [col for col in columns if col not in ['id', 'customer_name']]
-        X = df[feature_cols].values
+        X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
         
         # Standardize
         scaler = StandardScaler()
@@ -226,35 +242,13 @@ class DataQualityService:
             Dict chứa cluster assignments và statistics
         """
         # Load data
-        if customer_ids:
-            query = f"""
-                SELECT * FROM customers 
-                WHERE id IN ({','.join(map(str, customer_ids))})
-            """
-        else:
-            query = "SELECT * FROM customers LIMIT 5000"
-        
-        results = self.db.fetch_all(query)
+        df = self._load_customers(customer_ids)
         
-        if not results:
+        if df.empty:
             return {'error': 'No data found'}
         
-        # Convert to DataFrame
-        columns = [
-            'id', 'customer_name', 'LIMIT_BAL', 'SEX', 'EDUCATION', 'MARRIAGE', 'AGE',
-            'PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6',
-            'PAY_7', 'PAY_8', 'PAY_9', 'PAY_10', 'PAY_11', 'PAY_12',
-            'BILL_AMT1', 'BILL_AMT2', 'BILL_AMT3', 'BILL_AMT4', 'BILL_AMT5', 'BILL_AMT6',
-            'BILL_AMT7', 'BILL_AMT8', 'BILL_AMT9', 'BILL_AMT10', 'BILL_AMT11', 'BILL_AMT12',
-            'PAY_AMT1', 'PAY_AMT2', 'PAY_AMT3', 'PAY_AMT4', 'PAY_AMT5', 'PAY_AMT6',
-            'PAY_AMT7', 'PAY_AMT8', 'PAY_AMT9', 'PAY_AMT10', 'PAY_AMT11', 'PAY_AMT12'
-        ]
-        
-        df = pd.DataFrame(results, columns=columns)
-        
         # Features
-        feature_cols = [col for col in columns if col not in ['id', 'customer_name']]
-        X = df[feature_cols].values
+        X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
         
         # Standardize
         scaler = StandardScaler()
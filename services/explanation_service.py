@@ -0,0 +1,269 @@
+"""
+Explanation Service
+Ghi top-k đóng góp feature (ml.explain) cạnh từng dòng predictions_log để report tra cứu nhanh
+
+Chạy:
+    python -m services.explanation_service                      # giải thích các dự báo chưa có contribution
+    python -m services.explanation_service --model XGBoost --top-k 8 --chunk-size 5000
+
+- Đọc predictions_log theo keyset pagination (p.id > last_id ORDER BY p.id LIMIT n)
+- Feature lấy từ input đã chấm của chính dòng log (features_f32, hoặc raw_input_json với dòng cũ -
+  xem services.feature_storage); chỉ dòng không lưu input mới dùng feature hiện tại trong customers
+- Mỗi chunk được nhóm theo model_name, tính contribution vector hóa bằng ModelExplainer của model đó
+- Ghi prediction_contributions bằng multi-row INSERT ... ON DUPLICATE KEY UPDATE
+- Dự báo không có input lẫn customer_id được bỏ qua
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from ml.explain import ModelExplainer, top_contributions
+from ml.preprocess import FEATURE_NAMES
+from services.feature_storage import raw_input_columns, rows_to_matrix
+from services.ml_service import resolve_model_path
+
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_TOP_K = 5
+
+CONTRIBUTIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS prediction_contributions (
+        prediction_id INT PRIMARY KEY,
+        model_name VARCHAR(50) NOT NULL,
+        model_hash CHAR(64) NOT NULL,
+        output_space VARCHAR(20) NOT NULL DEFAULT 'log_odds',
+        base_value DOUBLE NOT NULL,
+        top_k_json TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (prediction_id) REFERENCES predictions_log(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+UPSERT_CONTRIBUTION = """
+    INSERT INTO prediction_contributions (
+        prediction_id, model_name, model_hash, output_space, base_value, top_k_json
+    ) VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        model_name = VALUES(model_name),
+        model_hash = VALUES(model_hash),
+        output_space = VALUES(output_space),
+        base_value = VALUES(base_value),
+        top_k_json = VALUES(top_k_json)
+"""
+
+
+class ExplanationService:
+    """
+    Service tính và lưu contribution cho predictions_log
+    """
+
+    def __init__(self, db_connector: DatabaseConnector):
+        """
+        Khởi tạo ExplanationService
+
+        Args:
+            db_connector: Instance DatabaseConnector đã connect
+        """
+        self.db = db_connector
+        self.db.execute_query(CONTRIBUTIONS_DDL)
+        self._explainers: Dict[str, Optional[ModelExplainer]] = {}
+
+    def get_explainer(self, model_name: str) -> Optional[ModelExplainer]:
+        """
+        Explainer cho model_name (đường dẫn theo model_registry, mặc định outputs/models)
+
+        Returns:
+            ModelExplainer hoặc None nếu không có file model / model không hỗ trợ
+        """
+        if model_name in self._explainers:
+            return self._explainers[model_name]
+        row = self.db.fetch_one(
+            "SELECT model_path FROM model_registry WHERE model_name = %s LIMIT 1", (model_name,)
+        )
+        model_path = resolve_model_path(model_name, row[0] if row and row[0] else None)
+        explainer = None
+        try:
+            explainer = ModelExplainer.from_path(model_path)
+        except FileNotFoundError:
+            print(f"✗ Không tìm thấy model {model_name}: {model_path}")
+        except Exception as e:
+            print(f"✗ Không tạo được explainer cho {model_name}: {e}")
+        self._explainers[model_name] = explainer
+        return explainer
+
+    # ---------- bulk ----------
+    def explain_predictions(
+        self,
+        model_name: Optional[str] = None,
+        top_k: int = DEFAULT_TOP_K,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        after_id: int = 0,
+        overwrite: bool = False
+    ) -> Dict:
+        """
+        Tính top-k contribution cho các dòng predictions_log và lưu vào prediction_contributions
+
+        Args:
+            model_name: Chỉ xử lý dự báo của model này (None = mọi model)
+            top_k: Số feature lưu cho mỗi dự báo
+            chunk_size: Số dòng mỗi chunk
+            after_id: Chỉ xử lý predictions_log.id > after_id
+            overwrite: True để tính lại cả các dòng đã có contribution
+
+        Returns:
+            Dict thống kê: rows, skipped, seconds, rows_per_sec, last_prediction_id
+        """
+        where = ["p.id > %s"]
+        if not overwrite:
+            where.append("pc.prediction_id IS NULL")
+        if model_name:
+            where.append("p.model_name = %s")
+        # Cột: id, model_name, raw_input_json, features_f32, extras_blob, feature customers (fallback)
+        query = f"""
+            SELECT p.id, p.model_name, p.raw_input_json, {raw_input_columns(self.db)},
+                   {', '.join('c.' + f for f in FEATURE_NAMES)}
+            FROM predictions_log p
+            LEFT JOIN customers c ON p.customer_id = c.id
+            LEFT JOIN prediction_contributions pc ON pc.prediction_id = p.id
+            WHERE {' AND '.join(where)}
+            ORDER BY p.id
+            LIMIT %s
+        """
+        t0 = time.perf_counter()
+        last_id, written, skipped = int(after_id), 0, 0
+        while True:
+            params = [last_id] + ([model_name] if model_name else []) + [int(chunk_size)]
+            rows = self.db.fetch_all(query, tuple(params))
+            if not rows:
+                break
+            last_id = int(rows[-1][0])
+            n_ok, n_skip = self._explain_chunk(rows, top_k)
+            if n_ok < 0:
+                raise RuntimeError(f"Ghi prediction_contributions thất bại: {self.db.last_error}")
+            written += n_ok
+            skipped += n_skip
+            elapsed = time.perf_counter() - t0
+            print(f"  → {written:,} dòng ({written / elapsed:,.0f} rows/s), tới prediction id {last_id}")
+            if len(rows) < chunk_size:
+                break
+
+        elapsed = time.perf_counter() - t0
+        print(f"✓ Đã ghi contribution cho {written:,} dự báo ({skipped:,} bỏ qua) trong {elapsed:.1f}s")
+        return {
+            'rows': written,
+            'skipped': skipped,
+            'seconds': elapsed,
+            'rows_per_sec': (written / elapsed) if elapsed > 0 else 0.0,
+            'last_prediction_id': last_id,
+        }
+
+    @staticmethod
+    def _feature_matrix(rows: List[tuple]) -> tuple:
+        """
+        Ma trận feature của 1 chunk: input đã lưu của dòng log, fallback feature trong customers
+
+        Returns:
+            Tuple (X (n, 41) float64, mask dòng có feature)
+        """
+        X = rows_to_matrix([r[2] for r in rows], [r[3] for r in rows])
+        # Dòng không giải mã được feature nào (không lưu input / JSON rỗng) -> dùng customers
+        stored = ~np.isnan(X).all(axis=1)
+        customer = np.asarray([r[5:] for r in rows], dtype=np.float64)
+        has_customer = ~np.isnan(customer).all(axis=1)
+        fallback = ~stored & has_customer
+        X[fallback] = customer[fallback]
+        return X, stored | has_customer
+
+    def _explain_chunk(self, rows: List[tuple], top_k: int) -> tuple:
+        """Tính + ghi 1 chunk, nhóm theo model_name. Trả về (số dòng ghi, số dòng bỏ qua), -1 nếu lỗi ghi"""
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        names = np.array([r[1] for r in rows], dtype=object)
+        X, usable = self._feature_matrix(rows)
+        params = []
+        skipped = int((~usable).sum())
+        for name in np.unique(names):
+            mask = (names == name) & usable
+            if not mask.any():
+                continue
+            explainer = self.get_explainer(str(name))
+            if explainer is None:
+                skipped += int(mask.sum())
+                continue
+            contribs, base = explainer.explain(X[mask])
+            for pid, b, top in zip(ids[mask], base, top_contributions(contribs, top_k)):
+                params.append((
+                    int(pid), str(name), explainer.model_hash, explainer.output_space,
+                    float(b), json.dumps([[f, round(v, 6)] for f, v in top])
+                ))
+        if params and not self.db.execute_many(UPSERT_CONTRIBUTION, params):
+            return -1, skipped
+        return len(params), skipped
+
+    # ---------- lookup ----------
+    def get_top_contributions(self, prediction_ids: Iterable[int]) -> Dict[int, List]:
+        """
+        Tra top-k contribution đã lưu cho các dự báo
+
+        Args:
+            prediction_ids: Danh sách predictions_log.id
+
+        Returns:
+            Dict {prediction_id: [[feature, contribution], ...]}
+        """
+        ids = [int(i) for i in prediction_ids]
+        if not ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(ids))
+        rows = self.db.fetch_all(
+            f"SELECT prediction_id, top_k_json FROM prediction_contributions WHERE prediction_id IN ({placeholders})",
+            tuple(ids)
+        )
+        result: Dict[int, List] = {}
+        for pid, payload in rows:
+            try:
+                result[int(pid)] = json.loads(payload)
+            except (TypeError, ValueError):
+                result[int(pid)] = []
+        return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ghi top-k contribution cho predictions_log")
+    parser.add_argument('--model', help="Chỉ xử lý dự báo của model này")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--after-id', type=int, default=0, help="Chỉ xử lý predictions_log.id > giá trị này")
+    parser.add_argument('--overwrite', action='store_true', help="Tính lại cả dòng đã có contribution")
+    args = parser.parse_args(argv)
+
+    db = DatabaseConnector(DatabaseConfig.default())
+    if not db.connect():
+        return 1
+    try:
+        ExplanationService(db).explain_predictions(
+            model_name=args.model,
+            top_k=args.top_k,
+            chunk_size=args.chunk_size,
+            after_id=args.after_id,
+            overwrite=args.overwrite,
+        )
+        return 0
+    except Exception as e:
+        print(f"✗ Explanation job lỗi: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+Feature Storage
+Lưu input của predictions_log dạng nhị phân thay cho raw_input_json TEXT
+
+    features_f32  VARBINARY(164)  41 float32 little-endian theo thứ tự FEATURE_NAMES
+    extras_blob   BLOB            các trường ngoài FEATURE_NAMES, JSON nén zstd (zlib nếu thiếu zstandard)
+
+Chạy migration cho DB cũ (thêm cột + backfill từ raw_input_json):
+    python -m services.feature_storage
+    python -m services.feature_storage --chunk-size 20000 --drop-json
+
+- Chế độ ghi lấy từ biến môi trường PREDICTION_FEATURE_STORAGE:
+  auto (mặc định: binary nếu bảng đã có 2 cột mới, ngược lại json), binary, json
+- Dòng cũ chưa backfill vẫn đọc được: reader dùng raw_input_json khi features_f32 là NULL
+- Backfill theo keyset (id), mỗi chunk: 1 multi-row INSERT vào bảng TEMPORARY + 1 UPDATE ... JOIN
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from ml.preprocess import (
+    FEATURE_NAMES, decode_extras, decode_feature_matrix, encode_extras, encode_features, matrix_to_dicts
+)
+
+
+STORAGE_ENV = 'PREDICTION_FEATURE_STORAGE'
+STORAGE_MODES = ('auto', 'binary', 'json')
+DEFAULT_CHUNK_SIZE = 5000
+
+ADD_COLUMNS_DDL = """
+    ALTER TABLE predictions_log
+        ADD COLUMN `features_f32` VARBINARY(164) NULL COMMENT '41 features float32 theo FEATURE_NAMES' AFTER `raw_input_json`,
+        ADD COLUMN `extras_blob` BLOB NULL COMMENT 'Trường ngoài features, JSON nén zstd/zlib' AFTER `features_f32`
+"""
+
+TEMP_TABLE_DDL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS tmp_feature_backfill (
+        id INT PRIMARY KEY,
+        features_f32 VARBINARY(164) NULL,
+        extras_blob BLOB NULL
+    ) ENGINE=InnoDB
+"""
+
+_FEATURE_SET = frozenset(FEATURE_NAMES)
+_columns_cache: Dict[tuple, bool] = {}
+_columns_lock = threading.Lock()
+
+
+def has_feature_columns(db: DatabaseConnector, refresh: bool = False) -> bool:
+    """
+    Bảng predictions_log đã có features_f32 + extras_blob chưa (cache theo database)
+
+    Args:
+        db: DatabaseConnector
+        refresh: Bỏ qua cache, kiểm tra lại information_schema
+
+    Returns:
+        True nếu có đủ 2 cột
+    """
+    key = db.config.pool_key()
+    with _columns_lock:
+        if not refresh and key in _columns_cache:
+            return _columns_cache[key]
+    row = db.fetch_one(
+        """
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'predictions_log'
+          AND COLUMN_NAME IN ('features_f32', 'extras_blob')
+        """
+    )
+    found = bool(row and int(row[0] or 0) == 2)
+    with _columns_lock:
+        _columns_cache[key] = found
+    return found
+
+
+def storage_mode(db: DatabaseConnector) -> str:
+    """
+    Chế độ ghi predictions_log hiện tại
+
+    Returns:
+        'binary' hoặc 'json'
+    """
+    mode = os.getenv(STORAGE_ENV, 'auto').strip().lower()
+    if mode not in STORAGE_MODES:
+        print(f"⚠ {STORAGE_ENV}={mode} không hợp lệ - dùng auto")
+        mode = 'auto'
+    if mode == 'json':
+        return 'json'
+    if has_feature_columns(db):
+        return 'binary'
+    if mode == 'binary':
+        print("⚠ predictions_log chưa có cột features_f32 - chạy python -m services.feature_storage; tạm ghi JSON")
+    return 'json'
+
+
+def encode_raw_input(raw_input_dict: Optional[Dict]) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """
+    Tách raw input thành (features_f32, extras_blob)
+
+    Returns:
+        features_f32 là None nếu dict không có trường feature nào (vd. dòng rescore)
+    """
+    raw = raw_input_dict or {}
+    features = encode_features(raw) if any(k in _FEATURE_SET for k in raw) else None
+    return features, encode_extras(raw)
+
+
+def prediction_log_insert(mode: str, extra_columns: Sequence[str] = ()) -> str:
+    """
+    Câu INSERT predictions_log cho chế độ ghi tương ứng
+
+    Args:
+        mode: 'binary' hoặc 'json'
+        extra_columns: Các cột thêm sau user_id
+
+    Returns:
+        SQL với placeholders: customer_id, model_name, predicted_label, probability,
+        (raw_input_json | features_f32, extras_blob), user_id, *extra_columns
+    """
+    cols = ['customer_id', 'model_name', 'predicted_label', 'probability']
+    cols += ['features_f32', 'extras_blob'] if mode == 'binary' else ['raw_input_json']
+    cols += ['user_id', *extra_columns]
+    return (
+        f"INSERT INTO predictions_log ({', '.join(cols)}) "
+        f"VALUES ({', '.join(['%s'] * len(cols))})"
+    )
+
+
+def raw_input_params(mode: str, raw_input_dict: Optional[Dict]) -> tuple:
+    """Giá trị cho phần raw input của prediction_log_insert(mode)"""
+    if mode == 'binary':
+        return encode_raw_input(raw_input_dict)
+    return (json.dumps(raw_input_dict or {}),)
+
+
+def raw_input_columns(db: DatabaseConnector, alias: str = 'p') -> str:
+    """
+    Cột blob cho SELECT (đặt cuối danh sách cột); 'NULL, NULL' nếu bảng chưa migrate
+    """
+    if has_feature_columns(db):
+        return f"{alias}.features_f32, {alias}.extras_blob"
+    return "NULL, NULL"
+
+
+def resolve_raw_inputs(
+    json_values: Sequence[Optional[str]],
+    features: Sequence[Optional[bytes]],
+    extras: Sequence[Optional[bytes]]
+) -> List[Optional[str]]:
+    """
+    Dựng lại raw_input_json cho cả result set: dòng có JSON giữ nguyên,
+    dòng nhị phân được giải mã 1 lần thành ma trận rồi json.dumps
+
+    Returns:
+        List JSON string (None nếu dòng không có cả hai)
+    """
+    out: List[Optional[str]] = list(json_values)
+    idx = [i for i, (j, f, e) in enumerate(zip(json_values, features, extras)) if j is None and (f is not None or e is not None)]
+    if not idx:
+        return out
+    dicts = matrix_to_dicts(decode_feature_matrix([features[i] for i in idx]))
+    for i, d in zip(idx, dicts):
+        try:
+            d.update(decode_extras(extras[i]))
+        except Exception as e:
+            print(f"⚠ Không giải nén được extras_blob: {e}")
+        out[i] = json.dumps(d)
+    return out
+
+
+def rows_to_matrix(
+    json_values: Sequence[Optional[str]],
+    features: Sequence[Optional[bytes]]
+) -> np.ndarray:
+    """
+    Ma trận (n, 41) từ result set hỗn hợp: features_f32 giải mã vector hóa,
+    dòng chỉ có raw_input_json (chưa backfill) được parse riêng
+
+    Returns:
+        Ma trận float64 (n, 41), trường thiếu = NaN
+    """
+    X = decode_feature_matrix(features)
+    for i, (j, f) in enumerate(zip(json_values, features)):
+        if f is None and j:
+            try:
+                X[i] = np.frombuffer(encode_features(json.loads(j)), dtype='<f4')
+            except (ValueError, TypeError):
+                pass
+    return X
+
+
+class FeatureStorageMigrator:
+    """
+    Migration predictions_log: thêm cột nhị phân và backfill từ raw_input_json
+    """
+
+    def __init__(self, db: DatabaseConnector):
+        """
+        Args:
+            db: DatabaseConnector không dùng pool (bảng TEMPORARY gắn với 1 connection)
+        """
+        self.db = db
+
+    def add_columns(self) -> bool:
+        """
+        Thêm features_f32 + extras_blob nếu chưa có
+
+        Returns:
+            True nếu bảng đã có đủ cột sau khi chạy
+        """
+        if has_feature_columns(self.db, refresh=True):
+            print("✓ predictions_log đã có features_f32 / extras_blob")
+            return True
+        if not self.db.execute_query(ADD_COLUMNS_DDL):
+            print(f"✗ Không thêm được cột: {self.db.last_error}")
+            return False
+        print("✓ Đã thêm features_f32 / extras_blob vào predictions_log")
+        return has_feature_columns(self.db, refresh=True)
+
+    def backfill(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        drop_json: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, float]:
+        """
+        Chuyển raw_input_json của các dòng cũ sang features_f32 / extras_blob
+
+        Args:
+            chunk_size: Số dòng mỗi chunk (1 transaction)
+            drop_json: Đặt raw_input_json = NULL sau khi chuyển (giải phóng dung lượng)
+            progress: callback(done, total)
+
+        Returns:
+            Dict converted, skipped, seconds, rows_per_sec
+        """
+        total_row = self.db.fetch_one(
+            "SELECT COUNT(*) FROM predictions_log WHERE features_f32 IS NULL AND extras_blob IS NULL AND raw_input_json IS NOT NULL"
+        )
+        total = int(total_row[0] or 0) if total_row else 0
+        if not self.db.execute_query(TEMP_TABLE_DDL):
+            raise RuntimeError(f"Không tạo được bảng tạm: {self.db.last_error}")
+
+        set_json = ", p.raw_input_json = NULL" if drop_json else ""
+        update_sql = f"""
+            UPDATE predictions_log p
+            JOIN tmp_feature_backfill t ON t.id = p.id
+            SET p.features_f32 = t.features_f32, p.extras_blob = t.extras_blob{set_json}
+        """
+        insert_sql = "INSERT INTO tmp_feature_backfill (id, features_f32, extras_blob) VALUES (%s, %s, %s)"
+        select_sql = """
+            SELECT id, raw_input_json FROM predictions_log
+            WHERE id > %s AND features_f32 IS NULL AND extras_blob IS NULL AND raw_input_json IS NOT NULL
+            ORDER BY id
+            LIMIT %s
+        """
+
+        t0 = time.perf_counter()
+        last_id, converted, skipped = 0, 0, 0
+        while True:
+            rows = self.db.fetch_all(select_sql, (last_id, int(chunk_size)))
+            if not rows:
+                break
+            last_id = int(rows[-1][0])
+            params = []
+            for rid, raw_json in rows:
+                try:
+                    raw = json.loads(raw_json)
+                    if not isinstance(raw, dict):
+                        raise ValueError("không phải object")
+                except (ValueError, TypeError):
+                    skipped += 1
+                    continue
+                params.append((int(rid), *encode_raw_input(raw)))
+            if params:
+                ok = (
+                    self.db.execute_query("DELETE FROM tmp_feature_backfill", commit=False)
+                    and self.db.execute_many(insert_sql, params, commit=False)
+                    and self.db.execute_query(update_sql, commit=False)
+                    and self.db.commit()
+                )
+                if not ok:
+                    self.db.rollback()
+                    raise RuntimeError(f"Backfill lỗi ở id <= {last_id}: {self.db.last_error}")
+                converted += len(params)
+            if progress:
+                progress(converted + skipped, total)
+
+        self.db.execute_query("DROP TEMPORARY TABLE IF EXISTS tmp_feature_backfill")
+        seconds = time.perf_counter() - t0
+        stats = {
+            'converted': converted,
+            'skipped': skipped,
+            'seconds': round(seconds, 2),
+            'rows_per_sec': round(converted / seconds, 1) if seconds > 0 else 0.0,
+        }
+        print(f"✓ Backfill predictions_log: {converted} dòng ({skipped} JSON lỗi bỏ qua) trong {stats['seconds']}s")
+        return stats
+
+    def get_storage_stats(self) -> Dict[str, int]:
+        """
+        Dung lượng dữ liệu input hiện tại
+
+        Returns:
+            Dict rows, json_rows, binary_rows, json_bytes, binary_bytes
+        """
+        row = self.db.fetch_one(
+            """
+            SELECT COUNT(*),
+                   SUM(raw_input_json IS NOT NULL), SUM(features_f32 IS NOT NULL OR extras_blob IS NOT NULL),
+                   COALESCE(SUM(LENGTH(raw_input_json)), 0),
+                   COALESCE(SUM(LENGTH(features_f32)), 0) + COALESCE(SUM(LENGTH(extras_blob)), 0)
+            FROM predictions_log
+            """
+        )
+        keys = ('rows', 'json_rows', 'binary_rows', 'json_bytes', 'binary_bytes')
+        return {k: int(v or 0) for k, v in zip(keys, row or (0,) * len(keys))}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Chuyển predictions_log.raw_input_json sang features_f32 / extras_blob")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--drop-json', action='store_true', help="Xóa raw_input_json sau khi chuyển")
+    parser.add_argument('--add-columns-only', action='store_true', help="Chỉ thêm cột, không backfill")
+    args = parser.parse_args(argv)
+
+    db = DatabaseConnector(DatabaseConfig.default(), use_pool=False)
+    if not db.connect():
+        return 1
+    try:
+        migrator = FeatureStorageMigrator(db)
+        if not migrator.add_columns():
+            return 1
+        if not args.add_columns_only:
+            migrator.backfill(chunk_size=args.chunk_size, drop_json=args.drop_json)
+        print(f"✓ Dung lượng input: {migrator.get_storage_stats()}")
+        return 0
+    except Exception as e:
+        print(f"✗ Migration lỗi: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
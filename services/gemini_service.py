@@ -5,7 +5,7 @@ Service tích hợp Google Gemini cho AI Assistant
 import json
 import decimal
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 try:
@@ -182,7 +182,9 @@ Hãy phân tích và trả lời câu hỏi dựa trên context data ở trên.
     def explain_prediction(
         self, 
         customer_data: Dict[str, Any], 
-        prediction_result: Dict[str, Any]
+        prediction_result: Dict[str, Any],
+        contributions: Optional[List] = None,
+        output_space: str = 'log_odds'
     ) -> str:
         """
         Giải thích kết quả dự báo cho khách hàng
@@ -190,6 +192,8 @@ Hãy phân tích và trả lời câu hỏi dựa trên context data ở trên.
         Args:
             customer_data: Dữ liệu khách hàng (41 features)
             prediction_result: Kết quả dự báo (probability, label, model_name)
+            contributions: Top-k (feature, contribution log-odds) từ ml.explain (optional)
+            output_space: ModelExplainer.output_space của contributions ('lr_margin' = LR trước calibration)
         
         Returns:
             Giải thích từ Gemini
@@ -200,6 +204,22 @@ Hãy phân tích và trả lời câu hỏi dựa trên context data ở trên.
             "prediction": prediction_result
         }
         
+        contrib_text = ""
+        if contributions:
+            context["contributions"] = [[f, float(v)] for f, v in contributions]
+            lines = "\n".join(
+                f"- {f} = {customer_data.get(f, '?')}: {float(v):+.3f} ({'tăng' if float(v) > 0 else 'giảm'} rủi ro)"
+                for f, v in contributions
+            )
+            space_label = {
+                'lr_margin': "margin LR trước calibration - chỉ so sánh mức/chiều tác động, không cộng ra xác suất",
+                'model_output': "SHAP trên output model",
+            }.get(output_space, "log-odds, tính từ model")
+            contrib_text = f"""
+**Đóng góp của từng yếu tố ({space_label}):**
+{lines}
+"""
+        
         prompt = f"""
 Phân tích kết quả dự báo rủi ro tín dụng cho khách hàng này:
 
@@ -207,7 +227,7 @@ Phân tích kết quả dự báo rủi ro tín dụng cho khách hàng này:
 - Model: {prediction_result.get('model_name', 'XGBoost')}
 - Xác suất vỡ nợ: {prediction_result.get('probability', 0)*100:.1f}%
 - Đánh giá: {prediction_result.get('risk_label', 'Unknown')}
-
+{contrib_text}
 **Yêu cầu:**
 1. Giải thích tại sao khách hàng này có mức rủi ro như vậy
 2. Phân tích 3-5 yếu tố quan trọng nhất
@@ -0,0 +1,208 @@
+"""
+Latest Score
+Bảng customer_latest_score: điểm mới nhất của mỗi (khách hàng, model), index (model_name, probability)
+để tra cứu theo tier / top-N bằng index range scan thay cho scan + sort predictions_log
+
+Chạy backfill từ predictions_log (an toàn khi ứng dụng đang ghi):
+    python -m services.latest_score
+    python -m services.latest_score --rebuild --chunk-size 20000
+
+- Mọi nơi INSERT predictions_log gọi upsert_latest_scores(..., commit=False) trong cùng transaction
+  (QueryService.save_prediction_log, PredictionLogWriter, RescoreService)
+- Upsert chỉ ghi đè khi scored_at mới hơn hoặc bằng -> backfill chạy song song với ghi trực tiếp
+  không làm lùi điểm; dòng customer_id NULL bị bỏ qua
+- scored_at luôn theo đồng hồ MySQL: ghi trực tiếp dùng NOW() (cùng giá trị CURRENT_TIMESTAMP của
+  predictions_log.created_at trong transaction đó), backfill dùng created_at -> không lệch giờ app/DB
+- Backfill theo keyset (predictions_log.id), mỗi chunk 1 câu INSERT ... SELECT ... ON DUPLICATE KEY UPDATE
+"""
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+
+
+DEFAULT_CHUNK_SIZE = 50000
+
+LATEST_SCORE_DDL = """
+    CREATE TABLE IF NOT EXISTS customer_latest_score (
+        customer_id INT NOT NULL,
+        model_name VARCHAR(50) NOT NULL,
+        probability DECIMAL(5, 4) NOT NULL,
+        predicted_label TINYINT NOT NULL,
+        scored_at DATETIME NOT NULL,
+        PRIMARY KEY (customer_id, model_name),
+        INDEX idx_model_probability (model_name, probability),
+        FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+# MySQL gán ON DUPLICATE KEY UPDATE từ trái sang phải: scored_at phải cập nhật sau cùng
+_NEWER = "VALUES(scored_at) >= scored_at"
+_ON_DUPLICATE = f"""
+    ON DUPLICATE KEY UPDATE
+        probability = IF({_NEWER}, VALUES(probability), probability),
+        predicted_label = IF({_NEWER}, VALUES(predicted_label), predicted_label),
+        scored_at = GREATEST(scored_at, VALUES(scored_at))
+"""
+
+UPSERT_LATEST_SCORE = """
+    INSERT INTO customer_latest_score (customer_id, model_name, probability, predicted_label, scored_at)
+    VALUES (%s, %s, %s, %s, NOW())
+""" + _ON_DUPLICATE
+
+# Chunk (last_id, max_id] của predictions_log theo PK; ORDER BY id để dòng sau thắng khi trùng scored_at
+BACKFILL_CHUNK = """
+    INSERT INTO customer_latest_score (customer_id, model_name, probability, predicted_label, scored_at)
+    SELECT p.customer_id, p.model_name, p.probability, p.predicted_label, p.created_at
+    FROM predictions_log p
+    WHERE p.id > %s AND p.id <= %s AND p.customer_id IS NOT NULL AND p.created_at IS NOT NULL
+    ORDER BY p.id
+""" + _ON_DUPLICATE
+
+_ready_cache: Dict[tuple, bool] = {}
+_ready_lock = threading.Lock()
+
+
+def ensure_latest_score_table(db: DatabaseConnector, refresh: bool = False) -> bool:
+    """
+    Tạo bảng customer_latest_score nếu chưa có (cache theo database)
+
+    Args:
+        db: DatabaseConnector
+        refresh: Bỏ qua cache, chạy lại DDL
+
+    Returns:
+        True nếu bảng dùng được (False -> nơi ghi chỉ ghi predictions_log)
+    """
+    key = db.config.pool_key()
+    with _ready_lock:
+        if not refresh and key in _ready_cache:
+            return _ready_cache[key]
+    ok = bool(db.execute_query(LATEST_SCORE_DDL))
+    if not ok:
+        print("⚠ Không tạo được customer_latest_score - tra cứu tier/top-N sẽ thiếu dữ liệu mới")
+    with _ready_lock:
+        _ready_cache[key] = ok
+    return ok
+
+
+def latest_score_rows(rows: Iterable[Tuple[Optional[int], str, int, float]]) -> List[tuple]:
+    """
+    Tham số cho UPSERT_LATEST_SCORE từ các bộ (customer_id, model_name, predicted_label, probability)
+
+    Args:
+        rows: Theo thứ tự ghi; trùng (customer_id, model_name) thì giữ dòng sau cùng
+
+    Returns:
+        List tuple (customer_id, model_name, probability, predicted_label), bỏ customer_id NULL
+        (scored_at = NOW() của MySQL)
+    """
+    latest: Dict[tuple, tuple] = {}
+    for cid, model, label, prob in rows:
+        if cid is None:
+            continue
+        key = (int(cid), model)
+        latest.pop(key, None)
+        latest[key] = (int(cid), model, round(float(prob), 4), int(label))
+    return list(latest.values())
+
+
+def upsert_latest_scores(
+    db: DatabaseConnector,
+    rows: Iterable[Tuple[Optional[int], str, int, float]],
+    commit: bool = False
+) -> bool:
+    """
+    Cập nhật customer_latest_score cho các dự báo vừa ghi
+    (gọi ensure_latest_score_table trước khi mở transaction - DDL tự commit)
+
+    Args:
+        db: DatabaseConnector (cùng connector với câu INSERT predictions_log)
+        rows: Các bộ (customer_id, model_name, predicted_label, probability)
+        commit: Mặc định False - nằm trong transaction của INSERT predictions_log
+
+    Returns:
+        True nếu thành công hoặc không có gì để ghi / bảng không dùng được
+    """
+    with _ready_lock:
+        ready = _ready_cache.get(db.config.pool_key(), False)
+    if not ready:
+        return True
+    params = latest_score_rows(rows)
+    if not params:
+        return True
+    return db.execute_many(UPSERT_LATEST_SCORE, params, commit=commit)
+
+
+def backfill(
+    db: DatabaseConnector,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    rebuild: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> bool:
+    """
+    Nạp customer_latest_score từ toàn bộ predictions_log
+
+    Args:
+        db: DatabaseConnector đã connect
+        chunk_size: Số id predictions_log mỗi chunk (mỗi chunk 1 transaction)
+        rebuild: Xóa bảng trước khi nạp (bỏ điểm của dòng log đã bị xóa)
+        progress: callback(last_id, max_id) sau mỗi chunk
+
+    Returns:
+        True nếu thành công
+    """
+    if not ensure_latest_score_table(db, refresh=True):
+        return False
+    if rebuild and not db.execute_query("DELETE FROM customer_latest_score"):
+        return False
+    row = db.fetch_one("SELECT MIN(id), MAX(id) FROM predictions_log")
+    if not row or row[1] is None:
+        print("✓ predictions_log rỗng - không có gì để backfill")
+        return True
+    last_id, max_id = int(row[0]) - 1, int(row[1])
+    t0 = time.perf_counter()
+    while last_id < max_id:
+        upper = min(last_id + int(chunk_size), max_id)
+        if not db.execute_query(BACKFILL_CHUNK, (last_id, upper)):
+            print(f"✗ Backfill dừng ở predictions_log.id={last_id}")
+            return False
+        last_id = upper
+        if progress:
+            progress(last_id, max_id)
+    row = db.fetch_one("SELECT COUNT(*) FROM customer_latest_score")
+    print(
+        f"✓ customer_latest_score: {int(row[0] or 0) if row else 0} dòng "
+        f"(predictions_log tới id={max_id}, {time.perf_counter() - t0:.1f}s)"
+    )
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill customer_latest_score từ predictions_log")
+    parser.add_argument('--rebuild', action='store_true', help="Xóa bảng rồi nạp lại toàn bộ")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    db = DatabaseConnector(DatabaseConfig.default())
+    if not db.connect():
+        return 1
+    try:
+        def progress(last_id: int, max_id: int):
+            print(f"  ... id {last_id}/{max_id}")
+
+        return 0 if backfill(db, args.chunk_size, args.rebuild, progress) else 1
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,15 +4,43 @@ Service giao tiếp với ML models và xử lý dự báo
 """
 import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 # Add ml package to path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
 from ml.predictor import ModelPredictor
-from ml.preprocess import preprocess_input
-from models.prediction_result import PredictionResult
+from ml.model_cache import get_model_cache, invalidate_model
+from ml.preprocess import preprocess_input, batch_preprocess_inputs, BatchInput
+from ml.explain import ModelExplainer
+from models.prediction_result import PredictionResult, PredictionBatch
+
+
+# Tên model -> file model mặc định trong outputs/models
+DEFAULT_MODEL_FILES = {
+    'XGBoost': 'xgb_model.pkl',
+    'LightGBM': 'lgbm_model.pkl',
+    'LogisticRegression': 'lr_cal_model.pkl',
+}
+
+
+def resolve_model_path(model_name: str, model_path: Optional[str] = None) -> str:
+    """
+    Xác định đường dẫn file model
+    
+    Args:
+        model_name: Tên model (XGBoost/LightGBM/LogisticRegression)
+        model_path: Đường dẫn lưu trong model_registry (tương đối theo project root, optional)
+    
+    Returns:
+        Đường dẫn tuyệt đối tới file model
+    """
+    if model_path:
+        p = Path(model_path)
+        return str(p if p.is_absolute() else project_root / p)
+    filename = DEFAULT_MODEL_FILES.get(model_name, DEFAULT_MODEL_FILES['XGBoost'])
+    return str(project_root / 'outputs' / 'models' / filename)
 
 
 class MLService:
@@ -39,15 +67,7 @@ class MLService:
         
         # Default model path nếu không cung cấp
         if model_path is None:
-            models_dir = project_root / 'outputs' / 'models'
-            if model_name == 'XGBoost':
-                model_path = str(models_dir / 'xgb_model.pkl')
-            elif model_name == 'LightGBM':
-                model_path = str(models_dir / 'lgbm_model.pkl')
-            elif model_name == 'LogisticRegression':
-                model_path = str(models_dir / 'lr_cal_model.pkl')
-            else:
-                model_path = str(models_dir / 'xgb_model.pkl')
+            model_path = resolve_model_path(model_name)
         
         self.model_path = model_path
         self.predictor = ModelPredictor(self.model_path)
@@ -93,6 +113,38 @@ class MLService:
                 raw_outputs={'error': str(e)}
             )
     
+    def predict_batch(self, inputs: BatchInput, threshold: float = 0.5) -> PredictionBatch:
+        """
+        Dự báo rủi ro vỡ nợ cho nhiều khách hàng trong 1 lần gọi model
+        
+        Args:
+            inputs: List các dict 41 trường, DataFrame hoặc ndarray (n, 41) theo FEATURE_NAMES
+            threshold: Ngưỡng xác suất để gán nhãn 1
+        
+        Returns:
+            PredictionBatch (structured array label/probability)
+        
+        Raises:
+            ValueError: Nếu model chưa load hoặc input không hợp lệ
+        """
+        processed = batch_preprocess_inputs(inputs)
+        labels, probabilities = self.predictor.predict_batch(processed, threshold=threshold)
+        return PredictionBatch(labels, probabilities, self.model_name)
+    
+    def explain_batch(self, inputs: BatchInput, top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k feature đóng góp nhiều nhất (log-odds; với lr_cal_model là margin LR trước calibration) cho từng dự báo
+        
+        Args:
+            inputs: List các dict 41 trường, DataFrame hoặc ndarray (n, 41) theo FEATURE_NAMES
+            top_k: Số feature mỗi dòng
+        
+        Returns:
+            List (mỗi dòng) các tuple (feature, contribution), giảm dần theo trị tuyệt đối
+        """
+        processed = batch_preprocess_inputs(inputs)
+        return ModelExplainer.from_path(self.model_path).explain_top_k(processed, top_k)
+    
     def get_model_info(self) -> Dict:
         """
         Lấy thông tin về model hiện tại
@@ -106,6 +158,16 @@ class MLService:
             'is_loaded': self.predictor.model is not None
         }
     
+    @staticmethod
+    def get_cache_stats() -> Dict:
+        """
+        Lấy thống kê của model cache dùng chung (hit/miss/load time)
+        
+        Returns:
+            Dict thống kê cache
+        """
+        return get_model_cache().get_stats()
+    
     def reload_model(self, new_model_path: Optional[str] = None):
         """
         Reload model từ file mới
@@ -116,6 +178,8 @@ class MLService:
         if new_model_path:
             self.model_path = new_model_path
         
+        # Buộc load lại từ đĩa thay vì lấy bản đang cache
+        invalidate_model(self.model_path)
         self.predictor = ModelPredictor(self.model_path)
         self.predictor.load_model()
         print(f"✓ Đã reload model: {self.model_path}")
@@ -3,6 +3,7 @@ Model Management Service
 Service quản lý các mô hình Machine Learning
 """
 import os
+import json
 import time
 import joblib
 import numpy as np
@@ -14,6 +15,13 @@ from sklearn.metrics import (
 )
 
 from database.connector import DatabaseConnector
+from ml.artifacts import export_artifact, remove_artifact
+from ml.model_cache import get_model_cache, invalidate_model
+from ml.train_cache import get_train_cache
+
+
+class TrainingCancelled(Exception):
+    """Train bị hủy qua cancel_token"""
 
 
 class ModelManagementService:
@@ -26,7 +34,7 @@ class ModelManagementService:
         Khởi tạo Model Management Service
         
         Args:
-            db_connector: Database connector
+            db_connector: Database connector (None: chỉ train / lưu file, không gọi các hàm ghi database)
         """
         self.db = db_connector
         self.models_dir = Path("outputs/models")
@@ -139,7 +147,10 @@ class ModelManagementService:
         X_test: np.ndarray,
         y_test: np.ndarray,
         username: str,
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        params: Optional[Dict[str, Any]] = None,
+        on_iteration: Optional[callable] = None,
+        cancel_token=None
     ) -> Dict[str, Any]:
         """
         Train một model cụ thể
@@ -150,10 +161,44 @@ class ModelManagementService:
             X_test, y_test: Test data
             username: Username của admin train
             progress_callback: Callback function(progress: int) để update progress
+            params: Tham số ghi đè lên mặc định của _create_model
+            on_iteration: Callback function(info: dict) sau mỗi boosting round (round, total, auc)
+            cancel_token: Có is_cancelled() - dừng sau round hiện tại
         
         Returns:
             Dict chứa metrics và model path
         """
+        result = self.fit_model(
+            model_name, X_train, y_train, X_test, y_test, username,
+            progress_callback=progress_callback, params=params,
+            on_iteration=on_iteration, cancel_token=cancel_token
+        )
+        if result.get('success'):
+            self.register_model(result, username)
+            if progress_callback:
+                progress_callback(100)
+        return result
+    
+    def fit_model(
+        self,
+        model_name: str,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        X_test: np.ndarray,
+        y_test: np.ndarray,
+        username: str,
+        progress_callback: Optional[callable] = None,
+        params: Optional[Dict[str, Any]] = None,
+        on_iteration: Optional[callable] = None,
+        cancel_token=None
+    ) -> Dict[str, Any]:
+        """
+        Train + đánh giá + lưu .pkl / artifact / train cache, không ghi database
+        (dùng trong process worker của services.training_jobs; train_model = fit_model + register_model)
+        
+        Returns:
+            Dict như train_model; hủy giữa chừng -> {'success': False, 'cancelled': True}
+        """
         print(f"\n{'='*60}")
         print(f"TRAINING MODEL: {model_name}")
         print(f"{'='*60}")
@@ -162,17 +207,27 @@ class ModelManagementService:
         
         try:
             # Import model class
-            model = self._create_model(model_name)
+            model = self._create_model(model_name, params)
             
             if model is None:
                 return {'success': False, 'error': f'Unknown model: {model_name}'}
             
+            model_filename = f"{model_name.lower().replace(' ', '_')}_model.pkl"
+            model_path = self.models_dir / model_filename
+            
+            # Cùng dữ liệu + tham số + phiên bản thư viện đã train rồi: dùng lại model trong cache
+            train_cache = get_train_cache()
+            cache_key = train_cache.key(model_name, self._model_params(model), X_train, y_train, X_test, y_test)
+            entry = train_cache.get(cache_key)
+            if entry is not None:
+                return self._train_from_cache(model_name, entry, model_path, progress_callback)
+            
             # Train
             if progress_callback:
                 progress_callback(10)
             
             print(f"Training {model_name}...")
-            model.fit(X_train, y_train)
+            self._fit(model, X_train, y_train, X_test, y_test, progress_callback, on_iteration, cancel_token)
             
             if progress_callback:
                 progress_callback(60)
@@ -194,31 +249,30 @@ class ModelManagementService:
                 progress_callback(80)
             
             # Save model
-            model_filename = f"{model_name.lower().replace(' ', '_')}_model.pkl"
-            model_path = self.models_dir / model_filename
             joblib.dump(model, model_path)
+            invalidate_model(model_path)
+            # Bản định dạng gốc + manifest (None nếu model chưa hỗ trợ - vẫn dùng .pkl)
+            export_artifact(model, model_path, metadata={
+                'trained_by': username,
+                'n_train': len(X_train),
+                'n_test': len(X_test),
+                'metrics': {k: float(v) for k, v in metrics.items()},
+                'params': params or {},
+            })
             
             model_size_mb = os.path.getsize(model_path) / (1024 * 1024)
             
             training_time = int(time.time() - start_time)
+            train_cache.put(cache_key, model_path, result={
+                'algorithm': model_name,
+                'metrics': {k: float(v) for k, v in metrics.items()},
+                'training_time': training_time,
+                'trained_by': username,
+            })
             
             if progress_callback:
                 progress_callback(90)
             
-            # Save to database
-            self._save_model_to_db(
-                model_name=model_name,
-                algorithm=model_name,
-                metrics=metrics,
-                training_time=training_time,
-                username=username,
-                model_path=str(model_path),
-                model_size_mb=model_size_mb
-            )
-            
-            if progress_callback:
-                progress_callback(100)
-            
             print(f"\n✓ TRAINING COMPLETED!")
             print(f"  AUC: {metrics['auc']:.4f}")
             print(f"  Accuracy: {metrics['accuracy']:.4f}")
@@ -229,48 +283,281 @@ class ModelManagementService:
             return {
                 'success': True,
                 'model_name': model_name,
-                'metrics': metrics,
+                'metrics': {k: float(v) for k, v in metrics.items()},
                 'training_time': training_time,
                 'model_path': str(model_path),
-                'model_size_mb': model_size_mb
+                'model_size_mb': model_size_mb,
+                'cached': False
             }
         
+        except TrainingCancelled:
+            print(f"\n⚠ TRAINING CANCELLED: {model_name}")
+            return {'success': False, 'cancelled': True, 'error': 'Đã hủy train'}
+        
         except Exception as e:
             print(f"\n✗ TRAINING FAILED: {e}")
             return {'success': False, 'error': str(e)}
     
-    def _create_model(self, model_name: str):
-        """Tạo instance của model class"""
-        if model_name == 'LightGBM':
-            from lightgbm import LGBMClassifier
-            return LGBMClassifier(
-                n_estimators=200,
-                learning_rate=0.05,
-                max_depth=7,
-                num_leaves=31,
-                random_state=42,
-                verbose=-1
+    def register_model(self, result: Dict[str, Any], username: str):
+        """Ghi kết quả fit_model vào model_registry"""
+        self._save_model_to_db(
+            model_name=result['model_name'],
+            algorithm=result['model_name'],
+            metrics=result['metrics'],
+            training_time=result['training_time'],
+            username=username,
+            model_path=result['model_path'],
+            model_size_mb=result['model_size_mb']
+        )
+    
+    @staticmethod
+    def _fit(model, X_train, y_train, X_test, y_test, progress_callback=None, on_iteration=None, cancel_token=None):
+        """
+        model.fit, với XGBoost / LightGBM: báo tiến độ từng boosting round (AUC trên tập test) và hủy giữa chừng
+        """
+        total = int(model.get_params().get('n_estimators') or 0) if hasattr(model, 'get_params') else 0
+        
+        def report(iteration: int, auc: Optional[float]):
+            if cancel_token is not None and cancel_token.is_cancelled():
+                raise TrainingCancelled()
+            if progress_callback and total:
+                progress_callback(10 + int(50 * iteration / total))
+            if on_iteration:
+                on_iteration({'round': iteration, 'total': total, 'auc': auc})
+        
+        module = type(model).__module__
+        if module.startswith('xgboost') and (progress_callback or on_iteration or cancel_token is not None):
+            from xgboost.callback import TrainingCallback
+            
+            class _Progress(TrainingCallback):
+                def after_iteration(self, booster, epoch, evals_log):
+                    history = evals_log.get('validation_0', {}).get('auc')
+                    report(epoch + 1, float(history[-1]) if history else None)
+                    return False
+            
+            model.set_params(callbacks=[_Progress()])
+            try:
+                model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False)
+            finally:
+                # Callback không pickle được cùng model
+                model.set_params(callbacks=None)
+        elif module.startswith('lightgbm') and (progress_callback or on_iteration or cancel_token is not None):
+            def _progress(env):
+                auc = next((r[2] for r in env.evaluation_result_list if r[1] == 'auc'), None)
+                report(env.iteration + 1, float(auc) if auc is not None else None)
+            
+            model.fit(X_train, y_train, eval_set=[(X_test, y_test)], eval_metric='auc', callbacks=[_progress])
+        else:
+            if cancel_token is not None and cancel_token.is_cancelled():
+                raise TrainingCancelled()
+            model.fit(X_train, y_train)
+    
+    @staticmethod
+    def _model_params(model) -> Dict[str, Any]:
+        """Tham số quyết định kết quả train (bỏ số thread / log)"""
+        params = model.get_params() if hasattr(model, 'get_params') else {}
+        return {k: v for k, v in params.items() if k not in ('n_jobs', 'thread_count', 'verbose', 'verbosity')}
+    
+    def _train_from_cache(
+        self,
+        model_name: str,
+        entry: Dict[str, Any],
+        model_path: Path,
+        progress_callback: Optional[callable] = None
+    ) -> Dict[str, Any]:
+        """Trả kết quả train đã cache: khôi phục .pkl (+ artifact) nếu cần"""
+        result = entry['result']
+        metrics = result['metrics']
+        if get_train_cache().restore(entry, model_path):
+            invalidate_model(model_path)
+            export_artifact(joblib.load(model_path), model_path, metadata={
+                'trained_by': result.get('trained_by'),
+                'metrics': metrics,
+                'train_cache_key': entry['key'],
+            })
+        model_size_mb = os.path.getsize(model_path) / (1024 * 1024)
+        if progress_callback:
+            progress_callback(90)
+        
+        print(f"✓ Train cache hit ({entry['key'][:16]}): AUC {metrics['auc']:.4f}, bỏ qua train lại")
+        return {
+            'success': True,
+            'model_name': model_name,
+            'metrics': metrics,
+            'training_time': result.get('training_time', 0),
+            'model_path': str(model_path),
+            'model_size_mb': model_size_mb,
+            'cached': True
+        }
+    
+    def search_hyperparameters(
+        self,
+        model_name: str,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        X_test: np.ndarray,
+        y_test: np.ndarray,
+        username: str,
+        n_candidates: int = 27,
+        max_rounds: int = 1000,
+        max_workers: Optional[int] = None,
+        base_params: Optional[Dict[str, Any]] = None,
+        progress_callback: Optional[callable] = None,
+        cancel_token=None
+    ) -> Dict[str, Any]:
+        """
+        Tìm siêu tham số (successive halving, cross-validation trên X_train) rồi train model tốt nhất
+
+        Model tốt nhất được train lại trên toàn bộ X_train qua train_model (lưu .pkl + artifact + model_registry),
+        training_time trong model_registry = thời gian tìm + thời gian fit cuối; lịch sử tìm lưu bảng hyperparam_search
+
+        Args:
+            model_name: 'XGBoost' | 'LightGBM'
+            X_train, y_train: Training data (dùng cho cross-validation)
+            X_test, y_test: Test data (chỉ để đánh giá model cuối)
+            username: Username của admin
+            n_candidates: Số bộ tham số ở rung đầu
+            max_rounds: Số boosting round tối đa
+            max_workers: Số process đánh giá song song
+            base_params: Tham số cố định cho mọi ứng viên
+            progress_callback: Callback function(progress: int)
+            cancel_token: Có is_cancelled() - dừng tìm kiếm sớm
+
+        Returns:
+            Dict như train_model + best_params, best_rounds, best_cv_auc, search_time, history
+        """
+        from ml.hyperparam_search import SuccessiveHalvingSearch
+
+        print(f"\n{'='*60}")
+        print(f"HYPERPARAMETER SEARCH: {model_name}")
+        print(f"{'='*60}")
+
+        try:
+            search = SuccessiveHalvingSearch(
+                model_name, n_candidates=n_candidates, max_rounds=max_rounds,
+                max_workers=max_workers, base_params=base_params
             )
+            result = search.run(
+                X_train, y_train,
+                progress=(lambda pct, msg: progress_callback(int(pct * 0.8))) if progress_callback else None,
+                cancel_token=cancel_token
+            )
+        except Exception as e:
+            print(f"\n✗ SEARCH FAILED: {e}")
+            return {'success': False, 'error': str(e)}
+
+        if result['cancelled'] or result['best_params'] is None:
+            print("⚠ Đã hủy tìm siêu tham số")
+            return {'success': False, 'error': 'Đã hủy tìm siêu tham số', 'search': result}
+
+        print(f"✓ Best CV AUC: {result['best_cv_auc']:.4f} ({result['best_rounds']} rounds) "
+              f"| {result['fits']} fits, {result['cache_hits']} cache hits, {result['elapsed_s']:.1f}s")
+
+        y_arr = np.asarray(y_train)
+        n_pos = max(int((y_arr == 1).sum()), 1)
+        params = {
+            **result['best_params'],
+            'n_estimators': result['best_rounds'],
+            'scale_pos_weight': (len(y_arr) - n_pos) / n_pos,
+        }
+        trained = self.train_model(
+            model_name, X_train, y_train, X_test, y_test, username,
+            progress_callback=(lambda pct: progress_callback(80 + pct // 5)) if progress_callback else None,
+            params=params
+        )
+        if not trained.get('success'):
+            return {**trained, 'search': result}
+
+        search_time = result['elapsed_s']
+        total_time = int(round(search_time + trained['training_time']))
+        self.db.execute_query(
+            "UPDATE model_registry SET training_time = %s WHERE model_name = %s",
+            (total_time, model_name)
+        )
+        self.db.execute_query(
+            """
+            INSERT INTO hyperparam_search
+            (model_name, algorithm, best_params, best_rounds, best_cv_auc, test_auc,
+             n_candidates, n_fits, cache_hits, search_time, fit_time, history, searched_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                model_name, model_name, json.dumps(params), result['best_rounds'],
+                result['best_cv_auc'], float(trained['metrics']['auc']),
+                result['n_candidates'], result['fits'], result['cache_hits'],
+                search_time, trained['training_time'], json.dumps(result['history'], default=float), username
+            )
+        )
+
+        return {
+            **trained,
+            'training_time': total_time,
+            'best_params': params,
+            'best_rounds': result['best_rounds'],
+            'best_cv_auc': result['best_cv_auc'],
+            'search_time': search_time,
+            'search': result,
+        }
+
+    def _create_model(self, model_name: str, params: Optional[Dict[str, Any]] = None):
+        """
+        Tạo instance của model class
+
+        Args:
+            model_name: Tên model
+            params: Tham số ghi đè lên mặc định (tên tham số sklearn, vd. từ ModelLabPage / search_hyperparameters)
+        """
+        params = dict(params or {})
+        if model_name == 'XGBoost':
+            from xgboost import XGBClassifier
+            return XGBClassifier(**{
+                'n_estimators': 300,
+                'learning_rate': 0.05,
+                'max_depth': 6,
+                'subsample': 0.8,
+                'colsample_bytree': 0.8,
+                'eval_metric': 'auc',
+                'tree_method': 'hist',
+                'random_state': 42,
+                'n_jobs': -1,
+                **params
+            })
+
+        elif model_name == 'LightGBM':
+            from lightgbm import LGBMClassifier
+            if params.get('subsample', 1.0) < 1.0:
+                params.setdefault('subsample_freq', 1)
+            return LGBMClassifier(**{
+                'n_estimators': 200,
+                'learning_rate': 0.05,
+                'max_depth': 7,
+                'num_leaves': 31,
+                'random_state': 42,
+                'verbose': -1,
+                **params
+            })
         
         elif model_name == 'CatBoost':
             from catboost import CatBoostClassifier
-            return CatBoostClassifier(
-                iterations=500,
-                learning_rate=0.03,
-                depth=6,
-                random_state=42,
-                verbose=False
-            )
+            return CatBoostClassifier(**{
+                'iterations': 500,
+                'learning_rate': 0.03,
+                'depth': 6,
+                'random_state': 42,
+                'verbose': False,
+                **params
+            })
         
         elif model_name == 'RandomForest':
             from sklearn.ensemble import RandomForestClassifier
-            return RandomForestClassifier(
-                n_estimators=200,
-                max_depth=10,
-                min_samples_split=10,
-                random_state=42,
-                n_jobs=-1
-            )
+            return RandomForestClassifier(**{
+                'n_estimators': 200,
+                'max_depth': 10,
+                'min_samples_split': 10,
+                'random_state': 42,
+                'n_jobs': -1,
+                **params
+            })
         
         elif model_name == 'Neural Network':
             # Placeholder - cần implement riêng với TensorFlow/Keras
@@ -356,6 +643,8 @@ class ModelManagementService:
             # Delete file
             if model_path and os.path.exists(model_path):
                 os.remove(model_path)
+                invalidate_model(model_path)
+                remove_artifact(model_path)
                 print(f"✓ Deleted file: {model_path}")
             
             # Delete from database
@@ -392,7 +681,7 @@ class ModelManagementService:
             return None
         
         try:
-            model = joblib.load(model_path)
+            model = get_model_cache().get(model_path)
             return model
         except Exception as e:
             print(f"✗ Failed to load model: {e}")
@@ -0,0 +1,457 @@
+"""
+Prediction Aggregate Service
+Bảng tổng hợp predictions_daily_agg cho dashboard/report (thay cho full scan predictions_log)
+
+Chạy:
+    python -m services.prediction_aggregate_service             # cộng dồn các dòng mới
+    python -m services.prediction_aggregate_service --rebuild   # tính lại toàn bộ
+
+- 1 dòng / (day, model_name, user_id, prob_bucket) với bucket xác suất rộng 0.01
+- refresh() chỉ cộng các dòng predictions_log có id > high-water mark, trong cùng
+  transaction với việc cập nhật watermark (khóa dòng watermark -> không cộng trùng)
+- AUTO_INCREMENT cấp id lúc INSERT chứ không phải lúc commit: watermark chỉ tiến tới dòng
+  có created_at cũ hơn SETTLE_SECONDS, để transaction đang mở (rescore, write-behind) kịp commit
+  các id nhỏ hơn. Transaction mở lâu hơn SETTLE_SECONDS vẫn bị bỏ sót -> chạy rebuild()
+- Truy vấn đọc AGG_SOURCE = aggregate + các dòng log sau watermark, nên số liệu không trễ theo watermark
+- UPDATE/DELETE trên predictions_log không được phản ánh: chạy rebuild() sau khi sửa/xóa log
+- Trạng thái "đã tạo bảng" và throttle refresh dùng chung theo database (QueryService tạo service mới mỗi lần)
+"""
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+
+
+AGG_NAME = 'predictions_daily_agg'
+BUCKETS = 100
+# Chỉ cộng vào aggregate các dòng đã cũ hơn ngần này giây (chờ transaction đang mở commit)
+SETTLE_SECONDS = 300
+# Bucket dashboard 0-20/20-40/40-60/60-80/80-100 (%) = 20 bucket 0.01
+RISK_BUCKET_KEYS = ['0_20', '20_40', '40_60', '60_80', '80_100']
+
+AGG_DDL = """
+    CREATE TABLE IF NOT EXISTS predictions_daily_agg (
+        day DATE NOT NULL,
+        model_name VARCHAR(50) NOT NULL,
+        user_id INT NOT NULL DEFAULT 0,
+        prob_bucket TINYINT UNSIGNED NOT NULL,
+        n_total INT NOT NULL DEFAULT 0,
+        n_default INT NOT NULL DEFAULT 0,
+        sum_probability DECIMAL(16, 4) NOT NULL DEFAULT 0,
+        sum_probability_default DECIMAL(16, 4) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, model_name, user_id, prob_bucket),
+        INDEX idx_user_day (user_id, day)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+WATERMARK_DDL = """
+    CREATE TABLE IF NOT EXISTS predictions_agg_watermark (
+        agg_name VARCHAR(50) PRIMARY KEY,
+        last_id INT NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+# Khóa kỳ roll-up từ cột day: 'YYYY-MM', 'YYYY-Qn', 'YYYY-Www' (tuần ISO)
+PERIOD_KEY_SQL = {
+    'month': "CONCAT(YEAR(day), '-', LPAD(MONTH(day), 2, '0'))",
+    'quarter': "CONCAT(YEAR(day), '-Q', QUARTER(day))",
+    'week': "CONCAT(YEARWEEK(day, 3) DIV 100, '-W', LPAD(YEARWEEK(day, 3) MOD 100, 2, '0'))",
+}
+
+# Cộng dồn các dòng (last_id, max_id] theo khóa PK của predictions_log (range scan)
+MERGE_NEW_ROWS = f"""
+    INSERT INTO predictions_daily_agg (
+        day, model_name, user_id, prob_bucket,
+        n_total, n_default, sum_probability, sum_probability_default
+    )
+    SELECT DATE(created_at), model_name, COALESCE(user_id, 0),
+           LEAST(FLOOR(probability * {BUCKETS}), {BUCKETS - 1}),
+           COUNT(*),
+           SUM(CASE WHEN predicted_label = 1 THEN 1 ELSE 0 END),
+           SUM(probability),
+           SUM(CASE WHEN predicted_label = 1 THEN probability ELSE 0 END)
+    FROM predictions_log
+    WHERE id > %s AND id <= %s AND created_at IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    ON DUPLICATE KEY UPDATE
+        n_total = n_total + VALUES(n_total),
+        n_default = n_default + VALUES(n_default),
+        sum_probability = sum_probability + VALUES(sum_probability),
+        sum_probability_default = sum_probability_default + VALUES(sum_probability_default)
+"""
+
+# Nguồn cho mọi truy vấn đọc: aggregate + các dòng predictions_log chưa cộng (id > watermark),
+# cùng 1 câu SQL nên cùng snapshot -> không đếm trùng/thiếu khi refresh chạy song song
+AGG_SOURCE = f"""(
+        SELECT day, model_name, user_id, prob_bucket,
+               n_total, n_default, sum_probability, sum_probability_default
+        FROM predictions_daily_agg
+        UNION ALL
+        SELECT DATE(created_at), model_name, COALESCE(user_id, 0),
+               LEAST(FLOOR(probability * {BUCKETS}), {BUCKETS - 1}),
+               1,
+               CASE WHEN predicted_label = 1 THEN 1 ELSE 0 END,
+               probability,
+               CASE WHEN predicted_label = 1 THEN probability ELSE 0 END
+        FROM predictions_log
+        WHERE id > (SELECT last_id FROM predictions_agg_watermark WHERE agg_name = '{AGG_NAME}')
+          AND created_at IS NOT NULL
+    ) agg"""
+
+# Trạng thái theo database (pool_key): bảng đã sẵn sàng, lần refresh gần nhất, lock refresh trong process
+_ready_cache: Dict[tuple, bool] = {}
+_last_refresh: Dict[tuple, float] = {}
+_refresh_locks: Dict[tuple, threading.Lock] = {}
+_state_lock = threading.Lock()
+
+
+def _refresh_lock(key: tuple) -> threading.Lock:
+    with _state_lock:
+        lock = _refresh_locks.get(key)
+        if lock is None:
+            lock = _refresh_locks[key] = threading.Lock()
+        return lock
+
+
+class PredictionAggregateService:
+    """
+    Service duy trì và truy vấn bảng predictions_daily_agg
+    """
+
+    def __init__(self, db_connector: DatabaseConnector, min_interval: float = 1.0,
+                 settle_seconds: int = SETTLE_SECONDS):
+        """
+        Khởi tạo PredictionAggregateService (bảng được tạo ở lần refresh đầu tiên của database)
+
+        Args:
+            db_connector: Instance DatabaseConnector
+            min_interval: Khoảng cách tối thiểu (giây) giữa 2 lần refresh tự động
+            settle_seconds: Chỉ cộng các dòng có created_at cũ hơn ngần này giây
+        """
+        self.db = db_connector
+        self.min_interval = float(min_interval)
+        self.settle_seconds = int(settle_seconds)
+        self._key = db_connector.config.pool_key()
+        self._lock = _refresh_lock(self._key)
+
+    def ensure_schema(self) -> bool:
+        """Tạo bảng aggregate + watermark nếu chưa có (1 lần cho mỗi database)"""
+        with _state_lock:
+            if _ready_cache.get(self._key):
+                return True
+        ok = self.db.execute_query(AGG_DDL) and self.db.execute_query(WATERMARK_DDL)
+        if ok:
+            ok = self.db.execute_query(
+                "INSERT IGNORE INTO predictions_agg_watermark (agg_name, last_id) VALUES (%s, 0)",
+                (AGG_NAME,)
+            )
+        with _state_lock:
+            _ready_cache[self._key] = bool(ok)
+        return bool(ok)
+
+    def _mark_refreshed(self):
+        with _state_lock:
+            _last_refresh[self._key] = time.monotonic()
+
+    # ===================== Maintenance =====================
+    def get_watermark(self) -> int:
+        """predictions_log.id lớn nhất đã được tổng hợp"""
+        row = self.db.fetch_one(
+            "SELECT last_id FROM predictions_agg_watermark WHERE agg_name = %s", (AGG_NAME,)
+        )
+        return int(row[0] or 0) if row else 0
+
+    def _settled_max_id(self, after_id: int) -> int:
+        """
+        id lớn nhất (> after_id) có created_at cũ hơn settle_seconds; after_id nếu không có
+
+        id tăng theo thời điểm INSERT, nên mọi id nhỏ hơn đều thuộc transaction đã mở từ trước
+        mốc này - đã commit, trừ khi transaction đó mở lâu hơn settle_seconds
+        """
+        row = self.db.fetch_one(
+            """
+            SELECT id FROM predictions_log
+            WHERE id > %s AND created_at < NOW() - INTERVAL %s SECOND
+            ORDER BY id DESC LIMIT 1
+            """,
+            (after_id, self.settle_seconds)
+        )
+        return int(row[0]) if row and row[0] else after_id
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Cộng dồn các dòng predictions_log mới (id > watermark, đã cũ hơn settle_seconds) vào bảng aggregate
+
+        Args:
+            force: Bỏ qua min_interval
+
+        Returns:
+            Số id đã xử lý (0 nếu không có dòng mới / bị throttle), -1 nếu lỗi
+        """
+        with _state_lock:
+            last = _last_refresh.get(self._key, 0.0)
+        if not force and time.monotonic() - last < self.min_interval:
+            return 0
+        with self._lock:
+            # Instance khác của cùng database có thể vừa refresh xong trong lúc chờ lock
+            with _state_lock:
+                last = _last_refresh.get(self._key, 0.0)
+            if not force and time.monotonic() - last < self.min_interval:
+                return 0
+            if not self.ensure_schema():
+                return -1
+            watermark = self.get_watermark()
+            max_id = self._settled_max_id(watermark)
+            self._mark_refreshed()
+            if max_id <= watermark:
+                return 0
+
+            # Khóa dòng watermark (giữ kết nối của transaction) để các process khác chờ
+            if not self.db.execute_query(
+                "UPDATE predictions_agg_watermark SET last_id = last_id WHERE agg_name = %s",
+                (AGG_NAME,), commit=False
+            ):
+                return -1
+            last_id = self.get_watermark()
+            if max_id <= last_id:
+                self.db.rollback()
+                return 0
+            ok = self.db.execute_query(MERGE_NEW_ROWS, (last_id, max_id), commit=False)
+            ok = ok and self.db.execute_query(
+                "UPDATE predictions_agg_watermark SET last_id = %s WHERE agg_name = %s",
+                (max_id, AGG_NAME), commit=False
+            )
+            if not ok or not self.db.commit():
+                self.db.rollback()
+                return -1
+            return max_id - last_id
+
+    def rebuild(self) -> bool:
+        """
+        Tính lại toàn bộ bảng aggregate từ predictions_log (tới dòng đã cũ hơn settle_seconds)
+
+        Returns:
+            True nếu thành công
+        """
+        with self._lock:
+            if not self.ensure_schema():
+                return False
+            max_id = self._settled_max_id(0)
+            ok = self.db.execute_query(
+                "UPDATE predictions_agg_watermark SET last_id = last_id WHERE agg_name = %s",
+                (AGG_NAME,), commit=False
+            )
+            ok = ok and self.db.execute_query("DELETE FROM predictions_daily_agg", commit=False)
+            ok = ok and self.db.execute_query(MERGE_NEW_ROWS, (0, max_id), commit=False)
+            ok = ok and self.db.execute_query(
+                "UPDATE predictions_agg_watermark SET last_id = %s WHERE agg_name = %s",
+                (max_id, AGG_NAME), commit=False
+            )
+            if not ok or not self.db.commit():
+                self.db.rollback()
+                print("✗ Rebuild predictions_daily_agg thất bại")
+                return False
+            self._mark_refreshed()
+            print(f"✓ Đã rebuild predictions_daily_agg (tới id={max_id})")
+            return True
+
+    # ===================== Queries =====================
+    @staticmethod
+    def threshold_bucket(threshold: float) -> Optional[int]:
+        """
+        Đổi ngưỡng xác suất sang chỉ số bucket (probability >= threshold <=> bucket >= kết quả)
+
+        Returns:
+            Chỉ số bucket, hoặc None nếu ngưỡng không nằm trên biên bucket (0.01) hoặc >= 1
+        """
+        scaled = round(float(threshold) * BUCKETS, 6)
+        if scaled <= 0:
+            return 0
+        if scaled != int(scaled) or scaled >= BUCKETS:
+            return None
+        return int(scaled)
+
+    def get_bucket_counts(self, since_day: Optional[str] = None) -> Dict[str, int]:
+        """
+        Đếm predictions theo 5 bucket xác suất 20%
+
+        Args:
+            since_day: Chỉ tính từ thời điểm này ('YYYY-MM-DD' hoặc ISO datetime), None = toàn bộ.
+                Ngày đầu không trọn (có giờ) được đếm từ predictions_log, các ngày sau từ AGG_SOURCE
+        """
+        self.refresh()
+        bucket_sql = "LEAST(prob_bucket DIV 20, 4)"
+        if not since_day:
+            rows = self.db.fetch_all(
+                f"SELECT {bucket_sql} AS b, SUM(n_total) FROM {AGG_SOURCE} GROUP BY b"
+            )
+        else:
+            since = datetime.fromisoformat(str(since_day).replace('Z', ''))
+            day = since.replace(hour=0, minute=0, second=0, microsecond=0)
+            if since == day:
+                rows = self.db.fetch_all(
+                    f"SELECT {bucket_sql} AS b, SUM(n_total) FROM {AGG_SOURCE} WHERE day >= %s GROUP BY b",
+                    (day.strftime('%Y-%m-%d'),)
+                )
+            else:
+                next_day = day + timedelta(days=1)
+                rows = self.db.fetch_all(
+                    f"""
+                    SELECT b, SUM(n) FROM (
+                        SELECT {bucket_sql} AS b, n_total AS n
+                        FROM {AGG_SOURCE} WHERE day >= %s
+                        UNION ALL
+                        SELECT LEAST(LEAST(FLOOR(probability * {BUCKETS}), {BUCKETS - 1}) DIV 20, 4), 1
+                        FROM predictions_log
+                        WHERE created_at >= %s AND created_at < %s
+                    ) t
+                    GROUP BY b
+                    """,
+                    (next_day.strftime('%Y-%m-%d'), since.strftime('%Y-%m-%d %H:%M:%S'),
+                     next_day.strftime('%Y-%m-%d'))
+                )
+        counts = {k: 0 for k in RISK_BUCKET_KEYS}
+        for b, n in rows:
+            counts[RISK_BUCKET_KEYS[int(b)]] = int(n or 0)
+        return counts
+
+    def get_period_counts(self, period: str, high_bucket: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        Roll-up theo kỳ, sắp xếp tăng dần
+
+        Args:
+            period: 'month' ('YYYY-MM'), 'quarter' ('YYYY-Qn') hoặc 'week' ('YYYY-Www', tuần ISO)
+            high_bucket: None = đếm predicted_label=1; ngược lại đếm prob_bucket >= high_bucket
+
+        Returns:
+            List (period_key, total, count)
+        """
+        self.refresh()
+        key_sql = PERIOD_KEY_SQL.get(period)
+        if key_sql is None:
+            raise ValueError(f"period không hợp lệ: {period}")
+        if high_bucket is None:
+            count_sql, params = "SUM(n_default)", None
+        else:
+            count_sql, params = "SUM(CASE WHEN prob_bucket >= %s THEN n_total ELSE 0 END)", (high_bucket,)
+        rows = self.db.fetch_all(
+            f"""
+            SELECT {key_sql} AS k, SUM(n_total), {count_sql}
+            FROM {AGG_SOURCE}
+            GROUP BY k
+            ORDER BY k ASC
+            """,
+            params
+        )
+        return [(str(k), int(t or 0), int(c or 0)) for k, t, c in rows]
+
+    def get_stats(
+        self,
+        start_day: Optional[str] = None,
+        end_day: Optional[str] = None,
+        user_id: Optional[int] = None,
+        label: Optional[int] = None,
+        high_bucket: Optional[int] = None
+    ) -> Dict:
+        """
+        Thống kê tổng số dự báo / số nguy cơ cao / xác suất trung bình
+
+        Args:
+            start_day, end_day: Khoảng ngày đóng [start_day, end_day] (YYYY-MM-DD), None = không lọc
+            user_id: Lọc theo user
+            label: 1/0 để chỉ tính các dòng predicted_label tương ứng
+            high_bucket: None = nguy cơ cao là predicted_label=1; ngược lại prob_bucket >= high_bucket
+
+        Returns:
+            Dict total_predictions, high_risk_count, avg_probability
+        """
+        self.refresh()
+        where_parts, params = [], []
+        if start_day and end_day:
+            where_parts.append("day BETWEEN %s AND %s")
+            params += [start_day, end_day]
+        if user_id is not None:
+            where_parts.append("user_id = %s")
+            params.append(user_id)
+        where_sql = ('WHERE ' + ' AND '.join(where_parts)) if where_parts else ''
+        if high_bucket is not None:
+            high_sql = "SUM(CASE WHEN prob_bucket >= %s THEN n_total ELSE 0 END)"
+            params.insert(0, high_bucket)
+        else:
+            high_sql = "SUM(n_default)"
+        row = self.db.fetch_one(
+            f"""
+            SELECT SUM(n_total), SUM(n_default), SUM(sum_probability), SUM(sum_probability_default), {high_sql}
+            FROM {AGG_SOURCE}
+            {where_sql}
+            """,
+            tuple(params) if params else None
+        )
+        if not row:
+            return stats_from_sums(0, 0, 0.0, 0.0, 0)
+        return stats_from_sums(row[0], row[1], row[2], row[3], row[4], label)
+
+
+def stats_from_sums(
+    n_total, n_default, sum_probability, sum_probability_default, n_high, label: Optional[int] = None
+) -> Dict:
+    """
+    Dict thống kê từ các tổng của predictions_daily_agg
+
+    Args:
+        n_total, n_default, sum_probability, sum_probability_default: SUM các cột tương ứng (có thể NULL)
+        n_high: Số dòng nguy cơ cao theo định nghĩa của caller (predicted_label=1 hoặc prob_bucket >= ngưỡng)
+        label: 1/0 để chỉ tính các dòng predicted_label tương ứng
+
+    Returns:
+        Dict total_predictions, high_risk_count, avg_probability
+    """
+    n_total, n_default = int(n_total or 0), int(n_default or 0)
+    sum_p, sum_p_default = float(sum_probability or 0.0), float(sum_probability_default or 0.0)
+    if label == 1:
+        total, high, sum_sel = n_default, n_default, sum_p_default
+    elif label == 0:
+        total, high, sum_sel = n_total - n_default, 0, sum_p - sum_p_default
+    else:
+        total, high, sum_sel = n_total, int(n_high or 0), sum_p
+    return {
+        'total_predictions': total,
+        'high_risk_count': high,
+        'avg_probability': (sum_sel / total) if total > 0 else 0.0
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cập nhật bảng predictions_daily_agg")
+    parser.add_argument('--rebuild', action='store_true', help="Tính lại toàn bộ từ predictions_log")
+    args = parser.parse_args(argv)
+
+    db = DatabaseConnector(DatabaseConfig.default())
+    if not db.connect():
+        return 1
+    try:
+        service = PredictionAggregateService(db)
+        if args.rebuild:
+            return 0 if service.rebuild() else 1
+        n = service.refresh(force=True)
+        if n < 0:
+            print("✗ Refresh predictions_daily_agg thất bại")
+            return 1
+        print(f"✓ predictions_daily_agg: đã xử lý {n} id mới (watermark={service.get_watermark()})")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Prediction Log Writer
+Ghi predictions_log kiểu write-behind: dự báo chỉ đẩy dòng vào hàng đợi trong RAM,
+thread nền gom thành multi-row INSERT và ghi theo lô
+
+    writer = get_prediction_log_writer(db.config)
+    writer.submit(customer_id, 'XGBoost', 1, 0.73, input_dict, user_id)
+    ...
+    close_prediction_log_writers()   # khi thoát ứng dụng: flush hết rồi dừng thread
+
+- Hàng đợi có giới hạn (max_queue); đầy thì submit chờ tối đa put_timeout (backpressure),
+  quá hạn thì ghi đồng bộ ngay - không bỏ dòng nào
+- Flush khi đủ batch_size dòng hoặc sau flush_interval giây kể từ dòng đầu của lô
+- Lô lỗi (kể cả lỗi mã hóa / exception của driver) được thử lại (max_retries), vẫn lỗi thì ghi ra
+  outputs/system/predictions_log_spill.jsonl; thread flusher luôn chạy tiếp sau 1 lô lỗi
+- Mỗi lô ghi predictions_log và customer_latest_score trong cùng 1 transaction (services.latest_score)
+- Mã hóa raw_input (features_f32 + extras_blob, hoặc json.dumps ở chế độ json - xem services.feature_storage)
+  chạy ở thread flusher, không nằm trên đường dự báo
+"""
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from services.feature_storage import prediction_log_insert, raw_input_params, storage_mode
+from services.latest_score import ensure_latest_score_table, upsert_latest_scores
+
+
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_PUT_TIMEOUT = 2.0
+SPILL_PATH = project_root / 'outputs' / 'system' / 'predictions_log_spill.jsonl'
+
+
+
+class PredictionLogWriter:
+    """
+    Hàng đợi write-behind cho predictions_log (1 thread flusher)
+    """
+
+    def __init__(
+        self,
+        config: DatabaseConfig,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        put_timeout: float = DEFAULT_PUT_TIMEOUT,
+        max_retries: int = 3,
+        spill_path: Path = SPILL_PATH
+    ):
+        """
+        Khởi tạo PredictionLogWriter (thread flusher start ngay)
+
+        Args:
+            config: DatabaseConfig - writer dùng connector riêng (pool) để an toàn giữa các thread
+            max_queue: Số dòng tối đa chờ ghi
+            batch_size: Số dòng tối đa mỗi INSERT
+            flush_interval: Thời gian tối đa (giây) 1 dòng nằm trong hàng đợi trước khi flush
+            put_timeout: Thời gian chờ tối đa khi hàng đợi đầy trước khi ghi đồng bộ
+            max_retries: Số lần thử lại 1 lô lỗi
+            spill_path: File JSONL nhận các lô không ghi được
+        """
+        self.db = DatabaseConnector(config, use_pool=True)
+        self.db.connect()
+        self.storage_mode = storage_mode(self.db)
+        self._insert_sql = prediction_log_insert(self.storage_mode)
+        ensure_latest_score_table(self.db)
+        self.batch_size = int(batch_size)
+        self.flush_interval = float(flush_interval)
+        self.put_timeout = float(put_timeout)
+        self.max_retries = int(max_retries)
+        self.spill_path = Path(spill_path)
+
+        self._queue: 'queue.Queue[tuple]' = queue.Queue(maxsize=int(max_queue))
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._listeners: List[Callable[[int], None]] = []
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'spilled': 0,
+            'sync_fallbacks': 0,
+            'max_depth': 0,
+            'last_flush_ms': 0.0,
+            'flush_ms_total': 0.0,
+            'last_queue_wait_ms': 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name='prediction-log-writer', daemon=True)
+        self._thread.start()
+
+    # ---------- producer ----------
+    def submit(
+        self,
+        customer_id: Optional[int],
+        model_name: str,
+        predicted_label: int,
+        probability: float,
+        raw_input_dict: Optional[Dict],
+        user_id: Optional[int] = None
+    ) -> bool:
+        """
+        Đưa 1 dòng predictions_log vào hàng đợi
+
+        Returns:
+            True nếu đã nhận (vào hàng đợi hoặc ghi đồng bộ khi hàng đợi đầy), False nếu ghi đồng bộ lỗi
+        """
+        row = (
+            customer_id, model_name, int(predicted_label), float(probability),
+            dict(raw_input_dict or {}), user_id, time.perf_counter()
+        )
+        if self._stop.is_set():
+            return self._write_sync([row])
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            print(f"⚠ Hàng đợi predictions_log đầy ({self._queue.maxsize}) - ghi đồng bộ")
+            with self._stats_lock:
+                self._stats['sync_fallbacks'] += 1
+            return self._write_sync([row])
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+        return True
+
+    def add_flush_listener(self, callback: Callable[[int], None]):
+        """callback(n_rows) được gọi từ thread flusher sau mỗi lô ghi thành công"""
+        self._listeners.append(callback)
+
+    def remove_flush_listener(self, callback: Callable[[int], None]):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    # ---------- flusher ----------
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            batch = [first]
+            deadline = first[-1] + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._stop.is_set():
+                    # Hết hạn / đang dừng: lấy nốt những gì có sẵn, không chờ thêm
+                    try:
+                        while len(batch) < self.batch_size:
+                            batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        pass
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._flush_batch(batch)
+            except Exception as e:
+                # 1 lô lỗi không được làm dừng thread flusher
+                print(f"✗ Flush predictions_log lỗi: {e}")
+                self._spill(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _params(self, batch: List[tuple]) -> List[tuple]:
+        return [
+            (cid, model, label, prob, *raw_input_params(self.storage_mode, raw), uid)
+            for cid, model, label, prob, raw, uid, _ in batch
+        ]
+
+    def _flush_batch(self, batch: List[tuple]):
+        params = None
+        t0 = time.perf_counter()
+        ok = False
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Mã hóa raw_input nằm trong vòng thử lại: lỗi mã hóa / driver cũng tính là 1 lần lỗi
+                if params is None:
+                    params = self._params(batch)
+                if self._write(batch, params):
+                    ok = True
+                    break
+            except Exception as e:
+                print(f"✗ Ghi lô predictions_log lỗi (lần {attempt + 1}): {e}")
+                self.db.rollback()
+            with self._stats_lock:
+                self._stats['failed_batches'] += 1
+            if attempt < self.max_retries:
+                time.sleep(min(0.2 * (2 ** attempt), 2.0))
+        flush_ms = (time.perf_counter() - t0) * 1000
+        if not ok:
+            self._spill(batch)
+            return
+        with self._stats_lock:
+            s = self._stats
+            s['written'] += len(batch)
+            s['batches'] += 1
+            s['last_flush_ms'] = flush_ms
+            s['flush_ms_total'] += flush_ms
+            s['last_queue_wait_ms'] = (t0 - batch[0][-1]) * 1000
+        for cb in list(self._listeners):
+            try:
+                cb(len(batch))
+            except Exception as e:
+                print(f"✗ Flush listener lỗi: {e}")
+
+    def _write(self, batch: List[tuple], params: List[tuple]) -> bool:
+        """INSERT predictions_log + upsert customer_latest_score trong 1 transaction"""
+        ok = (
+            self.db.execute_many(self._insert_sql, params, commit=False)
+            and upsert_latest_scores(self.db, [row[:4] for row in batch])
+            and self.db.commit()
+        )
+        if not ok:
+            self.db.rollback()
+        return ok
+
+    def _write_sync(self, batch: List[tuple]) -> bool:
+        try:
+            ok = self._write(batch, self._params(batch))
+        except Exception as e:
+            print(f"✗ Ghi đồng bộ predictions_log lỗi: {e}")
+            self.db.rollback()
+            ok = False
+        if ok:
+            with self._stats_lock:
+                self._stats['written'] += len(batch)
+        return ok
+
+    def _spill(self, batch: List[tuple]):
+        """Ghi lô không insert được ra JSONL để nạp lại sau"""
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for cid, model, label, prob, raw, uid, _ in batch:
+                    f.write(json.dumps({
+                        'customer_id': cid, 'model_name': model, 'predicted_label': label,
+                        'probability': prob, 'raw_input_json': json.dumps(raw, default=str), 'user_id': uid,
+                    }, default=str) + '\n')
+            print(f"✗ Không ghi được {len(batch)} dòng predictions_log - đã lưu vào {self.spill_path}")
+        except Exception as e:
+            print(f"✗ Mất {len(batch)} dòng predictions_log: {e}")
+        with self._stats_lock:
+            self._stats['spilled'] += len(batch)
+
+    # ---------- control ----------
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Chờ tới khi mọi dòng đã submit được ghi (hoặc spill)
+
+        Returns:
+            True nếu hàng đợi đã rỗng trong thời gian timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """Flush rồi dừng thread flusher (submit sau khi close sẽ ghi đồng bộ)"""
+        self._stop.set()
+        ok = self.flush(timeout)
+        self._thread.join(timeout=max(0.0, timeout))
+        self.db.close()
+        return ok
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Counters của writer
+
+        Returns:
+            Dict queue_depth, max_depth, enqueued, written, batches, avg_batch_size,
+            last_flush_ms, avg_flush_ms, last_queue_wait_ms, failed_batches, spilled, sync_fallbacks
+        """
+        with self._stats_lock:
+            s = dict(self._stats)
+        batches = s['batches']
+        s['queue_depth'] = self._queue.qsize()
+        s['avg_batch_size'] = (s['written'] / batches) if batches else 0.0
+        s['avg_flush_ms'] = (s.pop('flush_ms_total') / batches) if batches else 0.0
+        return s
+
+
+_writers: Dict[tuple, PredictionLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_prediction_log_writer(config: DatabaseConfig) -> PredictionLogWriter:
+    """PredictionLogWriter dùng chung theo database (host, port, user, database)"""
+    key = config.pool_key()
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = PredictionLogWriter(config)
+            _writers[key] = writer
+        return writer
+
+
+def close_prediction_log_writers(timeout: float = 10.0):
+    """Flush và dừng mọi writer (gọi khi thoát ứng dụng, trước close_all_pools)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        if not writer.close(timeout):
+            print(f"⚠ Còn {writer.get_stats()['queue_depth']} dòng predictions_log chưa ghi sau {timeout}s")
+
+
+atexit.register(close_prediction_log_writers)
@@ -2,17 +2,58 @@
 Query Service
 Service xử lý truy vấn database (customers, predictions_log)
 """
-import json
+import time
+import threading
 from typing import List, Optional, Dict
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
 from database.connector import DatabaseConnector
+from ml.eval_store import get_settings_store
+from ml.preprocess import FEATURE_NAMES, PAY_FIELDS
 from models.customer import Customer
+from models.dashboard_snapshot import DashboardSnapshot
+from services.prediction_aggregate_service import (
+    AGG_SOURCE, BUCKETS, PERIOD_KEY_SQL, RISK_BUCKET_KEYS, PredictionAggregateService, stats_from_sums
+)
+from services.prediction_log_writer import get_prediction_log_writer
+from services.latest_score import ensure_latest_score_table, upsert_latest_scores
+from services.feature_storage import (
+    prediction_log_insert, raw_input_columns, raw_input_params, resolve_raw_inputs, rows_to_matrix, storage_mode
+)
+from services.time_range import (
+    resolve_time_range, resolve_date_range, day_bounds, bounds_to_days, time_where
+)
+
+
+# SHAP-lite: feature rời rạc -> chênh lệch lớn nhất của tỷ lệ high-risk theo nhóm so với overall;
+# feature liên tục -> chênh lệch tỷ lệ high-risk giữa nhóm >= / < điểm cắt (mặc định: trung bình)
+_SHAP_LITE_CATEGORICAL = frozenset(['SEX', 'EDUCATION', 'MARRIAGE', *PAY_FIELDS])
+_SHAP_LITE_SPLITS = {'AGE': 30.0}
+_SHAP_LITE_LABELS = {
+    'AGE': 'Tuổi',
+    'MARRIAGE': 'Tình trạng hôn nhân',
+    'SEX': 'Giới tính',
+    'EDUCATION': 'Học vấn',
+}
+
+# Model mặc định cho customer_latest_score: model active, không có thì 1 model bất kỳ đã có điểm
+_LATEST_MODEL_SQL = (
+    "COALESCE((SELECT model_name FROM model_registry WHERE is_active = 1 LIMIT 1), "
+    "(SELECT model_name FROM customer_latest_score LIMIT 1))"
+)
+_LATE_RISK_SQL = (
+    "CASE WHEN s.probability >= 0.60 THEN 'High' "
+    "WHEN s.probability >= 0.40 THEN 'Medium' ELSE 'Low' END"
+)
 
 
 class QueryService:
     """
     Service quản lý truy vấn dữ liệu khách hàng và predictions log
     """
+
+    # Thời gian (giây) giữ kết quả SHAP-lite theo (since_iso, threshold)
+    SHAP_LITE_TTL = 60.0
     
     def __init__(self, db_connector: DatabaseConnector):
         """
@@ -22,12 +63,10 @@ class QueryService:
             db_connector: Instance DatabaseConnector
         """
         self.db = db_connector
-        try:
-            from pathlib import Path
-            self._project_root = Path(__file__).resolve().parents[1]
-            self._eval_path = self._project_root / 'outputs' / 'evaluation' / 'evaluation_data.npz'
-        except Exception:
-            self._eval_path = None
+        # Dashboard aggregates đọc từ predictions_daily_agg (cập nhật tăng dần theo high-water mark)
+        self.aggregates = PredictionAggregateService(db_connector)
+        self._shap_lite_cache: Dict[tuple, tuple] = {}
+        self._shap_lite_lock = threading.Lock()
     
     def save_customer(self, customer: Customer, strict_insert: bool = False) -> Optional[int]:
         """
@@ -74,11 +113,15 @@ class QueryService:
             customer.PAY_AMT10, customer.PAY_AMT11, customer.PAY_AMT12
         )
         
-        success = self.db.execute_query(query, params)
+        # commit=False: giữ kết nối (pool) để LAST_INSERT_ID() đọc đúng session vừa INSERT
+        success = self.db.execute_query(query, params, commit=False)
         
         if success:
             result = self.db.fetch_one("SELECT LAST_INSERT_ID()")
-            if result:
+            if not self.db.commit():
+                print("✗ Không thể lưu customer")
+                return None
+            if result and result[0]:
                 customer_id = result[0]
                 print(f"✓ Đã lưu customer ID: {customer_id}")
                 return customer_id
@@ -132,17 +175,19 @@ class QueryService:
         Returns:
             True nếu thành công, False nếu thất bại
         """
-        # Chuyển dict thành JSON string
-        raw_input_json = json.dumps(raw_input_dict)
-        
-        query = """
-            INSERT INTO predictions_log (
-                customer_id, model_name, predicted_label, probability, raw_input_json, user_id
-            ) VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        
-        params = (customer_id, model_name, predicted_label, probability, raw_input_json, user_id)
-        success = self.db.execute_query(query, params)
+        # features_f32 + extras_blob (hoặc JSON string nếu DB chưa migrate) - xem services.feature_storage
+        mode = storage_mode(self.db)
+        query = prediction_log_insert(mode)
+        params = (customer_id, model_name, predicted_label, probability, *raw_input_params(mode, raw_input_dict), user_id)
+        # customer_latest_score cập nhật cùng transaction với dòng log
+        ensure_latest_score_table(self.db)
+        success = (
+            self.db.execute_query(query, params, commit=False)
+            and upsert_latest_scores(self.db, [(customer_id, model_name, predicted_label, probability)])
+            and self.db.commit()
+        )
+        if not success:
+            self.db.rollback()
         
         if success:
             print(f"✓ Đã lưu prediction log cho customer_id={customer_id}")
@@ -151,6 +196,27 @@ class QueryService:
         
         return success
     
+    def enqueue_prediction_log(
+        self,
+        customer_id: Optional[int],
+        model_name: str,
+        predicted_label: int,
+        probability: float,
+        raw_input_dict: Dict,
+        user_id: Optional[int] = None
+    ) -> bool:
+        """
+        Lưu lịch sử dự báo qua hàng đợi write-behind (không chờ MySQL, xem services.prediction_log_writer)
+        
+        Args:
+            Giống save_prediction_log
+        
+        Returns:
+            True nếu đã đưa vào hàng đợi (hoặc đã ghi đồng bộ khi hàng đợi đầy)
+        """
+        writer = get_prediction_log_writer(self.db.config)
+        return writer.submit(customer_id, model_name, predicted_label, probability, raw_input_dict, user_id)
+    
     def get_recent_predictions(self, limit: int = 10) -> List[Dict]:
         """
         Lấy danh sách predictions log gần đây
@@ -161,18 +227,20 @@ class QueryService:
         Returns:
             List các dict chứa thông tin predictions
         """
-        query = """
+        query = f"""
             SELECT 
-                id, customer_id, model_name, predicted_label, probability, created_at, raw_input_json
+                id, customer_id, model_name, predicted_label, probability, created_at, raw_input_json,
+                {raw_input_columns(self.db, 'predictions_log')}
             FROM predictions_log
             ORDER BY created_at DESC
             LIMIT %s
         """
         
         results = self.db.fetch_all(query, (limit,))
+        raw_inputs = self._resolve_raw_inputs(results, 6)
         
         predictions = []
-        for row in results:
+        for row, raw_input_json in zip(results, raw_inputs):
             predictions.append({
                 'id': row[0],
                 'customer_id': row[1],
@@ -180,11 +248,72 @@ class QueryService:
                 'predicted_label': row[3],
                 'probability': float(row[4]),
                 'created_at': row[5],
-                'raw_input_json': row[6]
+                'raw_input_json': raw_input_json
             })
         
         return predictions
 
+    @staticmethod
+    def _resolve_raw_inputs(rows: List[tuple], json_idx: int) -> List[Optional[str]]:
+        """raw_input_json cho cả result set; 2 cột cuối của mỗi dòng là features_f32, extras_blob"""
+        return resolve_raw_inputs(
+            [r[json_idx] for r in rows], [r[-2] for r in rows], [r[-1] for r in rows]
+        )
+
+    def get_prediction_feature_matrix(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        model_name: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Đọc input của predictions_log thẳng thành ma trận NumPy (giải mã features_f32 theo lô)
+        
+        Args:
+            start_date: Ngày bắt đầu (YYYY-MM-DD, nullable)
+            end_date: Ngày kết thúc (YYYY-MM-DD, nullable)
+            model_name: Lọc theo model (nullable)
+            limit: Số dòng tối đa, mới nhất trước (nullable)
+        
+        Returns:
+            Dict ids (n,), probability (n,), label (n,), X (n, 41) float64 theo FEATURE_NAMES (trường thiếu = NaN)
+        """
+        where_parts, params = time_where(resolve_date_range(start_date, end_date))
+        if model_name:
+            where_parts.append("p.model_name = %s")
+            params.append(model_name)
+        where_sql = ' AND '.join(where_parts) if where_parts else '1=1'
+        query = f"""
+            SELECT p.id, p.probability, p.predicted_label, p.raw_input_json, {raw_input_columns(self.db)}
+            FROM predictions_log p
+            WHERE {where_sql}
+            ORDER BY p.id DESC
+        """
+        if limit:
+            query += " LIMIT %s"
+            params.append(int(limit))
+
+        ids: List[int] = []
+        probs: List[float] = []
+        labels: List[int] = []
+        json_values: List[Optional[str]] = []
+        blobs: List[Optional[bytes]] = []
+        for chunk in self.db.stream(query, tuple(params), batch_size=5000):
+            for rid, prob, label, raw_json, features, _ in chunk:
+                ids.append(rid)
+                probs.append(prob)
+                labels.append(label)
+                # raw_input_json chỉ cần cho dòng chưa backfill
+                json_values.append(raw_json if features is None else None)
+                blobs.append(features)
+        return {
+            'ids': np.asarray(ids, dtype=np.int64),
+            'probability': np.asarray(probs, dtype=np.float64),
+            'label': np.asarray(labels, dtype=np.int8),
+            'X': rows_to_matrix(json_values, blobs),
+        }
+
     def save_model_threshold(self, model_name: str, threshold: float, updated_by: str) -> bool:
         try:
             q1 = "INSERT INTO model_thresholds (model_name, threshold, updated_by) VALUES (%s, %s, %s)"
@@ -198,62 +327,30 @@ class QueryService:
     # ===================== Aggregates for User Dashboard =====================
     def get_risk_bucket_counts(self) -> Dict[str, int]:
         """Đếm số lượng predictions theo các bucket xác suất"""
-        query = """
-            SELECT 
-                SUM(CASE WHEN probability >= 0 AND probability < 0.20 THEN 1 ELSE 0 END) AS b0_20,
-                SUM(CASE WHEN probability >= 0.20 AND probability < 0.40 THEN 1 ELSE 0 END) AS b20_40,
-                SUM(CASE WHEN probability >= 0.40 AND probability < 0.60 THEN 1 ELSE 0 END) AS b40_60,
-                SUM(CASE WHEN probability >= 0.60 AND probability < 0.80 THEN 1 ELSE 0 END) AS b60_80,
-                SUM(CASE WHEN probability >= 0.80 AND probability <= 1.00 THEN 1 ELSE 0 END) AS b80_100
-            FROM predictions_log
-        """
-        row = self.db.fetch_one(query)
-        if not row:
-            return {'0_20': 0, '20_40': 0, '40_60': 0, '60_80': 0, '80_100': 0}
-        return {
-            '0_20': int(row[0] or 0),
-            '20_40': int(row[1] or 0),
-            '40_60': int(row[2] or 0),
-            '60_80': int(row[3] or 0),
-            '80_100': int(row[4] or 0),
-        }
+        return self.aggregates.get_bucket_counts()
 
     def get_risk_bucket_counts_since(self, since_iso: str) -> Dict[str, int]:
-        query = """
-            SELECT 
-                SUM(CASE WHEN probability >= 0 AND probability < 0.20 THEN 1 ELSE 0 END) AS b0_20,
-                SUM(CASE WHEN probability >= 0.20 AND probability < 0.40 THEN 1 ELSE 0 END) AS b20_40,
-                SUM(CASE WHEN probability >= 0.40 AND probability < 0.60 THEN 1 ELSE 0 END) AS b40_60,
-                SUM(CASE WHEN probability >= 0.60 AND probability < 0.80 THEN 1 ELSE 0 END) AS b60_80,
-                SUM(CASE WHEN probability >= 0.80 AND probability <= 1.00 THEN 1 ELSE 0 END) AS b80_100
-            FROM predictions_log
-            WHERE created_at >= %s
-        """
-        row = self.db.fetch_one(query, (since_iso,))
-        if not row:
-            return {'0_20': 0, '20_40': 0, '40_60': 0, '60_80': 0, '80_100': 0}
-        return {
-            '0_20': int(row[0] or 0),
-            '20_40': int(row[1] or 0),
-            '40_60': int(row[2] or 0),
-            '60_80': int(row[3] or 0),
-            '80_100': int(row[4] or 0),
-        }
+        return self.aggregates.get_bucket_counts(since_iso)
 
     def get_monthly_default_rate(self, months: int = 12) -> List[Dict]:
         """Tính % default (predicted_label=1) theo tháng gần nhất, bổ sung các tháng thiếu với 0"""
-        # Lấy aggregate theo tháng hiện có
-        query = """
-            SELECT DATE_FORMAT(created_at,'%Y-%m') AS ym,
-                   COUNT(*) AS total,
-                   SUM(CASE WHEN predicted_label = 1 THEN 1 ELSE 0 END) AS defaults
-            FROM predictions_log
-            GROUP BY ym
-            ORDER BY ym ASC
-        """
-        rows = self.db.fetch_all(query)
-        agg = {r[0]: (int(r[1] or 0), int(r[2] or 0)) for r in rows}
-        # Tạo danh sách tháng liên tục
+        return self._fill_rates(self.aggregates.get_period_counts('month'), self._month_keys(months))
+
+    def get_monthly_default_rate_recent(self, months: int = 12) -> List[Dict]:
+        return self._recent_rates(self.aggregates.get_period_counts('month'), months)
+
+    def get_quarterly_high_risk_rate(self, quarters: int = 8, threshold: float = 0.60) -> List[Dict]:
+        """Tính % high-risk theo quý (probability >= threshold), bổ sung quý thiếu với 0"""
+        thr = self._get_dashboard_threshold_override(threshold)
+        return self._fill_rates(self._get_quarterly_high_counts(thr), self._quarter_keys(quarters))
+
+    def get_quarterly_high_risk_rate_recent(self, quarters: int = 8, threshold: float = 0.60) -> List[Dict]:
+        thr = self._get_dashboard_threshold_override(threshold)
+        return self._recent_rates(self._get_quarterly_high_counts(thr), quarters)
+
+    @staticmethod
+    def _month_keys(months: int) -> List[str]:
+        """months tháng liên tục tới tháng hiện tại ('YYYY-MM', tăng dần)"""
         keys = []
         now = datetime.now()
         y = now.year; m = now.month
@@ -263,48 +360,11 @@ class QueryService:
             if m == 0:
                 m = 12; y -= 1
         keys.reverse()
-        result = []
-        for k in keys:
-            total, defaults = agg.get(k, (0, 0))
-            rate = (defaults / total) if total > 0 else 0.0
-            result.append({'period': k, 'rate': rate})
-        return result
+        return keys
 
-    def get_monthly_default_rate_recent(self, months: int = 12) -> List[Dict]:
-        query = """
-            SELECT DATE_FORMAT(created_at,'%Y-%m') AS ym,
-                   COUNT(*) AS total,
-                   SUM(CASE WHEN predicted_label = 1 THEN 1 ELSE 0 END) AS defaults
-            FROM predictions_log
-            GROUP BY ym
-            ORDER BY ym ASC
-        """
-        rows = self.db.fetch_all(query)
-        if not rows:
-            return []
-        start = max(0, len(rows) - months)
-        result = []
-        for ym, total, defaults in rows[start:]:
-            t = int(total or 0)
-            d = int(defaults or 0)
-            rate = (d / t) if t > 0 else 0.0
-            result.append({'period': ym, 'rate': rate})
-        return result
-
-    def get_quarterly_high_risk_rate(self, quarters: int = 8, threshold: float = 0.60) -> List[Dict]:
-        """Tính % high-risk theo quý (probability >= threshold), bổ sung quý thiếu với 0"""
-        thr = self._get_dashboard_threshold_override(threshold)
-        query = """
-            SELECT YEAR(created_at) AS y, QUARTER(created_at) AS q,
-                   COUNT(*) AS total,
-                   SUM(CASE WHEN probability >= %s THEN 1 ELSE 0 END) AS high
-            FROM predictions_log
-            GROUP BY y, q
-            ORDER BY y ASC, q ASC
-        """
-        rows = self.db.fetch_all(query, (thr,))
-        agg = {f"{int(r[0])}-Q{int(r[1])}": (int(r[2] or 0), int(r[3] or 0)) for r in rows}
-        # Tạo danh sách quý liên tục
+    @staticmethod
+    def _quarter_keys(quarters: int) -> List[str]:
+        """quarters quý liên tục tới quý hiện tại ('YYYY-Qn', tăng dần)"""
         keys = []
         now = datetime.now()
         y = now.year; q = (now.month - 1)//3 + 1
@@ -314,15 +374,47 @@ class QueryService:
             if q == 0:
                 q = 4; y -= 1
         keys.reverse()
+        return keys
+
+    @staticmethod
+    def _week_keys(weeks: int) -> List[str]:
+        """weeks tuần ISO liên tục tới tuần hiện tại ('YYYY-Www', tăng dần)"""
+        keys = []
+        cur = datetime.now()
+        for _ in range(weeks):
+            y = cur.isocalendar().year
+            w = cur.isocalendar().week
+            keys.append(f"{y}-W{w:02d}")
+            cur = cur - timedelta(days=7)
+        keys.reverse()
+        return keys
+
+    @staticmethod
+    def _fill_rates(rows: List[tuple], keys: List[str]) -> List[Dict]:
+        """Tỷ lệ count/total theo từng key; kỳ không có dữ liệu = 0"""
+        agg = {k: (total, count) for k, total, count in rows}
         result = []
         for k in keys:
-            total, high = agg.get(k, (0, 0))
-            rate = (high / total) if total > 0 else 0.0
+            total, count = agg.get(k, (0, 0))
+            rate = (count / total) if total > 0 else 0.0
             result.append({'period': k, 'rate': rate})
         return result
 
-    def get_quarterly_high_risk_rate_recent(self, quarters: int = 8, threshold: float = 0.60) -> List[Dict]:
-        thr = self._get_dashboard_threshold_override(threshold)
+    @staticmethod
+    def _recent_rates(rows: List[tuple], n: int) -> List[Dict]:
+        """Tỷ lệ count/total của n kỳ cuối có dữ liệu"""
+        result = []
+        for period, total, count in rows[max(0, len(rows) - n):]:
+            t = int(total or 0)
+            c = int(count or 0)
+            result.append({'period': period, 'rate': (c / t) if t > 0 else 0.0})
+        return result
+
+    def _get_quarterly_high_counts(self, thr: float) -> List[tuple]:
+        """(quý 'YYYY-Qn', total, số dòng probability >= thr) - dùng bảng aggregate nếu thr nằm trên biên bucket 0.01"""
+        bucket = self.aggregates.threshold_bucket(thr)
+        if bucket is not None:
+            return self.aggregates.get_period_counts('quarter', high_bucket=bucket)
         query = """
             SELECT YEAR(created_at) AS y, QUARTER(created_at) AS q,
                    COUNT(*) AS total,
@@ -332,59 +424,16 @@ class QueryService:
             ORDER BY y ASC, q ASC
         """
         rows = self.db.fetch_all(query, (thr,))
-        if not rows:
-            return []
-        start = max(0, len(rows) - quarters)
-        result = []
-        for y, q, total, high in rows[start:]:
-            t = int(total or 0)
-            h = int(high or 0)
-            rate = (h / t) if t > 0 else 0.0
-            result.append({'period': f"{int(y)}-Q{int(q)}", 'rate': rate})
-        return result
+        return [(f"{int(y)}-Q{int(q)}", int(total or 0), int(high or 0)) for y, q, total, high in rows]
 
     def _get_dashboard_threshold_override(self, default_thr: float = 0.60) -> float:
         try:
-            if not self._eval_path or not self._eval_path.exists():
-                return float(default_thr)
-            import numpy as np
-            data = np.load(self._eval_path, allow_pickle=True)
-            ov = data.get('dashboard_threshold', None)
-            if ov is None:
-                return float(default_thr)
-            d = ov.item() if hasattr(ov, 'item') else ov
-            return float(d.get('value', default_thr))
+            return get_settings_store().get_dashboard_threshold(default_thr)
         except Exception:
             return float(default_thr)
 
     def get_weekly_default_rate(self, weeks: int = 8) -> List[Dict]:
-        query = """
-            SELECT YEAR(created_at) AS y, WEEK(created_at, 3) AS w,
-                   COUNT(*) AS total,
-                   SUM(CASE WHEN predicted_label = 1 THEN 1 ELSE 0 END) AS defaults
-            FROM predictions_log
-            GROUP BY y, w
-            ORDER BY y ASC, w ASC
-        """
-        rows = self.db.fetch_all(query)
-        agg = {f"{int(r[0])}-W{int(r[1]):02d}": (int(r[2] or 0), int(r[3] or 0)) for r in rows}
-        # Build continuous series of last N weeks
-        from datetime import datetime, timedelta
-        now = datetime.now()
-        keys = []
-        cur = now
-        for _ in range(weeks):
-            y = cur.isocalendar().year
-            w = cur.isocalendar().week
-            keys.append(f"{y}-W{w:02d}")
-            cur = cur - timedelta(days=7)
-        keys.reverse()
-        result = []
-        for k in keys:
-            total, defaults = agg.get(k, (0, 0))
-            rate = (defaults / total) if total > 0 else 0.0
-            result.append({'period': k, 'rate': rate})
-        return result
+        return self._fill_rates(self.aggregates.get_period_counts('week'), self._week_keys(weeks))
 
     def get_demographics_counts(self) -> tuple:
         """Lấy thống kê số lượng khách hàng theo Gender, Marriage, Education"""
@@ -452,206 +501,340 @@ class QueryService:
 
         return gender_map, marriage_map, education_map
 
-    def get_shap_lite_importance_since(self, since_iso: str) -> Dict[str, float]:
-        """Tính điểm ảnh hưởng đơn giản theo thời gian (proxy):
-        - LIMIT_BAL: chênh lệch tỷ lệ high-risk giữa nhóm trên/ dưới trung bình
-        - AGE: chênh lệch tỷ lệ high-risk giữa nhóm >=30 và <30
-        - MARRIAGE: chênh lệch tối đa so với overall
-        - PAY_0, PAY_2: nếu có trong bảng customers hoặc bảng payment, cố gắng tính; nếu không có, trả 0.
+    def get_shap_lite_importance_since(self, since_iso: str, threshold: float = 0.60) -> Dict[str, float]:
         """
-        def overall_high_rate():
-            row = self.db.fetch_one(
-                """
-                SELECT AVG(CASE WHEN probability >= 0.60 THEN 1 ELSE 0 END)
-                FROM predictions_log
-                WHERE created_at >= %s
-                """,
-                (since_iso,)
-            )
-            return float(row[0] or 0.0)
+        Điểm ảnh hưởng đơn giản (proxy) của 41 features trên các dự báo kể từ since_iso
 
-        overall = overall_high_rate()
-        scores: Dict[str, float] = {}
+        Lấy 1 lần lát cắt predictions_log JOIN customers thành ma trận NumPy rồi tính mọi split
+        trong bộ nhớ. Kết quả được giữ SHAP_LITE_TTL giây theo (since_iso, threshold).
 
-        # LIMIT_BAL split by average
-        try:
-            row = self.db.fetch_one("SELECT AVG(LIMIT_BAL) FROM customers")
-            avg_limit = float(row[0] or 0.0)
-            def_rate_hi = self.db.fetch_one(
-                """
-                SELECT AVG(CASE WHEN p.probability >= 0.60 THEN 1 ELSE 0 END)
-                FROM predictions_log p JOIN customers c ON p.customer_id = c.id
-                WHERE p.created_at >= %s AND c.LIMIT_BAL >= %s
-                """,
-                (since_iso, avg_limit)
-            )[0]
-            def_rate_lo = self.db.fetch_one(
-                """
-                SELECT AVG(CASE WHEN p.probability >= 0.60 THEN 1 ELSE 0 END)
-                FROM predictions_log p JOIN customers c ON p.customer_id = c.id
-                WHERE p.created_at >= %s AND c.LIMIT_BAL < %s
-                """,
-                (since_iso, avg_limit)
-            )[0]
-            scores['LIMIT_BAL'] = abs(float(def_rate_hi or 0.0) - float(def_rate_lo or 0.0))
-        except Exception:
-            scores['LIMIT_BAL'] = 0.0
+        Args:
+            since_iso: Mốc thời gian bắt đầu (YYYY-MM-DD)
+            threshold: Ngưỡng probability coi là high-risk
 
-        # AGE split by 30
-        try:
-            def_rate_older = self.db.fetch_one(
-                """
-                SELECT AVG(CASE WHEN p.probability >= 0.60 THEN 1 ELSE 0 END)
-                FROM predictions_log p JOIN customers c ON p.customer_id = c.id
-                WHERE p.created_at >= %s AND c.AGE >= 30
-                """,
-                (since_iso,)
-            )[0]
-            def_rate_younger = self.db.fetch_one(
-                """
-                SELECT AVG(CASE WHEN p.probability >= 0.60 THEN 1 ELSE 0 END)
-                FROM predictions_log p JOIN customers c ON p.customer_id = c.id
-                WHERE p.created_at >= %s AND c.AGE < 30
-                """,
-                (since_iso,)
-            )[0]
-            scores['Tuổi'] = abs(float(def_rate_older or 0.0) - float(def_rate_younger or 0.0))
-        except Exception:
-            scores['Tuổi'] = 0.0
+        Returns:
+            Dict {tên feature (AGE -> 'Tuổi', MARRIAGE -> 'Tình trạng hôn nhân', ...): điểm}
+        """
+        key = (since_iso, float(threshold))
+        now = time.monotonic()
+        with self._shap_lite_lock:
+            hit = self._shap_lite_cache.get(key)
+            if hit and now - hit[0] < self.SHAP_LITE_TTL:
+                return dict(hit[1])
 
-        # MARRIAGE categories vs overall
-        try:
-            rows = self.db.fetch_all(
-                """
-                SELECT c.MARRIAGE,
-                       AVG(CASE WHEN p.probability >= 0.60 THEN 1 ELSE 0 END) AS rate
-                FROM predictions_log p JOIN customers c ON p.customer_id = c.id
-                WHERE p.created_at >= %s
-                GROUP BY c.MARRIAGE
-                """,
-                (since_iso,)
-            )
-            diffs = [abs(float(r[1] or 0.0) - overall) for r in rows]
-            scores['Tình trạng hôn nhân'] = max(diffs) if diffs else 0.0
-        except Exception:
-            scores['Tình trạng hôn nhân'] = 0.0
+        cols = ', '.join(f"c.{f}" for f in FEATURE_NAMES)
+        query = f"""
+            SELECT p.probability, {cols}
+            FROM predictions_log p JOIN customers c ON p.customer_id = c.id
+            WHERE p.created_at >= %s
+        """
+        chunks = [np.asarray(rows, dtype=np.float64) for rows in self.db.stream(query, (since_iso,), batch_size=5000)]
+        data = np.vstack(chunks) if chunks else np.empty((0, len(FEATURE_NAMES) + 1))
+        scores = self._shap_lite_scores(data[:, 0], data[:, 1:], float(threshold))
 
-        # PAY_0, PAY_2 (if available on customers)
-        for col, label in [('PAY_0', 'PAY_0'), ('PAY_2', 'PAY_2')]:
-            try:
-                rows = self.db.fetch_all(
-                    f"""
-                    SELECT c.{col}, AVG(CASE WHEN p.probability >= 0.60 THEN 1 ELSE 0 END) AS rate
-                    FROM predictions_log p JOIN customers c ON p.customer_id = c.id
-                    WHERE p.created_at >= %s
-                    GROUP BY c.{col}
-                    """,
-                    (since_iso,)
-                )
-                diffs = [abs(float(r[1] or 0.0) - overall) for r in rows]
-                scores[label] = max(diffs) if diffs else 0.0
-            except Exception:
-                scores[label] = 0.0
+        with self._shap_lite_lock:
+            self._shap_lite_cache = {
+                k: v for k, v in self._shap_lite_cache.items() if now - v[0] < self.SHAP_LITE_TTL
+            }
+            self._shap_lite_cache[key] = (now, scores)
+        return dict(scores)
 
+    @staticmethod
+    def _shap_lite_scores(probs: np.ndarray, X: np.ndarray, threshold: float) -> Dict[str, float]:
+        """Tính điểm SHAP-lite từ vector probability và ma trận features (n, 41)"""
+        scores: Dict[str, float] = {}
+        high = (probs >= threshold).astype(np.float64)
+        overall = float(high.mean()) if high.size else 0.0
+        for j, name in enumerate(FEATURE_NAMES):
+            label = _SHAP_LITE_LABELS.get(name, name)
+            col = X[:, j]
+            valid = ~np.isnan(col)
+            col, hv = col[valid], high[valid]
+            if col.size == 0:
+                scores[label] = 0.0
+                continue
+            if name in _SHAP_LITE_CATEGORICAL:
+                _, inv = np.unique(col, return_inverse=True)
+                rates = np.bincount(inv, weights=hv) / np.bincount(inv)
+                scores[label] = float(np.max(np.abs(rates - overall)))
+            else:
+                cut = _SHAP_LITE_SPLITS.get(name, float(col.mean()))
+                upper = col >= cut
+                rate_hi = float(hv[upper].mean()) if upper.any() else 0.0
+                rate_lo = float(hv[~upper].mean()) if (~upper).any() else 0.0
+                scores[label] = abs(rate_hi - rate_lo)
         return scores
 
     def get_prediction_stats(self) -> Dict:
-        query = """
-            SELECT 
-                COUNT(*) AS total_predictions,
-                SUM(CASE WHEN probability >= 0.60 THEN 1 ELSE 0 END) AS high_risk_count,
-                AVG(probability) AS avg_probability
-            FROM predictions_log
+        # high_risk_count: probability >= 0.60
+        return self.aggregates.get_stats(high_bucket=self.aggregates.threshold_bucket(0.60))
+
+    def _build_time_where(self, time_range: str) -> tuple:
         """
-        row = self.db.fetch_one(query)
-        if not row:
-            return {'total_predictions': 0, 'high_risk_count': 0, 'avg_probability': 0.0}
-        return {
-            'total_predictions': int(row[0] or 0),
-            'high_risk_count': int(row[1] or 0),
-            'avg_probability': float(row[2] or 0.0)
-        }
+        WHERE theo bộ lọc thời gian dạng khoảng nửa mở trên p.created_at (dùng được idx_created)
 
-    def _build_time_where(self, time_range: str) -> str:
-        tr = (time_range or '').strip().lower()
-        if 'hôm nay' in tr or 'hom nay' in tr or 'today' in tr:
-            return "DATE(p.created_at) = CURDATE()"
-        if 'tuần' in tr or 'tuan' in tr or 'week' in tr:
-            return "YEARWEEK(p.created_at) = YEARWEEK(CURDATE())"
-        if 'quý' in tr or 'quy' in tr or 'quarter' in tr:
-            return "YEAR(p.created_at) = YEAR(CURDATE()) AND QUARTER(p.created_at) = QUARTER(CURDATE())"
-        if 'năm' in tr or 'nam' in tr or 'year' in tr:
-            return "YEAR(p.created_at) = YEAR(CURDATE())"
-        if 'tất cả' in tr or 'tat ca' in tr or 'all' in tr:
-            return "1 = 1"
-        return "DATE_FORMAT(p.created_at,'%Y-%m') = DATE_FORMAT(CURDATE(),'%Y-%m')"
+        Returns:
+            Tuple (where_parts, params)
+        """
+        return time_where(resolve_time_range(time_range))
 
     def get_prediction_stats_filtered(self, time_range: str, status_filter: str, user_id: Optional[int] = None) -> Dict:
-        where_parts = [self._build_time_where(time_range)]
-        sf = (status_filter or '').strip().lower()
-        if 'nguy cơ cao' in sf or 'cao' in sf or 'high' in sf:
-            where_parts.append("p.predicted_label = 1")
-        elif 'nguy cơ thấp' in sf or 'thấp' in sf or 'low' in sf:
-            where_parts.append("p.predicted_label = 0")
-        if user_id is not None:
-            where_parts.append("p.user_id = %s")
-        where_sql = ' AND '.join(where_parts)
-        query = f"""
-            SELECT 
-                COUNT(*) AS total_predictions,
-                SUM(CASE WHEN p.predicted_label = 1 THEN 1 ELSE 0 END) AS high_risk_count,
-                AVG(p.probability) AS avg_probability
-            FROM predictions_log p
-            WHERE {where_sql}
-        """
-        params = (user_id,) if user_id is not None else tuple()
-        row = self.db.fetch_one(query, params if params else None)
-        if not row:
-            return {'total_predictions': 0, 'high_risk_count': 0, 'avg_probability': 0.0}
-        return {
-            'total_predictions': int(row[0] or 0),
-            'high_risk_count': int(row[1] or 0),
-            'avg_probability': float(row[2] or 0.0)
-        }
+        # Khoảng thời gian của bộ lọc luôn tròn ngày -> đọc predictions_daily_agg
+        start_day, end_day = bounds_to_days(resolve_time_range(time_range))
+        return self.get_prediction_stats_range(start_day, end_day, status_filter, user_id)
 
     def get_prediction_stats_range(self, start_date: Optional[str], end_date: Optional[str], status_filter: str, user_id: Optional[int] = None) -> Dict:
-        where_parts = []
-        if start_date and end_date:
-            where_parts.append("DATE(p.created_at) BETWEEN %s AND %s")
+        return self.aggregates.get_stats(start_date, end_date, user_id=user_id, label=self._status_label(status_filter))
+
+    @staticmethod
+    def _status_label(status_filter: Optional[str]) -> Optional[int]:
+        """'Nguy cơ cao' -> 1, 'Nguy cơ thấp' -> 0, còn lại None"""
         sf = (status_filter or '').strip().lower()
         if 'nguy cơ cao' in sf or 'cao' in sf or 'high' in sf:
-            where_parts.append("p.predicted_label = 1")
-        elif 'nguy cơ thấp' in sf or 'thấp' in sf or 'low' in sf:
-            where_parts.append("p.predicted_label = 0")
-        if user_id is not None:
-            where_parts.append("p.user_id = %s")
-        where_sql = ' AND '.join(where_parts) if where_parts else '1=1'
-        query = f"""
-            SELECT 
-                COUNT(*) AS total_predictions,
-                SUM(CASE WHEN p.predicted_label = 1 THEN 1 ELSE 0 END) AS high_risk_count,
-                AVG(p.probability) AS avg_probability
-            FROM predictions_log p
-            WHERE {where_sql}
+            return 1
+        if 'nguy cơ thấp' in sf or 'thấp' in sf or 'low' in sf:
+            return 0
+        return None
+
+    # ===================== Dashboard snapshot =====================
+    def get_dashboard_snapshot(self, filters: Optional[Dict] = None) -> DashboardSnapshot:
+        """
+        Toàn bộ số liệu của 1 lần refresh Dashboard / Report trong tối đa 3 câu SQL:
+        predictions_daily_agg (KPI, risk bucket, chuỗi tháng/quý/tuần - UNION ALL các subquery GROUP BY),
+        customers (nhân khẩu học + PAY_0 - conditional aggregation), danh sách top/bottom/trễ hạn + model active
+
+        Args:
+            filters: Dict (mọi khóa tùy chọn)
+                time_range: Text bộ lọc ('Hôm nay', 'Tháng này', ...) - kỳ lọc
+                since: 'YYYY-MM-DD' - kỳ lọc [since, nay) nếu không có time_range
+                start_date, end_date: Khoảng ngày đóng cho stats (Report)
+                status: Bộ lọc trạng thái ('Nguy cơ cao' / 'Nguy cơ thấp' / 'Tất cả') cho stats
+                user_id: Chỉ tính dự báo của user này (stats, bucket, nhân khẩu học, top)
+                model_name: Model cho top/bottom/trễ hạn (mặc định model active)
+                months, quarters, weeks: Độ dài chuỗi (mặc định 12, 8, 8)
+                top_n, late_limit: Số dòng top/bottom (10) và trễ hạn (20)
+                sections: Tập section cần tính (mặc định tất cả, xem DashboardSnapshot.SECTIONS)
+
+        Returns:
+            DashboardSnapshot
         """
-        params: list = []
-        if start_date and end_date:
-            params += [start_date, end_date]
+        t0 = time.perf_counter()
+        f = dict(filters or {})
+        snap = DashboardSnapshot(f)
+        sections = set(f.get('sections') or DashboardSnapshot.SECTIONS)
+        user_id = f.get('user_id')
+        if f.get('time_range'):
+            period = resolve_time_range(f['time_range'])
+        elif f.get('since'):
+            period = (datetime.fromisoformat(str(f['since'])[:10]), None)
+        else:
+            period = (None, None)
+
+        if sections & {'stats', 'buckets', 'series'}:
+            snap.queries += self._snapshot_aggregates(snap, sections, period, user_id)
+        if sections & {'demographics', 'payment_status'}:
+            snap.queries += self._snapshot_customers(snap, sections, period, user_id)
+        if sections & {'top', 'late', 'active_model'}:
+            snap.queries += self._snapshot_lists(snap, sections, period, user_id)
+        snap.elapsed_ms = (time.perf_counter() - t0) * 1000
+        return snap
+
+    @staticmethod
+    def _agg_where(bounds: tuple, user_id: Optional[int]) -> tuple:
+        """WHERE trên predictions_daily_agg cho khoảng [start, end) đã căn theo ngày"""
+        start, end = bounds
+        parts, params = [], []
+        if start is not None:
+            parts.append("day >= %s")
+            params.append(start.strftime('%Y-%m-%d'))
+        if end is not None:
+            parts.append("day < %s")
+            params.append(end.strftime('%Y-%m-%d'))
         if user_id is not None:
-            params += [user_id]
-        row = self.db.fetch_one(query, tuple(params) if params else None)
-        if not row:
-            return {'total_predictions': 0, 'high_risk_count': 0, 'avg_probability': 0.0}
-        return {
-            'total_predictions': int(row[0] or 0),
-            'high_risk_count': int(row[1] or 0),
-            'avg_probability': float(row[2] or 0.0)
-        }
+            parts.append("user_id = %s")
+            params.append(user_id)
+        return (('WHERE ' + ' AND '.join(parts)) if parts else ''), params
+
+    def _snapshot_aggregates(self, snap: DashboardSnapshot, sections: set, period: tuple, user_id: Optional[int]) -> int:
+        """KPI + risk bucket + chuỗi tháng/quý/tuần: 1 câu UNION ALL trên predictions_daily_agg"""
+        self.aggregates.refresh()
+        f = snap.filters
+        high60 = self.aggregates.threshold_bucket(0.60)
+        q_thr = self._get_dashboard_threshold_override(float(f.get('threshold', 0.60)))
+        q_bucket = self.aggregates.threshold_bucket(q_thr)
+        sums = "SUM(n_total), SUM(n_default), SUM(sum_probability), SUM(sum_probability_default)"
+        high_sql = "SUM(CASE WHEN prob_bucket >= %s THEN n_total ELSE 0 END)"
+        members: List[str] = []
+        params: List = []
+
+        def member(section: str, key_sql: str, high_bucket: Optional[int], where: tuple, group: bool):
+            where_sql, where_params = where
+            members.append(
+                f"SELECT '{section}', {key_sql}, {sums}, {high_sql} FROM {AGG_SOURCE} {where_sql}"
+                + (" GROUP BY 2" if group else "")
+            )
+            # Bucket không tồn tại (100) -> cột high = 0
+            params.extend([BUCKETS if high_bucket is None else high_bucket, *where_params])
+
+        if 'stats' in sections:
+            date_range = resolve_date_range(f.get('start_date'), f.get('end_date'))
+            if date_range != (None, None):
+                member('stats_range', "''", high60, self._agg_where(date_range, user_id), False)
+            member('stats_period', "''", high60, self._agg_where(period, user_id), False)
+            member('stats_all', "''", high60, ('', []), False)
+        if 'buckets' in sections:
+            member('bucket', "CAST(LEAST(prob_bucket DIV 20, 4) AS CHAR)", None, self._agg_where(period, user_id), True)
+        if 'series' in sections:
+            member('month', PERIOD_KEY_SQL['month'], None, ('', []), True)
+            member('quarter', PERIOD_KEY_SQL['quarter'], q_bucket, ('', []), True)
+            member('week', PERIOD_KEY_SQL['week'], None, ('', []), True)
+
+        rows = self.db.fetch_all(' UNION ALL '.join(members), tuple(params))
+        label = self._status_label(f.get('status'))
+        by_section: Dict[str, List[tuple]] = {}
+        for r in rows:
+            by_section.setdefault(r[0], []).append(r[1:])
+            if r[0] in ('stats_range', 'stats_period'):
+                # Như get_prediction_stats_range: nguy cơ cao = predicted_label=1
+                stats = stats_from_sums(r[2], r[3], r[4], r[5], r[3], label)
+                setattr(snap, 'stats' if r[0] == 'stats_range' else 'period_stats', stats)
+            elif r[0] == 'stats_all':
+                # Như get_prediction_stats: nguy cơ cao = probability >= 0.60
+                snap.overall_stats = stats_from_sums(r[2], r[3], r[4], r[5], r[6])
+        if 'stats' in sections and 'stats_range' not in by_section:
+            snap.stats = snap.period_stats
+        if 'buckets' in sections:
+            snap.risk_buckets = {k: 0 for k in RISK_BUCKET_KEYS}
+            for key, n_total, *_ in by_section.get('bucket', []):
+                snap.risk_buckets[RISK_BUCKET_KEYS[int(key)]] = int(n_total or 0)
+        n_queries = 1
+        if 'series' in sections:
+            def counts(section: str, col: int) -> List[tuple]:
+                items = [(str(r[0]), int(r[1] or 0), int(r[col] or 0)) for r in by_section.get(section, [])]
+                return sorted(items)
+            monthly, weekly = counts('month', 2), counts('week', 2)
+            if q_bucket is not None:
+                quarterly = counts('quarter', 5)
+            else:
+                quarterly = self._get_quarterly_high_counts(q_thr)
+                n_queries += 1
+            months, quarters, weeks = int(f.get('months', 12)), int(f.get('quarters', 8)), int(f.get('weeks', 8))
+            snap.monthly_default_rate = self._fill_rates(monthly, self._month_keys(months))
+            snap.monthly_default_rate_recent = self._recent_rates(monthly, months)
+            snap.quarterly_high_risk_rate = self._fill_rates(quarterly, self._quarter_keys(quarters))
+            snap.quarterly_high_risk_rate_recent = self._recent_rates(quarterly, quarters)
+            snap.weekly_default_rate = self._fill_rates(weekly, self._week_keys(weeks))
+        return n_queries
+
+    def _snapshot_customers(self, snap: DashboardSnapshot, sections: set, period: tuple, user_id: Optional[int]) -> int:
+        """Nhân khẩu học (1 GROUP BY SEX, MARRIAGE, EDUCATION) + phân bổ PAY_0: 1 câu UNION ALL"""
+        members: List[str] = []
+        params: List = []
+        if 'demographics' in sections:
+            where_parts, where_params = time_where(period)
+            if user_id is not None:
+                where_parts.append("p.user_id = %s")
+                where_params.append(user_id)
+            if where_parts:
+                source = f"customers c JOIN predictions_log p ON p.customer_id = c.id WHERE {' AND '.join(where_parts)}"
+            else:
+                source = "customers c"
+            members.append(
+                f"SELECT 'demo', c.SEX, c.MARRIAGE, c.EDUCATION, COUNT(*) FROM {source} "
+                "GROUP BY c.SEX, c.MARRIAGE, c.EDUCATION"
+            )
+            params.extend(where_params)
+        if 'payment_status' in sections:
+            members.append(
+                "SELECT 'pay', LEAST(GREATEST(c.PAY_0, 0), 3), NULL, NULL, COUNT(*) FROM customers c GROUP BY 2"
+            )
+        rows = self.db.fetch_all(' UNION ALL '.join(members), tuple(params) if params else None)
+        pay_labels = ['On time', '1 mo late', '2 mo late', '3+ mo late']
+        if 'payment_status' in sections:
+            snap.payment_status = {k: 0 for k in pay_labels}
+        for section, a, b, c, n in rows:
+            n = int(n or 0)
+            if section == 'demo':
+                for mp, label in (
+                    (snap.gender, self._map_sex_label(a)),
+                    (snap.marriage, self._map_marriage_label(b)),
+                    (snap.education, self._map_education_label(c)),
+                ):
+                    mp[label] = mp.get(label, 0) + n
+            elif a is not None:
+                snap.payment_status[pay_labels[int(a)]] = n
+        return 1
+
+    def _snapshot_lists(self, snap: DashboardSnapshot, sections: set, period: tuple, user_id: Optional[int]) -> int:
+        """Top/bottom, khách hàng trễ hạn và model active: 1 câu UNION ALL các subquery có LIMIT"""
+        f = snap.filters
+        members: List[str] = []
+        params: List = []
+        if f.get('model_name'):
+            model_sql, model_params = "%s", [f['model_name']]
+        else:
+            model_sql, model_params = f"({_LATEST_MODEL_SQL})", []
+        if 'top' in sections:
+            if user_id is None:
+                where_parts, where_params = time_where(period, column='s.scored_at')
+                source = (
+                    "FROM customer_latest_score s INNER JOIN customers c ON s.customer_id = c.id "
+                    f"WHERE {' AND '.join([f's.model_name = {model_sql}', *where_parts])}"
+                )
+                cols, prob = "s.customer_id, s.probability, s.predicted_label", "s.probability"
+                where_params = [*model_params, *where_params]
+            else:
+                where_parts, where_params = time_where(period)
+                where_parts.append("p.user_id = %s")
+                where_params.append(user_id)
+                source = (
+                    "FROM predictions_log p INNER JOIN customers c ON p.customer_id = c.id "
+                    f"WHERE {' AND '.join(where_parts)}"
+                )
+                cols, prob = "p.customer_id, p.probability, p.predicted_label", "p.probability"
+            for section, order in (('top', 'DESC'), ('bottom', 'ASC')):
+                members.append(
+                    f"(SELECT '{section}', {cols}, c.customer_name, c.customer_id_card, NULL, NULL, NULL "
+                    f"{source} ORDER BY {prob} {order} LIMIT %s)"
+                )
+                params.extend([*where_params, int(f.get('top_n', 10))])
+        if 'late' in sections:
+            members.append(
+                f"(SELECT 'late', c.id, s.probability, NULL, c.customer_name, c.customer_id_card, c.PAY_0, "
+                f"GREATEST(c.BILL_AMT1 - c.PAY_AMT1, 0) AS overdue, {_LATE_RISK_SQL} "
+                f"FROM customers c LEFT JOIN customer_latest_score s ON s.customer_id = c.id AND s.model_name = {model_sql} "
+                "WHERE c.PAY_0 >= 1 ORDER BY c.PAY_0 DESC, overdue DESC LIMIT %s)"
+            )
+            params.extend([*model_params, int(f.get('late_limit', 20))])
+        if 'active_model' in sections:
+            members.append(
+                "(SELECT 'active', NULL, NULL, NULL, NULL, NULL, NULL, NULL, model_name "
+                "FROM model_registry WHERE is_active = 1 LIMIT 1)"
+            )
+        rows = self.db.fetch_all(' UNION ALL '.join(members), tuple(params) if params else None)
+        for section, cid, prob, label, name, id_card, pay0, overdue, text in rows:
+            if section in ('top', 'bottom'):
+                getattr(snap, section).append({
+                    'customer_id': int(cid or 0),
+                    'probability': float(prob or 0.0),
+                    'label': int(label or 0),
+                    'customer_name': name,
+                    'customer_id_card': id_card,
+                })
+            elif section == 'late':
+                snap.late_customers.append({
+                    'customer_name': name,
+                    'customer_id_card': id_card,
+                    'risk': text,
+                    'months_late': int(pay0 or 0),
+                    'amount_overdue': float(overdue or 0.0),
+                })
+            elif section == 'active':
+                snap.active_model = text
+        return 1
 
     def get_predictions_join_customers_range(self, start_date: Optional[str], end_date: Optional[str], status_filter: str, limit: int = 200, user_id: Optional[int] = None) -> List[Dict]:
-        where_parts = []
-        if start_date and end_date:
-            where_parts.append("DATE(p.created_at) BETWEEN %s AND %s")
+        where_parts, params = time_where(resolve_date_range(start_date, end_date))
         sf = (status_filter or '').strip().lower()
         if 'nguy cơ cao' in sf or 'cao' in sf or 'high' in sf:
             where_parts.append("p.predicted_label = 1")
@@ -662,28 +845,27 @@ class QueryService:
         where_sql = ' AND '.join(where_parts) if where_parts else '1=1'
         query = f"""
             SELECT p.customer_id, p.probability, p.predicted_label, p.created_at, p.raw_input_json, p.user_id,
-                   c.customer_name, c.customer_id_card, c.LIMIT_BAL, c.AGE, c.PAY_0, c.BILL_AMT1
+                   c.customer_name, c.customer_id_card, c.LIMIT_BAL, c.AGE, c.PAY_0, c.BILL_AMT1,
+                   {raw_input_columns(self.db)}
             FROM predictions_log p
             LEFT JOIN customers c ON p.customer_id = c.id
             WHERE {where_sql}
             ORDER BY p.created_at DESC
             LIMIT %s
         """
-        params: list = []
-        if start_date and end_date:
-            params += [start_date, end_date]
         if user_id is not None:
             params += [user_id]
         params += [limit]
         rows = self.db.fetch_all(query, tuple(params))
+        raw_inputs = self._resolve_raw_inputs(rows, 4)
         results: List[Dict] = []
-        for r in rows:
+        for r, raw_input_json in zip(rows, raw_inputs):
             results.append({
                 'customer_id': int(r[0] or 0),
                 'probability': float(r[1] or 0.0),
                 'label': int(r[2] or 0),
                 'created_at': r[3],
-                'raw_input_json': r[4],
+                'raw_input_json': raw_input_json,
                 'user_id': int(r[5] or 0) if r[5] is not None else None,
                 'customer_name': r[6],
                 'customer_id_card': r[7],
@@ -695,7 +877,7 @@ class QueryService:
         return results
 
     def get_predictions_join_customers(self, time_range: str, status_filter: str, limit: int = 200, user_id: Optional[int] = None) -> List[Dict]:
-        where_parts = [self._build_time_where(time_range)]
+        where_parts, params = self._build_time_where(time_range)
         sf = (status_filter or '').strip().lower()
         if 'nguy cơ cao' in sf or 'cao' in sf or 'high' in sf:
             where_parts.append("p.predicted_label = 1")
@@ -703,26 +885,30 @@ class QueryService:
             where_parts.append("p.predicted_label = 0")
         if user_id is not None:
             where_parts.append("p.user_id = %s")
-        where_sql = ' AND '.join(where_parts)
+        where_sql = ' AND '.join(where_parts) if where_parts else '1=1'
         query = f"""
             SELECT p.customer_id, p.probability, p.predicted_label, p.created_at, p.raw_input_json, p.user_id,
-                   c.customer_name, c.customer_id_card, c.LIMIT_BAL, c.AGE, c.PAY_0, c.BILL_AMT1
+                   c.customer_name, c.customer_id_card, c.LIMIT_BAL, c.AGE, c.PAY_0, c.BILL_AMT1,
+                   {raw_input_columns(self.db)}
             FROM predictions_log p
             LEFT JOIN customers c ON p.customer_id = c.id
             WHERE {where_sql}
             ORDER BY p.created_at DESC
             LIMIT %s
         """
-        params: tuple = (user_id, limit) if user_id is not None else (limit,)
-        rows = self.db.fetch_all(query, params)
+        if user_id is not None:
+            params += [user_id]
+        params += [limit]
+        rows = self.db.fetch_all(query, tuple(params))
+        raw_inputs = self._resolve_raw_inputs(rows, 4)
         results: List[Dict] = []
-        for r in rows:
+        for r, raw_input_json in zip(rows, raw_inputs):
             results.append({
                 'customer_id': int(r[0] or 0),
                 'probability': float(r[1] or 0.0),
                 'label': int(r[2] or 0),
                 'created_at': r[3],
-                'raw_input_json': r[4],
+                'raw_input_json': raw_input_json,
                 'user_id': int(r[5] or 0) if r[5] is not None else None,
                 'customer_name': r[6],
                 'customer_id_card': r[7],
@@ -735,10 +921,15 @@ class QueryService:
 
     def get_top_predictions_join_customers_filtered(self, ascending: bool, time_range: str, limit: int = 10, user_id: Optional[int] = None) -> List[Dict]:
         order = "ASC" if ascending else "DESC"
-        where_parts = [self._build_time_where(time_range)]
+        if user_id is None:
+            # Điểm mới nhất mỗi khách hàng: đi theo idx_model_probability, lọc scored_at, dừng ở LIMIT
+            where_parts, params = time_where(resolve_time_range(time_range), column='s.scored_at')
+            return self._top_latest_scores(order, limit, where_parts, params)
+        where_parts, params = self._build_time_where(time_range)
         if user_id is not None:
             where_parts.append("p.user_id = %s")
-        where_sql = ' AND '.join(where_parts)
+            params.append(user_id)
+        where_sql = ' AND '.join(where_parts) if where_parts else '1=1'
         query = f"""
             SELECT p.customer_id, p.probability, p.predicted_label,
                    c.customer_name, c.customer_id_card
@@ -748,8 +939,7 @@ class QueryService:
             ORDER BY p.probability {order}
             LIMIT %s
         """
-        params: tuple = (user_id, limit) if user_id is not None else (limit,)
-        rows = self.db.fetch_all(query, params)
+        rows = self.db.fetch_all(query, tuple(params + [limit]))
         results: List[Dict] = []
         for r in rows:
             results.append({
@@ -762,10 +952,12 @@ class QueryService:
         return results
 
     def get_demographics_counts_filtered(self, time_range: str, user_id: Optional[int] = None) -> tuple:
-        where_parts = [self._build_time_where(time_range)]
+        where_parts, params = self._build_time_where(time_range)
         if user_id is not None:
             where_parts.append("p.user_id = %s")
-        where_sql = ' AND '.join(where_parts)
+            params.append(user_id)
+        where_sql = ' AND '.join(where_parts) if where_parts else '1=1'
+        params = tuple(params) if params else None
         # Gender
         rows = self.db.fetch_all(
             f"""
@@ -774,7 +966,7 @@ class QueryService:
             WHERE {where_sql}
             GROUP BY c.SEX
             """,
-            (user_id,) if user_id is not None else None
+            params
         )
         gender_map = {self._map_sex_label(r[0]): int(r[1]) for r in rows}
         # Marriage
@@ -785,7 +977,7 @@ class QueryService:
             WHERE {where_sql}
             GROUP BY c.MARRIAGE
             """,
-            (user_id,) if user_id is not None else None
+            params
         )
         marriage_map = {self._map_marriage_label(r[0]): int(r[1]) for r in rows}
         # Education
@@ -796,7 +988,7 @@ class QueryService:
             WHERE {where_sql}
             GROUP BY c.EDUCATION
             """,
-            (user_id,) if user_id is not None else None
+            params
         )
         education_map = {self._map_education_label(r[0]): int(r[1]) for r in rows}
         return gender_map, marriage_map, education_map
@@ -814,9 +1006,9 @@ class QueryService:
                 SUM(CASE WHEN probability >= 0.60 AND probability < 0.80 THEN 1 ELSE 0 END) AS b60_80,
                 SUM(CASE WHEN probability >= 0.80 AND probability <= 1.00 THEN 1 ELSE 0 END) AS b80_100
             FROM predictions_log
-            WHERE DATE(created_at) = %s
+            WHERE created_at >= %s AND created_at < %s
         """
-        r = self.db.fetch_one(query, (d,))
+        r = self.db.fetch_one(query, day_bounds(d))
         if not r:
             return {'0_20': 0, '20_40': 0, '40_60': 0, '60_80': 0, '80_100': 0}
         return {
@@ -839,11 +1031,11 @@ class QueryService:
                    c.PAY_0, c.BILL_AMT1
             FROM predictions_log p
             LEFT JOIN customers c ON p.customer_id = c.id
-            WHERE DATE(p.created_at) = %s
+            WHERE p.created_at >= %s AND p.created_at < %s
             ORDER BY p.probability DESC
             LIMIT %s
         """
-        rows = self.db.fetch_all(query, (d, limit))
+        rows = self.db.fetch_all(query, (*day_bounds(d), limit))
         results: List[Dict] = []
         for r in rows:
             results.append({
@@ -862,17 +1054,58 @@ class QueryService:
             })
         return results
 
-    def get_top_predictions_join_customers(self, limit: int = 10, ascending: bool = False) -> List[Dict]:
+    def get_top_predictions_join_customers(self, limit: int = 10, ascending: bool = False, model_name: Optional[str] = None) -> List[Dict]:
         order = "ASC" if ascending else "DESC"
+        return self._top_latest_scores(order, limit, model_name=model_name)
+
+    # ===================== customer_latest_score =====================
+    def _latest_score_model(self, model_name: Optional[str] = None) -> Optional[str]:
+        """
+        Model dùng cho tra cứu customer_latest_score
+
+        Returns:
+            model_name nếu truyền vào, ngược lại model active trong model_registry
+            (không có thì 1 model bất kỳ đã có điểm), None nếu bảng rỗng
+        """
+        if model_name:
+            return model_name
+        row = self.db.fetch_one(f"SELECT {_LATEST_MODEL_SQL}")
+        return row[0] if row and row[0] else None
+
+    def _top_latest_scores(
+        self,
+        order: str,
+        limit: int,
+        where_parts: Optional[List[str]] = None,
+        params: Optional[List] = None,
+        model_name: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Top-N khách hàng theo điểm mới nhất (index scan trên (model_name, probability))
+
+        Args:
+            order: 'ASC' hoặc 'DESC'
+            limit: Số dòng
+            where_parts, params: Điều kiện thêm trên alias s (vd. s.scored_at)
+            model_name: Model (mặc định: _latest_score_model)
+
+        Returns:
+            List dict customer_id, probability, label, customer_name, customer_id_card
+        """
+        model = self._latest_score_model(model_name)
+        if model is None:
+            return []
+        where_sql = ' AND '.join(['s.model_name = %s', *(where_parts or [])])
         query = f"""
-            SELECT p.customer_id, p.probability, p.predicted_label,
+            SELECT s.customer_id, s.probability, s.predicted_label,
                    c.customer_name, c.customer_id_card
-            FROM predictions_log p
-            INNER JOIN customers c ON p.customer_id = c.id
-            ORDER BY p.probability {order}
+            FROM customer_latest_score s
+            INNER JOIN customers c ON s.customer_id = c.id
+            WHERE {where_sql}
+            ORDER BY s.probability {order}
             LIMIT %s
         """
-        rows = self.db.fetch_all(query, (limit,))
+        rows = self.db.fetch_all(query, (model, *(params or []), limit))
         results: List[Dict] = []
         for r in rows:
             results.append({
@@ -887,43 +1120,45 @@ class QueryService:
     def get_recent_predictions_join_customers(self, period: str = 'today', limit: int = 100) -> List[Dict]:
         period = (period or 'today').strip().lower()
         if period in ('today', 'hôm nay', 'hom nay'):
-            where = "WHERE DATE(p.created_at) = CURDATE()"
+            where_parts, params = time_where(resolve_time_range('today'))
         elif period in ('week', 'tuần này', 'tuan nay'):
-            where = "WHERE p.created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)"
+            where_parts, params = ["p.created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)"], []
         else:
             # month
-            where = "WHERE DATE_FORMAT(p.created_at,'%Y-%m') = DATE_FORMAT(CURDATE(),'%Y-%m')"
+            where_parts, params = time_where(resolve_time_range('month'))
+        where = 'WHERE ' + ' AND '.join(where_parts)
         query = f"""
             SELECT p.customer_id, p.predicted_label, p.probability, p.created_at, p.raw_input_json, p.user_id,
-                   c.customer_name, c.customer_id_card
+                   c.customer_name, c.customer_id_card, {raw_input_columns(self.db)}
             FROM predictions_log p
             LEFT JOIN customers c ON p.customer_id = c.id
             {where}
             ORDER BY p.created_at DESC
             LIMIT %s
         """
-        rows = self.db.fetch_all(query, (limit,))
+        rows = self.db.fetch_all(query, tuple(params + [limit]))
         if not rows and period in ('today','hôm nay','hom nay'):
             drow = self.db.fetch_one("SELECT DATE(created_at) FROM predictions_log ORDER BY created_at DESC LIMIT 1")
             if drow and drow[0]:
-                query2 = """
+                query2 = f"""
                     SELECT p.customer_id, p.predicted_label, p.probability, p.created_at, p.raw_input_json, p.user_id,
-                           c.customer_name, c.customer_id_card
+                           c.customer_name, c.customer_id_card, {raw_input_columns(self.db)}
                     FROM predictions_log p
                     LEFT JOIN customers c ON p.customer_id = c.id
-                    WHERE DATE(p.created_at) = %s
+                    WHERE p.created_at >= %s AND p.created_at < %s
                     ORDER BY p.probability DESC
                     LIMIT %s
                 """
-                rows = self.db.fetch_all(query2, (drow[0], limit))
+                rows = self.db.fetch_all(query2, (*day_bounds(drow[0]), limit))
+        raw_inputs = self._resolve_raw_inputs(rows, 4)
         results: List[Dict] = []
-        for r in rows:
+        for r, raw_input_json in zip(rows, raw_inputs):
             results.append({
                 'customer_id': int(r[0] or 0),
                 'predicted_label': int(r[1] or 0),
                 'probability': float(r[2] or 0.0),
                 'created_at': r[3],
-                'raw_input_json': r[4],
+                'raw_input_json': raw_input_json,
                 'user_id': r[5],
                 'customer_name': r[6],
                 'customer_id_card': r[7],
@@ -949,36 +1184,20 @@ class QueryService:
             '3+ mo late': int(r[3] or 0),
         }
 
-    def get_top_late_customers_with_risk(self, limit: int = 20) -> List[Dict]:
-        row = self.db.fetch_one("SELECT DATE(created_at) FROM predictions_log ORDER BY created_at DESC LIMIT 1")
-        d = row[0] if row and row[0] else None
-        if d:
-            query = """
-                SELECT c.customer_name, c.customer_id_card,
-                       CASE WHEN p.probability >= 0.60 THEN 'High'
-                            WHEN p.probability >= 0.40 THEN 'Medium'
-                            ELSE 'Low' END AS risk,
-                       c.PAY_0,
-                       GREATEST(c.BILL_AMT1 - c.PAY_AMT1, 0) AS overdue
-                FROM customers c
-                LEFT JOIN predictions_log p ON p.customer_id = c.id AND DATE(p.created_at) = %s
-                WHERE c.PAY_0 >= 1
-                ORDER BY c.PAY_0 DESC, overdue DESC
-                LIMIT %s
-            """
-            rows = self.db.fetch_all(query, (d, limit))
-        else:
-            query = """
-                SELECT c.customer_name, c.customer_id_card,
-                       'Low' AS risk,
-                       c.PAY_0,
-                       GREATEST(c.BILL_AMT1 - c.PAY_AMT1, 0) AS overdue
-                FROM customers c
-                WHERE c.PAY_0 >= 1
-                ORDER BY c.PAY_0 DESC, overdue DESC
-                LIMIT %s
-            """
-            rows = self.db.fetch_all(query, (limit,))
+    def get_top_late_customers_with_risk(self, limit: int = 20, model_name: Optional[str] = None) -> List[Dict]:
+        # Risk theo điểm mới nhất của khách hàng (PK lookup customer_latest_score), không có điểm -> Low
+        model = self._latest_score_model(model_name)
+        query = """
+            SELECT c.customer_name, c.customer_id_card, {risk},
+                   c.PAY_0,
+                   GREATEST(c.BILL_AMT1 - c.PAY_AMT1, 0) AS overdue
+            FROM customers c
+            LEFT JOIN customer_latest_score s ON s.customer_id = c.id AND s.model_name = %s
+            WHERE c.PAY_0 >= 1
+            ORDER BY c.PAY_0 DESC, overdue DESC
+            LIMIT %s
+        """.format(risk=_LATE_RISK_SQL)
+        rows = self.db.fetch_all(query, (model or '', limit))
         result: List[Dict] = []
         for r in rows:
             result.append({
@@ -1003,47 +1222,60 @@ class QueryService:
     def _map_education_label(code: int) -> str:
         return {1: 'Cao học', 2: 'Đại học', 3: 'Trung học', 4: 'Khác'}.get(code, str(code))
 
-    def get_customers_by_probability_range(self, min_prob: float, max_prob: Optional[float] = None, limit: int = 50) -> List[Dict]:
-        query = """
-            SELECT 
-                p.id as prediction_id,
-                p.customer_id,
-                p.probability,
-                c.customer_id_card,
-                c.customer_name
-            FROM predictions_log p
-            LEFT JOIN customers c ON p.customer_id = c.id
-            WHERE p.probability >= %s {upper}
-            ORDER BY p.created_at DESC
+    def get_customers_by_probability_range(self, min_prob: float, max_prob: Optional[float] = None, limit: int = 50, model_name: Optional[str] = None) -> List[Dict]:
+        """
+        Khách hàng có điểm mới nhất trong [min_prob, max_prob) - range scan trên idx_model_probability
+
+        Args:
+            min_prob: Cận dưới (bao gồm)
+            max_prob: Cận trên (không bao gồm), None = không giới hạn
+            limit: Số dòng tối đa
+            model_name: Model (mặc định: model active)
+
+        Returns:
+            List dict customer_id, model_name, probability, label, scored_at, customer_id_card, customer_name;
+            xác suất giảm dần
+        """
+        model = self._latest_score_model(model_name)
+        if model is None:
+            return []
+        upper_clause = "AND s.probability < %s" if max_prob is not None else ""
+        query = f"""
+            SELECT s.customer_id, s.probability, s.predicted_label, s.scored_at,
+                   c.customer_id_card, c.customer_name
+            FROM customer_latest_score s
+            INNER JOIN customers c ON s.customer_id = c.id
+            WHERE s.model_name = %s AND s.probability >= %s {upper_clause}
+            ORDER BY s.probability DESC
             LIMIT %s
         """
-        upper_clause = "AND p.probability < %s" if max_prob is not None else ""
-        query = query.format(upper=upper_clause)
-        params = (min_prob, max_prob, limit) if max_prob is not None else (min_prob, limit)
+        params = (model, min_prob, max_prob, limit) if max_prob is not None else (model, min_prob, limit)
         rows = self.db.fetch_all(query, params)
         results = []
         for r in rows:
             results.append({
-                'prediction_id': r[0],
-                'customer_id': r[1],
-                'probability': float(r[2]),
-                'customer_id_card': r[3],
-                'customer_name': r[4],
+                'customer_id': r[0],
+                'model_name': model,
+                'probability': float(r[1]),
+                'label': int(r[2] or 0),
+                'scored_at': r[3],
+                'customer_id_card': r[4],
+                'customer_name': r[5],
             })
         return results
 
-    def get_customers_by_tier(self, tier: str, limit: int = 50) -> List[Dict]:
+    def get_customers_by_tier(self, tier: str, limit: int = 50, model_name: Optional[str] = None) -> List[Dict]:
         tier = tier.strip().lower()
         if tier in ('trung bình', 'trung binh', 'medium'):
-            return self.get_customers_by_probability_range(0.4, 0.6, limit)
+            return self.get_customers_by_probability_range(0.4, 0.6, limit, model_name)
         if tier in ('cao', 'high'):
-            return self.get_customers_by_probability_range(0.6, 0.8, limit)
+            return self.get_customers_by_probability_range(0.6, 0.8, limit, model_name)
         if tier in ('rất cao', 'rat cao', 'very high'):
-            return self.get_customers_by_probability_range(0.8, None, limit)
+            return self.get_customers_by_probability_range(0.8, None, limit, model_name)
         if tier in ('rất thấp', 'rat thap', 'very low'):
-            return self.get_customers_by_probability_range(0.0, 0.2, limit)
+            return self.get_customers_by_probability_range(0.0, 0.2, limit, model_name)
         if tier in ('thấp', 'thap', 'low'):
-            return self.get_customers_by_probability_range(0.2, 0.4, limit)
+            return self.get_customers_by_probability_range(0.2, 0.4, limit, model_name)
         return []
     
     def search_customers(self, keyword: str, limit: int = 50) -> List[Dict]:
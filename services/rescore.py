@@ -0,0 +1,364 @@
+"""
+Rescore Service
+Chấm điểm lại toàn bộ bảng customers bằng model đang active trong model_registry
+
+Chạy:
+    python -m services.rescore                  # model active, tự resume nếu job trước bị dừng
+    python -m services.rescore --model LightGBM --workers 4 --chunk-size 5000
+    python -m services.rescore --restart        # bỏ checkpoint, chấm lại từ đầu
+
+- Đọc customers theo keyset pagination (id > last_id ORDER BY id LIMIT n) với cursor không buffer
+- Chấm điểm từng chunk trong process pool, mỗi worker giữ model riêng (ModelCache của process)
+- Ghi predictions_log bằng multi-row INSERT, cùng transaction với customer_latest_score
+  và checkpoint (last customer id)
+"""
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from ml.predictor import ModelPredictor
+from ml.preprocess import FEATURE_NAMES
+from services.latest_score import ensure_latest_score_table, upsert_latest_scores
+from services.ml_service import resolve_model_path
+
+
+DEFAULT_CHUNK_SIZE = 2000
+FETCH_BATCH = 500
+RAW_INPUT_MARKER = json.dumps({'source': 'rescore'})
+
+CHECKPOINT_DDL = """
+    CREATE TABLE IF NOT EXISTS rescore_checkpoint (
+        job_key VARCHAR(100) PRIMARY KEY,
+        model_name VARCHAR(50) NOT NULL,
+        last_customer_id INT NOT NULL DEFAULT 0,
+        rows_scored INT NOT NULL DEFAULT 0,
+        status ENUM('running', 'completed', 'failed') DEFAULT 'running',
+        started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+INSERT_PREDICTION = """
+    INSERT INTO predictions_log (
+        customer_id, model_name, predicted_label, probability, raw_input_json, user_id, model_version
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+UPSERT_CHECKPOINT = """
+    INSERT INTO rescore_checkpoint (job_key, model_name, last_customer_id, rows_scored, status)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        last_customer_id = VALUES(last_customer_id),
+        rows_scored = VALUES(rows_scored),
+        status = VALUES(status)
+"""
+
+
+# ===================== Worker process =====================
+_worker_predictor: Optional[ModelPredictor] = None
+
+
+def _init_worker(model_path: str):
+    """Load model 1 lần cho mỗi worker process"""
+    global _worker_predictor
+    _worker_predictor = ModelPredictor(model_path)
+    if not _worker_predictor.load_model():
+        raise RuntimeError(f"Không load được model: {model_path}")
+
+
+def _score_chunk(ids: np.ndarray, X: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Chấm điểm 1 chunk trong worker (X là ma trận thô theo FEATURE_NAMES)"""
+    labels, probs = _worker_predictor.predict_batch(X, threshold=threshold)
+    return ids, labels, probs
+
+
+class _InlineFuture:
+    """Kết quả đồng bộ có cùng interface với Future (dùng khi workers=0)"""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+class RescoreService:
+    """
+    Service chấm điểm lại toàn bộ khách hàng theo chunk, có checkpoint để resume
+    """
+
+    def __init__(self, db_connector: DatabaseConnector):
+        """
+        Khởi tạo RescoreService
+
+        Args:
+            db_connector: Instance DatabaseConnector đã connect
+        """
+        self.db = db_connector
+        self.db.execute_query(CHECKPOINT_DDL)
+        ensure_latest_score_table(self.db)
+
+    # ---------- model / checkpoint ----------
+    def get_active_model(self) -> Optional[Dict]:
+        """Lấy model active trong model_registry"""
+        row = self.db.fetch_one(
+            "SELECT model_name, model_path, threshold FROM model_registry WHERE is_active = 1 LIMIT 1"
+        )
+        if not row:
+            return None
+        return {
+            'model_name': row[0],
+            'model_path': row[1],
+            'threshold': float(row[2]) if row[2] is not None else None,
+        }
+
+    def get_checkpoint(self, job_key: str) -> Optional[Dict]:
+        row = self.db.fetch_one(
+            "SELECT last_customer_id, rows_scored, status FROM rescore_checkpoint WHERE job_key = %s",
+            (job_key,)
+        )
+        if not row:
+            return None
+        return {'last_customer_id': int(row[0]), 'rows_scored': int(row[1]), 'status': row[2]}
+
+    def reset_checkpoint(self, job_key: str) -> bool:
+        return self.db.execute_query("DELETE FROM rescore_checkpoint WHERE job_key = %s", (job_key,))
+
+    @staticmethod
+    def make_job_key(model_name: str, model_path: str) -> str:
+        """Job key = tên model + mtime file model (model mới -> job mới, crash -> cùng job)"""
+        try:
+            mtime = int(Path(model_path).stat().st_mtime)
+        except OSError:
+            mtime = 0
+        return f"{model_name}@{mtime}"
+
+    # ---------- streaming ----------
+    def iter_customer_chunks(self, after_id: int, chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Đọc customers theo keyset pagination, mỗi trang qua cursor không buffer (stream từ server)
+
+        Args:
+            after_id: Chỉ đọc các customer có id > after_id
+            chunk_size: Số dòng mỗi chunk
+
+        Yields:
+            Tuple (ids int64 (n,), X float64 (n, 41))
+        """
+        query = f"""
+            SELECT id, {', '.join(FEATURE_NAMES)}
+            FROM customers
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """
+        last_id = int(after_id)
+        while True:
+            # iter_numpy (raise khi lỗi, khác fetch_numpy) - DECIMAL parse theo cột, không qua Decimal
+            parts = list(self.db.iter_numpy(query, (last_id, chunk_size), dtypes={'id': np.int64}, chunk_size=FETCH_BATCH))
+            n = sum(len(p['id']) for p in parts)
+            if n == 0:
+                return
+            ids = np.concatenate([p['id'] for p in parts])
+            X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+            offset = 0
+            for p in parts:
+                m = len(p['id'])
+                for j, f in enumerate(FEATURE_NAMES):
+                    X[offset:offset + m, j] = p[f]
+                offset += m
+            last_id = int(ids[n - 1])
+            yield ids, X
+            if n < chunk_size:
+                return
+
+    # ---------- write ----------
+    def _write_chunk(
+        self,
+        job_key: str,
+        model_name: str,
+        ids: np.ndarray,
+        labels: np.ndarray,
+        probs: np.ndarray,
+        rows_scored: int,
+        user_id: Optional[int]
+    ) -> bool:
+        """Ghi predictions + customer_latest_score + checkpoint trong cùng 1 transaction"""
+        rows = [
+            (int(cid), model_name, int(lbl), round(float(p), 4), RAW_INPUT_MARKER, user_id, 'rescore')
+            for cid, lbl, p in zip(ids, labels, probs)
+        ]
+        if not self.db.execute_many(INSERT_PREDICTION, rows, commit=False):
+            return False
+        if not upsert_latest_scores(self.db, [r[:4] for r in rows]):
+            return False
+        ok = self.db.execute_query(
+            UPSERT_CHECKPOINT,
+            (job_key, model_name, int(ids[-1]), rows_scored, 'running'),
+            commit=False
+        )
+        if not ok:
+            return False
+        return self.db.commit()
+
+    # ---------- run ----------
+    def run(
+        self,
+        model_name: Optional[str] = None,
+        model_path: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: int = 2,
+        threshold: Optional[float] = None,
+        job_key: Optional[str] = None,
+        restart: bool = False,
+        user_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Chấm điểm lại toàn bộ customers
+
+        Args:
+            model_name: Tên model (None = model active trong model_registry)
+            model_path: Đường dẫn file model (None = theo registry / mặc định)
+            chunk_size: Số khách hàng mỗi chunk
+            workers: Số worker process (0 = chấm trong process hiện tại)
+            threshold: Ngưỡng gán nhãn (None = threshold trong registry hoặc 0.5)
+            job_key: Khóa checkpoint (None = tên model + mtime file model)
+            restart: Bỏ checkpoint cũ và chấm lại từ đầu
+            user_id: User thực hiện (ghi vào predictions_log)
+
+        Returns:
+            Dict thống kê: rows, seconds, rows_per_sec, last_customer_id, job_key
+        """
+        active = self.get_active_model() or {}
+        if model_name is None:
+            model_name = active.get('model_name') or 'XGBoost'
+        if model_path is None:
+            registry_path = active.get('model_path') if active.get('model_name') == model_name else None
+            model_path = resolve_model_path(model_name, registry_path)
+        if threshold is None:
+            threshold = active.get('threshold') if active.get('model_name') == model_name else None
+            threshold = float(threshold) if threshold is not None else 0.5
+        if not Path(model_path).exists():
+            raise FileNotFoundError(f"Không tìm thấy model: {model_path}")
+
+        job_key = job_key or self.make_job_key(model_name, model_path)
+        if restart:
+            self.reset_checkpoint(job_key)
+        checkpoint = self.get_checkpoint(job_key)
+        if checkpoint and checkpoint['status'] == 'completed':
+            print(f"✓ Job {job_key} đã hoàn thành trước đó ({checkpoint['rows_scored']:,} dòng) - dùng --restart để chạy lại")
+            return {'job_key': job_key, 'rows': 0, 'seconds': 0.0, 'rows_per_sec': 0.0,
+                    'last_customer_id': checkpoint['last_customer_id'], 'skipped': True}
+
+        last_id = checkpoint['last_customer_id'] if checkpoint else 0
+        rows_scored = checkpoint['rows_scored'] if checkpoint else 0
+        if checkpoint:
+            print(f"↻ Resume job {job_key} từ customer id > {last_id} ({rows_scored:,} dòng đã chấm)")
+        else:
+            print(f"▶ Bắt đầu job {job_key} - model {model_name} ({model_path})")
+
+        executor = None
+        if workers > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(model_path,)
+            )
+        else:
+            _init_worker(model_path)
+
+        max_inflight = max(2, workers * 2)
+        inflight: deque = deque()
+        rows_this_run = 0
+        t0 = time.perf_counter()
+
+        def drain_one():
+            nonlocal rows_scored, rows_this_run, last_id
+            ids, labels, probs = inflight.popleft().result()
+            rows_scored += len(ids)
+            if not self._write_chunk(job_key, model_name, ids, labels, probs, rows_scored, user_id):
+                raise RuntimeError(f"Ghi predictions_log thất bại: {self.db.last_error}")
+            rows_this_run += len(ids)
+            last_id = int(ids[-1])
+            elapsed = time.perf_counter() - t0
+            print(f"  ✓ {rows_scored:,} dòng (id ≤ {last_id}) - {rows_this_run / max(elapsed, 1e-9):,.0f} rows/s")
+
+        try:
+            for ids, X in self.iter_customer_chunks(last_id, chunk_size):
+                if executor is not None:
+                    inflight.append(executor.submit(_score_chunk, ids, X, threshold))
+                else:
+                    inflight.append(_InlineFuture(_score_chunk(ids, X, threshold)))
+                # Ghi theo đúng thứ tự chunk để checkpoint luôn tăng liên tục
+                while len(inflight) >= max_inflight:
+                    drain_one()
+            while inflight:
+                drain_one()
+        except BaseException:
+            self.db.rollback()
+            self.db.execute_query(
+                "UPDATE rescore_checkpoint SET status = 'failed' WHERE job_key = %s", (job_key,)
+            )
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        self.db.execute_query(UPSERT_CHECKPOINT, (job_key, model_name, last_id, rows_scored, 'completed'))
+        elapsed = time.perf_counter() - t0
+        stats = {
+            'job_key': job_key,
+            'rows': rows_this_run,
+            'seconds': elapsed,
+            'rows_per_sec': rows_this_run / elapsed if elapsed > 0 else 0.0,
+            'last_customer_id': last_id,
+            'skipped': False,
+        }
+        print(f"✓ Hoàn thành {rows_this_run:,} dòng trong {elapsed:.1f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chấm điểm lại toàn bộ customers vào predictions_log")
+    parser.add_argument('--model', dest='model_name', default=None, help='Tên model (mặc định: model active)')
+    parser.add_argument('--model-path', default=None, help='Đường dẫn file model (.pkl)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=2, help='Số worker process (0 = không dùng pool)')
+    parser.add_argument('--threshold', type=float, default=None)
+    parser.add_argument('--job-key', default=None, help='Khóa checkpoint (mặc định: model@mtime)')
+    parser.add_argument('--restart', action='store_true', help='Bỏ checkpoint và chấm lại từ đầu')
+    parser.add_argument('--user-id', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    db = DatabaseConnector(DatabaseConfig.default())
+    if not db.connect():
+        print("✗ Không kết nối được database")
+        return 1
+    try:
+        RescoreService(db).run(
+            model_name=args.model_name,
+            model_path=args.model_path,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            threshold=args.threshold,
+            job_key=args.job_key,
+            restart=args.restart,
+            user_id=args.user_id,
+        )
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Time Range
+Đổi bộ lọc thời gian của Report ('Hôm nay', 'Tuần', 'Tháng', 'Quý', 'Năm', 'Tất cả', khoảng ngày)
+thành khoảng nửa mở [start, end) để WHERE dùng được index idx_created:
+
+    p.created_at >= %s AND p.created_at < %s
+
+thay vì bọc cột trong DATE()/YEARWEEK()/DATE_FORMAT() (full scan).
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+TimeBounds = Tuple[Optional[datetime], Optional[datetime]]
+
+
+def _start_of_day(d: Union[date, datetime]) -> datetime:
+    return datetime(d.year, d.month, d.day)
+
+
+def _add_months(d: datetime, months: int) -> datetime:
+    idx = d.year * 12 + (d.month - 1) + months
+    return d.replace(year=idx // 12, month=idx % 12 + 1, day=1)
+
+
+def resolve_time_range(time_range: str, now: Optional[datetime] = None) -> TimeBounds:
+    """
+    Tính khoảng [start, end) cho bộ lọc thời gian (cùng ngữ nghĩa với bộ lọc cũ)
+
+    Args:
+        time_range: Text combobox ('Hôm nay', 'Tuần này', 'Tháng này', 'Quý này', 'Năm nay', 'Tất cả')
+        now: Thời điểm hiện tại (mặc định datetime.now())
+
+    Returns:
+        Tuple (start, end); (None, None) nếu 'Tất cả'. Không khớp -> tháng hiện tại
+    """
+    tr = (time_range or '').strip().lower()
+    today = _start_of_day(now or datetime.now())
+    if 'hôm nay' in tr or 'hom nay' in tr or 'today' in tr:
+        return today, today + timedelta(days=1)
+    if 'tuần' in tr or 'tuan' in tr or 'week' in tr:
+        # Tuần bắt đầu Chủ nhật như YEARWEEK() mode 0 trước đây
+        start = today - timedelta(days=(today.weekday() + 1) % 7)
+        return start, start + timedelta(days=7)
+    if 'quý' in tr or 'quy' in tr or 'quarter' in tr:
+        start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+        return start, _add_months(start, 3)
+    if 'năm' in tr or 'nam' in tr or 'year' in tr:
+        start = today.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    if 'tất cả' in tr or 'tat ca' in tr or 'all' in tr:
+        return None, None
+    start = today.replace(day=1)
+    return start, _add_months(start, 1)
+
+
+def resolve_date_range(start_date: Optional[str], end_date: Optional[str]) -> TimeBounds:
+    """
+    Khoảng ngày đóng [start_date, end_date] (YYYY-MM-DD) -> [start 00:00, end_date+1 00:00)
+
+    Returns:
+        (None, None) nếu thiếu 1 trong 2 ngày (không lọc, như trước)
+    """
+    if not start_date or not end_date:
+        return None, None
+    start = _start_of_day(date.fromisoformat(str(start_date)[:10]))
+    end = _start_of_day(date.fromisoformat(str(end_date)[:10])) + timedelta(days=1)
+    return start, end
+
+
+def day_bounds(d: Union[date, datetime]) -> TimeBounds:
+    """Khoảng [00:00, 00:00 ngày sau) của 1 ngày"""
+    start = _start_of_day(d)
+    return start, start + timedelta(days=1)
+
+
+def bounds_to_days(bounds: TimeBounds) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Đổi khoảng [start, end) đã căn theo ngày thành ngày đóng (YYYY-MM-DD) cho predictions_daily_agg
+
+    Returns:
+        (start_day, end_day) hoặc (None, None) nếu không lọc
+    """
+    start, end = bounds
+    if start is None or end is None:
+        return None, None
+    return start.strftime('%Y-%m-%d'), (end - timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def time_where(bounds: TimeBounds, column: str = 'p.created_at') -> Tuple[List[str], List[datetime]]:
+    """
+    Predicate sargable cho khoảng [start, end)
+
+    Args:
+        bounds: (start, end), mỗi đầu có thể None
+        column: Cột datetime cần lọc
+
+    Returns:
+        Tuple (where_parts, params)
+    """
+    start, end = bounds
+    parts: List[str] = []
+    params: List[datetime] = []
+    if start is not None:
+        parts.append(f"{column} >= %s")
+        params.append(start)
+    if end is not None:
+        parts.append(f"{column} < %s")
+        params.append(end)
+    return parts, params
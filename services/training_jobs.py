@@ -0,0 +1,478 @@
+"""
+Training Jobs
+Chạy ModelManagementService.fit_model trong process riêng (spawn), nhiều job song song có giới hạn,
+tiến độ từng boosting round gửi về qua Pipe riêng của từng job
+
+    runner = get_training_job_runner(db.config)
+    runner.add_listener(lambda job: ...)              # gọi từ thread monitor mỗi khi job đổi trạng thái / tiến độ
+    job_id = runner.submit('XGBoost', X_train, y_train, X_test, y_test, username='admin')
+    runner.cancel(job_id)
+    runner.get_jobs()
+
+- Dữ liệu ghi 1 lần ra .npy trong thư mục tạm của job, worker np.load(mmap_mode='r') - không pickle qua pipe
+- Tối đa max_concurrent job chạy cùng lúc, job còn lại xếp hàng (queued); mỗi job n_jobs = số CPU / max_concurrent
+- Job cùng model_name chạy lần lượt (cùng file {name}_model.pkl / thư mục artifact), job sau chờ trong hàng đợi
+- Hủy: job đang chờ bỏ ngay; job đang chạy dừng ở boosting round kế tiếp, quá CANCEL_GRACE_S thì terminate process.
+  Mỗi job có Pipe riêng, bỏ cùng job: terminate 1 worker không làm hỏng kênh tiến độ của job khác
+- Bảng training_jobs lưu trạng thái / tiến độ (ghi tiến độ tối đa 1 lần / PROGRESS_WRITE_INTERVAL giây mỗi job);
+  train xong, process chính ghi model_registry qua ModelManagementService.register_model
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from multiprocessing.connection import wait as wait_connections
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.database_config import DatabaseConfig
+from database.connector import DatabaseConnector
+from ml.utils import load_arrays, save_arrays
+
+
+DEFAULT_MAX_CONCURRENT = 2
+CANCEL_GRACE_S = 10.0
+PROGRESS_WRITE_INTERVAL = 2.0
+# Gửi tiến độ từng round tối đa ~10 lần / giây
+ITERATION_MIN_INTERVAL = 0.1
+# Model nhận n_jobs từ runner (CatBoost dùng thread_count - để mặc định)
+N_JOBS_MODELS = ('XGBoost', 'LightGBM', 'RandomForest')
+FINAL_STATES = ('completed', 'failed', 'cancelled')
+
+
+class _EventToken:
+    """cancel_token (is_cancelled) trên multiprocessing.Event"""
+
+    def __init__(self, event):
+        self._event = event
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+def _write_data(directory: Path, X_train, y_train, X_test, y_test) -> Dict[str, Any]:
+    spec = {'dir': str(directory), 'columns': [str(c) for c in getattr(X_train, 'columns', [])]}
+    save_arrays(directory, {
+        name: np.asarray(part, dtype=np.float64 if name.startswith('X') else np.int8)
+        for name, part in (('X_train', X_train), ('y_train', y_train), ('X_test', X_test), ('y_test', y_test))
+    })
+    return spec
+
+
+def _read_data(spec: Dict[str, Any]):
+    parts = load_arrays(spec['dir'], ('X_train', 'y_train', 'X_test', 'y_test'))
+    for name in ('X_train', 'X_test'):
+        if spec['columns']:
+            parts[name] = pd.DataFrame(parts[name], columns=spec['columns'], copy=False)
+    return parts['X_train'], parts['y_train'], parts['X_test'], parts['y_test']
+
+
+def _job_main(job: Dict[str, Any], messages, cancel_event):
+    """Entry point của process worker: fit + lưu file, gửi ('progress' | 'iteration' | 'done', job_id, payload) qua Pipe của job"""
+    job_id = job['job_id']
+    # numpy đã load khi import module này: biến môi trường chỉ tới thư viện load sau, BLAS giới hạn qua limit_threads
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(job['n_jobs'])
+    try:
+        from ml.train_orchestrator import limit_threads
+        from services.model_management_service import ModelManagementService
+
+        last_sent = [0.0]
+        last_progress = [-1, 0.0]
+
+        def on_iteration(info):
+            now = time.perf_counter()
+            if now - last_sent[0] >= ITERATION_MIN_INTERVAL or info['round'] >= info['total']:
+                last_sent[0] = now
+                messages.send(('iteration', job_id, info))
+
+        def on_progress(pct):
+            # Cùng nhịp với on_iteration: bỏ % trùng, tối đa 1 tin / ITERATION_MIN_INTERVAL (trừ 100%)
+            pct, now = int(pct), time.perf_counter()
+            if pct == last_progress[0]:
+                return
+            if now - last_progress[1] >= ITERATION_MIN_INTERVAL or pct >= 100:
+                last_progress[0], last_progress[1] = pct, now
+                messages.send(('progress', job_id, pct))
+
+        X_train, y_train, X_test, y_test = _read_data(job['data'])
+        # Worker không ghi database: process chính register_model khi nhận 'done'
+        with limit_threads(job['n_jobs']):
+            result = ModelManagementService(None).fit_model(
+                job['model_name'], X_train, y_train, X_test, y_test, job['username'],
+                progress_callback=on_progress,
+                params=job['params'],
+                on_iteration=on_iteration,
+                cancel_token=_EventToken(cancel_event)
+            )
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    messages.send(('done', job_id, result))
+    messages.close()
+
+
+class TrainingJobRunner:
+    """
+    Hàng đợi job train chạy trên process riêng, 1 thread monitor nhận tiến độ và cập nhật bảng job
+    """
+
+    def __init__(
+        self,
+        config: DatabaseConfig,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        total_cpus: Optional[int] = None
+    ):
+        """
+        Khởi tạo TrainingJobRunner (thread monitor start ngay)
+
+        Args:
+            config: DatabaseConfig - runner dùng connector riêng (pool) để an toàn giữa các thread
+            max_concurrent: Số job train cùng lúc
+            total_cpus: Tổng CPU chia cho các job chạy cùng lúc (mặc định os.cpu_count())
+        """
+        self.db = DatabaseConnector(config, use_pool=True)
+        self.db.connect()
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.n_jobs = max(1, int(total_cpus or os.cpu_count() or 1) // self.max_concurrent)
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._pending: List[str] = []
+        # job_id -> [Process, Event hủy, thời điểm yêu cầu hủy, Connection nhận tin (None khi đã đóng)]
+        self._running: Dict[str, list] = {}
+        self._last_write: Dict[str, float] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='training-job-monitor', daemon=True)
+        self._thread.start()
+
+    # ---------- API ----------
+    def submit(
+        self,
+        model_name: str,
+        X_train,
+        y_train,
+        X_test,
+        y_test,
+        username: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Đưa 1 job train vào hàng đợi (job cùng model_name với job đang chạy chờ job đó xong)
+
+        Returns:
+            job_id
+        """
+        job_id = uuid4().hex[:16]
+        data_dir = Path(tempfile.mkdtemp(prefix=f'train_job_{job_id}_'))
+        params = dict(params or {})
+        if model_name in N_JOBS_MODELS:
+            params.setdefault('n_jobs', self.n_jobs)
+        job = {
+            'job_id': job_id,
+            'model_name': model_name,
+            'username': username,
+            'params': params,
+            'n_jobs': self.n_jobs,
+            'data': _write_data(data_dir, X_train, y_train, X_test, y_test),
+            'status': 'queued',
+            'progress': 0,
+            'round': None,
+            'total_rounds': None,
+            'eval_auc': None,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._pending.append(job_id)
+        self.db.execute_query(
+            "INSERT INTO training_jobs (job_id, model_name, status, params, submitted_by) VALUES (%s, %s, 'queued', %s, %s)",
+            (job_id, model_name, json.dumps(params), username)
+        )
+        print(f"✓ Training job {job_id}: {model_name} (queued)")
+        self._notify(job_id)
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Hủy job (đang chờ: bỏ ngay; đang chạy: dừng ở round kế tiếp, quá CANCEL_GRACE_S thì terminate)
+
+        Returns:
+            False nếu job không tồn tại / đã kết thúc
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINAL_STATES:
+                return False
+            if job_id in self._pending:
+                self._pending.remove(job_id)
+                pending = True
+            else:
+                pending = False
+                entry = self._running.get(job_id)
+                if entry is not None and entry[2] is None:
+                    entry[1].set()
+                    entry[2] = time.monotonic()
+                job['status'] = 'cancelling'
+        if pending:
+            self._finish(job_id, 'cancelled', error='Hủy trước khi chạy')
+        else:
+            self._notify(job_id)
+        return True
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def get_jobs(self) -> List[Dict[str, Any]]:
+        """Mọi job của runner (mới nhất trước)"""
+        with self._lock:
+            jobs = [self._public(j) for j in self._jobs.values()]
+        return sorted(jobs, key=lambda j: j['created_at'], reverse=True)
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """callback(job) được gọi từ thread monitor khi job đổi trạng thái / tiến độ"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def close(self, timeout: float = CANCEL_GRACE_S):
+        """Hủy mọi job, chờ worker thoát (quá timeout thì terminate) rồi dừng thread monitor"""
+        with self._lock:
+            job_ids = [j for j in self._jobs if self._jobs[j]['status'] not in FINAL_STATES]
+        for job_id in job_ids:
+            self.cancel(job_id)
+        deadline = time.monotonic() + timeout
+        while self._running and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self._stop.set()
+        self._thread.join(timeout=max(0.0, deadline - time.monotonic()) + 1.0)
+        for process, _, _, conn in list(self._running.values()):
+            process.terminate()
+            if conn is not None:
+                conn.close()
+        self.db.close()
+
+    # ---------- monitor ----------
+    def _run(self):
+        while not self._stop.is_set():
+            self._start_pending()
+            with self._lock:
+                conns = {e[3]: job_id for job_id, e in self._running.items() if e[3] is not None}
+            if conns:
+                ready = wait_connections(list(conns), timeout=0.2)
+            else:
+                ready = []
+                self._stop.wait(0.2)
+            for conn in ready:
+                self._read_messages(conns[conn], conn)
+            self._check_processes()
+
+    def _read_messages(self, job_id: str, conn):
+        """Đọc hết tin đang có trên Pipe của job; EOF / tin hỏng (worker bị terminate) -> đóng kênh"""
+        while True:
+            try:
+                if not conn.poll():
+                    return
+                kind, _, payload = conn.recv()
+            except Exception:
+                self._close_channel(job_id)
+                return
+            if kind == 'progress':
+                self._update(job_id, progress=payload)
+            elif kind == 'iteration':
+                self._update(job_id, round=payload['round'], total_rounds=payload['total'], eval_auc=payload['auc'])
+            elif kind == 'done':
+                self._done(job_id, payload)
+                return
+
+    def _close_channel(self, job_id: str):
+        with self._lock:
+            entry = self._running.get(job_id)
+            conn = entry[3] if entry is not None else None
+            if entry is not None:
+                entry[3] = None
+        if conn is not None:
+            conn.close()
+
+    def _start_pending(self):
+        while True:
+            with self._lock:
+                if len(self._running) >= self.max_concurrent:
+                    return
+                # Job đầu hàng đợi có model chưa chạy (2 job cùng model ghi đè file của nhau)
+                busy = {self._jobs[j]['model_name'] for j in self._running}
+                job_id = next((j for j in self._pending if self._jobs[j]['model_name'] not in busy), None)
+                if job_id is None:
+                    return
+                self._pending.remove(job_id)
+                job = self._jobs[job_id]
+                cancel_event = self._ctx.Event()
+                recv_conn, send_conn = self._ctx.Pipe(duplex=False)
+                spec = {k: job[k] for k in ('job_id', 'model_name', 'username', 'params', 'n_jobs', 'data')}
+                process = self._ctx.Process(
+                    target=_job_main, args=(spec, send_conn, cancel_event),
+                    name=f'train-{job["model_name"]}-{job_id}', daemon=True
+                )
+                self._running[job_id] = [process, cancel_event, None, recv_conn]
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+            process.start()
+            # Đóng đầu ghi ở process chính: worker thoát -> recv_conn nhận EOF
+            send_conn.close()
+            self.db.execute_query(
+                "UPDATE training_jobs SET status = 'running', started_at = NOW(), worker_pid = %s WHERE job_id = %s",
+                (process.pid, job_id)
+            )
+            print(f"✓ Training job {job_id}: {job['model_name']} started (pid {process.pid})")
+            self._notify(job_id)
+
+    def _check_processes(self):
+        """Worker chết không gửi 'done' (crash / bị terminate) và hủy quá hạn"""
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._running.items())
+        for job_id, (process, _, cancel_requested, conn) in items:
+            if cancel_requested is not None and process.is_alive() and now - cancel_requested > CANCEL_GRACE_S:
+                print(f"⚠ Training job {job_id}: không dừng sau {CANCEL_GRACE_S:.0f}s, terminate")
+                process.terminate()
+                process.join(timeout=5)
+            if not process.is_alive():
+                # 'done' có thể vẫn đang trên đường tới: đọc nốt trước khi kết luận crash
+                time.sleep(0.05)
+                with self._lock:
+                    still_running = job_id in self._running
+                if still_running and not self._has_messages(conn):
+                    if cancel_requested is not None:
+                        self._finish(job_id, 'cancelled', error='Đã hủy train')
+                    else:
+                        self._finish(job_id, 'failed', error=f'Worker thoát bất thường (exit code {process.exitcode})')
+
+    @staticmethod
+    def _has_messages(conn) -> bool:
+        try:
+            return conn is not None and conn.poll()
+        except (OSError, ValueError):
+            return False
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINAL_STATES:
+                return
+            job.update({k: v for k, v in fields.items() if v is not None})
+            if job['round'] and job['total_rounds']:
+                job['progress'] = max(job['progress'], 10 + int(50 * job['round'] / job['total_rounds']))
+            now = time.monotonic()
+            write = now - self._last_write.get(job_id, 0.0) >= PROGRESS_WRITE_INTERVAL
+            if write:
+                self._last_write[job_id] = now
+                row = (job['progress'], job['round'], job['total_rounds'], job['eval_auc'], job_id)
+        if write:
+            self.db.execute_query(
+                "UPDATE training_jobs SET progress = %s, current_round = %s, total_rounds = %s, eval_auc = %s "
+                "WHERE job_id = %s", row
+            )
+        self._notify(job_id)
+
+    def _done(self, job_id: str, result: Dict[str, Any]):
+        if result.get('success'):
+            username = self._jobs[job_id]['username']
+            try:
+                from services.model_management_service import ModelManagementService
+                ModelManagementService(self.db).register_model(result, username)
+            except Exception as e:
+                print(f"✗ Training job {job_id}: ghi model_registry lỗi: {e}")
+            self._finish(job_id, 'completed', result=result)
+        elif result.get('cancelled'):
+            self._finish(job_id, 'cancelled', error=result.get('error'))
+        else:
+            self._finish(job_id, 'failed', error=result.get('error'))
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINAL_STATES:
+                return
+            entry = self._running.pop(job_id, None)
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            if status == 'completed':
+                job['progress'] = 100
+            self._last_write.pop(job_id, None)
+        if entry is not None:
+            entry[0].join(timeout=5)
+            if entry[3] is not None:
+                entry[3].close()
+        shutil.rmtree(job['data']['dir'], ignore_errors=True)
+        metrics = (result or {}).get('metrics') or {}
+        self.db.execute_query(
+            "UPDATE training_jobs SET status = %s, progress = %s, test_auc = %s, cached = %s, error = %s, "
+            "finished_at = NOW() WHERE job_id = %s",
+            (status, job['progress'], metrics.get('auc'), bool((result or {}).get('cached')), error, job_id)
+        )
+        mark = '✓' if status == 'completed' else ('⚠' if status == 'cancelled' else '✗')
+        print(f"{mark} Training job {job_id}: {job['model_name']} {status}" + (f" ({error})" if error else ''))
+        self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        job = self.get_job(job_id)
+        if job is None:
+            return
+        for cb in list(self._listeners):
+            try:
+                cb(job)
+            except Exception as e:
+                print(f"✗ Training job listener lỗi: {e}")
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in job.items() if k not in ('data',)}
+
+
+_runners: Dict[tuple, TrainingJobRunner] = {}
+_runners_lock = threading.Lock()
+
+
+def get_training_job_runner(config: DatabaseConfig, max_concurrent: int = DEFAULT_MAX_CONCURRENT) -> TrainingJobRunner:
+    """TrainingJobRunner dùng chung theo database"""
+    key = config.pool_key()
+    with _runners_lock:
+        runner = _runners.get(key)
+        if runner is None:
+            runner = TrainingJobRunner(config, max_concurrent=max_concurrent)
+            _runners[key] = runner
+        return runner
+
+
+def close_training_job_runners(timeout: float = CANCEL_GRACE_S):
+    """Hủy job đang chạy và dừng mọi runner (gọi khi thoát ứng dụng)"""
+    with _runners_lock:
+        runners = list(_runners.values())
+        _runners.clear()
+    for runner in runners:
+        runner.close(timeout)
+
+
+atexit.register(close_training_job_runners)
@@ -14,6 +14,10 @@ from ui.LoginPage import LoginPage
 from ui.SignupPage import SignupPage
 from ui.MainWindow import MainWindow
 from ui.user_model import User as SimpleUser
+from database.pool import close_all_pools
+from ui.task_executor import shutdown_task_executor
+from services.prediction_log_writer import close_prediction_log_writers
+from services.training_jobs import close_training_job_runners
 
 
 class CreditRiskApp:
@@ -107,6 +111,13 @@ def main():
         rc = app.exec()
     except KeyboardInterrupt:
         rc = 0
+    # Dừng worker trước khi đóng pool DB (task có thể đang ghi MySQL)
+    shutdown_task_executor()
+    # Hủy job train nền (terminate worker không dừng kịp) trước khi đóng pool
+    close_training_job_runners()
+    # Flush hàng đợi predictions_log còn lại
+    close_prediction_log_writers()
+    close_all_pools()
     sys.exit(rc)
 
 
@@ -19,6 +19,7 @@ sys.path.insert(0, str(project_root))
 from models.user import User
 from services.gemini_service import GeminiService
 from database.connector import DatabaseConnector
+from services.feature_storage import raw_input_columns, resolve_raw_inputs
 
 
 class AIAssistantWidget(QWidget):
@@ -578,17 +579,28 @@ class AIAssistantWidget(QWidget):
             except Exception:
                 pass
     
+    @staticmethod
+    def _with_raw_inputs(rows):
+        """Điền raw_input_json (cột 9) từ features_f32 / extras_blob (2 cột cuối) rồi bỏ 2 cột đó"""
+        if not rows:
+            return rows
+        raw_inputs = resolve_raw_inputs([r[9] for r in rows], [r[-2] for r in rows], [r[-1] for r in rows])
+        return [tuple(r[:9]) + (raw,) + tuple(r[10:-2]) for r, raw in zip(rows, raw_inputs)]
+
     def get_user_context(self):
         """Get context chỉ từ predictions của user này (User role)"""
         try:
-            recent_predictions = self.db.fetch_all("""
-                SELECT p.*, c.customer_name, c.customer_id_card
+            recent_predictions = self.db.fetch_all(f"""
+                SELECT p.id, p.customer_id, p.user_id, p.model_name, p.model_version, p.predicted_label,
+                       p.probability, p.confidence_score, p.cluster_id, p.raw_input_json, p.created_at,
+                       c.customer_name, c.customer_id_card, {raw_input_columns(self.db)}
                 FROM predictions_log p
                 LEFT JOIN customers c ON p.customer_id = c.id
                 WHERE p.user_id = %s
                 ORDER BY p.created_at DESC
                 LIMIT 10
             """, (self.user.id,))
+            recent_predictions = self._with_raw_inputs(recent_predictions)
             
             return {
                 'user_predictions': recent_predictions,
@@ -603,14 +615,17 @@ class AIAssistantWidget(QWidget):
         """Get context từ toàn bộ database (Admin role)"""
         try:
             # All recent predictions
-            all_predictions = self.db.fetch_all("""
-                SELECT p.*, c.customer_name, c.customer_id_card, u.username
+            all_predictions = self.db.fetch_all(f"""
+                SELECT p.id, p.customer_id, p.user_id, p.model_name, p.model_version, p.predicted_label,
+                       p.probability, p.confidence_score, p.cluster_id, p.raw_input_json, p.created_at,
+                       c.customer_name, c.customer_id_card, u.username, {raw_input_columns(self.db)}
                 FROM predictions_log p
                 LEFT JOIN customers c ON p.customer_id = c.id
                 LEFT JOIN user u ON p.user_id = u.id
                 ORDER BY p.created_at DESC
                 LIMIT 50
             """)
+            all_predictions = self._with_raw_inputs(all_predictions)
             
             # System stats
             stats = self.db.fetch_one("""
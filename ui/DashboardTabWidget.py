@@ -61,6 +61,8 @@ class DashboardTabWidget(QWidget):
         self.period_kind = 'month'
         self.period_count = 12
         self.health_labels = {}
+        # Số liệu của lần refresh gần nhất (QueryService.get_dashboard_snapshot)
+        self.snapshot = None
         self.setup_ui()
         self.load_and_plot_data()
     
@@ -228,6 +230,7 @@ class DashboardTabWidget(QWidget):
         try:
             if hasattr(self.user, 'is_admin') and self.user.is_admin():
                 # Admin: giữ dashboard ML hiện tại
+                self.snapshot = self._load_snapshot({'sections': {'active_model'}})
                 self.eval_data = load_evaluation_data()
                 try:
                     self.title_top_left.setText('Tầm quan trọng đặc trưng')
@@ -246,6 +249,10 @@ class DashboardTabWidget(QWidget):
                     self.title_bottom_right.setText('Phân bổ khách hàng theo nhóm')
                 except Exception:
                     pass
+                self.snapshot = self._load_snapshot({
+                    'since': self._compute_since_iso(self.period_kind, self.period_count),
+                    'sections': {'stats', 'buckets', 'demographics', 'payment_status', 'top', 'late'},
+                })
                 self._plot_user_operational_dashboard()
                 self._update_kpi_cards()
             print("✓ Dashboard loaded successfully")
@@ -264,14 +271,7 @@ class DashboardTabWidget(QWidget):
             # Confusion Matrix: ưu tiên active model (mặc định LightGBM)
             ax = self.canvas_top_right.axes; ax.clear()
             confusion_matrices = self.eval_data.get('confusion_matrices', {})
-            active_name = 'LightGBM'
-            try:
-                if self.query_service and hasattr(self.query_service, 'db') and self.query_service.db:
-                    row = self.query_service.db.fetch_one("SELECT model_name FROM model_registry WHERE is_active = 1 LIMIT 1")
-                    if row and row[0]:
-                        active_name = str(row[0])
-            except Exception:
-                pass
+            active_name = self._active_model_name()
             cm = confusion_matrices.get(active_name)
             if cm is None:
                 cm = confusion_matrices.get('LightGBM')
@@ -363,7 +363,7 @@ class DashboardTabWidget(QWidget):
         try:
             ax = self.canvas_top_left.axes; ax.clear()
             since = self._compute_since_iso(self.period_kind, self.period_count)
-            buckets = self._get_risk_bucket_counts(since)
+            buckets = self.snapshot.risk_buckets if self.snapshot else self._get_risk_bucket_counts(since)
             labels = ['0–20%', '20–40%', '40–60%', '60–80%', '80–100%']
             values = [buckets.get('0_20', 0), buckets.get('20_40', 0), buckets.get('40_60', 0), buckets.get('60_80', 0), buckets.get('80_100', 0)]
             colors = self._assign_rank_colors(values)
@@ -423,7 +423,10 @@ class DashboardTabWidget(QWidget):
             ax2 = fig.add_subplot(gs[0,1])
             ax3 = fig.add_subplot(gs[0,2])
             since = self._compute_since_iso(self.period_kind, self.period_count)
-            gender, marriage, education = self._get_demographics_counts(since)
+            if self.snapshot:
+                gender, marriage, education = self.snapshot.demographics()
+            else:
+                gender, marriage, education = self._get_demographics_counts(since)
             def pie(ax, data, title):
                 labels = [str(k) for k in data.keys()]
                 sizes = [int(v) for v in data.values()]
@@ -443,7 +446,7 @@ class DashboardTabWidget(QWidget):
         # 5. Payment status distribution (PAY_0)
         try:
             ax = self.canvas_pay_status.axes; ax.clear()
-            dist = self.query_service.get_payment_status_distribution() if self.query_service else {}
+            dist = self.snapshot.payment_status if self.snapshot else {}
             labels = list(dist.keys())
             values = [int(dist[k]) for k in labels] if dist else []
             if values:
@@ -466,7 +469,7 @@ class DashboardTabWidget(QWidget):
 
         # 6. Late customers table (from DB)
         try:
-            rows = self.query_service.get_top_late_customers_with_risk(limit=20) if self.query_service else []
+            rows = self.snapshot.late_customers if self.snapshot else []
             self.table_late_customers.setRowCount(len(rows))
             for i, r in enumerate(rows):
                 vals = [r.get('customer_name'), r.get('customer_id_card'), r.get('risk'), r.get('months_late'), f"{r.get('amount_overdue',0.0):,.0f}"]
@@ -498,14 +501,7 @@ class DashboardTabWidget(QWidget):
             
             confusion_matrices = self.eval_data.get('confusion_matrices', {})
             # Ưu tiên active model (mặc định LightGBM)
-            active_name = 'LightGBM'
-            try:
-                if self.query_service and hasattr(self.query_service, 'db') and self.query_service.db:
-                    row = self.query_service.db.fetch_one("SELECT model_name FROM model_registry WHERE is_active = 1 LIMIT 1")
-                    if row and row[0]:
-                        active_name = str(row[0])
-            except Exception:
-                pass
+            active_name = self._active_model_name()
             cm = confusion_matrices.get(active_name)
             if cm is None:
                 cm = confusion_matrices.get('LightGBM')
@@ -588,14 +584,16 @@ class DashboardTabWidget(QWidget):
             mode = self.top_filter_mode.currentText()
         except Exception:
             pass
-        # Fetch latest-day predictions joined with customers
+        # Điểm mới nhất của khách hàng trong kỳ (đã có trong snapshot - đổi bộ lọc không truy vấn lại)
         rows = []
-        if self.query_service and hasattr(self.query_service, 'get_top_predictions_join_customers'):
-            try:
-                asc = (mode == 'Thấp nhất')
-                rows = self.query_service.get_top_predictions_join_customers(limit=10, ascending=asc)
-            except Exception:
-                rows = []
+        if self.snapshot:
+            rows = self.snapshot.top_list(ascending=(mode == 'Thấp nhất'))
+            if not rows:
+                # Không có điểm nào trong kỳ: lấy top toàn bộ như trước
+                try:
+                    rows = self.query_service.get_top_predictions_join_customers(limit=10, ascending=(mode == 'Thấp nhất'))
+                except Exception:
+                    rows = []
         # Fallback demo
         if not rows:
             rows = [
@@ -730,8 +728,8 @@ class DashboardTabWidget(QWidget):
             self.health_labels['feat']['desc'].setText(f"Độ lệch đặc trưng: N/A")
             self.health_labels['acc']['desc'].setText("Độ chính xác mô hình: N/A")
     def _update_kpi_cards(self):
-        stats = None
-        if self.query_service and hasattr(self.query_service, 'get_prediction_stats'):
+        stats = self.snapshot.overall_stats if self.snapshot else None
+        if stats is None and self.query_service and hasattr(self.query_service, 'get_prediction_stats'):
             try:
                 stats = self.query_service.get_prediction_stats()
             except Exception:
@@ -749,6 +747,22 @@ class DashboardTabWidget(QWidget):
             self.kpi_cards['high_rate'].setText(f"{high_rate*100:.1f}%")
             self.kpi_cards['avg_prob'].setText(f"{stats.get('avg_probability',0.0)*100:.1f}%")
 
+    def _load_snapshot(self, filters: dict):
+        """1 lần refresh = QueryService.get_dashboard_snapshot; None nếu không có DB (dùng dữ liệu demo)"""
+        if not self.query_service or not hasattr(self.query_service, 'get_dashboard_snapshot'):
+            return None
+        try:
+            return self.query_service.get_dashboard_snapshot(filters)
+        except Exception as e:
+            print(f"⚠ Lỗi lấy dashboard snapshot: {e}")
+            return None
+
+    def _active_model_name(self) -> str:
+        """Model active theo snapshot (mặc định LightGBM)"""
+        if self.snapshot and self.snapshot.active_model:
+            return str(self.snapshot.active_model)
+        return 'LightGBM'
+
     def _get_risk_bucket_counts(self, since_iso: str | None = None):
         if self.query_service:
             try:
@@ -13,6 +13,15 @@ project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
 from services.ml_service import MLService
+from ui.task_executor import get_task_executor
+
+
+def score_model(model_name: str, customer_data: Dict[str, Any], cancel_token=None):
+    """Chấm điểm 1 khách hàng bằng 1 model (chạy ở worker thread)"""
+    ml_service = MLService(model_name=model_name)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    return ml_service.predict_default_risk(customer_data)
 
 
 class ModelComparisonDialog(QDialog):
@@ -61,6 +70,9 @@ class ModelComparisonDialog(QDialog):
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.setRowCount(len(self.ALL_MODELS))
         layout.addWidget(self.table)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
         
         # Close button
         btn_layout = QHBoxLayout()
@@ -80,75 +92,96 @@ class ModelComparisonDialog(QDialog):
             pass
     
     def run_comparison(self):
-        """Chạy so sánh dự đoán từ các models"""
-        results = []
-        
+        """Chạy so sánh dự đoán từ các models (song song trên TaskExecutor, không chặn GUI)"""
         # Model name mapping
         model_name_map = {
             'Logistic': 'LogisticRegression'
         }
-        
+        self._display_names = {}
         for display_name in self.ALL_MODELS:
-            # Map display name to actual model name
             model_name = model_name_map.get(display_name, display_name)
-            
-            # Check if this is a trained model (simple check by name)
-            is_trained = model_name in self.TRAINED_MODELS
-            print(f"DEBUG: {display_name} → {model_name} → is_trained={is_trained} (TRAINED_MODELS={self.TRAINED_MODELS})")
-            
-            if is_trained:
-                # Run real prediction
-                try:
-                    ml_service = MLService(model_name=model_name)
-                    result = ml_service.predict_default_risk(self.customer_data)
-                    probability = result.probability
-                    risk_label = result.get_risk_label()
-                    status = "✅ Hợp lệ"
-                    print(f"✓ {display_name}: {probability:.2%}")
-                except Exception as e:
-                    print(f"✗ Error predicting with {display_name}: {e}")
-                    probability = 0.0
-                    risk_label = "Lỗi"
-                    status = "❌ Lỗi"
-                    is_trained = False
-            else:
+            if model_name in self.TRAINED_MODELS:
+                self._display_names[model_name] = display_name
+
+        self.status_label.setText(f"Đang chấm điểm {len(self._display_names)} mô hình...")
+        self._group = get_task_executor().map(
+            score_model,
+            list(self._display_names),
+            customer_data=self.customer_data,
+            on_progress=self._on_comparison_progress,
+            on_finished=self._on_comparison_finished,
+        )
+
+    def _on_comparison_progress(self, done: int, total: int):
+        self.status_label.setText(f"Đang chấm điểm... {done}/{total} mô hình")
+
+    def _on_comparison_finished(self, scored: dict):
+        """Gom kết quả từ các task và hiển thị bảng"""
+        if self._group.is_cancelled():
+            return
+        results = []
+        for display_name in self.ALL_MODELS:
+            model_name = next((m for m, d in self._display_names.items() if d == display_name), None)
+            if model_name is None:
                 # Demo model - show placeholder
-                probability = 0.0064  # Demo value 0.64%
-                risk_label = "Nguy cơ thấp"
-                status = "🔸 DEMO"
-            
-            results.append({
-                'model': display_name,
-                'probability': probability,
-                'risk_label': risk_label,
-                'status': status,
-                'is_trained': is_trained
-            })
-        
+                results.append({
+                    'model': display_name,
+                    'probability': 0.0064,  # Demo value 0.64%
+                    'risk_label': "Nguy cơ thấp",
+                    'status': "🔸 DEMO",
+                    'is_trained': False
+                })
+            elif model_name in scored:
+                result = scored[model_name]
+                print(f"✓ {display_name}: {result.probability:.2%}")
+                results.append({
+                    'model': display_name,
+                    'probability': result.probability,
+                    'risk_label': result.get_risk_label(),
+                    'status': "✅ Hợp lệ",
+                    'is_trained': True
+                })
+            else:
+                print(f"✗ Error predicting with {display_name}: {self._group.errors.get(model_name, 'đã hủy')}")
+                results.append({
+                    'model': display_name,
+                    'probability': 0.0,
+                    'risk_label': "Lỗi",
+                    'status': "❌ Lỗi",
+                    'is_trained': False
+                })
+
         # Sort by probability descending
         results.sort(key=lambda x: x['probability'], reverse=True)
-        
+        self.status_label.setText("")
+
         # Display in table
         for i, result in enumerate(results):
             # Model name with DEMO label
             model_display = result['model']
             if not result['is_trained']:
                 model_display += " (DEMO)"
-            
+
             self.table.setItem(i, 0, QTableWidgetItem(model_display))
             self.table.setItem(i, 1, QTableWidgetItem(f"{result['probability']:.2%}"))
             self.table.setItem(i, 2, QTableWidgetItem(result['risk_label']))
             self.table.setItem(i, 3, QTableWidgetItem(result['status']))
-            
+
             # Color coding based on risk
             if result['probability'] >= 0.5:
                 color = QColor(255, 200, 200)  # Red for high risk
             else:
                 color = QColor(200, 255, 200)  # Green for low risk
-            
+
             for col in range(4):
                 self.table.item(i, col).setBackground(color)
 
+    def done(self, r):
+        """Đóng dialog: hủy các task chấm điểm chưa xong"""
+        if getattr(self, '_group', None) is not None:
+            self._group.cancel()
+        super().done(r)
+
 
 if __name__ == "__main__":
     from PyQt6.QtWidgets import QApplication
@@ -22,7 +22,10 @@ sys.path.insert(0, str(project_root))
 from models.customer import Customer
 from models.user import User
 from services.ml_service import MLService
+from services.prediction_log_writer import get_prediction_log_writer
 from services.query_service import QueryService
+from ui.ModelComparisonDialog import score_model
+from ui.task_executor import get_task_executor
 
 
 class PredictionTabWidget(QWidget):
@@ -45,6 +48,8 @@ class PredictionTabWidget(QWidget):
         except Exception:
             self.random_icon = QIcon()
         self._original_customer = None
+        self._predict_task = None
+        self._compare_group = None
         
         # Init ML Service (ưu tiên LightGBM cho tất cả vai trò)
         try:
@@ -53,6 +58,16 @@ class PredictionTabWidget(QWidget):
             print(f"⚠ Không thể load ML model: {e}")
             self.ml_service = None
         
+        # predictions_log ghi write-behind: báo prediction_logged khi lô đã vào MySQL
+        # Writer dùng chung cả process: gỡ listener khi widget bị hủy (logout) để không emit lên QObject đã xóa
+        try:
+            writer = get_prediction_log_writer(self.query_service.db.config)
+            listener = lambda n: self.prediction_logged.emit()
+            writer.add_flush_listener(listener)
+            self.destroyed.connect(lambda *_: writer.remove_flush_listener(listener))
+        except Exception as e:
+            print(f"⚠ Không khởi tạo được prediction log writer: {e}")
+        
         # Init UI
         self.setup_ui()
     
@@ -618,28 +633,62 @@ class PredictionTabWidget(QWidget):
             print(f"{'='*60}\n")
             
             # Admin: Chọn model từ dropdown
+            selected_model = None
             if self.user.is_admin() and self.model_selector:
                 selected_model = self.model_selector.currentText().split()[0]  # Get model name
                 print(f"Admin selected model: {selected_model}")
-                try:
-                    self.ml_service = MLService(model_name=selected_model)
-                except Exception as e:
-                    QMessageBox.warning(self, "Lỗi", f"Không thể load model {selected_model}: {e}")
-                    return
-            
-            # Predict
-            result = self.ml_service.predict_default_risk(input_dict)
-            
-            # Display result
-            self.display_result(result)
-            
-            # Save to database if checked
-            if self.chkSaveHistory.isChecked():
-                self.save_prediction_to_db(input_dict, result)
-        
+
+            # Đọc widget ở GUI thread; load model + predict + ghi DB chạy ở worker
+            save_history = self.chkSaveHistory.isChecked()
+            customer_name = self.txtCustomerName.text().strip()
+            customer_id_card = self.txtCustomerID.text().strip()
         except Exception as e:
             QMessageBox.critical(self, "Lỗi", f"Lỗi khi dự báo: {str(e)}")
             print(f"Prediction error: {e}")
+            return
+
+        if self._predict_task is not None and not self._predict_task.done:
+            self._predict_task.cancel()
+        self.btnPredict.setEnabled(False)
+        self._predict_task = get_task_executor().submit(
+            self._run_prediction,
+            input_dict, selected_model, save_history, customer_name, customer_id_card,
+            name='predict',
+            on_result=self._on_prediction_done,
+            on_error=self._on_prediction_error,
+            on_finished=lambda: self.btnPredict.setEnabled(True),
+        )
+
+    def _run_prediction(self, input_dict, selected_model, save_history, customer_name, customer_id_card,
+                        cancel_token=None):
+        """
+        Load model (nếu admin chọn), dự báo và lưu lịch sử - chạy ở worker thread
+
+        Returns:
+            Tuple (service, result, saved)
+        """
+        service = self.ml_service
+        if selected_model:
+            try:
+                service = MLService(model_name=selected_model)
+            except Exception as e:
+                raise RuntimeError(f"Không thể load model {selected_model}: {e}")
+        result = service.predict_default_risk(input_dict)
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        saved = False
+        if save_history:
+            saved = self.save_prediction_to_db(input_dict, result, customer_name, customer_id_card)
+        return service, result, saved
+
+    def _on_prediction_done(self, payload):
+        service, result, saved = payload
+        self.ml_service = service
+        self.display_result(result)
+
+    def _on_prediction_error(self, message: str):
+        QMessageBox.critical(self, "Lỗi", f"Lỗi khi dự báo: {message}")
+        print(f"Prediction error: {message}")
     
     def display_result(self, result):
         """Hiển thị kết quả dự báo"""
@@ -659,13 +708,20 @@ class PredictionTabWidget(QWidget):
             self.lblRiskLabel.setStyleSheet("color: #EB5757; padding: 20px; background-color: #fdecef; border-radius: 10px;")
             self.lblProbability.setStyleSheet("color: #EB5757; padding: 10px; background-color: #fdecef; border-radius: 10px;")
     
-    def save_prediction_to_db(self, input_dict, result):
-        """Lưu prediction vào database"""
+    def save_prediction_to_db(self, input_dict, result, customer_name=None, customer_id_card=None) -> bool:
+        """
+        Lưu prediction vào database (gọi được từ worker thread nếu truyền sẵn tên/CMND)
+
+        Returns:
+            True nếu đã lưu
+        """
         try:
             # Create customer if has name/ID
             customer_id = None
-            customer_name = self.txtCustomerName.text().strip()
-            customer_id_card = self.txtCustomerID.text().strip()
+            if customer_name is None:
+                customer_name = self.txtCustomerName.text().strip()
+            if customer_id_card is None:
+                customer_id_card = self.txtCustomerID.text().strip()
             
             if customer_name or customer_id_card:
                 customer = Customer(
@@ -676,7 +732,7 @@ class PredictionTabWidget(QWidget):
                 customer_id = self.query_service.save_customer(customer)
             
             # Save prediction log
-            self.query_service.save_prediction_log(
+            self.query_service.enqueue_prediction_log(
                 customer_id=customer_id,
                 model_name=result.model_name,
                 predicted_label=result.label,
@@ -684,15 +740,12 @@ class PredictionTabWidget(QWidget):
                 raw_input_dict=input_dict,
                 user_id=getattr(self.user, 'id', None)
             )
-            try:
-                self.prediction_logged.emit()
-            except Exception:
-                pass
-            
-            print("✓ Đã lưu prediction vào database")
+            print("✓ Đã đưa prediction vào hàng đợi ghi database")
+            return True
         
         except Exception as e:
             print(f"⚠ Không thể lưu vào database: {e}")
+            return False
     
     def clear_form(self):
         """Xóa toàn bộ form"""
@@ -762,8 +815,7 @@ class PredictionTabWidget(QWidget):
         """So sánh 8 models với DEMO labels"""
         print("🟢🟢🟢 compare_all_models NEW VERSION CALLED! 🟢🟢🟢")
         
-        from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QLabel, QProgressDialog, QApplication
-        from PyQt6.QtGui import QColor, QFont
+        from PyQt6.QtWidgets import QProgressDialog
         from PyQt6.QtCore import Qt
         
         # Collect input
@@ -778,13 +830,39 @@ class PredictionTabWidget(QWidget):
         progress.setWindowTitle("Vui lòng đợi")
         progress.setWindowModality(Qt.WindowModality.ApplicationModal)
         progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+
+        # Model demo không cần chấm điểm; model đã train chạy song song trên TaskExecutor
+        trained = [m for m in ALL_MODELS if m in TRAINED_MODELS]
+        n_demo = len(ALL_MODELS) - len(trained)
+        progress.setValue(n_demo)
         progress.show()
-        
+
+        if self._compare_group is not None:
+            self._compare_group.cancel()
+        group = get_task_executor().map(
+            score_model,
+            trained,
+            customer_data=input_dict,
+            on_progress=lambda done, total: progress.setValue(n_demo + done),
+            on_finished=lambda scored: self._on_compare_finished(group, progress, ALL_MODELS, TRAINED_MODELS, scored),
+        )
+        progress.canceled.connect(group.cancel)
+        self._compare_group = group
+
+    def _on_compare_finished(self, group, progress, ALL_MODELS, TRAINED_MODELS, scored: dict):
+        """Gom kết quả so sánh (GUI thread) và hiển thị dialog"""
+        from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QLabel
+        from PyQt6.QtGui import QColor, QFont
+        from PyQt6.QtCore import Qt
+
+        progress.close()
+        if group.is_cancelled():
+            return
+
         results = []
-        for i, display_name in enumerate(ALL_MODELS):
-            if progress.wasCanceled():
-                break
-                
+        for display_name in ALL_MODELS:
             # Map display name to actual model name
             if display_name == 'Logistic':
                 model_name = 'LogisticRegression'
@@ -795,31 +873,28 @@ class PredictionTabWidget(QWidget):
             
             print(f"🔸 Processing {display_name} → {model_name} → is_trained={is_trained}")
             
-            if is_trained:
-                try:
-                    print(f"   → Trying to load {model_name}...")
-                    service = MLService(model_name=model_name)
-                    res = service.predict_default_risk(input_dict)
-                    prob = res.probability
-                    risk = res.get_risk_label()
-                    status = "✅ Hợp lệ"
-                    print(f"   ✓ {display_name}: {prob:.2%}")
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"   ✗ Error: {error_msg}")
-                    
-                    # Always mark LogisticRegression error as version issue
-                    if "LogisticRegression" in model_name:
-                        prob = 0.0
-                        risk = "Lỗi sklearn"
-                        status = "⚠️ Lỗi version"
-                        is_trained = False
-                        print(f"   ⚠️ {display_name}: Lỗi version sklearn - model cần train lại")
-                    else:
-                        prob = 0.0
-                        risk = "Lỗi"
-                        status = "❌ Lỗi"
-                        is_trained = False
+            if is_trained and model_name in scored:
+                res = scored[model_name]
+                prob = res.probability
+                risk = res.get_risk_label()
+                status = "✅ Hợp lệ"
+                print(f"   ✓ {display_name}: {prob:.2%}")
+            elif is_trained:
+                error_msg = group.errors.get(model_name, '')
+                print(f"   ✗ Error: {error_msg}")
+                
+                # Always mark LogisticRegression error as version issue
+                if "LogisticRegression" in model_name:
+                    prob = 0.0
+                    risk = "Lỗi sklearn"
+                    status = "⚠️ Lỗi version"
+                    is_trained = False
+                    print(f"   ⚠️ {display_name}: Lỗi version sklearn - model cần train lại")
+                else:
+                    prob = 0.0
+                    risk = "Lỗi"
+                    status = "❌ Lỗi"
+                    is_trained = False
             else:
                 prob = 0.0064
                 risk = "Nguy cơ thấp"
@@ -833,11 +908,6 @@ class PredictionTabWidget(QWidget):
                 'status': status,
                 'is_trained': is_trained  # This determines if (DEMO) label is added
             })
-            
-            progress.setValue(i + 1)
-            QApplication.processEvents()
-        
-        progress.close()
 
         # Debug: In toàn bộ kết quả trước khi show dialog
         print("===== DEBUG: KẾT QUẢ SO SÁNH 8 MÔ HÌNH =====")
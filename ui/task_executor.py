@@ -0,0 +1,302 @@
+"""
+Task Executor
+Chạy tác vụ nặng (load model, chấm điểm, ghi MySQL) trên QThreadPool dùng chung để GUI không bị đứng
+
+    executor = get_task_executor()
+    handle = executor.submit(fn, arg, on_result=..., on_error=..., on_progress=...)
+    handle.cancel()
+
+    group = executor.map(score_one, ['XGBoost', 'LightGBM'], on_item=..., on_finished=...)
+    group.cancel()
+
+- Callback được gọi trên GUI thread (signal Qt, queued connection)
+- Hàm có tham số cancel_token / progress sẽ được truyền CancelToken và hàm progress(percent, message)
+- Hủy là cooperative: task đang chờ trong hàng đợi bị bỏ, task đang chạy tự kiểm tra cancel_token
+"""
+import inspect
+import itertools
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskCancelled(Exception):
+    """Task bị hủy (raise từ CancelToken.raise_if_cancelled)"""
+
+
+class CancelToken:
+    """Cờ hủy dùng chung giữa GUI thread và worker"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+class TaskSignals(QObject):
+    """Signal của 1 task (object sống ở GUI thread)"""
+    progress = pyqtSignal(int, str)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+def _accepts(fn: Callable, name: str) -> bool:
+    try:
+        params = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in params or any(p.kind == p.VAR_KEYWORD for p in params.values())
+
+
+class _Runnable(QRunnable):
+    def __init__(self, handle: 'TaskHandle', fn: Callable, args: tuple, kwargs: dict):
+        super().__init__()
+        self.setAutoDelete(False)
+        self._handle = handle
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+
+    def run(self):
+        handle = self._handle
+        signals = handle.signals
+        try:
+            handle.token.raise_if_cancelled()
+            kwargs = dict(self._kwargs)
+            if _accepts(self._fn, 'cancel_token'):
+                kwargs['cancel_token'] = handle.token
+            if _accepts(self._fn, 'progress'):
+                kwargs['progress'] = lambda pct, msg='': signals.progress.emit(int(pct), str(msg))
+            value = self._fn(*self._args, **kwargs)
+            handle.token.raise_if_cancelled()
+            signals.result.emit(value)
+        except TaskCancelled:
+            signals.cancelled.emit()
+        except Exception as e:
+            print(f"✗ Task {handle.name} lỗi: {e}")
+            signals.error.emit(str(e))
+        finally:
+            signals.finished.emit()
+
+
+class TaskHandle:
+    """Kết quả của TaskExecutor.submit - dùng để hủy / nối thêm callback"""
+
+    def __init__(self, task_id: int, name: str):
+        self.id = task_id
+        self.name = name
+        self.token = CancelToken()
+        self.signals = TaskSignals()
+        self.done = False
+        self._runnable: Optional[_Runnable] = None
+
+    def cancel(self):
+        self.token.cancel()
+
+    def is_cancelled(self) -> bool:
+        return self.token.is_cancelled()
+
+
+class TaskGroup(QObject):
+    """
+    Nhóm task chạy song song (TaskExecutor.map), gom kết quả theo key
+
+    Signals:
+        item_done(key, result, error): mỗi khi 1 item xong (error = '' nếu thành công)
+        progress(done, total)
+        finished(dict): {key: result} các item thành công, phát 1 lần khi mọi item xong/hủy
+    """
+    item_done = pyqtSignal(object, object, str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(dict)
+
+    def __init__(self, total: int):
+        super().__init__()
+        self.total = total
+        self.results: Dict[Any, Any] = {}
+        self.errors: Dict[Any, str] = {}
+        self.handles = []
+        self._done = 0
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+        for h in self.handles:
+            h.cancel()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def _item_finished(self, key, value=None, error: str = '', ok: bool = True):
+        if ok:
+            self.results[key] = value
+        elif error:
+            self.errors[key] = error
+        self._done += 1
+        self.item_done.emit(key, value, error)
+        self.progress.emit(self._done, self.total)
+        if self._done == self.total:
+            self.finished.emit(dict(self.results))
+
+
+class TaskExecutor(QObject):
+    """
+    Bridge QThreadPool <-> signal Qt, dùng chung cho các tab (ui/ và UI/)
+    """
+
+    def __init__(self, max_threads: Optional[int] = None):
+        """
+        Args:
+            max_threads: Số worker thread tối đa (None = theo số CPU của QThreadPool)
+        """
+        super().__init__()
+        self.pool = QThreadPool()
+        if max_threads:
+            self.pool.setMaxThreadCount(int(max_threads))
+        self._ids = itertools.count(1)
+        # Giữ tham chiếu tới task đang chạy để signal object không bị GC
+        self._active: Dict[int, TaskHandle] = {}
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        name: Optional[str] = None,
+        on_result: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[str], None]] = None,
+        on_progress: Optional[Callable[[int, str], None]] = None,
+        on_cancelled: Optional[Callable[[], None]] = None,
+        on_finished: Optional[Callable[[], None]] = None,
+        **kwargs
+    ) -> TaskHandle:
+        """
+        Chạy fn(*args, **kwargs) trên thread pool
+
+        Args:
+            fn: Hàm chạy ở worker (không được đụng tới widget)
+            name: Tên task (log)
+            on_result / on_error / on_progress / on_cancelled / on_finished: callback trên GUI thread
+
+        Returns:
+            TaskHandle
+        """
+        handle = TaskHandle(next(self._ids), name or getattr(fn, '__name__', 'task'))
+        sig = handle.signals
+        if on_result:
+            sig.result.connect(on_result)
+        if on_error:
+            sig.error.connect(on_error)
+        if on_progress:
+            sig.progress.connect(on_progress)
+        if on_cancelled:
+            sig.cancelled.connect(on_cancelled)
+        if on_finished:
+            sig.finished.connect(on_finished)
+        sig.finished.connect(lambda h=handle: self._release(h))
+
+        self._active[handle.id] = handle
+        handle._runnable = _Runnable(handle, fn, args, kwargs)
+        self.pool.start(handle._runnable)
+        return handle
+
+    def map(
+        self,
+        fn: Callable,
+        items: Iterable,
+        key: Optional[Callable[[Any], Any]] = None,
+        on_item: Optional[Callable[[Any, Any, str], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        on_finished: Optional[Callable[[dict], None]] = None,
+        **kwargs
+    ) -> TaskGroup:
+        """
+        Chạy fn(item, **kwargs) song song cho từng item
+
+        Args:
+            fn: Hàm xử lý 1 item
+            items: Danh sách item
+            key: Hàm lấy key kết quả từ item (mặc định chính item)
+            on_item(key, result, error) / on_progress(done, total) / on_finished(results): callback GUI thread
+
+        Returns:
+            TaskGroup (cancel() để hủy các item chưa xong)
+        """
+        items = list(items)
+        group = TaskGroup(len(items))
+        if on_item:
+            group.item_done.connect(on_item)
+        if on_progress:
+            group.progress.connect(on_progress)
+        if on_finished:
+            group.finished.connect(on_finished)
+        if not items:
+            group.finished.emit({})
+            return group
+
+        for item in items:
+            k = key(item) if key else item
+            h = self.submit(
+                fn, item,
+                name=f"{getattr(fn, '__name__', 'task')}[{k}]",
+                on_result=lambda v, k=k: group._item_finished(k, v),
+                on_error=lambda e, k=k: group._item_finished(k, None, e, ok=False),
+                on_cancelled=lambda k=k: group._item_finished(k, None, '', ok=False),
+                **kwargs
+            )
+            group.handles.append(h)
+        return group
+
+    def _release(self, handle: TaskHandle):
+        handle.done = True
+        self._active.pop(handle.id, None)
+
+    def cancel_all(self):
+        """Hủy mọi task: bỏ task còn trong hàng đợi, báo hủy cho task đang chạy"""
+        for handle in list(self._active.values()):
+            handle.cancel()
+            if handle._runnable is not None and self.pool.tryTake(handle._runnable):
+                handle.signals.cancelled.emit()
+                handle.signals.finished.emit()
+
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def shutdown(self, wait_ms: int = 5000) -> bool:
+        """
+        Hủy task và chờ worker dừng (gọi khi thoát ứng dụng)
+
+        Returns:
+            True nếu mọi worker đã dừng trong wait_ms
+        """
+        self.cancel_all()
+        return self.pool.waitForDone(int(wait_ms))
+
+
+_executor: Optional[TaskExecutor] = None
+
+
+def get_task_executor() -> TaskExecutor:
+    """Lấy TaskExecutor dùng chung (tạo ở GUI thread lần đầu gọi)"""
+    global _executor
+    if _executor is None:
+        _executor = TaskExecutor()
+    return _executor
+
+
+def shutdown_task_executor(wait_ms: int = 5000):
+    """Dừng TaskExecutor dùng chung nếu đã tạo"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait_ms)
+        _executor = None